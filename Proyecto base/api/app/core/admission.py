@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict
+
+
+class Saturado(Exception):
+    """La cola de un endpoint está llena o la espera superó el máximo"""
+
+
+class AdmissionControl:
+    """
+    Control de admisión de un endpoint: como mucho `max_concurrentes`
+    peticiones se procesan a la vez y hasta `max_cola` esperan turno. Si la
+    cola está llena, o una petición espera más de `espera_max_s`, se rechaza
+    de inmediato con `Saturado` en lugar de acumular trabajo.
+
+    Vive en el event loop (las esperas no ocupan hilos del threadpool), así
+    que sus contadores no necesitan locks.
+    """
+
+    def __init__(self, nombre: str, max_concurrentes: int, max_cola: int, espera_max_s: float,
+                 muestras: int = 1000):
+        self.nombre = nombre
+        self.max_concurrentes = max_concurrentes
+        self.max_cola = max_cola
+        self.espera_max_s = espera_max_s
+        self._semaforo = asyncio.Semaphore(max_concurrentes)
+        self.en_curso = 0
+        self.en_cola = 0
+        self.admitidas = 0
+        self.rechazadas = 0
+        # Últimos tiempos de espera en cola (segundos)
+        self._esperas = deque(maxlen=muestras)
+
+    async def entrar(self) -> float:
+        """Espera turno y devuelve el tiempo pasado en cola, en segundos"""
+        if self._semaforo.locked() and self.en_cola >= self.max_cola:
+            self.rechazadas += 1
+            raise Saturado(self.nombre)
+
+        inicio = time.perf_counter()
+        self.en_cola += 1
+        # asyncio.timeout espera en la misma tarea: a diferencia de wait_for,
+        # un permiso concedido justo al vencer el plazo no queda huérfano
+        adquirido = False
+        try:
+            async with asyncio.timeout(self.espera_max_s):
+                adquirido = await self._semaforo.acquire()
+        except TimeoutError:
+            self.rechazadas += 1
+            raise Saturado(self.nombre)
+        except asyncio.CancelledError:
+            # Petición cancelada (el cliente se fue): si el permiso ya era
+            # suyo, se devuelve
+            if adquirido:
+                self._semaforo.release()
+            raise
+        finally:
+            self.en_cola -= 1
+
+        espera = time.perf_counter() - inicio
+        self.en_curso += 1
+        self.admitidas += 1
+        self._esperas.append(espera)
+        return espera
+
+    def salir(self):
+        self.en_curso -= 1
+        self._semaforo.release()
+
+    def stats(self) -> Dict[str, float]:
+        esperas = sorted(self._esperas)
+
+        def percentil(p: float) -> float:
+            if not esperas:
+                return 0.0
+            return round(esperas[min(len(esperas) - 1, int(p / 100 * len(esperas)))] * 1000, 2)
+
+        return {
+            "max_concurrentes": self.max_concurrentes,
+            "max_cola": self.max_cola,
+            "en_curso": self.en_curso,
+            "en_cola": self.en_cola,
+            "admitidas": self.admitidas,
+            "rechazadas": self.rechazadas,
+            "espera_p50_ms": percentil(50),
+            "espera_p99_ms": percentil(99),
+        }
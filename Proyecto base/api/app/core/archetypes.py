@@ -0,0 +1,205 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from .model_manager import ModelManager, RATING_COLUMNS
+
+# Clave de los resultados sin filtro de provincia
+TODAS_LAS_PROVINCIAS = "*"
+
+# Temas para generar familias sintéticas: cada familia se inclina por uno o
+# dos temas y sus miembros califican alto los atractivos del tema
+TEMAS = {
+    "playa_y_descanso": ["resorts", "playas", "piscinas", "hoteles_alojamientos", "belleza_spas"],
+    "cultura": ["iglesias", "teatros", "museos", "galerias_arte", "monumentos"],
+    "naturaleza": ["parques", "zoologicos", "miradores", "jardines"],
+    "gastronomia": ["restaurantes", "pizzerias_hamburgueserias", "juguerias", "panaderias", "cafeterias"],
+    "vida_nocturna": ["bares_pubs", "discotecas"],
+    "ciudad": ["centros_comerciales", "servicios_locales", "gimnasios"],
+}
+
+
+def vector_preferencias(aggregated_preferences: Dict[str, float], columnas: List[str] = RATING_COLUMNS) -> np.ndarray:
+    """Preferencias agregadas como vector de 24 valores (0 = sin preferencia)"""
+    return np.array([aggregated_preferences.get(col, 0.0) for col in columnas], dtype=np.float32)
+
+
+def familias_sinteticas(n: int, seed: int = 42, columnas: List[str] = RATING_COLUMNS) -> np.ndarray:
+    """
+    Matriz (n × columnas) de preferencias agregadas de familias sintéticas,
+    con NaN donde ningún miembro opinó.
+    """
+    rng = np.random.default_rng(seed)
+    posicion = {col.replace("Calif promedio ", ""): j for j, col in enumerate(columnas)}
+    temas = list(TEMAS.values())
+    vectores = np.full((n, len(columnas)), np.nan)
+    for i in range(n):
+        elegidos = rng.choice(len(temas), size=rng.integers(1, 3), replace=False)
+        sumas = np.zeros(len(columnas))
+        conteos = np.zeros(len(columnas))
+        for _ in range(rng.integers(2, 7)):
+            for t in elegidos:
+                for item in temas[t]:
+                    if rng.random() < 0.7:
+                        sumas[posicion[item]] += rng.integers(4, 6)
+                        conteos[posicion[item]] += 1
+            for j in rng.choice(len(columnas), size=rng.integers(0, 4), replace=False):
+                sumas[j] += rng.integers(1, 6)
+                conteos[j] += 1
+        con_valor = conteos > 0
+        vectores[i, con_valor] = sumas[con_valor] / conteos[con_valor]
+    return vectores
+
+
+def vectores_historicos(new_data_path: str, columnas: List[str] = RATING_COLUMNS) -> np.ndarray:
+    """Preferencias de los registros guardados por save_family_record (0 = sin preferencia)"""
+    if not os.path.exists(new_data_path):
+        return np.empty((0, len(columnas)))
+    df = pd.read_csv(new_data_path)
+    for col in columnas:
+        if col not in df.columns:
+            df[col] = 0.0
+    vectores = np.array(df[columnas].apply(pd.to_numeric, errors="coerce"), dtype=float)
+    vectores[vectores == 0] = np.nan
+    return vectores
+
+
+def a_preferencias(vector: np.ndarray, columnas: List[str] = RATING_COLUMNS) -> Dict[str, float]:
+    return {col: float(v) for col, v in zip(columnas, vector) if not np.isnan(v)}
+
+
+class ArchetypeIndex:
+    """
+    Recomendaciones precalculadas por arquetipo de preferencias y provincia.
+
+    Se genera fuera de línea (generar_arquetipos.py) y se guarda junto al
+    modelo con la versión del modelo que la produjo; si el modelo cambia, el
+    archivo se ignora hasta regenerarlo.
+    """
+
+    def __init__(self, model_version: str, centroides: np.ndarray, nombres: List[str],
+                 resultados: List[Dict[str, List[dict]]], calidad: Optional[dict] = None):
+        self.model_version = model_version
+        self.centroides = np.asarray(centroides, dtype=np.float32)
+        self.nombres = nombres
+        self.resultados = resultados
+        self.calidad = calidad or {}
+        # Destinos guardados por arquetipo (las provincias pequeñas pueden tener menos)
+        self.top_m = max(
+            (len(recs) for por_provincia in resultados for recs in por_provincia.values()), default=0
+        )
+
+    @classmethod
+    def build(cls, model_manager: ModelManager, catalogo: pd.DataFrame, vectores: np.ndarray,
+              n_arquetipos: int = 12, top_m: int = 50, seed: int = 42) -> Tuple["ArchetypeIndex", list]:
+        """
+        Agrupa los vectores de preferencias con k-means y calcula, con el
+        modelo actual, los `top_m` mejores destinos de cada arquetipo en todo
+        el catálogo y en cada provincia. Devuelve también el orden completo
+        del catálogo por arquetipo (para medir la calidad).
+        """
+        from sklearn.cluster import KMeans
+
+        columnas = model_manager.feature_columns
+        rellenos = np.nan_to_num(vectores, nan=0.0)
+        kmeans = KMeans(n_clusters=n_arquetipos, n_init=10, random_state=seed).fit(rellenos)
+
+        nombres, resultados, ordenes = [], [], []
+        provincias = catalogo["provincia"].str.upper().to_numpy()
+        for a in range(n_arquetipos):
+            miembros = vectores[kmeans.labels_ == a]
+            # Una columna entra en el arquetipo si la fijó al menos la mitad de sus familias
+            conteos = np.sum(~np.isnan(miembros), axis=0)
+            fijadas = conteos >= 0.5 * len(miembros)
+            medias = np.nansum(miembros, axis=0) / np.maximum(conteos, 1)
+            representante = np.where(fijadas, medias, np.nan)
+            preferencias = a_preferencias(representante, columnas)
+
+            principales = np.argsort(-np.nan_to_num(representante, nan=0.0))[:3]
+            nombres.append(" + ".join(columnas[j].replace("Calif promedio ", "") for j in principales))
+
+            scores = model_manager.predict_with_preferences(catalogo, preferencias)
+            orden = np.argsort(-scores, kind="stable")
+            ordenes.append(orden)
+
+            por_provincia = {TODAS_LAS_PROVINCIAS: cls._registros(catalogo, scores, orden[:top_m])}
+            for provincia in np.unique(provincias):
+                en_provincia = orden[provincias[orden] == provincia][:top_m]
+                por_provincia[provincia] = cls._registros(catalogo, scores, en_provincia)
+            resultados.append(por_provincia)
+
+        indice = cls(model_manager.model_version, kmeans.cluster_centers_, nombres, resultados)
+        return indice, ordenes
+
+    @staticmethod
+    def _registros(catalogo: pd.DataFrame, scores: np.ndarray, posiciones: np.ndarray) -> List[dict]:
+        filas = catalogo.iloc[posiciones]
+        return [
+            {
+                "nombre": r["nombre"],
+                "provincia": r["provincia"],
+                "canton": r["canton"],
+                "lat": float(r["lat"]),
+                "lon": float(r["lon"]),
+                "predicted_score": round(float(score), 3),
+            }
+            for (_, r), score in zip(filas.iterrows(), scores[posiciones])
+        ]
+
+    def nearest(self, aggregated_preferences: Dict[str, float], columnas: List[str] = RATING_COLUMNS) -> int:
+        diferencias = self.centroides - vector_preferencias(aggregated_preferences, columnas)
+        return int(np.argmin(np.einsum("ij,ij->i", diferencias, diferencias)))
+
+    def recommend(self, aggregated_preferences: Dict[str, float], provincia: Optional[str],
+                  top_k: int) -> Optional[Tuple[int, List[dict]]]:
+        """
+        Recomendaciones del arquetipo más cercano, o None si no se pueden
+        responder desde lo precalculado (top_k mayor al guardado o provincia
+        desconocida).
+        """
+        if top_k > self.top_m:
+            return None
+        arquetipo = self.nearest(aggregated_preferences)
+        clave = provincia.upper() if provincia else TODAS_LAS_PROVINCIAS
+        recs = self.resultados[arquetipo].get(clave)
+        if recs is None:
+            return None
+        return arquetipo, [dict(r) for r in recs[:top_k]]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model_version": self.model_version,
+                "centroides": self.centroides.tolist(),
+                "nombres": self.nombres,
+                "resultados": self.resultados,
+                "calidad": self.calidad,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, model_version: Optional[str]) -> Optional["ArchetypeIndex"]:
+        """
+        Carga los arquetipos si existen y corresponden al modelo actual. Si
+        faltan o son de otro modelo avisa al arrancar: sin ellos no hay modo
+        rápido ni nivel "precalculado" (ARQUETIPOS_PATH vacío los desactiva
+        sin aviso).
+        """
+        if not path:
+            return None
+        if not os.path.exists(path):
+            print(f"Aviso: no hay arquetipos en {path}; sin modo rápido ni nivel precalculado "
+                  f"hasta generarlos (python generar_arquetipos.py).")
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("model_version") != model_version:
+            print(f"Aviso: arquetipos en {path} generados con el modelo {data.get('model_version')}, "
+                  f"no con el actual ({model_version}); se ignoran hasta regenerarlos "
+                  f"(python generar_arquetipos.py).")
+            return None
+        print(f"Arquetipos cargados: {len(data['nombres'])}")
+        return cls(data["model_version"], np.array(data["centroides"]), data["nombres"],
+                   data["resultados"], data.get("calidad"))
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+class _Pendiente:
+    __slots__ = ("X", "evento", "resultado", "error")
+
+    def __init__(self, X: np.ndarray):
+        self.X = X
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Agrupa predicciones concurrentes en una sola llamada al modelo.
+
+    Cada llamador entrega su bloque de filas y espera. Un hilo de fondo toma
+    el primer bloque pendiente, junta los que lleguen durante `ventana_s`
+    (hasta `max_lote` bloques o `max_filas` filas), predice una vez sobre
+    todos apilados y reparte a cada llamador sus filas. Si la predicción falla,
+    todos los llamadores del lote reciben la excepción.
+
+    Solo compensa para bloques pequeños, donde pesa el costo fijo de cada
+    llamada: los bloques de `max_filas_bloque` filas o más se predicen
+    directamente. Si no hay otro llamador activo tampoco se espera la ventana.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], ventana_s: float = 0.002,
+                 max_lote: int = 64, max_filas: int = 20_000, max_filas_bloque: int = 1024):
+        self.predict_fn = predict_fn
+        self.ventana_s = ventana_s
+        self.max_lote = max_lote
+        self.max_filas = max_filas
+        self.max_filas_bloque = max_filas_bloque
+        self._cola: "queue.Queue[_Pendiente]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._activos = 0
+        self.lotes = 0
+        self.predicciones = 0
+        self._hilo = threading.Thread(target=self._bucle, name="microbatcher", daemon=True)
+        self._hilo.start()
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) >= self.max_filas_bloque:
+            return self.predict_fn(X)
+
+        pendiente = _Pendiente(X)
+        with self._lock:
+            self._activos += 1
+        try:
+            self._cola.put(pendiente)
+            pendiente.evento.wait()
+        finally:
+            with self._lock:
+                self._activos -= 1
+        if pendiente.error is not None:
+            raise pendiente.error
+        return pendiente.resultado
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            filas = len(lote[0].X)
+            limite = time.monotonic() + self.ventana_s
+            while len(lote) < self.max_lote and filas < self.max_filas:
+                restante = limite - time.monotonic()
+                try:
+                    if restante <= 0 or self._activos <= 1:
+                        # Ventana agotada o llamador único: solo lo ya encolado
+                        siguiente = self._cola.get_nowait()
+                    else:
+                        siguiente = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                lote.append(siguiente)
+                filas += len(siguiente.X)
+            self._procesar(lote)
+
+    def _procesar(self, lote: List[_Pendiente]):
+        try:
+            X = lote[0].X if len(lote) == 1 else np.vstack([p.X for p in lote])
+            scores = self.predict_fn(X)
+            inicio = 0
+            for p in lote:
+                p.resultado = scores[inicio:inicio + len(p.X)]
+                inicio += len(p.X)
+        except Exception as e:
+            for p in lote:
+                p.error = e
+        finally:
+            with self._lock:
+                self.lotes += 1
+                self.predicciones += len(lote)
+            for p in lote:
+                p.evento.set()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "lotes": self.lotes,
+                "predicciones": self.predicciones,
+                "tamano_medio_lote": round(self.predicciones / self.lotes, 2) if self.lotes else 0.0,
+            }
@@ -0,0 +1,92 @@
+import numpy as np
+from typing import Dict
+
+# Punto medio de la escala de calificaciones (1 a 5): el coseno se calcula
+# sobre las calificaciones centradas aquí, para que gustos opuestos (5 frente
+# a 1) den similitud negativa y no casi 1
+CENTRO_ESCALA = 3.0
+# Mayor desviación estándar posible en la escala 1 a 5 (mitad en 1, mitad en 5)
+DESVIACION_MAXIMA = 2.0
+
+
+def similitud_coseno(valores: np.ndarray, opino: np.ndarray) -> np.ndarray:
+    """
+    Coseno entre cada par de miembros sobre las columnas que calificaron
+    ambos, con las calificaciones centradas en CENTRO_ESCALA. NaN si no hay
+    columnas en común o si alguno calificó todas en el punto medio.
+    """
+    x = np.where(opino, valores - CENTRO_ESCALA, 0.0)
+    w = opino.astype(float)
+    producto = x @ x.T
+    # normas[i, k]: norma de i sobre las columnas que también calificó k
+    normas = (x * x) @ w.T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coseno = producto / np.sqrt(normas * normas.T)
+    coseno[(w @ w.T) == 0] = np.nan
+    return np.clip(coseno, -1.0, 1.0)
+
+
+def correlacion_rangos(valores: np.ndarray, opino: np.ndarray) -> np.ndarray:
+    """
+    Correlación de Spearman entre cada par de miembros sobre las columnas que
+    calificaron ambos (rangos promedio en los empates). Todo el cálculo es un
+    bloque (miembros × miembros × columnas × columnas), sin ciclos por par.
+    NaN si hay menos de dos columnas en común o alguno no varía en ellas.
+    """
+    comunes = opino[:, None, :] & opino[None, :, :]              # (n, n, k)
+    x = np.where(opino, valores, 0.0)
+
+    # r_i[i, k, j]: rango de la columna j de i entre las columnas que i y k
+    # calificaron; los rangos de k en el par son r_i[k, i] (el par es simétrico)
+    v = x[:, None, :]
+    menores = ((v[..., None, :] < v[..., :, None]) & comunes[..., None, :]).sum(axis=-1)
+    iguales = ((v[..., None, :] == v[..., :, None]) & comunes[..., None, :]).sum(axis=-1)
+    r_i = menores + (iguales + 1) / 2
+    r_k = r_i.transpose(1, 0, 2)
+    cuenta = comunes.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        d_i = np.where(comunes, r_i - (r_i * comunes).sum(axis=-1, keepdims=True) / cuenta[..., None], 0.0)
+        d_k = np.where(comunes, r_k - (r_k * comunes).sum(axis=-1, keepdims=True) / cuenta[..., None], 0.0)
+        rho = (d_i * d_k).sum(axis=-1) / np.sqrt((d_i ** 2).sum(axis=-1) * (d_k ** 2).sum(axis=-1))
+    rho[cuenta < 2] = np.nan
+    return np.clip(rho, -1.0, 1.0)
+
+
+def conflictos(valores: np.ndarray, opino: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Por columna, entre los miembros que la calificaron: cuántos son, la
+    media, el mínimo, el máximo y el conflicto (desviación estándar relativa
+    a DESVIACION_MAXIMA, de 0 = todos de acuerdo a 1 = opiniones opuestas).
+    También qué miembro la calificó más alto y cuál más bajo.
+    """
+    cuenta = opino.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(opino, valores, 0.0).sum(axis=0) / cuenta
+        varianza = np.where(opino, (valores - media) ** 2, 0.0).sum(axis=0) / cuenta
+    return {
+        "miembros": cuenta,
+        "media": media,
+        "minimo": np.where(opino, valores, np.inf).min(axis=0),
+        "maximo": np.where(opino, valores, -np.inf).max(axis=0),
+        "conflicto": np.sqrt(varianza) / DESVIACION_MAXIMA,
+        "quien_mas": np.where(opino, valores, -np.inf).argmax(axis=0),
+        "quien_menos": np.where(opino, valores, np.inf).argmin(axis=0),
+    }
+
+
+def matriz_compatibilidad(preferencias: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compatibilidad de la familia a partir de la matriz (miembros × columnas)
+    de `preferencias_por_miembro` (NaN = sin opinión): coseno y correlación
+    de rangos entre cada par, columnas en común por par y conflictos por
+    columna.
+    """
+    valores = np.asarray(preferencias, dtype=float)
+    opino = ~np.isnan(valores)
+    w = opino.astype(float)
+    return {
+        "coseno": similitud_coseno(valores, opino),
+        "rangos": correlacion_rangos(valores, opino),
+        "comunes": (w @ w.T).astype(int),
+        "conflictos": conflictos(valores, opino),
+    }
@@ -0,0 +1,58 @@
+import numpy as np
+from typing import Callable, Dict, List
+
+from .preferences import normalizar_texto
+
+# Peso de cada rol en la estrategia "equidad_rol". Se busca la clave dentro
+# del rol normalizado, así que funciona con los roles del frontend ("👦👧 Hijos
+# (Adolescentes 13-17)", "👴👵 Abuelos", ...). Los roles sin coincidencia pesan 1.
+# Hijos y abuelos suelen quedar en minoría en las decisiones, por eso pesan más.
+PESOS_ROL = {
+    "hijos": 1.5,
+    "abuelos": 1.25,
+    "padres": 1.0,
+}
+
+
+def pesos_por_rol(roles: List[str]) -> np.ndarray:
+    pesos = []
+    for rol in roles:
+        rol_norm = normalizar_texto(rol)
+        pesos.append(next((p for clave, p in PESOS_ROL.items() if clave in rol_norm), 1.0))
+    return np.asarray(pesos, dtype=float)
+
+
+def _promedio(scores: np.ndarray, roles: List[str]) -> np.ndarray:
+    return scores.mean(axis=0)
+
+
+def _minima_miseria(scores: np.ndarray, roles: List[str]) -> np.ndarray:
+    return scores.min(axis=0)
+
+
+def _maximo_placer(scores: np.ndarray, roles: List[str]) -> np.ndarray:
+    return scores.max(axis=0)
+
+
+def _equidad_rol(scores: np.ndarray, roles: List[str]) -> np.ndarray:
+    pesos = pesos_por_rol(roles)
+    return pesos @ scores / pesos.sum()
+
+
+# Estrategias de consenso: reciben los scores (miembros × destinos) y los
+# roles de los miembros, y devuelven un score por destino
+ESTRATEGIAS: Dict[str, Callable[[np.ndarray, List[str]], np.ndarray]] = {
+    "promedio": _promedio,
+    "minima_miseria": _minima_miseria,
+    "maximo_placer": _maximo_placer,
+    "equidad_rol": _equidad_rol,
+}
+
+
+def combinar_scores(scores: np.ndarray, estrategia: str, roles: List[str]) -> np.ndarray:
+    """
+    Combina los scores individuales en un score de grupo por destino
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia desconocida: {estrategia}")
+    return ESTRATEGIAS[estrategia](scores, roles)
@@ -0,0 +1,111 @@
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Niveles de servicio de recommend_destinations, del más caro al más barato
+NIVELES = ("completo", "candidatos", "sustituto", "cache", "precalculado")
+
+
+class EstimadorCostos:
+    """
+    Costo de cada etapa de la recomendación, como media móvil exponencial de
+    lo observado: "carga" por lectura del catálogo, "booster" y "sustituto"
+    por fila puntuada. Con él se elige el nivel más completo que cabe en el
+    tiempo que le queda a una petición con plazo.
+
+    Los costos suben rápido (`alfa_subida`) y bajan despacio (`alfa`), y el
+    costo por fila del booster incluye el costo fijo de cada llamada, así que
+    en bloques pequeños se sobreestima: el error es hacia el lado seguro.
+    """
+
+    def __init__(self, iniciales: Dict[str, float], alfa: float = 0.2, alfa_subida: float = 0.5,
+                 margen: float = 0.8):
+        self.alfa = alfa
+        self.alfa_subida = alfa_subida
+        # Fracción del tiempo restante que se reparte entre las etapas; el
+        # resto queda para armar la respuesta
+        self.margen = margen
+        self._costos = dict(iniciales)
+        self._servidos: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def observar(self, etapa: str, segundos: float, filas: int = 1):
+        if filas <= 0:
+            return
+        muestra = segundos / filas
+        with self._lock:
+            anterior = self._costos.get(etapa)
+            if anterior is None:
+                self._costos[etapa] = muestra
+            else:
+                alfa = self.alfa_subida if muestra > anterior else self.alfa
+                self._costos[etapa] = anterior + alfa * (muestra - anterior)
+
+    def estimar(self, etapa: str, filas: int = 1) -> float:
+        """Segundos estimados para `filas` filas de la etapa (0 si aún no se ha observado)"""
+        return self._costos.get(etapa, 0.0) * filas
+
+    def elegir_nivel(self, disponible: float, destinos: int, miembros: int,
+                     candidatos: int, minimo: int) -> Tuple[Optional[str], int]:
+        """
+        Nivel y candidatos de la primera etapa (0 = sin primera etapa) para
+        `destinos` filtrados puntuados por `miembros` (1 con preferencias
+        promediadas) en `disponible` segundos. `candidatos` es la primera etapa
+        pedida. Devuelve (None, 0) si ni el sustituto cabe: entonces solo queda
+        una respuesta guardada.
+        """
+        presupuesto = disponible * self.margen
+        filas = candidatos if 0 < candidatos < destinos else destinos
+        sustituto = self.estimar("sustituto", destinos * miembros)
+
+        costo = self.estimar("booster", filas * miembros) + (sustituto if filas < destinos else 0.0)
+        if costo <= presupuesto:
+            return ("completo", 0) if filas == destinos else ("candidatos", filas)
+
+        por_destino = self.estimar("booster", miembros)
+        if por_destino > 0:
+            n = min(filas, int((presupuesto - sustituto) / por_destino))
+            if n >= minimo:
+                return "candidatos", n
+
+        if sustituto <= presupuesto:
+            return "sustituto", 0
+        return None, 0
+
+    def registrar(self, nivel: str):
+        with self._lock:
+            self._servidos[nivel] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "costo_us": {
+                    etapa: round(costo * 1e6, 3) for etapa, costo in self._costos.items()
+                },
+                "servidos": {nivel: self._servidos[nivel] for nivel in NIVELES},
+            }
+
+
+class UltimasRespuestas:
+    """Últimas respuestas exactas por clave de recomendación (LRU acotado)"""
+
+    def __init__(self, max_claves: int = 1024):
+        self.max_claves = max_claves
+        self._respuestas: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave: str) -> Optional[dict]:
+        with self._lock:
+            respuesta = self._respuestas.get(clave)
+            if respuesta is not None:
+                self._respuestas.move_to_end(clave)
+            return respuesta
+
+    def put(self, clave: str, respuesta: dict):
+        if self.max_claves <= 0:
+            return
+        with self._lock:
+            self._respuestas[clave] = respuesta
+            self._respuestas.move_to_end(clave)
+            while len(self._respuestas) > self.max_claves:
+                self._respuestas.popitem(last=False)
@@ -1,9 +1,16 @@
 import os
+import json
+import time
+import hashlib
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional, Tuple
+import xgboost as xgb
 from xgboost import XGBRegressor
 
+from .batching import MicroBatcher
+from .training import N_ARBOLES, PARAMETROS, entrenar_booster, huella_archivo, muestra
+
 # Columnas de calificación de atractivos (mismo orden que el CSV)
 RATING_COLUMNS = [
     "Calif promedio iglesias","Calif promedio resorts","Calif promedio playas","Calif promedio parques",
@@ -15,6 +22,16 @@ RATING_COLUMNS = [
     "Calif promedio miradores","Calif promedio monumentos","Calif promedio jardines"
 ]
 
+# Filas con las que se ajusta el sustituto lineal al entrenar por bloques
+FILAS_SUSTITUTO = 200_000
+
+# Variantes que se pueden servir siempre, sin generar nada fuera de línea
+VARIANTES_BASE: Dict[str, Dict[str, Any]] = {
+    "completo": {"tipo": "completo"},
+    "media": {"tipo": "media"},
+    "sustituto": {"tipo": "lineal"},
+}
+
 class ModelManager:
     def __init__(self, data_path: str, new_data_path: str):
         self.data_path = os.path.abspath(data_path)
@@ -22,6 +39,24 @@ class ModelManager:
         self.model: XGBRegressor | None = None
         self.is_trained = False
         self.feature_columns = RATING_COLUMNS.copy()
+        self.model_version: str | None = None
+        # Perfil, filas y árboles del último entrenamiento
+        self.training_summary: Dict[str, Any] = {}
+        # Variantes servibles por nombre (ver load_variants y use_model); la
+        # versión del modelo combina la huella del booster y la variante activa
+        self.booster_version: str | None = None
+        self.variants: Dict[str, Dict[str, Any]] = {}
+        self.active_model = "completo"
+        self._predictor: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        # Booster de la variante activa cuando es un booster destilado (ver explain)
+        self._variant_booster: Optional[xgb.Booster] = None
+        # Sustituto lineal del booster (primera etapa de la recomendación)
+        self.surrogate_coef: np.ndarray | None = None
+        self.surrogate_intercept: float = 0.0
+        # Segundos por fila del booster y del sustituto medidos al entrenar
+        self.costo_por_fila: Dict[str, float] = {}
+        # Agrupador de predicciones concurrentes (ver enable_batching)
+        self.batcher: MicroBatcher | None = None
 
     def _load_data(self) -> pd.DataFrame:
         if not os.path.exists(self.data_path):
@@ -33,32 +68,283 @@ class ModelManager:
                 df[col] = 0.0
         return df
 
-    def train_model(self):
+    def train_model(self, df: Optional[pd.DataFrame] = None, perfil: str = "clasico",
+                    n_jobs: Optional[int] = None):
         """
-        Entrena el modelo con los datos históricos
+        Entrena el modelo con los datos históricos (o con `df`, p. ej. una
+        partición de entrenamiento) según el perfil de entrenamiento (ver
+        training.PERFILES). `n_jobs` limita los hilos de XGBoost.
         """
-        df = self._load_data()
+        if perfil != "clasico":
+            self._train_profile(df if df is not None else self.data_path, perfil, n_jobs)
+            return
+
+        if df is None:
+            df = self._load_data()
         if "score" not in df.columns:
             raise ValueError("Falta la columna 'score' en el dataset")
         
         X = df[self.feature_columns]
         y = df["score"].astype(float)
 
-        self.model = XGBRegressor(
-            n_estimators=300,
-            learning_rate=0.05,
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            reg_alpha=0.1,
-            reg_lambda=1,
-            objective="reg:squarederror",
-            random_state=42
-        )
+        self.model = XGBRegressor(n_estimators=N_ARBOLES, n_jobs=n_jobs, **PARAMETROS)
         self.model.fit(X, y)
-        self.is_trained = True
+        self.training_summary = {"perfil": perfil, "filas": len(df), "arboles": N_ARBOLES}
+        self._after_training(X)
         print(f"Modelo entrenado con {len(df)} registros.")
 
+    def load_artifact(self, path: str):
+        """
+        Carga un modelo publicado por buscar_hiperparametros.py (carpeta con
+        modelo.ubj y metadata.json) en lugar de entrenar. El sustituto lineal
+        se ajusta sobre una muestra de los datos actuales.
+
+        Falla si el modelo usa otras columnas que la API y avisa si se
+        entrenó con otros datos que los de data_path o si a estos les faltan
+        columnas del modelo (se completarían con 0).
+        """
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            metadata = json.load(f)
+        self.model = XGBRegressor()
+        self.model.load_model(os.path.join(path, "modelo.ubj"))
+
+        version = metadata["version"]
+        columnas = metadata.get("columnas") or self.model.get_booster().feature_names
+        if columnas is not None and list(columnas) != self.feature_columns:
+            raise ValueError(f"El modelo publicado {version} usa otras columnas que la API")
+        encabezado = pd.read_csv(self.data_path, sep="|", nrows=0).columns.str.strip()
+        faltantes = [c for c in self.feature_columns if c not in encabezado]
+        if faltantes:
+            print(f"Aviso: a {self.data_path} le faltan {len(faltantes)} columnas del modelo publicado {version}: "
+                  f"{', '.join(faltantes)}")
+        datos = metadata.get("datos", {})
+        if datos.get("sha1") and datos["sha1"] != huella_archivo(self.data_path):
+            print(f"Aviso: el modelo publicado {version} se entrenó con otros datos ({datos.get('ruta')}), "
+                  f"no con {self.data_path}")
+        self.training_summary = {"perfil": "publicado", "artefacto": version,
+                                 "filas": metadata["filas"], "arboles": metadata["arboles"]}
+        self._after_training(muestra(self.data_path, self.feature_columns, FILAS_SUSTITUTO))
+        print(f"Modelo publicado {version} cargado desde {path}")
+
+    def load_or_train(self, artefacto: Optional[str] = None, perfil: str = "clasico",
+                      n_jobs: Optional[int] = None):
+        """Carga el modelo publicado en `artefacto` si se indica; si no, entrena con el perfil"""
+        if artefacto:
+            self.load_artifact(artefacto)
+        else:
+            self.train_model(perfil=perfil, n_jobs=n_jobs)
+
+    def _train_profile(self, fuente, perfil: str, n_jobs: Optional[int]):
+        """Entrena por bloques con entrenar_booster; el sustituto se ajusta sobre una muestra"""
+        if isinstance(fuente, str) and not os.path.exists(fuente):
+            raise FileNotFoundError(f"Archivo de datos no encontrado: {fuente}")
+        booster, self.training_summary = entrenar_booster(fuente, self.feature_columns, perfil, n_jobs)
+        self.model = XGBRegressor(n_jobs=n_jobs)
+        self.model.load_model(bytearray(booster.save_raw()))
+        self._after_training(muestra(fuente, self.feature_columns, FILAS_SUSTITUTO))
+        print(f"Modelo entrenado con {self.training_summary['filas']} registros "
+              f"(perfil {perfil}, {self.training_summary['arboles']} árboles).")
+
+    def _after_training(self, X: pd.DataFrame):
+        self.is_trained = True
+        # Huella del booster entrenado: cambia solo si cambia el modelo
+        self.booster_version = hashlib.sha1(self.model.get_booster().save_raw()).hexdigest()[:12]
+        self._fit_surrogate(X)
+        self.variants = {nombre: dict(espec) for nombre, espec in VARIANTES_BASE.items()}
+        self.use_model(self.active_model if self.active_model in self.variants else "completo")
+
+    def export_state(self) -> Dict[str, Any]:
+        """Lo necesario para predecir en otro proceso (ver load_state)"""
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+        return {
+            "booster": bytes(self.model.get_booster().save_raw()),
+            "booster_version": self.booster_version,
+            "active_model": self.active_model,
+            "variant": self.variants[self.active_model],
+            "surrogate_coef": self.surrogate_coef,
+            "surrogate_intercept": self.surrogate_intercept,
+            "costo_por_fila": dict(self.costo_por_fila),
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        """Carga un modelo ya entrenado exportado con export_state, sin reentrenar"""
+        self.model = XGBRegressor()
+        self.model.load_model(bytearray(state["booster"]))
+        self.is_trained = True
+        self.booster_version = state["booster_version"]
+        self.surrogate_coef = state["surrogate_coef"]
+        self.surrogate_intercept = state["surrogate_intercept"]
+        self.costo_por_fila = dict(state["costo_por_fila"])
+        self.variants = {nombre: dict(espec) for nombre, espec in VARIANTES_BASE.items()}
+        self.variants[state["active_model"]] = state["variant"]
+        self.use_model(state["active_model"])
+
+    def load_variants(self, path: str) -> int:
+        """
+        Registra las variantes generadas por destilar_modelo.py (índice
+        `indice.json` en `path`). Las podas se sirven desde el booster actual;
+        los boosters destilados solo si se destilaron de este mismo modelo.
+        Devuelve cuántas variantes se registraron.
+        """
+        indice_path = os.path.join(path, "indice.json")
+        if not os.path.exists(indice_path):
+            return 0
+        with open(indice_path, encoding="utf-8") as f:
+            indice = json.load(f)
+
+        registradas = 0
+        for nombre, espec in indice["variantes"].items():
+            if espec["tipo"] == "booster":
+                if indice["model_version"] != self.booster_version:
+                    print(f"Variante {nombre} descartada: destilada de otro modelo ({indice['model_version']})")
+                    continue
+                with open(os.path.join(path, espec["archivo"]), "rb") as f:
+                    espec = {**espec, "booster": f.read()}
+            if espec["tipo"] in ("poda", "booster"):
+                self.variants[nombre] = espec
+                registradas += 1
+        return registradas
+
+    def use_model(self, nombre: str):
+        """
+        Sirve la variante `nombre` en predict (y en todo lo que pasa por él):
+        "completo" (el booster entrenado), "media" (promedio de las
+        calificaciones, que es como se define el score), "sustituto" (el
+        sustituto lineal) o una registrada con load_variants.
+        """
+        if nombre not in self.variants:
+            raise ValueError(f"Modelo desconocido: {nombre}. Opciones: {', '.join(self.variants)}")
+        self._predictor = self._build_predictor(self.variants[nombre])
+        self.active_model = nombre
+        self.model_version = self.booster_version if nombre == "completo" else f"{self.booster_version}+{nombre}"
+
+    def _build_predictor(self, espec: Dict[str, Any]) -> Callable[[np.ndarray], np.ndarray]:
+        tipo = espec["tipo"]
+        if tipo == "completo":
+            return lambda X: self.model.predict(X)
+        if tipo == "poda":
+            arboles = espec["arboles"]
+            return lambda X: self.model.predict(X, iteration_range=(0, arboles))
+        if tipo == "media":
+            return lambda X: np.asarray(X, dtype=np.float32).mean(axis=1)
+        if tipo == "lineal":
+            return lambda X: np.asarray(X, dtype=np.float32) @ self.surrogate_coef + np.float32(self.surrogate_intercept)
+        if tipo == "booster":
+            modelo = XGBRegressor()
+            modelo.load_model(bytearray(espec["booster"]))
+            self._variant_booster = modelo.get_booster()
+            return modelo.predict
+        raise ValueError(f"Tipo de variante desconocido: {tipo}")
+
+    def explain(self, X, aproximadas: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Contribución de cada columna al score de cada fila de X según el
+        modelo activo, y el valor base de cada fila: la suma de ambos es la
+        predicción. En los boosters son los valores SHAP de XGBoost
+        (pred_contribs); en la media y el sustituto lineal, el término de
+        cada columna. Conviene llamarla solo con las filas a explicar: cuesta
+        bastante más que predecir. Con `aproximadas` los boosters usan el
+        reparto por camino de cada árbol (approx_contribs), mucho más barato;
+        la suma sigue siendo la predicción, pero el reparto entre columnas es
+        menos justo.
+        """
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+
+        X = np.asarray(X, dtype=np.float32)
+        espec = self.variants[self.active_model]
+        if espec["tipo"] == "media":
+            return X / X.shape[1], np.zeros(len(X), dtype=np.float32)
+        if espec["tipo"] == "lineal":
+            return X * self.surrogate_coef, np.full(len(X), self.surrogate_intercept, dtype=np.float32)
+
+        booster = self._variant_booster if espec["tipo"] == "booster" else self.model.get_booster()
+        rango = (0, espec["arboles"]) if espec["tipo"] == "poda" else (0, 0)
+        contribuciones = booster.predict(
+            xgb.DMatrix(X, feature_names=self.feature_columns), pred_contribs=True,
+            approx_contribs=aproximadas, iteration_range=rango
+        )
+        return contribuciones[:, :-1], contribuciones[:, -1]
+
+    def _predict_active(self, X) -> np.ndarray:
+        return self._predictor(X)
+
+    def _fit_surrogate(self, X: pd.DataFrame):
+        """
+        Ajusta por mínimos cuadrados una aproximación lineal de las
+        predicciones del booster sobre los datos de entrenamiento. Es mucho
+        menos precisa que el booster, pero puntúa todo el catálogo con un
+        producto punto y sirve para preseleccionar candidatos.
+        """
+        X_np = X.to_numpy(dtype=float)
+        inicio = time.perf_counter()
+        objetivo = self.model.predict(X_np)
+        self.costo_por_fila["booster"] = (time.perf_counter() - inicio) / len(X_np)
+        A = np.column_stack([X_np, np.ones(len(X_np))])
+        solucion, *_ = np.linalg.lstsq(A, objetivo, rcond=None)
+        self.surrogate_coef = solucion[:-1].astype(np.float32)
+        self.surrogate_intercept = float(solucion[-1])
+
+        X_32 = X_np.astype(np.float32)
+        inicio = time.perf_counter()
+        X_32 @ self.surrogate_coef
+        self.costo_por_fila["sustituto"] = (time.perf_counter() - inicio) / len(X_np)
+
+    def candidate_indices(self, X_destinos: np.ndarray, aggregated_preferences: Dict[str, float], n: int) -> np.ndarray:
+        """
+        Primera etapa: posiciones (en X_destinos) de los `n` destinos con mejor
+        score según el sustituto lineal, para preferencias agregadas dadas. Las
+        columnas fijadas por la familia valen lo mismo para todos los destinos,
+        así que solo las columnas libres influyen en el orden.
+        """
+        if self.surrogate_coef is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+        if n >= len(X_destinos):
+            return np.arange(len(X_destinos))
+
+        coef = self.surrogate_coef.copy()
+        for col in aggregated_preferences:
+            if col in self.feature_columns:
+                coef[self.feature_columns.index(col)] = 0.0
+
+        scores = np.asarray(X_destinos, dtype=np.float32) @ coef
+        candidatos = np.argpartition(-scores, n - 1)[:n]
+        return np.sort(candidatos)
+
+    def surrogate_members(self, X_destinos: np.ndarray, preferencias: np.ndarray) -> np.ndarray:
+        """
+        Como `predict_members`, pero con el sustituto lineal en lugar del
+        booster: score aproximado de cada miembro (fila de `preferencias`,
+        NaN donde no opinó) frente a cada destino. Para preferencias
+        promediadas basta una sola fila.
+        """
+        if self.surrogate_coef is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+
+        X_destinos = np.asarray(X_destinos, dtype=np.float32)
+        preferencias = np.asarray(preferencias, dtype=np.float32)
+        # Score del destino tal cual, más la corrección de las columnas fijadas
+        base = X_destinos @ self.surrogate_coef + self.surrogate_intercept
+        fijadas = ~np.isnan(preferencias)
+        ajuste = np.where(fijadas, preferencias, 0.0) @ self.surrogate_coef
+        return base[None, :] + ajuste[:, None] - (X_destinos @ (fijadas * self.surrogate_coef).T).T
+
+    def enable_batching(self, ventana_ms: float = 0.5, max_lote: int = 64):
+        """
+        Activa el micro-batching: las predicciones pequeñas concurrentes que
+        llegan dentro de `ventana_ms` se resuelven con una sola llamada al booster.
+        """
+        self.batcher = MicroBatcher(self._predict_active, ventana_s=ventana_ms / 1000, max_lote=max_lote)
+
+    def predict(self, X) -> np.ndarray:
+        """Predicción del modelo activo, agrupada con otras concurrentes si el micro-batching está activo"""
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+        if self.batcher is None:
+            return self._predict_active(X)
+        return self.batcher.predict(X)
+
     def predict_score(self, aggregated_preferences: Dict[str, float]) -> float:
         """
         Recibe un diccionario con preferencias agregadas y devuelve el score predicho
@@ -67,9 +353,63 @@ class ModelManager:
             raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
 
         X_input = np.array([aggregated_preferences.get(col, 0.0) for col in self.feature_columns]).reshape(1, -1)
-        score_pred = self.model.predict(X_input)[0]
+        score_pred = self.predict(X_input)[0]
         return float(score_pred)
 
+    def predict_with_preferences(self, X_destinos: pd.DataFrame, aggregated_preferences: Dict[str, float]) -> np.ndarray:
+        """
+        Score de cada destino para unas preferencias agregadas: las columnas
+        indicadas por la familia reemplazan a las del destino en todas las filas.
+        """
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+
+        X = X_destinos[self.feature_columns].to_numpy(dtype=np.float32, copy=True)
+        for col, val in aggregated_preferences.items():
+            if col in self.feature_columns:
+                X[:, self.feature_columns.index(col)] = val
+        return self.predict(X)
+
+    def predict_members(self, X_destinos: np.ndarray, preferencias: np.ndarray) -> np.ndarray:
+        """
+        Score de cada miembro frente a cada destino con una sola predicción
+        sobre el bloque (miembros × destinos). `preferencias` viene de
+        `preferencias_por_miembro`: donde un miembro no opinó (NaN) se usa el
+        valor del destino, igual que en la ruta de preferencias promediadas.
+        Devuelve una matriz (miembros × destinos).
+        """
+        if not self.is_trained or self.model is None:
+            raise RuntimeError("El modelo no ha sido entrenado. Llama a 'train_model()' primero.")
+
+        X_destinos = np.asarray(X_destinos, dtype=np.float32)
+        preferencias = np.asarray(preferencias, dtype=np.float32)
+        bloque = np.where(
+            np.isnan(preferencias)[:, None, :],
+            X_destinos[None, :, :],
+            preferencias[:, None, :],
+        )
+        scores = self.predict(bloque.reshape(-1, X_destinos.shape[1]))
+        return scores.reshape(len(preferencias), len(X_destinos))
+
+    def explain_members(self, X_destinos: np.ndarray, preferencias: np.ndarray,
+                        aproximadas: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Como `predict_members`, pero con las contribuciones de `explain`: una
+        sola llamada sobre el bloque (miembros × destinos). Devuelve las
+        contribuciones (miembros × destinos × columnas) y el valor base
+        (miembros × destinos).
+        """
+        X_destinos = np.asarray(X_destinos, dtype=np.float32)
+        preferencias = np.asarray(preferencias, dtype=np.float32)
+        bloque = np.where(
+            np.isnan(preferencias)[:, None, :],
+            X_destinos[None, :, :],
+            preferencias[:, None, :],
+        )
+        contribuciones, base = self.explain(bloque.reshape(-1, X_destinos.shape[1]), aproximadas)
+        forma = (len(preferencias), len(X_destinos))
+        return contribuciones.reshape(*forma, -1), base.reshape(forma)
+
     def save_new_record(self, record: Dict[str, Any]):
         """
         Guarda un nuevo registro en el archivo CSV para futuros reentrenamientos
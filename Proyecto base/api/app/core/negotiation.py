@@ -0,0 +1,102 @@
+import contextvars
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import msgpack
+except ImportError:  # MessagePack es opcional: sin la librería la API solo habla JSON
+    msgpack = None
+
+MSGPACK = "application/msgpack"
+TIPOS_MSGPACK = (MSGPACK, "application/x-msgpack")
+TIPOS_JSON = ("application/json", "application/*", "*/*")
+
+# Formato de la respuesta de la petición en curso ("json" o "msgpack"): lo fija
+# RutaNegociada y lo leen RespuestaNegociada y los ETag (uno por formato)
+formato_respuesta: contextvars.ContextVar[str] = contextvars.ContextVar("formato_respuesta", default="json")
+
+
+def calidad(accept: str, tipos: Iterable[str]) -> float:
+    """Mayor factor q que la cabecera Accept da a alguno de los tipos (0 si ninguno)"""
+    mejor = 0.0
+    for parte in accept.split(","):
+        tipo, *parametros = [p.strip() for p in parte.split(";")]
+        if tipo.lower() not in tipos:
+            continue
+        q = 1.0
+        for p in parametros:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        mejor = max(mejor, q)
+    return mejor
+
+
+def prefiere_msgpack(accept: Optional[str]) -> bool:
+    """El cliente acepta MessagePack y no prefiere JSON (sin Accept, JSON)"""
+    if msgpack is None or not accept:
+        return False
+    q = calidad(accept, TIPOS_MSGPACK)
+    return q > 0 and q >= calidad(accept, TIPOS_JSON)
+
+
+class RespuestaNegociada(JSONResponse):
+    """Respuesta en JSON o, si el cliente lo pidió con Accept, en MessagePack"""
+
+    def __init__(self, content, *args, **kwargs):
+        if formato_respuesta.get() == "msgpack":
+            self.media_type = MSGPACK
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content) -> bytes:
+        if self.media_type == MSGPACK:
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+
+class RutaNegociada(APIRoute):
+    """
+    Ruta que además de JSON acepta cuerpos MessagePack (Content-Type
+    application/msgpack) y responde en MessagePack si el cliente lo prefiere
+    (Accept). El cuerpo se decodifica directo a objetos de Python y se valida
+    con los mismos esquemas que el JSON (FamilyBase, etc.), sin pasar por
+    texto. Los errores (HTTPException, validación) se siguen enviando en JSON.
+    """
+
+    def get_route_handler(self):
+        original = super().get_route_handler()
+
+        async def handler(request: Request):
+            tipo = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            if tipo in TIPOS_MSGPACK:
+                if msgpack is None:
+                    raise HTTPException(415, "MessagePack no está disponible en este servidor")
+                body = await request.body()
+                try:
+                    datos = msgpack.unpackb(body, raw=False) if body else None
+                except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+                    raise HTTPException(400, "Cuerpo MessagePack inválido")
+                # FastAPI valida como JSON el cuerpo ya decodificado
+                scope = dict(request.scope)
+                scope["headers"] = [(k, v) for k, v in request.scope["headers"] if k != b"content-type"]
+                scope["headers"].append((b"content-type", b"application/json"))
+                request = Request(scope, request.receive)
+                request._body = body
+                request._json = datos
+
+            formato_respuesta.set("msgpack" if prefiere_msgpack(request.headers.get("accept")) else "json")
+            try:
+                response = await original(request)
+            except HTTPException as exc:
+                # También los 304 de los ETag (uno por formato) y los errores
+                exc.headers = {**(exc.headers or {}), "Vary": "Accept"}
+                raise
+            response.headers.append("Vary", "Accept")
+            return response
+
+        return handler
@@ -0,0 +1,87 @@
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+from .model_manager import RATING_COLUMNS
+
+
+def normalizar_texto(texto: str) -> str:
+    return texto.lower().strip().replace("_", " ").replace("-", " ")
+
+
+@lru_cache(maxsize=2048)
+def columnas_para_clave(clave: str, columnas: Tuple[str, ...] = tuple(RATING_COLUMNS)) -> Tuple[int, ...]:
+    """
+    Índices de las columnas cuyo nombre contiene la clave (forma dict de las
+    preferencias). Se memoriza porque los clientes repiten siempre las mismas claves.
+    """
+    clave_norm = normalizar_texto(clave)
+    return tuple(i for i, col in enumerate(columnas) if clave_norm in normalizar_texto(col))
+
+
+def posiciones_y_valores(miembros: Sequence, columnas: Tuple[str, ...]) -> Tuple[List[int], List[float]]:
+    """
+    Aplana las preferencias de todos los miembros en pares (posición en
+    `columnas`, valor). Acepta las tres formas del esquema: vector denso,
+    índices y valores dispersos, o el diccionario de preferencias.
+    """
+    posiciones, valores = [], []
+    for member in miembros:
+        if member.vector is not None:
+            for i, x in enumerate(member.vector):
+                if x is not None:
+                    posiciones.append(i)
+                    valores.append(x)
+        elif member.indices is not None:
+            posiciones.extend(member.indices)
+            valores.extend(member.valores)
+        else:
+            for key, value in member.preferencias.items():
+                for i in columnas_para_clave(key, columnas):
+                    posiciones.append(i)
+                    valores.append(value)
+    return posiciones, valores
+
+
+def aggregate_preferences(miembros: Sequence, feature_columns: List[str] = RATING_COLUMNS) -> Dict[str, float]:
+    """
+    Promedia las preferencias de la familia por columna, considerando solo
+    los miembros que dieron un valor para esa columna. Las columnas sin
+    ningún valor no aparecen en el resultado.
+    """
+    columnas = tuple(feature_columns)
+    posiciones, valores = posiciones_y_valores(miembros, columnas)
+    if not posiciones:
+        return {}
+
+    sumas = np.bincount(posiciones, weights=valores, minlength=len(columnas))
+    conteos = np.bincount(posiciones, minlength=len(columnas))
+
+    return {
+        columnas[i]: float(sumas[i] / conteos[i])
+        for i in np.flatnonzero(conteos)
+    }
+
+
+def preferencias_por_miembro(miembros: Sequence, feature_columns: List[str] = RATING_COLUMNS) -> np.ndarray:
+    """
+    Matriz (miembros × columnas) con las preferencias de cada miembro, sin
+    promediar entre ellos. NaN marca las columnas en las que el miembro no
+    dio un valor.
+    """
+    columnas = tuple(feature_columns)
+    k = len(columnas)
+    posiciones, valores = [], []
+    for fila, member in enumerate(miembros):
+        pos_miembro, val_miembro = posiciones_y_valores((member,), columnas)
+        posiciones.extend(p + fila * k for p in pos_miembro)
+        valores.extend(val_miembro)
+
+    total = len(miembros) * k
+    posiciones = np.asarray(posiciones, dtype=np.intp)
+    sumas = np.bincount(posiciones, weights=np.asarray(valores, dtype=float), minlength=total)
+    conteos = np.bincount(posiciones, minlength=total)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matriz = np.where(conteos > 0, sumas / conteos, np.nan)
+    return matriz.reshape(len(miembros), k)
@@ -0,0 +1,307 @@
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Peso de una coincidencia según el campo donde aparece el término (si
+# aparece en varios, cuenta el mayor)
+PESOS_CAMPO = {
+    "nombre": 3,
+    "canton": 2,
+    "parroquia": 2,
+    "descripcion": 1,
+}
+# Palabras que no se indexan ni se buscan
+PALABRAS_VACIAS = frozenset(
+    "a al con de del el en es la las lo los o para por que se su un una y".split()
+)
+# Similitud mínima (Jaccard de trigramas) para aceptar un término parecido y
+# cuántos términos parecidos se prueban como máximo por palabra de la consulta
+SIMILITUD_MINIMA = 0.45
+MAX_EXPANSIONES = 8
+# Los prefijos cuentan como coincidencia (búsqueda mientras se escribe) desde
+# este largo, con esta similitud
+LARGO_MINIMO_PREFIJO = 3
+SIMILITUD_PREFIJO = 0.8
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas, sin tildes, diéresis ni virgulilla (ñ → n) y solo letras y números"""
+    texto = unicodedata.normalize("NFKD", str(texto).lower()).encode("ascii", "ignore").decode("ascii")
+    return _NO_ALFANUMERICO.sub(" ", texto).strip()
+
+
+def plegar_serie(textos: pd.Series) -> pd.Series:
+    """`plegar` sobre muchos textos a la vez (operaciones de texto de pandas)"""
+    return (
+        textos.fillna("").astype(str).str.lower()
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.replace(_NO_ALFANUMERICO, " ", regex=True).str.strip()
+    )
+
+
+def terminos_de(texto: str) -> List[str]:
+    return [t for t in plegar(texto).split() if t not in PALABRAS_VACIAS]
+
+
+def trigramas(termino: str) -> List[str]:
+    relleno = f"  {termino} "
+    return sorted({relleno[i:i + 3] for i in range(len(relleno) - 2)})
+
+
+def _agrupar(codigos: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(indptr, posiciones) de las posiciones de cada código, en formato CSR"""
+    orden = np.argsort(codigos, kind="stable").astype(np.int32)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(codigos, minlength=n))
+    return indptr, orden
+
+
+def _expandir_grupos(grupos: np.ndarray, indptr: np.ndarray, posiciones: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Para cada grupo de `grupos`, todas sus posiciones: (índice en `grupos`, posición)"""
+    largos = indptr[grupos + 1] - indptr[grupos]
+    if (largos == 1).all():
+        return np.arange(len(grupos)), posiciones[indptr[grupos]]
+    cual = np.repeat(np.arange(len(grupos)), largos)
+    desplazamiento = np.arange(largos.sum()) - np.repeat(np.cumsum(largos) - largos, largos)
+    return cual, posiciones[indptr[grupos][cual] + desplazamiento]
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido del catálogo para buscar destinos por nombre, cantón,
+    parroquia y descripción, tolerante a tildes y errores de tipeo:
+      • las filas con el mismo nombre, cantón y parroquia forman un documento
+        (se indexa una vez aunque el destino se repita en el catálogo)
+      • cada término plegado (sin tildes, en minúsculas) apunta a los
+        documentos donde aparece, con el peso del mejor campo
+      • cada trigrama apunta a los términos del vocabulario que lo contienen,
+        para encontrar términos parecidos a una palabra mal escrita
+    Todo se guarda en arreglos contiguos (formato CSR), sin objetos por fila;
+    cada texto distinto se pliega una sola vez.
+    """
+
+    def __init__(self, df: pd.DataFrame, descripciones: Optional[Dict[str, str]] = None):
+        inicio = time.perf_counter()
+        descripciones = descripciones or {}
+        self.filas = len(df)
+
+        textos = {c: df[c].fillna("").astype(str).to_numpy() for c in ("nombre", "canton", "parroquia")}
+        claves = pd.MultiIndex.from_arrays(list(textos.values()))
+        doc_de_fila, _ = pd.factorize(claves)
+        self.documentos = int(doc_de_fila.max()) + 1 if len(doc_de_fila) else 0
+        self.doc_indptr, self.doc_filas = _agrupar(doc_de_fila, self.documentos)
+        primera = self.doc_filas[self.doc_indptr[:-1]]
+
+        # (término, documento, peso) de cada campo; cada texto distinto se
+        # pliega y se parte en términos una sola vez, en bloque con pandas, y
+        # sus términos se reparten a los documentos que lo usan
+        por_campo = []
+        for campo, peso in PESOS_CAMPO.items():
+            if campo == "descripcion":
+                nombres = plegar_serie(pd.Series(textos["nombre"][primera]))
+                origen = nombres.map(descripciones).fillna("").to_numpy(dtype=object)
+            else:
+                origen = textos[campo][primera]
+            codigo, unicos = pd.factorize(origen)
+            partes = plegar_serie(pd.Series(unicos, dtype=object)).str.split().explode().dropna()
+            partes = partes[~partes.isin(PALABRAS_VACIAS)]
+            pares = pd.DataFrame({"texto": partes.index.to_numpy(), "termino": partes.to_numpy()}).drop_duplicates()
+            if len(pares):
+                por_campo.append((codigo, len(unicos), pares, peso))
+
+        # Vocabulario en orden alfabético (para los prefijos)
+        vocabulario = pd.Index(np.concatenate([p["termino"].unique().astype(object) for _, _, p, _ in por_campo]))
+        vocabulario = vocabulario.unique().sort_values()
+        self.vocabulario: List[str] = vocabulario.tolist()
+        self.id_termino = {t: i for i, t in enumerate(self.vocabulario)}
+
+        terminos, docs, pesos = [], [], []
+        for codigo, n_textos, pares, peso in por_campo:
+            indptr, posiciones = _agrupar(codigo, n_textos)
+            cual, doc = _expandir_grupos(pares["texto"].to_numpy(), indptr, posiciones)
+            terminos.append(vocabulario.get_indexer(pares["termino"]).astype(np.int64)[cual])
+            docs.append(doc)
+            pesos.append(np.full(len(doc), peso, dtype=np.uint8))
+
+        # Postings por término, ordenados por documento; si un término aparece
+        # en varios campos del mismo documento cuenta el de más peso
+        clave = np.concatenate(terminos) * max(self.documentos, 1) + np.concatenate(docs)
+        peso = np.concatenate(pesos)
+        orden = np.argsort(clave, kind="stable")
+        clave, peso = clave[orden], peso[orden]
+        inicios = np.flatnonzero(np.r_[True, clave[1:] != clave[:-1]])
+        peso = np.maximum.reduceat(peso, inicios)
+        clave = clave[inicios]
+        termino = clave // max(self.documentos, 1)
+        self.indptr = np.zeros(len(self.vocabulario) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(np.bincount(termino, minlength=len(self.vocabulario)))
+        self.postings = (clave % max(self.documentos, 1)).astype(np.int32)
+        self.pesos = peso
+
+        # Trigramas del vocabulario
+        por_trigrama: Dict[str, List[int]] = defaultdict(list)
+        self.n_trigramas = np.zeros(len(self.vocabulario), dtype=np.int16)
+        for i, t in enumerate(self.vocabulario):
+            tri = trigramas(t)
+            self.n_trigramas[i] = len(tri)
+            for x in tri:
+                por_trigrama[x].append(i)
+        self.trigramas = sorted(por_trigrama)
+        self.id_trigrama = {t: i for i, t in enumerate(self.trigramas)}
+        self.tri_indptr = np.zeros(len(self.trigramas) + 1, dtype=np.int64)
+        self.tri_indptr[1:] = np.cumsum([len(por_trigrama[t]) for t in self.trigramas])
+        self.tri_terminos = np.fromiter(
+            (i for t in self.trigramas for i in por_trigrama[t]), dtype=np.int32, count=int(self.tri_indptr[-1])
+        )
+        self.segundos_construccion = time.perf_counter() - inicio
+
+    def expandir(self, palabra: str) -> List[Tuple[int, float]]:
+        """
+        Términos del vocabulario que coinciden con la palabra y su similitud:
+        el término exacto (1.0), los que empiezan por ella y los parecidos por
+        trigramas, los MAX_EXPANSIONES mejores.
+        """
+        similitudes: Dict[int, float] = {}
+        if palabra in self.id_termino:
+            similitudes[self.id_termino[palabra]] = 1.0
+
+        if len(palabra) >= LARGO_MINIMO_PREFIJO:
+            i = bisect_left(self.vocabulario, palabra)
+            while i < len(self.vocabulario) and self.vocabulario[i].startswith(palabra) \
+                    and len(similitudes) < 4 * MAX_EXPANSIONES:
+                similitudes.setdefault(i, SIMILITUD_PREFIJO)
+                i += 1
+
+        propios = trigramas(palabra)
+        tri = [self.id_trigrama[t] for t in propios if t in self.id_trigrama]
+        if tri:
+            terminos = np.concatenate([self.tri_terminos[self.tri_indptr[t]:self.tri_indptr[t + 1]] for t in tri])
+            candidatos, comunes = np.unique(terminos, return_counts=True)
+            jaccard = comunes / (len(propios) + self.n_trigramas[candidatos] - comunes)
+            for i in np.flatnonzero(jaccard >= SIMILITUD_MINIMA):
+                termino = int(candidatos[i])
+                similitudes[termino] = max(similitudes.get(termino, 0.0), float(jaccard[i]))
+
+        return sorted(similitudes.items(), key=lambda kv: (-kv[1], kv[0]))[:MAX_EXPANSIONES]
+
+    def _lista(self, termino: int) -> Tuple[np.ndarray, np.ndarray]:
+        return (self.postings[self.indptr[termino]:self.indptr[termino + 1]],
+                self.pesos[self.indptr[termino]:self.indptr[termino + 1]])
+
+    def _coincidencias(self, expansiones: List[Tuple[int, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Documentos (ordenados) con alguno de los términos y el mejor puntaje en cada uno"""
+        docs, puntajes = [], []
+        for t, s in expansiones:
+            lista, pesos = self._lista(t)
+            docs.append(lista)
+            puntajes.append(pesos * np.float32(s))
+        if len(docs) == 1:
+            return docs[0], puntajes[0]
+        # Las listas ya vienen ordenadas: el ordenamiento estable solo las intercala
+        docs, puntajes = np.concatenate(docs), np.concatenate(puntajes)
+        orden = np.argsort(docs, kind="stable")
+        docs, puntajes = docs[orden], puntajes[orden]
+        inicios = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+        return docs[inicios], np.maximum.reduceat(puntajes, inicios)
+
+    def buscar(self, consulta: str) -> Tuple[np.ndarray, np.ndarray, Dict[str, List[str]]]:
+        """
+        Filas del catálogo que coinciden con todas las palabras de la consulta
+        y su relevancia (suma por palabra de similitud × peso del campo).
+        También devuelve qué términos del vocabulario coincidieron con cada
+        palabra.
+        """
+        palabras = list(dict.fromkeys(terminos_de(consulta)))
+        vacio = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32), {})
+        if not palabras:
+            return vacio
+
+        expansiones = {p: self.expandir(p) for p in palabras}
+        terminos = {p: [self.vocabulario[t] for t, _ in e] for p, e in expansiones.items()}
+        if not all(expansiones.values()):
+            return (*vacio[:2], terminos)
+
+        # Se empieza por la palabra con menos documentos; las demás solo se
+        # buscan entre los que ya coincidieron
+        palabras.sort(key=lambda p: sum(self.indptr[t + 1] - self.indptr[t] for t, _ in expansiones[p]))
+        docs, relevancia = self._coincidencias(expansiones[palabras[0]])
+        relevancia = relevancia.astype(np.float32)
+
+        for palabra in palabras[1:]:
+            if not len(docs):
+                break
+            mejor = np.zeros(len(docs), dtype=np.float32)
+            for t, s in expansiones[palabra]:
+                lista, pesos = self._lista(t)
+                pos = np.minimum(np.searchsorted(lista, docs), len(lista) - 1)
+                mejor = np.maximum(mejor, np.where(lista[pos] == docs, pesos[pos] * np.float32(s), 0))
+            conserva = mejor > 0
+            docs, relevancia = docs[conserva], relevancia[conserva] + mejor[conserva]
+
+        # De documentos a filas del catálogo
+        cual, filas = _expandir_grupos(docs, self.doc_indptr, self.doc_filas)
+        return filas, relevancia[cual], terminos
+
+    def stats(self) -> Dict:
+        arreglos = [self.doc_indptr, self.doc_filas, self.indptr, self.postings, self.pesos,
+                    self.n_trigramas, self.tri_indptr, self.tri_terminos]
+        bytes_texto = sum(len(t.encode("utf-8")) for t in self.vocabulario) + sum(
+            len(t.encode("utf-8")) for t in self.trigramas
+        )
+        return {
+            "filas": self.filas,
+            "documentos": self.documentos,
+            "terminos": len(self.vocabulario),
+            "trigramas": len(self.trigramas),
+            "postings": int(len(self.postings)),
+            "bytes_arreglos": int(sum(a.nbytes for a in arreglos)),
+            "bytes_vocabulario": bytes_texto,
+            "segundos_construccion": round(self.segundos_construccion, 3),
+        }
+
+
+def mejores(relevancia: np.ndarray, score: np.ndarray, k: int) -> np.ndarray:
+    """
+    Posiciones de los k mejores por relevancia y, a igual relevancia, por
+    score (y luego por posición), sin ordenar todos los candidatos.
+    """
+    if len(relevancia) <= k:
+        return np.lexsort((np.arange(len(relevancia)), -score, -relevancia))
+    umbral = np.partition(relevancia, len(relevancia) - k)[len(relevancia) - k]
+    seguros = np.flatnonzero(relevancia > umbral)
+    empatados = np.flatnonzero(relevancia == umbral)
+    faltan = k - len(seguros)
+    if len(empatados) > faltan:
+        corte = np.partition(-score[empatados], faltan - 1)[faltan - 1]
+        empatados = empatados[-score[empatados] <= corte]
+    elegidos = np.concatenate([seguros, empatados])
+    orden = np.lexsort((elegidos, -score[elegidos], -relevancia[elegidos]))
+    return elegidos[orden][:k]
+
+
+def cargar_descripciones(path: Optional[str]) -> Dict[str, str]:
+    """
+    Descripciones de los atractivos (desc_, desc2 y desc3 del dataset
+    original, ver union_y_preprocesamiento.py) por nombre plegado. Vacío si
+    el archivo no existe.
+    """
+    if not path:
+        return {}
+    try:
+        df = pd.read_csv(path, sep="|", usecols=["nombre", "desc_", "desc2", "desc3"], dtype=str)
+    except (FileNotFoundError, ValueError):
+        return {}
+    df = df.fillna("")
+    texto = (df["desc_"] + " " + df["desc2"] + " " + df["desc3"]).str.replace("Sin información", "", regex=False)
+    descripciones: Dict[str, str] = {}
+    for nombre, desc in zip(df["nombre"], texto):
+        descripciones.setdefault(plegar(nombre), desc.strip())
+    return descripciones
@@ -0,0 +1,407 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .consensus import combinar_scores
+from .model_manager import ModelManager
+from .preferences import normalizar_texto
+
+RADIO_TIERRA_KM = 6371
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Haversine vectorizada (misma fórmula que calcular_distancia en las rutas)"""
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def cota_distancia_km(lat: float, lon: float, caja: Tuple[float, float, float, float]) -> float:
+    """
+    Distancia mínima posible desde (lat, lon) a cualquier punto de la caja
+    (lat_min, lat_max, lon_min, lon_max): ningún destino dentro de la caja
+    puede estar más cerca.
+    """
+    lat_min, lat_max, lon_min, lon_max = caja
+    if lon_min <= lon <= lon_max:
+        return RADIO_TIERRA_KM * math.radians(max(lat_min - lat, lat - lat_max, 0.0))
+
+    # Fuera del rango de longitudes: el punto más cercano está en el meridiano
+    # del borde más próximo, al pie de la perpendicular o en una esquina
+    borde = lon_min if lon < lon_min else lon_max
+    dlon = math.radians(lon - borde)
+    phi = math.radians(lat)
+    pie = math.degrees(math.atan2(math.tan(phi), math.cos(dlon)))
+    if lat_min <= pie <= lat_max and abs(dlon) <= math.pi / 2:
+        distancia = RADIO_TIERRA_KM * math.asin(min(1.0, abs(math.sin(dlon)) * math.cos(phi)))
+    else:
+        distancia = float(min(distancia_km(lat, lon, lat_min, borde), distancia_km(lat, lon, lat_max, borde)))
+    # Margen por redondeo: la cota nunca debe superar la distancia real
+    return max(0.0, distancia * (1 - 1e-9) - 1e-9)
+
+
+class Particion:
+    """
+    Destinos de un grupo de provincias en arreglos contiguos, ordenados por
+    provincia para que filtrar por una sea tomar un tramo. Cada destino guarda
+    su posición `fila` en el catálogo completo, que decide los empates al unir
+    resultados de varias particiones igual que en el catálogo sin particionar.
+    """
+
+    def __init__(self, df: pd.DataFrame, feature_columns: List[str], columnas_numericas: List[str]):
+        df = df.sort_values(["_provincia", "_fila"])
+        self.fila = df["_fila"].to_numpy()
+        self.nombre = df["nombre"].to_numpy(dtype=object)
+        self.provincia = df["provincia"].to_numpy(dtype=object)
+        self.canton = df["canton"].to_numpy(dtype=object)
+        self.lat = df["lat"].to_numpy(dtype=float)
+        self.lon = df["lon"].to_numpy(dtype=float)
+        self.X = df[feature_columns].to_numpy(dtype=np.float32)
+        self.numericas = df[columnas_numericas].to_numpy(dtype=float)
+        self.columna_score = columnas_numericas.index("score") if "score" in columnas_numericas else None
+
+        self.rangos: Dict[str, Tuple[int, int]] = {}
+        provincias = df["_provincia"].to_numpy(dtype=object)
+        inicio = 0
+        for i in range(1, len(provincias) + 1):
+            if i == len(provincias) or provincias[i] != provincias[inicio]:
+                self.rangos[provincias[inicio]] = (inicio, i)
+                inicio = i
+
+    def __len__(self):
+        return len(self.fila)
+
+    def _posiciones(self, provincias: Optional[List[str]]) -> np.ndarray:
+        if provincias is None:
+            return np.arange(len(self))
+        tramos = [np.arange(*self.rangos[p]) for p in provincias if p in self.rangos]
+        return np.concatenate(tramos) if tramos else np.arange(0)
+
+    def _registro(self, pos: int) -> Dict[str, Any]:
+        return {
+            "fila": int(self.fila[pos]),
+            "nombre": self.nombre[pos],
+            "provincia": self.provincia[pos],
+            "canton": self.canton[pos],
+            "lat": float(self.lat[pos]),
+            "lon": float(self.lon[pos]),
+        }
+
+    def _filtrar(self, consulta: Dict[str, Any]) -> Tuple[np.ndarray, Optional[np.ndarray], int]:
+        """
+        Posiciones que pasan los filtros de recommend_destinations, su
+        distancia (None sin ubicación) y cuántas pasaron provincia y tipos,
+        antes de la distancia máxima (sin ninguna, la recomendación es un 404)
+        """
+        pos = self._posiciones(consulta["provincias"])
+        if consulta["columnas_tipos"]:
+            pos = pos[(self.numericas[np.ix_(pos, consulta["columnas_tipos"])] > 2).any(axis=1)]
+        filtrados = len(pos)
+
+        distancias = None
+        if consulta["lat"] is not None and consulta["lon"] is not None:
+            distancias = distancia_km(consulta["lat"], consulta["lon"], self.lat[pos], self.lon[pos])
+            if consulta["max_distancia_km"]:
+                dentro = distancias <= consulta["max_distancia_km"]
+                pos, distancias = pos[dentro], distancias[dentro]
+        return pos, distancias, filtrados
+
+    def contar(self, modelo: ModelManager, consulta: Dict[str, Any]) -> Dict[str, int]:
+        """Destinos de esta partición antes y después de la distancia máxima, sin puntuarlos"""
+        pos, _, filtrados = self._filtrar(consulta)
+        return {"filtrados": filtrados, "destinos": len(pos)}
+
+    def recomendar(self, modelo: ModelManager, consulta: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Top-k parcial de recommend_destinations en esta partición (mismos
+        filtros y niveles que el catálogo completo). Devuelve los registros,
+        los destinos antes y después de la distancia máxima (ver _filtrar),
+        las filas puntuadas y si hubo primera etapa (la partición puede tener
+        menos destinos filtrados que candidatos pedidos).
+        """
+        pos, distancias, filtrados = self._filtrar(consulta)
+        destinos = len(pos)
+        if not destinos:
+            return {"registros": [], "filtrados": filtrados, "destinos": 0, "filas": 0, "candidatos": False}
+
+        X = self.X[pos]
+        preseleccion = False
+        preferencias = consulta["preferencias"]
+        if consulta["nivel"] == "sustituto":
+            scores = modelo.surrogate_members(X, preferencias)
+        else:
+            n = consulta["candidatos"]
+            if consulta["nivel"] == "candidatos" and 0 < n < len(pos):
+                elegidos = modelo.candidate_indices(X, consulta["agregadas"], n)
+                preseleccion = True
+                pos, X = pos[elegidos], X[elegidos]
+                if distancias is not None:
+                    distancias = distancias[elegidos]
+            scores = modelo.predict_members(X, preferencias)
+
+        estrategia = consulta["estrategia"]
+        combinado = scores[0] if estrategia is None else combinar_scores(scores, estrategia, consulta["roles"])
+        orden = np.lexsort((self.fila[pos], -combinado))[:consulta["top_k"]]
+
+        registros = []
+        for j in orden:
+            registro = self._registro(pos[j])
+            registro["predicted_score"] = float(combinado[j])
+            registro["distancia_km"] = float(distancias[j]) if distancias is not None else None
+            if estrategia is not None:
+                registro["scores_miembros"] = [float(s) for s in scores[:, j]]
+            registros.append(registro)
+        return {"registros": registros, "filtrados": filtrados, "destinos": destinos, "filas": scores.size,
+                "candidatos": preseleccion}
+
+    def por_tipo(self, modelo: ModelManager, consulta: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Top-k parcial de cada tipo: promedio de sus columnas, solo destinos con score > 0"""
+        pos = self._posiciones(consulta["provincias"])
+        mejores = {}
+        for tipo, columnas in consulta["columnas_por_tipo"].items():
+            valores = self.numericas[np.ix_(pos, columnas)]
+            presentes = ~np.isnan(valores)
+            cuenta = presentes.sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                score = np.where(cuenta > 0, np.where(presentes, valores, 0.0).sum(axis=1) / cuenta, np.nan)
+            validos = np.flatnonzero(score > 0)
+            orden = validos[np.lexsort((self.fila[pos[validos]], -score[validos]))][:consulta["top_k"]]
+            mejores[tipo] = [
+                {**self._registro(pos[j]), "score_general": float(score[j])} for j in orden
+            ]
+        return mejores
+
+    def mas_cercano(self, modelo: ModelManager, consulta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Destino más cercano de las provincias indicadas que pasa los filtros, o None"""
+        pos = self._posiciones(consulta["provincias"])
+        if self.columna_score is not None:
+            pos = pos[self.numericas[pos, self.columna_score] >= consulta["min_score"]]
+        if consulta["columnas_tipo"]:
+            pos = pos[(self.numericas[np.ix_(pos, consulta["columnas_tipo"])] > 0).any(axis=1)]
+        if not len(pos):
+            return None
+
+        distancias = distancia_km(consulta["lat"], consulta["lon"], self.lat[pos], self.lon[pos])
+        j = np.lexsort((self.fila[pos], distancias))[0]
+        registro = self._registro(pos[j])
+        registro["score"] = float(self.numericas[pos[j], self.columna_score]) if self.columna_score is not None else 0.0
+        registro["distancia_km"] = float(distancias[j])
+        return registro
+
+
+# Estado de cada proceso trabajador: sus particiones y su copia del modelo
+_particiones_worker: Dict[int, Particion] = {}
+_modelo_worker: Optional[ModelManager] = None
+
+
+def _iniciar_worker(particiones: Dict[int, Particion], estado: Dict[str, Any], data_path: str,
+                    new_data_path: str, hilos: int):
+    global _modelo_worker
+    _particiones_worker.update(particiones)
+    _modelo_worker = ModelManager(data_path, new_data_path)
+    _modelo_worker.load_state(estado)
+    # Repartir los núcleos entre los trabajadores en lugar de que cada uno los use todos
+    _modelo_worker.model.set_params(n_jobs=hilos)
+
+
+def _ejecutar_en_worker(indice: int, operacion: str, consulta: Dict[str, Any]):
+    return getattr(_particiones_worker[indice], operacion)(_modelo_worker, consulta)
+
+
+def _listo():
+    return True
+
+
+class CatalogoParticionado:
+    """
+    Catálogo partido por provincia en `n_particiones` particiones (cada
+    provincia entera en una sola; las más grandes se reparten primero entre
+    las menos cargadas). Cada consulta se envía solo a las particiones de las
+    provincias que pueden aportar resultados y se unen sus top-k parciales.
+
+    Con `procesos` > 0 las particiones se reparten entre ese número de
+    procesos trabajadores, cada uno con sus arreglos y su copia del modelo, y
+    se consultan en paralelo; con 0 se consultan en este proceso, una tras otra.
+    """
+
+    def __init__(self, df: pd.DataFrame, modelo: ModelManager, n_particiones: int, procesos: int = 0):
+        self.modelo = modelo
+        df = df.reset_index(drop=True).copy()
+        df["_fila"] = np.arange(len(df))
+        df["_provincia"] = df["provincia"].astype(str).str.upper()
+        self.columnas = list(df.columns.drop(["_fila", "_provincia"]))
+        self.columnas_numericas = [c for c in self.columnas if pd.api.types.is_numeric_dtype(df[c])]
+
+        # Provincias completas, de mayor a menor, a la partición con menos filas
+        tamanos = df["_provincia"].value_counts()
+        n_particiones = max(1, min(n_particiones, len(tamanos)))
+        carga = [0] * n_particiones
+        self.particion_de: Dict[str, int] = {}
+        for provincia, filas in tamanos.items():
+            i = carga.index(min(carga))
+            self.particion_de[provincia] = i
+            carga[i] += filas
+        self.filas_por_provincia: Dict[str, int] = tamanos.to_dict()
+
+        agrupado = df.groupby("_provincia")
+        self.cajas: Dict[str, Tuple[float, float, float, float]] = {
+            provincia: (float(g["lat"].min()), float(g["lat"].max()), float(g["lon"].min()), float(g["lon"].max()))
+            for provincia, g in agrupado
+        }
+        particiones = [
+            Particion(
+                df[df["_provincia"].map(self.particion_de) == i], modelo.feature_columns, self.columnas_numericas
+            )
+            for i in range(n_particiones)
+        ]
+        self.n_particiones = n_particiones
+        self.filas_por_particion = [len(p) for p in particiones]
+
+        self.procesos = min(procesos, n_particiones)
+        self._trabajadores: List[ProcessPoolExecutor] = []
+        if self.procesos:
+            estado = modelo.export_state()
+            hilos = max(1, (os.cpu_count() or 1) // self.procesos)
+            contexto = multiprocessing.get_context("spawn")
+            for w in range(self.procesos):
+                propias = {i: p for i, p in enumerate(particiones) if i % self.procesos == w}
+                self._trabajadores.append(ProcessPoolExecutor(
+                    max_workers=1, mp_context=contexto, initializer=_iniciar_worker,
+                    initargs=(propias, estado, modelo.data_path, modelo.new_data_path, hilos)
+                ))
+            # Arrancar los trabajadores ahora y no en la primera consulta
+            for futuro in [t.submit(_listo) for t in self._trabajadores]:
+                futuro.result()
+        # Con trabajadores las particiones viven solo en ellos
+        self.particiones: Optional[List[Particion]] = None if self.procesos else particiones
+
+    def cerrar(self):
+        for trabajador in self._trabajadores:
+            trabajador.shutdown(cancel_futures=True)
+
+    def _consultar(self, operacion: str, consultas: Dict[int, Dict[str, Any]]) -> Dict[int, Any]:
+        """Ejecuta la operación en cada partición indicada y devuelve sus resultados"""
+        if not self._trabajadores:
+            return {
+                i: getattr(self.particiones[i], operacion)(self.modelo, consulta)
+                for i, consulta in consultas.items()
+            }
+        futuros = {
+            i: self._trabajadores[i % self.procesos].submit(_ejecutar_en_worker, i, operacion, consulta)
+            for i, consulta in consultas.items()
+        }
+        return {i: futuro.result() for i, futuro in futuros.items()}
+
+    def _agrupar(self, provincia: Optional[str]) -> Dict[int, Optional[List[str]]]:
+        """Particiones a consultar y provincias de cada una (None = todas las suyas)"""
+        if provincia is None:
+            return {i: None for i in range(self.n_particiones)}
+        provincia = provincia.upper()
+        if provincia not in self.particion_de:
+            return {}
+        return {self.particion_de[provincia]: [provincia]}
+
+    def filas(self, provincia: Optional[str] = None) -> int:
+        if provincia is None:
+            return sum(self.filas_por_provincia.values())
+        return self.filas_por_provincia.get(provincia.upper(), 0)
+
+    def columnas_de_tipo(self, tipo: str) -> List[int]:
+        """Columnas numéricas cuyo nombre contiene el tipo (como buscar_columnas_por_tipo)"""
+        tipo_norm = normalizar_texto(tipo)
+        return [
+            j for j, col in enumerate(self.columnas_numericas) if tipo_norm in normalizar_texto(col)
+        ]
+
+    def contar(self, consulta: Dict[str, Any], provincia: Optional[str]) -> Dict[str, int]:
+        """Destinos que pasan los filtros de recommend_destinations en todas las particiones (ver Particion.contar)"""
+        grupos = self._agrupar(provincia)
+        cuentas = self._consultar("contar", {i: {**consulta, "provincias": p} for i, p in grupos.items()}).values()
+        return {clave: sum(c[clave] for c in cuentas) for clave in ("filtrados", "destinos")}
+
+    def recomendar(self, consulta: Dict[str, Any], provincia: Optional[str]) -> Dict[str, Any]:
+        """
+        Top-k de recommend_destinations unido de las particiones, destinos
+        filtrados (antes y después de la distancia máxima) y filas puntuadas
+        en total y si alguna aplicó la primera etapa. Con nivel "candidatos"
+        cada partición preselecciona hasta `candidatos` destinos propios, así
+        que entre todas puntúan al menos los que puntuaría el catálogo sin
+        particionar.
+        """
+        grupos = self._agrupar(provincia)
+        resultados = self._consultar("recomendar", {i: {**consulta, "provincias": p} for i, p in grupos.items()})
+        registros = [r for parcial in resultados.values() for r in parcial["registros"]]
+        registros.sort(key=lambda r: (-r["predicted_score"], r["fila"]))
+        return {
+            "registros": registros[:consulta["top_k"]],
+            "filtrados": sum(parcial["filtrados"] for parcial in resultados.values()),
+            "destinos": sum(parcial["destinos"] for parcial in resultados.values()),
+            "filas": sum(parcial["filas"] for parcial in resultados.values()),
+            "candidatos": any(parcial["candidatos"] for parcial in resultados.values()),
+        }
+
+    def por_tipo(self, tipos: List[str], top_k: int, provincia: Optional[str]) -> List[Tuple[Dict[str, Any], str]]:
+        """
+        Ranking de destinos_por_tipo: top-k de cada tipo unido de las
+        particiones; un destino en varios tipos se queda con su mejor score.
+        """
+        columnas_por_tipo = {t: self.columnas_de_tipo(t) for t in tipos}
+        grupos = self._agrupar(provincia)
+        resultados = self._consultar("por_tipo", {
+            i: {"provincias": p, "columnas_por_tipo": columnas_por_tipo, "top_k": top_k} for i, p in grupos.items()
+        })
+
+        mejores: Dict[int, Tuple[Dict[str, Any], str]] = {}
+        for tipo in tipos:
+            parciales = [r for parcial in resultados.values() for r in parcial[tipo]]
+            parciales.sort(key=lambda r: (-r["score_general"], r["fila"]))
+            for registro in parciales[:top_k]:
+                fila = registro["fila"]
+                if fila not in mejores or registro["score_general"] > mejores[fila][0]["score_general"]:
+                    mejores[fila] = (registro, tipo)
+        return sorted(mejores.values(), key=lambda rt: -rt[0]["score_general"])
+
+    def mas_cercano(self, lat: float, lon: float, tipo: Optional[str], min_score: float) -> Optional[Dict[str, Any]]:
+        """
+        Destino más cercano. Se consulta primero la provincia cuya caja queda
+        más cerca y luego, en paralelo, solo las provincias cuya caja puede
+        contener un destino más cercano que el encontrado.
+        """
+        consulta = {
+            "lat": lat, "lon": lon, "min_score": min_score,
+            "columnas_tipo": self.columnas_de_tipo(tipo) if tipo else [],
+        }
+        cotas = sorted((cota_distancia_km(lat, lon, caja), p) for p, caja in self.cajas.items())
+
+        mejor = None
+        restantes = cotas
+        while restantes:
+            if mejor is None:
+                # Sin candidato todavía: la provincia más prometedora sola
+                ronda, restantes = restantes[:1], restantes[1:]
+            else:
+                ronda = [(cota, p) for cota, p in restantes if cota < mejor["distancia_km"]]
+                restantes = []
+            grupos: Dict[int, List[str]] = {}
+            for _, provincia in ronda:
+                grupos.setdefault(self.particion_de[provincia], []).append(provincia)
+            resultados = self._consultar("mas_cercano", {i: {**consulta, "provincias": p} for i, p in grupos.items()})
+            for registro in resultados.values():
+                if registro is not None and (
+                    mejor is None
+                    or (registro["distancia_km"], registro["fila"]) < (mejor["distancia_km"], mejor["fila"])
+                ):
+                    mejor = registro
+        return mejor
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "particiones": self.n_particiones,
+            "procesos": self.procesos,
+            "filas_por_particion": self.filas_por_particion,
+        }
@@ -0,0 +1,77 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Llamada:
+    __slots__ = ("evento", "resultado", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicación de cálculos concurrentes idénticos: mientras una llamada con
+    una clave está en curso, las que llegan con la misma clave esperan su
+    resultado (o su excepción) en lugar de repetir el trabajo.
+
+    Es acotada: con `max_claves` cálculos distintos en curso, las claves nuevas
+    se calculan sin registrarse. Si la llamada compartida tarda más de
+    `timeout_s`, quien espera deja de esperar y calcula por su cuenta.
+    El resultado compartido es el mismo objeto para todos: no debe modificarse.
+    """
+
+    def __init__(self, max_claves: int = 1024, timeout_s: float = 10.0):
+        self.max_claves = max_claves
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._en_vuelo: Dict[Hashable, _Llamada] = {}
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, clave: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Devuelve (resultado, compartido)"""
+        with self._lock:
+            llamada = self._en_vuelo.get(clave)
+            lider = llamada is None
+            if lider:
+                if len(self._en_vuelo) >= self.max_claves:
+                    llamada = None
+                else:
+                    llamada = self._en_vuelo[clave] = _Llamada()
+
+        if llamada is None:
+            return fn(), False
+
+        if lider:
+            try:
+                llamada.resultado = fn()
+            except BaseException as e:
+                llamada.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._en_vuelo[clave]
+                llamada.evento.set()
+            return llamada.resultado, False
+
+        if not llamada.evento.wait(self.timeout_s):
+            with self._lock:
+                self.timeouts += 1
+            return fn(), False
+
+        if llamada.error is not None:
+            raise llamada.error
+        with self._lock:
+            self.coalesced += 1
+        return llamada.resultado, True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "en_vuelo": len(self._en_vuelo),
+            }
@@ -0,0 +1,158 @@
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Las celdas de agrupación miden PIXELES_CELDA píxeles en pantalla: en el
+# zoom z una tesela de 256 px abarca 360 / 2**z grados de longitud. Las
+# celdas son en grados (cerca del ecuador son casi cuadradas en pantalla)
+PIXELES_CELDA = 64
+# Cuántas celdas por tesela hay en cada lado: las celdas del zoom z miden
+# 360 / 2**(z + NIVELES_TESELA) grados
+NIVELES_TESELA = 2
+
+
+def grados_celda(zoom: int) -> float:
+    return 360.0 / 2 ** (zoom + NIVELES_TESELA)
+
+
+def _celdas(lat: np.ndarray, lon: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(fila, columna) de la celda del zoom dado que contiene cada punto"""
+    g = grados_celda(zoom)
+    iy = np.floor((np.clip(lat, -90.0, 90.0) + 90.0) / g).astype(np.int64)
+    ix = np.floor((np.clip(lon, -180.0, 180.0) + 180.0) / g).astype(np.int64)
+    return iy, ix
+
+
+def _rango_celdas(zoom: int, lat_min: float, lat_max: float, lon_min: float, lon_max: float):
+    iy = _celdas(np.array([lat_min, lat_max]), np.array([lon_min, lon_max]), zoom)
+    return int(iy[0][0]), int(iy[0][1]), int(iy[1][0]), int(iy[1][1])
+
+
+class Nivel:
+    """
+    Celdas no vacías de un zoom, ordenadas por (fila, columna), con la
+    cantidad de destinos, las sumas de score, lat y lon (para el promedio y
+    el centroide) y el destino de mejor score de cada una.
+    """
+
+    def __init__(self, iy, ix, cantidad, suma_score, suma_lat, suma_lon, mejor, mejor_score):
+        self.iy, self.ix = iy, ix
+        self.cantidad = cantidad
+        self.suma_score, self.suma_lat, self.suma_lon = suma_score, suma_lat, suma_lon
+        self.mejor, self.mejor_score = mejor, mejor_score
+
+    @classmethod
+    def agrupar(cls, iy, ix, cantidad, suma_score, suma_lat, suma_lon, mejor, mejor_score) -> "Nivel":
+        """Une las entradas con la misma celda (sumas y el mejor destino de todas)"""
+        orden = np.lexsort((-mejor_score, ix, iy))
+        iy, ix = iy[orden], ix[orden]
+        inicios = np.flatnonzero(np.r_[True, (iy[1:] != iy[:-1]) | (ix[1:] != ix[:-1])])
+        return cls(
+            iy[inicios], ix[inicios],
+            np.add.reduceat(cantidad[orden], inicios),
+            np.add.reduceat(suma_score[orden], inicios),
+            np.add.reduceat(suma_lat[orden], inicios),
+            np.add.reduceat(suma_lon[orden], inicios),
+            mejor[orden][inicios], mejor_score[orden][inicios],
+        )
+
+    def padre(self) -> "Nivel":
+        """El mismo nivel un zoom más lejos: cada celda es la mitad en cada lado"""
+        return Nivel.agrupar(self.iy >> 1, self.ix >> 1, self.cantidad, self.suma_score,
+                             self.suma_lat, self.suma_lon, self.mejor, self.mejor_score)
+
+    def en_rango(self, iy0: int, iy1: int, ix0: int, ix1: int) -> np.ndarray:
+        """Posiciones de las celdas con fila en [iy0, iy1] y columna en [ix0, ix1]"""
+        desde, hasta = np.searchsorted(self.iy, [iy0, iy1 + 1])
+        ix = self.ix[desde:hasta]
+        return desde + np.flatnonzero((ix >= ix0) & (ix <= ix1))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.iy, self.ix, self.cantidad, self.suma_score,
+                                      self.suma_lat, self.suma_lon, self.mejor, self.mejor_score))
+
+
+class IndiceEspacial:
+    """
+    Índice de grilla del catálogo para responder "qué hay en esta vista del
+    mapa" sin recorrer todos los destinos:
+      • en el zoom de detalle, los destinos ordenados por celda: una vista es
+        un tramo contiguo por cada fila de celdas que cubre
+      • en cada zoom menor, las celdas ya agregadas (cantidad, score medio,
+        centroide y mejor destino). Cada nivel se obtiene del siguiente
+        juntando celdas de a 2 × 2, sin volver a recorrer los destinos
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, score: np.ndarray, zoom_detalle: int):
+        inicio = time.perf_counter()
+        self.zoom_detalle = zoom_detalle
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.score = np.nan_to_num(np.asarray(score, dtype=np.float64))
+
+        # Destinos ordenados por celda del zoom de detalle (a igual celda, por fila)
+        iy, ix = _celdas(self.lat, self.lon, zoom_detalle)
+        self.columnas = 2 ** (zoom_detalle + NIVELES_TESELA)
+        clave = iy * self.columnas + ix
+        self.orden = np.argsort(clave, kind="stable").astype(np.int32)
+        self.claves = clave[self.orden]
+
+        # Pirámide de celdas agregadas, del zoom de detalle - 1 hacia el 0
+        n = len(self.lat)
+        nivel = Nivel.agrupar(
+            iy, ix, np.ones(n, dtype=np.int64), self.score, self.lat, self.lon,
+            np.arange(n, dtype=np.int32), self.score,
+        )
+        self.niveles: List[Nivel] = []
+        for _ in range(zoom_detalle):
+            nivel = nivel.padre()
+            self.niveles.append(nivel)
+        self.niveles.reverse()
+        self.segundos_construccion = time.perf_counter() - inicio
+
+    def filas_en(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> np.ndarray:
+        """Filas del catálogo dentro de los límites (incluidos los bordes)"""
+        iy0, iy1, ix0, ix1 = _rango_celdas(self.zoom_detalle, lat_min, lat_max, lon_min, lon_max)
+        filas_celda = np.arange(iy0, iy1 + 1, dtype=np.int64) * self.columnas
+        desde = np.searchsorted(self.claves, filas_celda + ix0)
+        hasta = np.searchsorted(self.claves, filas_celda + ix1 + 1)
+        largos = hasta - desde
+        if not largos.sum():
+            return np.zeros(0, dtype=np.int32)
+        posiciones = np.repeat(desde - np.cumsum(largos) + largos, largos) + np.arange(largos.sum())
+        filas = self.orden[posiciones]
+        dentro = (self.lat[filas] >= lat_min) & (self.lat[filas] <= lat_max) \
+            & (self.lon[filas] >= lon_min) & (self.lon[filas] <= lon_max)
+        return filas[dentro]
+
+    def celdas_en(self, zoom: int, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> Dict:
+        """
+        Celdas del zoom dado que tocan los límites: cantidad de destinos,
+        score medio, centroide, límites de la celda y su mejor destino.
+        """
+        nivel = self.niveles[zoom]
+        pos = nivel.en_rango(*_rango_celdas(zoom, lat_min, lat_max, lon_min, lon_max))
+        g = grados_celda(zoom)
+        cantidad = nivel.cantidad[pos]
+        return {
+            "cantidad": cantidad,
+            "score_medio": nivel.suma_score[pos] / cantidad,
+            "lat": nivel.suma_lat[pos] / cantidad,
+            "lon": nivel.suma_lon[pos] / cantidad,
+            "lat_min": nivel.iy[pos] * g - 90.0,
+            "lon_min": nivel.ix[pos] * g - 180.0,
+            "grados": g,
+            "mejor": nivel.mejor[pos],
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "destinos": int(len(self.lat)),
+            "zoom_detalle": self.zoom_detalle,
+            "celdas_por_zoom": [int(len(n.iy)) for n in self.niveles],
+            "bytes": int(sum(n.nbytes for n in self.niveles) + self.orden.nbytes + self.claves.nbytes
+                         + self.lat.nbytes + self.lon.nbytes + self.score.nbytes),
+            "segundos_construccion": round(self.segundos_construccion, 3),
+        }
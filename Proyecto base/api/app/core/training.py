@@ -0,0 +1,191 @@
+import hashlib
+import os
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+# Hiperparámetros del modelo de la API, compartidos por todos los perfiles
+PARAMETROS = {
+    "learning_rate": 0.05,
+    "max_depth": 6,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "reg_alpha": 0.1,
+    "reg_lambda": 1,
+    "objective": "reg:squarederror",
+    "random_state": 42,
+}
+N_ARBOLES = 300
+
+# Perfiles de entrenamiento de ModelManager.train_model:
+#   • clasico: XGBRegressor.fit sobre el DataFrame completo, 300 árboles (el
+#     modelo de siempre; su versión no cambia)
+#   • hist: DMatrix float32 con tree_method "hist" y parada temprana sobre
+#     un pliegue de validación
+#   • cuantiles: como hist, pero el QuantileDMatrix se arma por bloques desde
+#     un iterador y guarda solo los bins, no la matriz original
+#   • externo: como cuantiles, con las páginas de la matriz en disco
+#     (ExtMemQuantileDMatrix), para historiales que no caben en memoria
+PERFILES: Dict[str, Dict[str, Any]] = {
+    "clasico": {"matriz": None},
+    "hist": {"matriz": "dmatrix"},
+    "cuantiles": {"matriz": "cuantiles"},
+    "externo": {"matriz": "externa"},
+}
+
+# Una de cada PLIEGUE_VALIDACION filas (por posición) va a validación
+PLIEGUE_VALIDACION = 10
+PARADA_TEMPRANA = 20
+MAX_BIN = 256
+FILAS_POR_BLOQUE = 100_000
+
+
+def huella_archivo(path: str) -> str:
+    """SHA-1 del contenido de un archivo, leído por trozos"""
+    huella = hashlib.sha1()
+    with open(path, "rb") as f:
+        for trozo in iter(lambda: f.read(1 << 20), b""):
+            huella.update(trozo)
+    return huella.hexdigest()
+
+
+def bloques(fuente: Union[str, pd.DataFrame], columnas: List[str],
+            filas_por_bloque: int = FILAS_POR_BLOQUE) -> Iterator[pd.DataFrame]:
+    """Bloques float32 de `columnas` + score, desde un CSV (sin cargarlo entero) o un DataFrame"""
+    if isinstance(fuente, pd.DataFrame):
+        for inicio in range(0, len(fuente), filas_por_bloque):
+            yield fuente.iloc[inicio:inicio + filas_por_bloque]
+        return
+    encabezado = pd.read_csv(fuente, sep="|", nrows=0).columns
+    presentes = [c for c in columnas + ["score"] if c in encabezado]
+    tipos = {c: np.float32 for c in presentes}
+    for bloque in pd.read_csv(fuente, sep="|", usecols=presentes, dtype=tipos, chunksize=filas_por_bloque):
+        yield bloque
+
+
+class IteradorDatos(xgb.DataIter):
+    """
+    Entrega a XGBoost los bloques de `fuente` de una de las dos partes
+    (entrenamiento o validación), para armar la matriz sin tener todo el
+    historial en memoria a la vez.
+    """
+
+    def __init__(self, fuente, columnas: List[str], validacion: bool, cache_prefix: Optional[str] = None,
+                 filas_por_bloque: int = FILAS_POR_BLOQUE):
+        self.fuente = fuente
+        self.columnas = columnas
+        self.validacion = validacion
+        self.filas_por_bloque = filas_por_bloque
+        self._bloques: Optional[Iterator[pd.DataFrame]] = None
+        self._inicio = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._bloques = None
+        self._inicio = 0
+
+    def next(self, input_data) -> bool:
+        if self._bloques is None:
+            self._bloques = bloques(self.fuente, self.columnas, self.filas_por_bloque)
+        for bloque in self._bloques:
+            posiciones = np.arange(self._inicio, self._inicio + len(bloque))
+            self._inicio += len(bloque)
+            parte = (posiciones % PLIEGUE_VALIDACION == 0) == self.validacion
+            if not parte.any():
+                continue
+            X = np.column_stack([
+                bloque[c].to_numpy(dtype=np.float32) if c in bloque else np.zeros(len(bloque), np.float32)
+                for c in self.columnas
+            ])
+            input_data(data=X[parte], label=bloque["score"].to_numpy(dtype=np.float32)[parte],
+                       feature_names=self.columnas)
+            return True
+        return False
+
+
+def matrices(fuente, columnas: List[str], matriz: str, n_jobs: Optional[int],
+             cache_dir: Optional[str] = None) -> Tuple[xgb.DMatrix, xgb.DMatrix]:
+    """Matrices de entrenamiento y validación del perfil"""
+    if matriz == "dmatrix":
+        df = fuente if isinstance(fuente, pd.DataFrame) else pd.concat(bloques(fuente, columnas))
+        X = df.reindex(columns=columnas, fill_value=0.0).to_numpy(dtype=np.float32)
+        y = df["score"].to_numpy(dtype=np.float32)
+        validacion = np.arange(len(X)) % PLIEGUE_VALIDACION == 0
+        entrenamiento = xgb.DMatrix(X[~validacion], y[~validacion], feature_names=columnas, nthread=n_jobs)
+        return entrenamiento, xgb.DMatrix(X[validacion], y[validacion], feature_names=columnas, nthread=n_jobs)
+
+    if matriz == "cuantiles":
+        entrenamiento = xgb.QuantileDMatrix(
+            IteradorDatos(fuente, columnas, validacion=False), max_bin=MAX_BIN, nthread=n_jobs
+        )
+        validacion = xgb.QuantileDMatrix(
+            IteradorDatos(fuente, columnas, validacion=True), max_bin=MAX_BIN, nthread=n_jobs, ref=entrenamiento
+        )
+        return entrenamiento, validacion
+
+    if matriz == "externa":
+        entrenamiento = xgb.ExtMemQuantileDMatrix(
+            IteradorDatos(fuente, columnas, validacion=False, cache_prefix=os.path.join(cache_dir, "entrenamiento")),
+            max_bin=MAX_BIN, nthread=n_jobs
+        )
+        validacion = xgb.ExtMemQuantileDMatrix(
+            IteradorDatos(fuente, columnas, validacion=True, cache_prefix=os.path.join(cache_dir, "validacion")),
+            max_bin=MAX_BIN, nthread=n_jobs, ref=entrenamiento
+        )
+        return entrenamiento, validacion
+
+    raise ValueError(f"Matriz desconocida: {matriz}")
+
+
+def parametros_nativos(parametros: Dict[str, Any], n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """Hiperparámetros con nombres de XGBRegressor traducidos a los de xgb.train"""
+    nombres = {"learning_rate": "eta", "reg_alpha": "alpha", "reg_lambda": "lambda", "random_state": "seed"}
+    nativos = {nombres.get(k, k): v for k, v in parametros.items()}
+    nativos.update({"tree_method": "hist", "max_bin": MAX_BIN, "eval_metric": "rmse"})
+    if n_jobs:
+        nativos["nthread"] = n_jobs
+    return nativos
+
+
+def entrenar_booster(fuente, columnas: List[str], perfil: str, n_jobs: Optional[int] = None) -> Tuple[xgb.Booster, Dict[str, Any]]:
+    """
+    Entrena con un perfil distinto de "clasico" hasta N_ARBOLES árboles,
+    deteniéndose cuando el RMSE del pliegue de validación deja de mejorar
+    durante PARADA_TEMPRANA rondas. Devuelve el booster recortado al mejor
+    árbol y un resumen del entrenamiento.
+    """
+    if perfil not in PERFILES or PERFILES[perfil]["matriz"] is None:
+        raise ValueError(f"Perfil de entrenamiento desconocido: {perfil}. Opciones: {', '.join(PERFILES)}")
+
+    parametros = parametros_nativos(PARAMETROS, n_jobs)
+
+    with tempfile.TemporaryDirectory(prefix="xgb_cache_") as cache_dir:
+        entrenamiento, validacion = matrices(fuente, columnas, PERFILES[perfil]["matriz"], n_jobs, cache_dir)
+        evaluaciones: Dict[str, Dict[str, List[float]]] = {}
+        booster = xgb.train(
+            parametros, entrenamiento, num_boost_round=N_ARBOLES,
+            evals=[(validacion, "validacion")], early_stopping_rounds=PARADA_TEMPRANA,
+            evals_result=evaluaciones, verbose_eval=False
+        )
+        filas = entrenamiento.num_row()
+        del entrenamiento, validacion
+
+    mejor = booster.best_iteration
+    resumen = {
+        "perfil": perfil,
+        "filas": filas,
+        "arboles": mejor + 1,
+        "rmse_validacion": round(float(evaluaciones["validacion"]["rmse"][mejor]), 5),
+    }
+    return booster[:mejor + 1], resumen
+
+
+def muestra(fuente, columnas: List[str], filas: int) -> pd.DataFrame:
+    """Primeras `filas` filas de la fuente (para ajustar el sustituto lineal)"""
+    if isinstance(fuente, pd.DataFrame):
+        return fuente.head(filas).reindex(columns=columnas, fill_value=0.0)
+    df = pd.read_csv(fuente, sep="|", nrows=filas)
+    return df.reindex(columns=columnas, fill_value=0.0)
@@ -1,22 +1,62 @@
 import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .routes import family
 
 
+# Detener los procesos trabajadores del catálogo particionado al apagar la API
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    yield
+    if family.catalogo is not None:
+        family.catalogo.cerrar()
+
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title="Family Harmony AI: Recomendador de Vacaciones Familiares",
     description="API para recomendar destinos óptimos basados en preferencias familiares usando XGBoost.",
-    version="0.2.0"
+    version="0.2.0",
+    lifespan=ciclo_de_vida
 )
 
 # Incluir rutas
 app.include_router(family.router, prefix="/api/family", tags=["family"])
 
+# Versión del modelo en cada respuesta (los clientes la usan para invalidar sus cachés)
+@app.middleware("http")
+async def agregar_version_modelo(request, call_next):
+    response = await call_next(request)
+    if family.model_manager.model_version:
+        response.headers["X-Model-Version"] = family.model_manager.model_version
+    return response
+
+# Momento de llegada de la petición (los plazos de respuesta se cuentan desde aquí)
+@app.middleware("http")
+async def marcar_llegada(request, call_next):
+    request.state.llegada = time.perf_counter()
+    return await call_next(request)
+
+# Métricas de operación de la API
+@app.get("/metricas")
+async def metricas():
+    return {
+        "recomendaciones": family.recomendaciones_en_vuelo.stats(),
+        "admision": {nombre: control.stats() for nombre, control in family.admisiones.items()},
+        "microbatching": family.model_manager.batcher.stats() if family.model_manager.batcher else None,
+        "niveles": family.costos.stats(),
+        "catalogo": family.catalogo.stats() if family.catalogo else None,
+        "busqueda": family.indice_busqueda()["indice"].stats() if family.BUSQUEDA_ENABLED else None,
+        "mapa": family.indice_mapa()["indice"].stats()
+    }
+
 # Ruta raíz (para comprobar que la API está funcionando)
 @app.get("/")
 async def root():
     return {
         "mensaje": "¡Bienvenido al sistema de recomendación de vacaciones familiares!",
-        "documentación": "/docs"
+        "documentación": "/docs",
+        "version_modelo": family.model_manager.model_version,
+        "modelo_activo": family.model_manager.active_model
     }
\ No newline at end of file
@@ -1,11 +1,28 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from ..schemas import FamilyBase
 from ..core.model_manager import ModelManager
+from ..core.preferences import aggregate_preferences, normalizar_texto, preferencias_por_miembro
+from ..core.consensus import ESTRATEGIAS, combinar_scores
+from ..core.compatibility import matriz_compatibilidad
+from ..core.search import IndiceBusqueda, cargar_descripciones, mejores, plegar
+from ..core.spatial import IndiceEspacial
+from ..core.archetypes import ArchetypeIndex
+from ..core.singleflight import SingleFlight
+from ..core.admission import AdmissionControl, Saturado
+from ..core.deadline import EstimadorCostos, UltimasRespuestas
+from ..core.shards import CatalogoParticionado
+from ..core.negotiation import RespuestaNegociada, RutaNegociada, formato_respuesta
+from fastapi.routing import APIRoute
+import copy
 import os
+import time
+import json
+import hashlib
+import threading
 from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
-from typing import Optional, List
+from typing import Annotated, Optional, List
 
 # Cargar variables de entorno desde .env
 dotenv_path = os.path.join(os.path.dirname(__file__), "..", "..", ".env")
@@ -15,11 +32,261 @@ load_dotenv(dotenv_path)
 DATA_PATH = os.getenv("DATA_PATH")
 NEW_DATA_PATH = os.getenv("NEW_DATA_PATH")
 
-router = APIRouter()
+# Candidatos que pasan de la primera etapa (sustituto lineal) al booster en
+# recommend_destinations cuando la petición no indica `candidatos`. 0 = puntuar
+# todo el catálogo filtrado con el booster.
+CANDIDATOS_RERANK = int(os.getenv("CANDIDATOS_RERANK", "0"))
+
+# Recomendaciones precalculadas por arquetipo (generar_arquetipos.py) y número
+# de recomendaciones en curso a partir del cual se responde desde ellas aunque
+# la petición no pida el modo rápido. 0 = solo cuando se pide.
+ARQUETIPOS_PATH = os.getenv(
+    "ARQUETIPOS_PATH", os.path.join(os.path.dirname(__file__), "..", "..", "models", "arquetipos.json")
+)
+ARQUETIPOS_SOBRECARGA = int(os.getenv("ARQUETIPOS_SOBRECARGA", "0"))
+
+# Unir recomendaciones idénticas concurrentes en un solo cálculo
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "1") != "0"
+
+# Control de admisión de los endpoints que puntúan el catálogo. Cada endpoint
+# acepta ADMISION_<ENDPOINT>_CONCURRENCIA peticiones a la vez y deja esperar a
+# ADMISION_<ENDPOINT>_COLA; el resto recibe 503 con Retry-After.
+ADMISION_ENABLED = os.getenv("ADMISION_ENABLED", "1") != "0"
+ADMISION_ESPERA_MAX_S = float(os.getenv("ADMISION_ESPERA_MAX_S", "2"))
+ADMISION_RETRY_AFTER_S = int(os.getenv("ADMISION_RETRY_AFTER_S", "1"))
+
+# ETag y Cache-Control de los endpoints de solo lectura (su respuesta depende
+# solo de los parámetros, del catálogo y del modelo). Cache-Control por
+# endpoint con CACHE_CONTROL_<ENDPOINT>; por defecto el cliente revalida
+# siempre (no-cache) y el servidor responde 304 si nada cambió.
+ETAGS_ENABLED = os.getenv("ETAGS_ENABLED", "1") != "0"
+CACHE_CONTROL = {
+    nombre: os.getenv(f"CACHE_CONTROL_{nombre.upper()}", "no-cache")
+    for nombre in ("destinos_por_tipo", "destino_mas_cercano")
+}
+
+# Recomendaciones con plazo (deadline_ms / X-Deadline-Ms): fracción del tiempo
+# restante que se reparte entre las etapas, mínimo de candidatos para que el
+# nivel "candidatos" valga la pena y respuestas exactas guardadas para el
+# nivel "cache"
+DEADLINE_MARGEN = float(os.getenv("DEADLINE_MARGEN", "0.8"))
+DEADLINE_MIN_CANDIDATOS = int(os.getenv("DEADLINE_MIN_CANDIDATOS", "50"))
+DEADLINE_CACHE_CLAVES = int(os.getenv("DEADLINE_CACHE_CLAVES", "1024"))
+
+# Explicaciones guardadas (una por clave de recomendación)
+EXPLICACIONES_CACHE_CLAVES = int(os.getenv("EXPLICACIONES_CACHE_CLAVES", "1024"))
+# Contribuciones aproximadas (approx_contribs de XGBoost) en vez de SHAP exactos
+EXPLICACIONES_APROXIMADAS = os.getenv("EXPLICACIONES_APROXIMADAS", "0") == "1"
+
+# Catálogo particionado por provincia: SHARDS particiones (0 = leer el CSV
+# completo en cada petición) repartidas entre SHARDS_PROCESOS procesos
+# trabajadores (0 = consultarlas en el proceso de la API)
+SHARDS = int(os.getenv("SHARDS", "0"))
+SHARDS_PROCESOS = int(os.getenv("SHARDS_PROCESOS", "0"))
+
+# Búsqueda de destinos por texto: índice construido al cargar el catálogo
+# (0 = sin búsqueda) y descripciones de los atractivos que se indexan junto
+# con nombre, cantón y parroquia (dataset original con desc_, desc2 y desc3)
+BUSQUEDA_ENABLED = os.getenv("BUSQUEDA_ENABLED", "1") != "0"
+DESCRIPCIONES_PATH = os.getenv(
+    "DESCRIPCIONES_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "..", "..", "reseñas_con_atractivos_turisticos.csv")
+)
+
+# Mapa por vista (/destinos_en_vista): desde este zoom se devuelven destinos
+# sueltos y por debajo celdas agrupadas; tope de elementos por respuesta
+MAPA_ZOOM_DETALLE = int(os.getenv("MAPA_ZOOM_DETALLE", "12"))
+MAPA_MAX_ELEMENTOS = int(os.getenv("MAPA_MAX_ELEMENTOS", "500"))
+
+# Perfil de entrenamiento del modelo (ver core/training.py) e hilos de
+# XGBoost al entrenar (0 = todos los núcleos). Los arquetipos y las variantes
+# destiladas se generan con el mismo perfil.
+ENTRENAMIENTO_PERFIL = os.getenv("ENTRENAMIENTO_PERFIL", "clasico")
+ENTRENAMIENTO_HILOS = int(os.getenv("ENTRENAMIENTO_HILOS", "0")) or None
+# Modelo publicado por buscar_hiperparametros.py (carpeta de una versión);
+# si se indica, se carga en lugar de entrenar
+MODELO_PUBLICADO = os.getenv("MODELO_PUBLICADO")
+
+# Variantes del modelo generadas con destilar_modelo.py y la que se sirve
+# ("completo", "media", "sustituto" o una del índice de MODELOS_PATH)
+MODELOS_PATH = os.getenv(
+    "MODELOS_PATH", os.path.join(os.path.dirname(__file__), "..", "..", "models", "modelos")
+)
+MODELO_ACTIVO = os.getenv("MODELO_ACTIVO", "completo")
+
+# Cuerpos y respuestas en MessagePack además de JSON (Content-Type / Accept
+# application/msgpack, ver core/negotiation.py). 0 = solo JSON
+MSGPACK_ENABLED = os.getenv("MSGPACK_ENABLED", "1") != "0"
+
+router = APIRouter(
+    route_class=RutaNegociada if MSGPACK_ENABLED else APIRoute,
+    default_response_class=RespuestaNegociada,
+)
 
 # Inicializar y entrenar el modelo al arrancar la app
 model_manager = ModelManager(DATA_PATH, NEW_DATA_PATH)
-model_manager.train_model() # Entrenar con los datos historicos
+model_manager.load_or_train(MODELO_PUBLICADO, ENTRENAMIENTO_PERFIL, ENTRENAMIENTO_HILOS) # Entrenar con los datos historicos
+if MODELO_ACTIVO != "completo":
+    model_manager.load_variants(MODELOS_PATH)
+    model_manager.use_model(MODELO_ACTIVO)
+# Micro-batching de predicciones pequeñas concurrentes (los bloques del
+# tamaño del catálogo se predicen directamente)
+if os.getenv("MICROBATCH_ENABLED", "1") != "0":
+    model_manager.enable_batching(
+        ventana_ms=float(os.getenv("MICROBATCH_VENTANA_MS", "0.5")),
+        max_lote=int(os.getenv("MICROBATCH_MAX_LOTE", "64")),
+    )
+archetype_index = ArchetypeIndex.load(ARQUETIPOS_PATH, model_manager.model_version)
+
+# Cálculos de recomendación en curso, compartidos entre peticiones idénticas
+recomendaciones_en_vuelo = SingleFlight(
+    max_claves=int(os.getenv("COALESCE_MAX_CLAVES", "1024")),
+    timeout_s=float(os.getenv("COALESCE_TIMEOUT_S", "10")),
+)
+
+# Costos observados de cada etapa y últimas respuestas exactas, para
+# degradar las recomendaciones con plazo
+costos = EstimadorCostos(model_manager.costo_por_fila, margen=DEADLINE_MARGEN)
+ultimas_respuestas = UltimasRespuestas(DEADLINE_CACHE_CLAVES)
+# Recomendaciones con sus explicaciones, por la misma clave
+explicaciones = UltimasRespuestas(EXPLICACIONES_CACHE_CLAVES)
+
+# Control de admisión por endpoint
+
+
+def crear_admision(nombre: str, concurrencia: int, cola: int) -> AdmissionControl:
+    prefijo = f"ADMISION_{nombre.upper()}"
+    return AdmissionControl(
+        nombre,
+        max_concurrentes=int(os.getenv(f"{prefijo}_CONCURRENCIA", str(concurrencia))),
+        max_cola=int(os.getenv(f"{prefijo}_COLA", str(cola))),
+        espera_max_s=ADMISION_ESPERA_MAX_S,
+    )
+
+
+admisiones = {
+    "recommend_destinations": crear_admision("recommend_destinations", 2, 8),
+    "destino_mas_cercano": crear_admision("destino_mas_cercano", 4, 16),
+    "destinos_por_tipo": crear_admision("destinos_por_tipo", 4, 16),
+    "explain_recommendations": crear_admision("explain_recommendations", 2, 8),
+    "buscar_destinos": crear_admision("buscar_destinos", 8, 32),
+    "destinos_en_vista": crear_admision("destinos_en_vista", 8, 32),
+}
+
+
+def admitir(nombre: str):
+    """
+    Dependencia que hace pasar la petición por el control de admisión del
+    endpoint. Agrega la cabecera X-Queue-Time-ms con el tiempo en cola.
+    """
+    control = admisiones[nombre]
+
+    async def dependencia(response: Response):
+        if not ADMISION_ENABLED:
+            yield
+            return
+        try:
+            espera = await control.entrar()
+        except Saturado:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Servicio saturado ({nombre}), intenta de nuevo en unos segundos",
+                headers={"Retry-After": str(ADMISION_RETRY_AFTER_S)}
+            )
+        response.headers["X-Queue-Time-ms"] = f"{espera * 1000:.1f}"
+        try:
+            yield
+        finally:
+            control.salir()
+
+    return dependencia
+
+
+def version_archivo(path: str) -> str:
+    """Versión de un archivo de datos: fecha de modificación y tamaño"""
+    info = os.stat(path)
+    return f"{info.st_mtime_ns}-{info.st_size}"
+
+
+def version_catalogo() -> str:
+    """Versión de los datos con que responden los endpoints del catálogo"""
+    if catalogo is not None:
+        # El catálogo particionado se carga al arrancar y no cambia después
+        return catalogo_version
+    return version_archivo(DATA_PATH)
+
+
+def etag_de(nombre: str, request: Request) -> str:
+    """
+    ETag fuerte de la respuesta: endpoint, parámetros (los repetidos en su
+    orden, que decide los empates), versión del catálogo y del modelo y
+    formato (JSON y MessagePack son representaciones distintas).
+    """
+    parametros = sorted(request.query_params.multi_items(), key=lambda kv: kv[0])
+    raw = json.dumps(
+        [nombre, parametros, version_catalogo(), model_manager.model_version, formato_respuesta.get()],
+        ensure_ascii=False
+    )
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def coincide_etag(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match usa comparación débil: W/"x" coincide con "x"; * con cualquiera"""
+    if not if_none_match:
+        return False
+    etiquetas = [e.strip() for e in if_none_match.split(",")]
+    return "*" in etiquetas or etag in (e[2:] if e.startswith("W/") else e for e in etiquetas)
+
+
+def validar_etag(nombre: str):
+    """
+    Dependencia de los endpoints de solo lectura: agrega ETag y Cache-Control
+    a la respuesta y, si el cliente ya tiene esa versión (If-None-Match),
+    responde 304 sin calcular nada. Va antes que la admisión, así que una
+    revalidación tampoco ocupa lugar en la cola.
+    """
+    async def dependencia(request: Request, response: Response):
+        if not ETAGS_ENABLED:
+            return
+        cabeceras = {"ETag": etag_de(nombre, request), "Cache-Control": CACHE_CONTROL[nombre]}
+        if coincide_etag(request.headers.get("if-none-match"), cabeceras["ETag"]):
+            raise HTTPException(status_code=304, headers=cabeceras)
+        response.headers.update(cabeceras)
+
+    return dependencia
+
+
+# Recomendaciones en curso (para detectar sobrecarga)
+_en_curso = 0
+_en_curso_lock = threading.Lock()
+
+
+def contar_en_curso():
+    global _en_curso
+    with _en_curso_lock:
+        _en_curso += 1
+        actual = _en_curso
+    try:
+        yield actual
+    finally:
+        with _en_curso_lock:
+            _en_curso -= 1
+
+def limite_respuesta(
+        request: Request,
+        deadline_ms: Annotated[Optional[float], Query(gt=0)] = None,
+        x_deadline_ms: Annotated[Optional[float], Header(gt=0)] = None
+    ) -> Optional[float]:
+    """
+    Instante (time.perf_counter) en que vence el plazo de la petición, contado
+    desde que llegó a la API (incluye la espera en cola), o None si no tiene.
+    Si llegan el parámetro y la cabecera manda el plazo menor.
+    """
+    plazos = [p for p in (deadline_ms, x_deadline_ms) if p is not None]
+    if not plazos:
+        return None
+    llegada = getattr(request.state, "llegada", None) or time.perf_counter()
+    return llegada + min(plazos) / 1000
 
 # Utilidades
 def calcular_distancia(lat1, lon1, lat2, lon2):
@@ -31,10 +298,6 @@ def calcular_distancia(lat1, lon1, lat2, lon2):
     return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
 
-def normalizar_texto(texto: str) -> str:
-    return texto.lower().strip().replace("_", " ").replace("-", " ")
-
-
 def buscar_columnas_por_tipo(df: pd.DataFrame, tipo: str) -> List[str]:
     tipo_norm = normalizar_texto(tipo)
     return [
@@ -49,6 +312,76 @@ def limpiar_coordenadas(df: pd.DataFrame) -> pd.DataFrame:
     return df.dropna(subset=["lat", "lon"]).copy()
 
 
+def cargar_destinos() -> pd.DataFrame:
+    """Destinos con coordenadas válidas: los de destinos_en_memoria o, si no hay, los de DATA_PATH"""
+    if destinos_en_memoria is not None:
+        return destinos_en_memoria.copy()
+    df = pd.read_csv(DATA_PATH, sep="|")
+    df.columns = df.columns.str.strip()
+    return limpiar_coordenadas(df)
+
+
+# Catálogo de los endpoints de lectura y lo derivado de él (características,
+# índice de búsqueda, índice del mapa): una sola copia, que se rehace con
+# todo lo derivado si cambia DATA_PATH o destinos_en_memoria
+_catalogo_lectura = {"version": None, "df": None, "derivados": {}}
+_catalogo_lectura_lock = threading.Lock()
+
+
+def derivado_del_catalogo(nombre: str, construir):
+    """`construir(df)` sobre el catálogo actual, calculado una vez por versión del catálogo"""
+    version = id(destinos_en_memoria) if destinos_en_memoria is not None else version_archivo(DATA_PATH)
+    with _catalogo_lectura_lock:
+        if _catalogo_lectura["version"] != version:
+            _catalogo_lectura.update(
+                version=version, df=cargar_destinos().reset_index(drop=True), derivados={}
+            )
+        derivados = _catalogo_lectura["derivados"]
+        if nombre not in derivados:
+            derivados[nombre] = construir(_catalogo_lectura["df"])
+        return derivados[nombre]
+
+
+def caracteristicas_destinos():
+    """Matriz de características del catálogo y posiciones de cada destino por (nombre, lat, lon)"""
+    def construir(df):
+        indice = {}
+        for pos, clave in enumerate(zip(df["nombre"], df["lat"].astype(float), df["lon"].astype(float))):
+            indice.setdefault(clave, []).append(pos)
+        return df[model_manager.feature_columns].to_numpy(dtype=np.float32), indice
+
+    return derivado_del_catalogo("caracteristicas", construir)
+
+
+def indice_busqueda():
+    """Índice de búsqueda, catálogo indexado y códigos de provincia de cada fila"""
+    def construir(df):
+        provincias, nombres = pd.factorize(df["provincia"].astype(str).map(plegar))
+        return {
+            "df": df,
+            "indice": IndiceBusqueda(df, cargar_descripciones(DESCRIPCIONES_PATH)),
+            "provincias": provincias,
+            "codigo_provincia": {p: i for i, p in enumerate(nombres)},
+            "score": df["score"].to_numpy(dtype=float) if "score" in df else np.zeros(len(df)),
+        }
+
+    return derivado_del_catalogo("busqueda", construir)
+
+
+def indice_mapa():
+    """Índice espacial del catálogo y los campos de cada fila que devuelve el mapa"""
+    def construir(df):
+        score = df["score"].to_numpy(dtype=float) if "score" in df else np.zeros(len(df))
+        return {
+            "indice": IndiceEspacial(df["lat"].to_numpy(), df["lon"].to_numpy(), score, MAPA_ZOOM_DETALLE),
+            "nombre": df["nombre"].to_numpy(dtype=object),
+            "provincia": df["provincia"].to_numpy(dtype=object),
+            "canton": df["canton"].to_numpy(dtype=object),
+        }
+
+    return derivado_del_catalogo("mapa", construir)
+
+
 def calcular_distancias_seguras(df, lat, lon):
     def safe(row):
         try:
@@ -59,9 +392,60 @@ def calcular_distancias_seguras(df, lat, lon):
     df["distancia_km"] = df.apply(safe, axis=1)
     return df.dropna(subset=["distancia_km"])
 
+def recomendar_por_arquetipo(miembros, top_k, provincia, lat, lon):
+    aggregated_preferences = aggregate_preferences(miembros, model_manager.feature_columns)
+    resultado = archetype_index.recommend(aggregated_preferences, provincia, top_k)
+    if resultado is None:
+        return None
+
+    arquetipo, recommendations = resultado
+    for rec in recommendations:
+        rec["distancia_km"] = (
+            round(float(calcular_distancia(lat, lon, rec["lat"], rec["lon"])), 2)
+            if lat is not None and lon is not None else None
+        )
+    return {
+        "recommendations": recommendations,
+        "modo": "arquetipo",
+        "arquetipo": archetype_index.nombres[arquetipo],
+        "nivel": "precalculado"
+    }
+
+
+def respuesta_guardada(clave, miembros, top_k, provincia_preferida, lat, lon,
+                       tipos_interes, max_distancia_km, estrategia):
+    """Último recurso con plazo: la última respuesta exacta igual o, si no hay, el arquetipo"""
+    respuesta = ultimas_respuestas.get(clave)
+    if respuesta is not None:
+        return {**respuesta, "nivel": "cache"}
+    if archetype_index is not None and estrategia is None and not tipos_interes and not max_distancia_km:
+        return recomendar_por_arquetipo(miembros, top_k, provincia_preferida, lat, lon)
+    return None
+
+# Destinos ya cargados en memoria para calcular_recomendaciones (los fija
+# recomendar_lote.py, una vez por proceso); None = leer el CSV en cada petición
+destinos_en_memoria: Optional[pd.DataFrame] = None
+
+# Catálogo particionado (se carga una vez al arrancar)
+catalogo = None
+catalogo_version = None
+if SHARDS > 0:
+    catalogo_version = version_archivo(DATA_PATH)
+    _df_catalogo = pd.read_csv(DATA_PATH, sep="|")
+    _df_catalogo.columns = _df_catalogo.columns.str.strip()
+    catalogo = CatalogoParticionado(
+        limpiar_coordenadas(_df_catalogo), model_manager, SHARDS, procesos=SHARDS_PROCESOS
+    )
+    print(f"Catálogo particionado: {catalogo.stats()}")
+
+if BUSQUEDA_ENABLED:
+    print(f"Índice de búsqueda: {indice_busqueda()['indice'].stats()}")
+
+print(f"Índice del mapa: {indice_mapa()['indice'].stats()}")
+
 # Endpoints a exponer
 
-@router.post("/recommend_destinations")
+@router.post("/recommend_destinations", dependencies=[Depends(admitir("recommend_destinations"))])
 def recommend_destinations(
         family: FamilyBase,
         top_k: int = 10,
@@ -69,31 +453,151 @@ def recommend_destinations(
         ubicacion_actual_lon: Optional[float] = None,
         max_distancia_km: Optional[float] = None,
         provincia_preferida: Optional[str] = None,
-        tipos_interes: Optional[List[str]] = None
+        tipos_interes: Optional[List[str]] = None,
+        estrategia: Optional[str] = None,
+        candidatos: Annotated[Optional[int], Query(ge=0)] = None,
+        rapido: bool = False,
+        en_curso: int = Depends(contar_en_curso),
+        limite: Optional[float] = Depends(limite_respuesta)
     ):
+    """
+    Recomienda destinos para la familia. Sin `estrategia` se promedian las
+    preferencias de los miembros y se predice una vez por destino. Con
+    `estrategia` (promedio, minima_miseria, maximo_placer, equidad_rol) se
+    predice el score de cada miembro frente a cada destino en un solo bloque
+    y se combinan según la estrategia; la respuesta incluye el score de cada
+    miembro en los destinos recomendados ("scores_miembros", en el orden de
+    `miembros`: los nombres pueden repetirse).
+
+    Con `candidatos` = N (o CANDIDATOS_RERANK si no se indica) se puntúa
+    primero todo el catálogo filtrado con el sustituto lineal del modelo y solo
+    los N mejores pasan por el booster. 0 desactiva la primera etapa.
+
+    Con `rapido=true` (o si hay más de ARQUETIPOS_SOBRECARGA recomendaciones
+    en curso) se responde desde el arquetipo precalculado más cercano, sin leer
+    el catálogo ni usar el modelo. Solo aplica sin `estrategia`, `tipos_interes`
+    ni `max_distancia_km`; si no aplica se calcula la recomendación exacta. Las
+    respuestas del modo rápido incluyen "modo": "arquetipo".
+
+    Con plazo (`deadline_ms` o cabecera X-Deadline-Ms, en milisegundos desde
+    que llega la petición) se usa el nivel más completo que cabe en el tiempo
+    restante según los costos observados: "completo" (booster sobre todo el
+    catálogo filtrado), "candidatos" (booster sobre los que quepan tras el
+    sustituto lineal), "sustituto" (solo el sustituto lineal) y, si ni eso
+    cabe, "cache" (última respuesta exacta igual) o "precalculado" (arquetipo).
+    Toda respuesta indica en "nivel" cuál la sirvió.
+
+    Las peticiones idénticas sin plazo que llegan mientras otra igual se está
+    calculando esperan ese cálculo y reciben su mismo resultado (ver /metricas).
+    """
     miembros = family.miembros
     if not miembros:
         raise HTTPException(status_code=400, detail="No se proporcionaron miembros de la familia.")
 
-    aggregated_preferences, counts = {}, {}
+    if estrategia is not None and estrategia not in ESTRATEGIAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Estrategia desconocida: {estrategia}. Opciones: {', '.join(ESTRATEGIAS)}"
+        )
+
+    # Modo rápido: responder desde el arquetipo más cercano
+    sobrecarga = ARQUETIPOS_SOBRECARGA > 0 and en_curso > ARQUETIPOS_SOBRECARGA
+    if (rapido or sobrecarga) and archetype_index is not None \
+            and estrategia is None and not tipos_interes and not max_distancia_km:
+        respuesta = recomendar_por_arquetipo(
+            miembros, top_k, provincia_preferida, ubicacion_actual_lat, ubicacion_actual_lon
+        )
+        if respuesta is not None:
+            costos.registrar("precalculado")
+            return respuesta
+
+    parametros = dict(
+        top_k=top_k,
+        ubicacion_actual_lat=ubicacion_actual_lat,
+        ubicacion_actual_lon=ubicacion_actual_lon,
+        max_distancia_km=max_distancia_km,
+        provincia_preferida=provincia_preferida,
+        tipos_interes=tipos_interes,
+        estrategia=estrategia,
+        candidatos=candidatos,
+    )
+    # El plazo no forma parte de la clave: peticiones iguales con distinto
+    # plazo comparten la respuesta guardada. No comparten cálculo: el nivel lo
+    # elige el plazo de quien calcula, así que las peticiones con plazo no se
+    # unen a otras en curso (ni las demás a ellas)
+    clave = clave_recomendacion(family, parametros)
+    calcular = lambda: calcular_recomendaciones(miembros, **parametros, limite=limite, clave=clave)
+    if not COALESCE_ENABLED or limite is not None:
+        resultado = calcular()
+    else:
+        resultado, _ = recomendaciones_en_vuelo.do(clave, calcular)
+    costos.registrar(resultado["nivel"])
+    return resultado
+
+
+def clave_recomendacion(family: FamilyBase, parametros: dict) -> str:
+    """Clave canónica de una recomendación: misma familia y mismos parámetros"""
+    canonica = json.dumps(
+        {"family": family.model_dump(), "parametros": parametros},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha1(canonica.encode("utf-8")).hexdigest()
+
+
+def nivel_de_servicio(destinos: int, n_miembros: int, candidatos: Optional[int], top_k: int,
+                      limite: Optional[float]):
+    """
+    Nivel y candidatos de la primera etapa para `destinos` filtrados: sin
+    plazo, los pedidos; con plazo, los que quepan (nivel None si solo queda una
+    respuesta guardada). También devuelve lo pedido, para saber si la
+    respuesta es la misma que sin plazo.
+    """
+    n_candidatos = CANDIDATOS_RERANK if candidatos is None else candidatos
+    nivel = "candidatos" if 0 < n_candidatos < destinos else "completo"
+    pedido = (nivel, n_candidatos if nivel == "candidatos" else 0)
+    if limite is not None:
+        nivel, n_candidatos = costos.elegir_nivel(
+            limite - time.perf_counter(), destinos, n_miembros, n_candidatos,
+            max(top_k, DEADLINE_MIN_CANDIDATOS)
+        )
+    return nivel, n_candidatos, pedido
+
+
+def calcular_recomendaciones(
+        miembros,
+        top_k: int,
+        ubicacion_actual_lat: Optional[float],
+        ubicacion_actual_lon: Optional[float],
+        max_distancia_km: Optional[float],
+        provincia_preferida: Optional[str],
+        tipos_interes: Optional[List[str]],
+        estrategia: Optional[str],
+        candidatos: Optional[int],
+        limite: Optional[float] = None,
+        clave: Optional[str] = None
+    ):
+    def guardada():
+        return respuesta_guardada(
+            clave, miembros, top_k, provincia_preferida, ubicacion_actual_lat, ubicacion_actual_lon,
+            tipos_interes, max_distancia_km, estrategia
+        )
 
-    # Agregar preferencias de cada miembro
-    for member in miembros:
-        for key, value in member.preferencias.items():
-            key_norm = normalizar_texto(key)
-            for col in model_manager.feature_columns:
-                if key_norm in normalizar_texto(col):
-                    aggregated_preferences[col] = aggregated_preferences.get(col, 0.0) + value
-                    counts[col] = counts.get(col, 0) + 1
+    if catalogo is not None:
+        return recomendar_particionado(
+            miembros, top_k, ubicacion_actual_lat, ubicacion_actual_lon, max_distancia_km,
+            provincia_preferida, tipos_interes, estrategia, candidatos, limite, clave, guardada
+        )
 
-    # Promediar
-    for col in aggregated_preferences:
-        aggregated_preferences[col] /= counts[col]
+    # Con plazo: si ni la lectura del catálogo cabe, responder con lo guardado
+    if limite is not None and limite - time.perf_counter() < costos.estimar("carga"):
+        respuesta = guardada()
+        if respuesta is not None:
+            return respuesta
 
     # Cargar destinos históricos
-    df = pd.read_csv(DATA_PATH, sep="|")
-    df.columns = df.columns.str.strip()
-    df = limpiar_coordenadas(df)
+    inicio = time.perf_counter()
+    df = cargar_destinos()
+    costos.observar("carga", time.perf_counter() - inicio)
 
     if provincia_preferida:
         df = df[df["provincia"].str.upper() == provincia_preferida.upper()]
@@ -114,31 +618,345 @@ def recommend_destinations(
         if max_distancia_km:
             df = df[df["distancia_km"] <= max_distancia_km]
 
-    # Repetir agregadas para todos los destinos
-    X = df[model_manager.feature_columns].copy()
-    for col, val in aggregated_preferences.items():
-        X[col] = val
+    # Promediar preferencias de los miembros (dict, vector o forma dispersa)
+    aggregated_preferences = aggregate_preferences(miembros, model_manager.feature_columns)
+    n_miembros = 1 if estrategia is None else len(miembros)
+
+    nivel, n_candidatos, pedido = nivel_de_servicio(len(df), n_miembros, candidatos, top_k, limite)
+    if nivel is None:
+        respuesta = guardada()
+        if respuesta is not None:
+            return respuesta
+        nivel = "sustituto"
 
-    df["predicted_score"] = model_manager.model.predict(X)
+    X_destinos = df[model_manager.feature_columns].to_numpy(dtype=np.float32)
+    if estrategia is None:
+        preferencias = np.array(
+            [[aggregated_preferences.get(col, np.nan) for col in model_manager.feature_columns]]
+        )
+    else:
+        preferencias = preferencias_por_miembro(miembros, model_manager.feature_columns)
 
+    if nivel == "sustituto":
+        # Solo el sustituto lineal, sin pasar por el booster
+        inicio = time.perf_counter()
+        scores_miembros = model_manager.surrogate_members(X_destinos, preferencias)
+        costos.observar("sustituto", time.perf_counter() - inicio, scores_miembros.size)
+    else:
+        # Primera etapa: quedarse con los N mejores según el sustituto lineal
+        if nivel == "candidatos":
+            inicio = time.perf_counter()
+            posiciones = model_manager.candidate_indices(X_destinos, aggregated_preferences, n_candidatos)
+            costos.observar("sustituto", time.perf_counter() - inicio, len(X_destinos))
+            df = df.iloc[posiciones].copy()
+            X_destinos = X_destinos[posiciones]
+
+        inicio = time.perf_counter()
+        if estrategia is None:
+            # Repetir agregadas para todos los destinos
+            scores_miembros = model_manager.predict_with_preferences(df, aggregated_preferences)[None, :]
+        else:
+            # Consenso: un score por miembro y destino, combinado por la estrategia
+            scores_miembros = model_manager.predict_members(X_destinos, preferencias)
+        costos.observar("booster", time.perf_counter() - inicio, scores_miembros.size)
+
+    if estrategia is None:
+        df["predicted_score"] = scores_miembros[0]
+    else:
+        df["predicted_score"] = combinar_scores(scores_miembros, estrategia, [m.rol for m in miembros])
+
+    df = df.reset_index(drop=True)
     top = df.sort_values("predicted_score", ascending=False).head(top_k)
-    # recommendations = top_destinos[["nombre", "provincia", "canton", "predicted_score"]].to_dict(orient="records")
+
+    recommendations = [
+        {
+            "nombre": r["nombre"],
+            "provincia": r["provincia"],
+            "canton": r["canton"],
+            "lat": float(r["lat"]),
+            "lon": float(r["lon"]),
+            "predicted_score": round(float(r["predicted_score"]), 3),
+            "distancia_km": round(float(r["distancia_km"]), 2) if "distancia_km" in r else None
+        }
+        for _, r in top.iterrows()
+    ]
+
+    if estrategia is None:
+        respuesta = {"recommendations": recommendations, "nivel": nivel}
+    else:
+        for rec, pos in zip(recommendations, top.index):
+            rec["scores_miembros"] = [round(float(s), 3) for s in scores_miembros[:, pos]]
+        respuesta = {"recommendations": recommendations, "estrategia": estrategia, "nivel": nivel}
+
+    # Solo se guardan las respuestas que se darían igual sin plazo
+    if clave is not None and (nivel, n_candidatos) == pedido:
+        ultimas_respuestas.put(clave, respuesta)
+    return respuesta
+
+def recomendar_particionado(miembros, top_k, ubicacion_actual_lat, ubicacion_actual_lon, max_distancia_km,
+                            provincia_preferida, tipos_interes, estrategia, candidatos, limite, clave, guardada):
+    """calcular_recomendaciones sobre el catálogo particionado: solo se consultan las particiones necesarias"""
+    n_miembros = 1 if estrategia is None else len(miembros)
+    columnas_tipos = sorted({j for tipo in tipos_interes or [] for j in catalogo.columnas_de_tipo(tipo)})
+    if catalogo.filas(provincia_preferida) == 0 or (tipos_interes and not columnas_tipos):
+        raise HTTPException(404, "No hay destinos tras aplicar filtros")
+    filtros = {
+        "lat": ubicacion_actual_lat,
+        "lon": ubicacion_actual_lon,
+        "max_distancia_km": max_distancia_km,
+        "columnas_tipos": columnas_tipos,
+    }
+
+    # Con plazo el nivel se elige, como sin particionar, sobre los destinos que
+    # pasan los filtros; sin plazo basta el total (cada partición ajusta la
+    # primera etapa a los suyos). Como sin particionar, es un 404 si ninguno
+    # pasa provincia y tipos, y una lista vacía si los descarta la distancia
+    if limite is None:
+        destinos = catalogo.filas(provincia_preferida)
+    else:
+        cuenta = catalogo.contar(filtros, provincia_preferida)
+        if not cuenta["filtrados"]:
+            raise HTTPException(404, "No hay destinos tras aplicar filtros")
+        destinos = cuenta["destinos"]
+
+    nivel, n_candidatos, pedido = nivel_de_servicio(destinos, n_miembros, candidatos, top_k, limite)
+    if nivel is None:
+        respuesta = guardada()
+        if respuesta is not None:
+            return respuesta
+        nivel = "sustituto"
+
+    aggregated_preferences = aggregate_preferences(miembros, model_manager.feature_columns)
+    if estrategia is None:
+        preferencias = np.array(
+            [[aggregated_preferences.get(col, np.nan) for col in model_manager.feature_columns]]
+        )
+    else:
+        preferencias = preferencias_por_miembro(miembros, model_manager.feature_columns)
+
+    inicio = time.perf_counter()
+    resultado = catalogo.recomendar({
+        **filtros,
+        "top_k": top_k,
+        "nivel": nivel,
+        "candidatos": n_candidatos,
+        "agregadas": aggregated_preferences,
+        "preferencias": preferencias,
+        "estrategia": estrategia,
+        "roles": [m.rol for m in miembros],
+    }, provincia_preferida)
+    costos.observar(
+        "sustituto" if nivel == "sustituto" else "booster", time.perf_counter() - inicio, resultado["filas"]
+    )
+    if not resultado["filtrados"]:
+        raise HTTPException(404, "No hay destinos tras aplicar filtros")
+    if nivel == "candidatos" and not resultado["candidatos"]:
+        # Ninguna partición tenía más destinos filtrados que candidatos
+        nivel, n_candidatos = "completo", 0
+        pedido = (nivel, 0) if pedido[0] == "candidatos" else pedido
+
+    recommendations = []
+    for r in resultado["registros"]:
+        rec = {
+            "nombre": r["nombre"],
+            "provincia": r["provincia"],
+            "canton": r["canton"],
+            "lat": r["lat"],
+            "lon": r["lon"],
+            "predicted_score": round(r["predicted_score"], 3),
+            "distancia_km": round(r["distancia_km"], 2) if r["distancia_km"] is not None else None
+        }
+        if estrategia is not None:
+            rec["scores_miembros"] = [round(s, 3) for s in r["scores_miembros"]]
+        recommendations.append(rec)
+
+    respuesta = {"recommendations": recommendations}
+    if estrategia is not None:
+        respuesta["estrategia"] = estrategia
+    respuesta["nivel"] = nivel
+    if clave is not None and (nivel, n_candidatos) == pedido:
+        ultimas_respuestas.put(clave, respuesta)
+    return respuesta
+
+def explicar(respuesta: dict, miembros, estrategia: Optional[str]) -> dict:
+    """
+    Agrega a cada recomendación de `respuesta` la contribución de cada
+    columna a su score, con una sola llamada a explain_members sobre las
+    filas recomendadas (no sobre el catálogo). Sin estrategia se explica el
+    score con las preferencias promediadas; con estrategia, el de cada miembro.
+    """
+    X, indice = caracteristicas_destinos()
+    columnas = model_manager.feature_columns
+    if estrategia is None:
+        promedio = aggregate_preferences(miembros, columnas)
+        preferencias = np.array([[promedio.get(col, np.nan) for col in columnas]], dtype=np.float32)
+    else:
+        preferencias = preferencias_por_miembro(miembros, columnas)
+
+    # Filas de cada recomendación (puede haber destinos repetidos en el catálogo)
+    filas = [indice.get((r["nombre"], r["lat"], r["lon"]), []) for r in respuesta["recommendations"]]
+    posiciones = [p for grupo in filas for p in grupo]
+    if not posiciones:
+        return respuesta
+    contribuciones, base = model_manager.explain_members(X[posiciones], preferencias, EXPLICACIONES_APROXIMADAS)
+
+    fijadas = [col for j, col in enumerate(columnas) if not np.isnan(preferencias[:, j]).all()]
+    cortas = [col.replace("Calif promedio ", "") for col in columnas]
+
+    def detalle(c, b):
+        orden = np.argsort(-c)
+        return {"base": round(float(b), 4), "contribuciones": {cortas[j]: round(float(c[j]), 4) for j in orden}}
+
+    inicio = 0
+    for rec, grupo in zip(respuesta["recommendations"], filas):
+        if not grupo:
+            continue
+        fin = inicio + len(grupo)
+        scores = contribuciones[:, inicio:fin].sum(axis=2) + base[:, inicio:fin]
+        if estrategia is None:
+            objetivo = np.array([[rec["predicted_score"]]])
+        else:
+            objetivo = np.array(rec["scores_miembros"])[:, None]
+        # Entre filas repetidas, la que reproduce el score recomendado
+        k = inicio + int(np.abs(scores - objetivo).sum(axis=0).argmin())
+        inicio = fin
+
+        rec["explicacion"] = {"preferencias_familia": [c.replace("Calif promedio ", "") for c in fijadas]}
+        if estrategia is None:
+            rec["explicacion"].update(detalle(contribuciones[0, k], base[0, k]))
+        else:
+            rec["explicacion"]["por_miembro"] = [
+                detalle(contribuciones[i, k], base[i, k]) for i in range(len(miembros))
+            ]
+    return respuesta
+
+
+@router.post("/explain_recommendations", dependencies=[Depends(admitir("explain_recommendations"))])
+def explain_recommendations(
+        family: FamilyBase,
+        top_k: int = 10,
+        ubicacion_actual_lat: Optional[float] = None,
+        ubicacion_actual_lon: Optional[float] = None,
+        max_distancia_km: Optional[float] = None,
+        provincia_preferida: Optional[str] = None,
+        tipos_interes: Optional[List[str]] = None,
+        estrategia: Optional[str] = None,
+        candidatos: Annotated[Optional[int], Query(ge=0)] = None,
+        en_curso: int = Depends(contar_en_curso)
+    ):
+    """
+    Las mismas recomendaciones que recommend_destinations (sin modo rápido ni
+    plazo), cada una con "explicacion": el valor base del modelo y la
+    contribución de cada columna a su score (valores SHAP de XGBoost en los
+    boosters, o su aproximación con EXPLICACIONES_APROXIMADAS=1), ordenadas
+    de mayor a menor; la suma de base y contribuciones es el score.
+    "preferencias_familia" indica qué columnas tomaron el valor de la familia
+    en vez del destino. Con `estrategia` la explicación es por miembro
+    ("por_miembro", en el orden de `miembros` como "scores_miembros").
+
+    Las explicaciones se guardan junto con la recomendación (misma clave y
+    versión del modelo y del catálogo), así que repetir la petición no vuelve
+    a calcularlas.
+    """
+    parametros = dict(
+        top_k=top_k,
+        ubicacion_actual_lat=ubicacion_actual_lat,
+        ubicacion_actual_lon=ubicacion_actual_lon,
+        max_distancia_km=max_distancia_km,
+        provincia_preferida=provincia_preferida,
+        tipos_interes=tipos_interes,
+        estrategia=estrategia,
+        candidatos=candidatos,
+    )
+    clave = f"{model_manager.model_version}:{version_catalogo()}:{clave_recomendacion(family, parametros)}"
+    guardada = explicaciones.get(clave)
+    if guardada is not None:
+        return guardada
+
+    resultado = recommend_destinations(family, **parametros, rapido=False, en_curso=en_curso, limite=None)
+    # La respuesta puede ser compartida (unión de peticiones, última respuesta): no modificarla
+    respuesta = explicar(copy.deepcopy(resultado), family.miembros, estrategia)
+    explicaciones.put(clave, respuesta)
+    return respuesta
+
+
+def _redondear(valores: np.ndarray, decimales: int = 3):
+    """Lista (o lista de listas) con NaN como None, para responder en JSON"""
+    return np.where(np.isnan(valores), None, np.round(valores, decimales)).tolist()
+
+
+@router.post("/compatibility")
+def compatibility(family: FamilyBase):
+    """
+    Compatibilidad entre los miembros de la familia, calculada de una vez
+    sobre la matriz (miembros × 24) de preferencias:
+      • similitud: coseno (calificaciones centradas en el punto medio de la
+        escala) y correlación de rangos (Spearman) entre cada par, sobre las
+        columnas que ambos calificaron, y cuántas columnas tienen en común.
+        null = el par no tiene suficientes columnas en común
+      • conflictos: por interés calificado por dos o más miembros, qué tan
+        dispersas están sus calificaciones (0 = de acuerdo, 1 = opuestas) y
+        quién lo calificó más alto y más bajo; de mayor a menor conflicto
+      • miembros: preferencias dadas, calificación promedio y afinidad (coseno
+        medio con el resto)
+      • resumen: totales de la familia y su compatibilidad (coseno medio entre
+        pares, llevado a 0-100)
+    """
+    miembros = family.miembros
+    if not miembros:
+        raise HTTPException(status_code=400, detail="No se proporcionaron miembros de la familia.")
+
+    preferencias = preferencias_por_miembro(miembros, model_manager.feature_columns)
+    resultado = matriz_compatibilidad(preferencias)
+    coseno, conflicto = resultado["coseno"], resultado["conflictos"]
+    opino = ~np.isnan(preferencias)
+    nombres = [m.nombre for m in miembros]
+    cortas = [col.replace("Calif promedio ", "") for col in model_manager.feature_columns]
+
+    # Solo pares distintos: la diagonal no cuenta para afinidad ni compatibilidad
+    otros = np.where(np.eye(len(miembros), dtype=bool), np.nan, coseno)
+    pares = otros[np.triu_indices(len(miembros), k=1)]
+    pares = pares[~np.isnan(pares)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        afinidad = np.nansum(otros, axis=1) / (~np.isnan(otros)).sum(axis=1)
+        promedio = np.nansum(preferencias, axis=1) / opino.sum(axis=1)
+
+    en_conflicto = np.flatnonzero(conflicto["miembros"] >= 2)
+    en_conflicto = en_conflicto[np.argsort(-conflicto["conflicto"][en_conflicto], kind="stable")]
 
     return {
-        "recommendations": [
+        "miembros": [
+            {"nombre": m.nombre, "rol": m.rol, "preferencias": int(n), "promedio": p, "afinidad": a}
+            for m, n, p, a in zip(miembros, opino.sum(axis=1), _redondear(promedio, 2), _redondear(afinidad))
+        ],
+        "resumen": {
+            "preferencias_totales": int(opino.sum()),
+            "calificacion_promedio": round(float(np.nanmean(preferencias)), 2) if opino.any() else None,
+            "intereses_unicos": int(opino.any(axis=0).sum()),
+            "pares_comparables": int(len(pares)),
+            "compatibilidad": round(float((pares.mean() + 1) * 50), 1) if len(pares) else None,
+        },
+        "similitud": {
+            "coseno": _redondear(coseno),
+            "rangos": _redondear(resultado["rangos"]),
+            "comunes": resultado["comunes"].tolist(),
+        },
+        "conflictos": [
             {
-                "nombre": r["nombre"],
-                "provincia": r["provincia"],
-                "canton": r["canton"],
-                "lat": float(r["lat"]),
-                "lon": float(r["lon"]),
-                "predicted_score": round(float(r["predicted_score"]), 3),
-                "distancia_km": round(float(r["distancia_km"]), 2) if "distancia_km" in r else None
+                "interes": cortas[j],
+                "conflicto": round(float(conflicto["conflicto"][j]), 3),
+                "media": round(float(conflicto["media"][j]), 2),
+                "minimo": float(conflicto["minimo"][j]),
+                "maximo": float(conflicto["maximo"][j]),
+                "miembros": int(conflicto["miembros"][j]),
+                "quien_mas": nombres[conflicto["quien_mas"][j]],
+                "quien_menos": nombres[conflicto["quien_menos"][j]],
             }
-            for _, r in top.iterrows()
-        ]
+            for j in en_conflicto
+        ],
     }
 
+
 @router.post("/save_family_record")
 def save_family_record(record: dict):
     """
@@ -153,13 +971,30 @@ def save_family_record(record: dict):
 
 # Nuevos endpoints para manejar mapa interactivo
 
-@router.get("/destino_mas_cercano")
+@router.get(
+    "/destino_mas_cercano",
+    dependencies=[Depends(validar_etag("destino_mas_cercano")), Depends(admitir("destino_mas_cercano"))]
+)
 def obtener_destino_mas_cercano(
     lat: float,
     lon: float,
     tipo: Optional[str] = None,
     min_score: float = 0.0
 ):
+    if catalogo is not None:
+        d = catalogo.mas_cercano(lat, lon, tipo, min_score)
+        if d is None:
+            raise HTTPException(404, "No hay destinos válidos")
+        return {
+            "nombre": d["nombre"],
+            "provincia": d["provincia"],
+            "canton": d["canton"],
+            "lat": d["lat"],
+            "lon": d["lon"],
+            "score": d["score"],
+            "distancia_km": round(d["distancia_km"], 2)
+        }
+
     df = pd.read_csv(DATA_PATH, sep="|")
     df.columns = df.columns.str.strip()
     df = limpiar_coordenadas(df)
@@ -196,12 +1031,24 @@ def obtener_destino_mas_cercano(
         "distancia_km": round(float(d["distancia_km"]), 2)
     }
 
-@router.get("/destinos_por_tipo")
+@router.get(
+    "/destinos_por_tipo",
+    dependencies=[Depends(validar_etag("destinos_por_tipo")), Depends(admitir("destinos_por_tipo"))]
+)
 def destinos_por_tipo(
-    tipo: str,
+    tipo: List[str] = Query(...),
     top_k: int = 10,
     provincia: Optional[str] = None
 ):
+    """
+    Top K destinos por tipo de lugar. Acepta varios `tipo` en la misma
+    llamada (?tipo=playas&tipo=museos): el catálogo se lee y filtra una sola
+    vez, se calcula el score de todos los tipos a la vez y se devuelven los
+    mejores de cada uno, sin duplicados.
+    """
+    if catalogo is not None:
+        return destinos_por_tipo_particionado(tipo, top_k, provincia)
+
     df = pd.read_csv(DATA_PATH, sep="|")
     df.columns = df.columns.str.strip()
     df = limpiar_coordenadas(df)
@@ -210,34 +1057,220 @@ def destinos_por_tipo(
     if provincia:
         df = df[df["provincia"].str.upper() == provincia.upper()]
 
-    # ---- Buscar columnas del tipo ----
-    cols = buscar_columnas_por_tipo(df, tipo)
+    # ---- Buscar columnas de cada tipo ----
+    tipos = list(dict.fromkeys(tipo))
+    cols_por_tipo = {t: buscar_columnas_por_tipo(df, t) for t in tipos}
 
-    if not cols:
-        raise HTTPException(404, f"No hay columnas para el tipo: {tipo}")
+    sin_columnas = [t for t, cols in cols_por_tipo.items() if not cols]
+    if sin_columnas:
+        raise HTTPException(404, f"No hay columnas para el tipo: {', '.join(sin_columnas)}")
 
-    # ---- Score promedio del tipo ----
-    df["score_tipo"] = df[cols].mean(axis=1)
+    # ---- Score promedio de cada tipo (una columna por tipo) ----
+    scores = np.column_stack([
+        df[cols].mean(axis=1).to_numpy(dtype=float) for cols in cols_por_tipo.values()
+    ])
 
-    # ---- Filtrar destinos válidos ----
-    df = df[df["score_tipo"] > 0]
+    # ---- Top K de cada tipo entre los destinos válidos ----
+    mejores = {}
+    for j, t in enumerate(tipos):
+        score_tipo = scores[:, j]
+        validos = np.flatnonzero(score_tipo > 0)
+        orden = validos[np.argsort(-score_tipo[validos], kind="stable")][:top_k]
+        for pos in orden:
+            # Un destino que aparece en varios tipos se queda con su mejor score
+            if pos not in mejores or score_tipo[pos] > mejores[pos][0]:
+                mejores[pos] = (score_tipo[pos], t)
 
-    if df.empty:
+    if not mejores:
         raise HTTPException(404, "No hay destinos válidos")
 
-    # ---- Top K ----
-    top = df.sort_values("score_tipo", ascending=False).head(top_k)
+    ranking = sorted(mejores.items(), key=lambda kv: -kv[1][0])
+    top = df.iloc[[pos for pos, _ in ranking]]
+
+    return {
+        "resultados": [
+            {
+                "nombre": r["nombre"],
+                "provincia": r["provincia"],
+                "canton": r["canton"],
+                "lat": float(r["lat"]),
+                "lon": float(r["lon"]),
+                "score_general": round(float(score), 3),
+                "tipo": t
+            }
+            for (_, r), (_, (score, t)) in zip(top.iterrows(), ranking)
+        ]
+    }
+
+
+@router.get("/buscar_destinos", dependencies=[Depends(admitir("buscar_destinos"))])
+def buscar_destinos(
+    q: str,
+    top_k: int = 10,
+    provincia: Optional[str] = None,
+    tipo: Optional[List[str]] = Query(None)
+):
+    """
+    Busca destinos por texto en nombre, cantón, parroquia y descripción, sin
+    importar tildes ni mayúsculas y tolerando errores de tipeo (términos
+    parecidos por trigramas y prefijos). Un destino debe coincidir con todas
+    las palabras; se ordenan por relevancia (coincidencias en el nombre pesan
+    más que en la descripción) y luego por score. Se combina con los filtros
+    de provincia y de tipo de lugar (los mismos de destinos_por_tipo; con
+    varios `tipo` basta con uno). "terminos" muestra con qué palabras del
+    catálogo coincidió cada palabra buscada.
+    """
+    if not BUSQUEDA_ENABLED:
+        raise HTTPException(404, "La búsqueda de destinos está desactivada (BUSQUEDA_ENABLED=0)")
+
+    busqueda = indice_busqueda()
+    df = busqueda["df"]
+    filas, relevancia, terminos = busqueda["indice"].buscar(q)
+
+    # Los filtros se aplican solo a las filas que coincidieron
+    if provincia:
+        codigo = busqueda["codigo_provincia"].get(plegar(provincia), -1)
+        dentro = busqueda["provincias"][filas] == codigo
+        filas, relevancia = filas[dentro], relevancia[dentro]
+
+    if tipo:
+        cols_por_tipo = {t: buscar_columnas_por_tipo(df, t) for t in dict.fromkeys(tipo)}
+        sin_columnas = [t for t, cols in cols_por_tipo.items() if not cols]
+        if sin_columnas:
+            raise HTTPException(404, f"No hay columnas para el tipo: {', '.join(sin_columnas)}")
+        dentro = np.zeros(len(filas), dtype=bool)
+        for cols in cols_por_tipo.values():
+            dentro |= np.mean([df[c].to_numpy(dtype=float)[filas] for c in cols], axis=0) > 0
+        filas, relevancia = filas[dentro], relevancia[dentro]
 
+    elegidas = mejores(relevancia, busqueda["score"][filas], top_k)
     return {
+        "consulta": q,
+        "total": int(len(filas)),
+        "terminos": terminos,
         "resultados": [
             {
                 "nombre": r["nombre"],
                 "provincia": r["provincia"],
                 "canton": r["canton"],
+                "parroquia": r["parroquia"],
                 "lat": float(r["lat"]),
                 "lon": float(r["lon"]),
-                "score_general": round(float(r["score_tipo"]), 3)
+                "score_general": round(float(r["score"]), 3) if "score" in r else None,
+                "relevancia": round(float(rel), 3),
+            }
+            for (_, r), rel in zip(df.iloc[filas[elegidas]].iterrows(), relevancia[elegidas])
+        ]
+    }
+
+
+@router.get("/destinos_en_vista", dependencies=[Depends(admitir("destinos_en_vista"))])
+def destinos_en_vista(
+    lat_min: float = Query(..., ge=-90, le=90),
+    lat_max: float = Query(..., ge=-90, le=90),
+    lon_min: float = Query(..., ge=-180, le=180),
+    lon_max: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=22),
+    limite: Optional[int] = Query(None, ge=1)
+):
+    """
+    Lo que hay en la vista del mapa (límites y zoom de Leaflet), desde el
+    índice espacial del catálogo:
+      • con zoom >= MAPA_ZOOM_DETALLE, los destinos dentro de los límites
+        ("destinos"); si son más que el límite, los de mejor score
+      • con zoom menor, celdas agrupadas de unos 64 px ("clusters") con la
+        cantidad de destinos, score medio, centroide y su mejor destino; si
+        son más que el límite se agrupan con el zoom anterior
+    Ninguna respuesta pasa de `limite` elementos (como máximo
+    MAPA_MAX_ELEMENTOS). "total" cuenta los destinos en la vista (en modo
+    agrupado, los de las celdas que la tocan).
+    """
+    if lat_min > lat_max or lon_min > lon_max:
+        raise HTTPException(422, "Límites inválidos: el mínimo debe ser menor o igual que el máximo")
+    limite = min(limite or MAPA_MAX_ELEMENTOS, MAPA_MAX_ELEMENTOS)
+    mapa = indice_mapa()
+    indice = mapa["indice"]
+    limites = (lat_min, lat_max, lon_min, lon_max)
+
+    if zoom >= indice.zoom_detalle:
+        filas = indice.filas_en(*limites)
+        total = len(filas)
+        # Los de mejor score y, a igual score, en el orden del catálogo
+        filas = np.sort(filas)
+        filas = filas[np.argsort(-indice.score[filas], kind="stable")[:limite]]
+        return {
+            "modo": "destinos",
+            "zoom": zoom,
+            "total": total,
+            "truncado": total > limite,
+            "destinos": [
+                {
+                    "nombre": mapa["nombre"][f],
+                    "provincia": mapa["provincia"][f],
+                    "canton": mapa["canton"][f],
+                    "lat": float(indice.lat[f]),
+                    "lon": float(indice.lon[f]),
+                    "score_general": round(float(indice.score[f]), 3),
+                }
+                for f in filas.tolist()
+            ]
+        }
+
+    nivel = zoom
+    celdas = indice.celdas_en(nivel, *limites)
+    while len(celdas["cantidad"]) > limite and nivel > 0:
+        nivel -= 1
+        celdas = indice.celdas_en(nivel, *limites)
+    # Solo con un límite muy chico: quedan las celdas con más destinos
+    elegidas = np.argsort(-celdas["cantidad"], kind="stable")[:limite]
+    g = celdas["grados"]
+    return {
+        "modo": "clusters",
+        "zoom": zoom,
+        "zoom_agrupacion": nivel,
+        "total": int(celdas["cantidad"].sum()),
+        "truncado": len(elegidas) < len(celdas["cantidad"]),
+        "clusters": [
+            {
+                "lat": round(float(celdas["lat"][i]), 6),
+                "lon": round(float(celdas["lon"][i]), 6),
+                "cantidad": int(celdas["cantidad"][i]),
+                "score_medio": round(float(celdas["score_medio"][i]), 3),
+                "limites": [
+                    [float(celdas["lat_min"][i]), float(celdas["lon_min"][i])],
+                    [float(celdas["lat_min"][i] + g), float(celdas["lon_min"][i] + g)],
+                ],
+                "destacado": {
+                    "nombre": mapa["nombre"][celdas["mejor"][i]],
+                    "score_general": round(float(indice.score[celdas["mejor"][i]]), 3),
+                },
+            }
+            for i in np.sort(elegidas).tolist()
+        ]
+    }
+
+
+def destinos_por_tipo_particionado(tipo: List[str], top_k: int, provincia: Optional[str]):
+    tipos = list(dict.fromkeys(tipo))
+    sin_columnas = [t for t in tipos if not catalogo.columnas_de_tipo(t)]
+    if sin_columnas:
+        raise HTTPException(404, f"No hay columnas para el tipo: {', '.join(sin_columnas)}")
+
+    ranking = catalogo.por_tipo(tipos, top_k, provincia)
+    if not ranking:
+        raise HTTPException(404, "No hay destinos válidos")
+
+    return {
+        "resultados": [
+            {
+                "nombre": r["nombre"],
+                "provincia": r["provincia"],
+                "canton": r["canton"],
+                "lat": r["lat"],
+                "lon": r["lon"],
+                "score_general": round(r["score_general"], 3),
+                "tipo": t
             }
-            for _, r in top.iterrows()
+            for r, t in ranking
         ]
     }
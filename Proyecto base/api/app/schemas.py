@@ -1,13 +1,36 @@
-from pydantic import BaseModel
-from typing import Dict, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Dict, List, Optional
+
+# Largo del vector de preferencias: una posición por columna de RATING_COLUMNS
+N_PREFERENCIAS = 24
+
+# Restricciones declarativas: las valida pydantic-core sin pasar por Python
+VectorPreferencias = Annotated[List[Optional[float]], Field(min_length=N_PREFERENCIAS, max_length=N_PREFERENCIAS)]
+IndicePreferencia = Annotated[int, Field(ge=0, lt=N_PREFERENCIAS)]
 
 class MemberBase(BaseModel):
     """
-    Define un miembro de la familia con su nombre, rol y preferencias
+    Define un miembro de la familia con su nombre, rol y preferencias.
+
+    Las preferencias pueden enviarse de tres formas (se usa la primera presente):
+      • vector: 24 valores en el orden de RATING_COLUMNS (null = sin preferencia)
+      • indices + valores: forma dispersa, posiciones de RATING_COLUMNS y sus valores
+      • preferencias: diccionario por nombre de columna
     """
     nombre: str
     rol: str
-    preferencias: Dict[str, float]  # ejemplo: {"calif promedio playas":5, "calif promedio resorts":4}
+    preferencias: Dict[str, float] = {}  # ejemplo: {"calif promedio playas":5, "calif promedio resorts":4}
+    vector: Optional[VectorPreferencias] = None
+    indices: Optional[List[IndicePreferencia]] = None
+    valores: Optional[List[float]] = None
+
+    @model_validator(mode="after")
+    def validar_dispersa(self):
+        if (self.indices is None) != (self.valores is None) or (
+            self.indices is not None and len(self.indices) != len(self.valores)
+        ):
+            raise ValueError("'indices' y 'valores' deben enviarse juntos y con el mismo largo")
+        return self
 
 class FamilyBase(BaseModel):
     """
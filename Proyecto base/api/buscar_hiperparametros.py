@@ -0,0 +1,304 @@
+'''
+BÚSQUEDA DE HIPERPARÁMETROS DEL MODELO
+
+Proceso fuera de línea para elegir los hiperparámetros del booster:
+  1. Lee el historial una sola vez, lo separa en entrenamiento y validación
+     (el mismo pliegue que los perfiles de entrenamiento de la API) y lo
+     guarda como matrices float32 .npy en un directorio temporal
+  2. Reparte los ensayos entre procesos trabajadores. Cada trabajador abre
+     las matrices con memoria mapeada (las páginas las comparte el sistema
+     operativo, no se copian por proceso) y arma una sola vez su matriz de
+     cuantiles, que reutiliza en todos sus ensayos
+  3. Cada ensayo entrena con parada temprana y se poda antes de terminar si
+     en algún punto de control su RMSE de validación queda por encima de la
+     mediana de los ensayos que ya pasaron por ese punto
+  4. De cada ensayo terminado registra RMSE y MAE de validación, árboles y
+     latencia de inferencia (bloque del tamaño del catálogo y fila suelta)
+  5. Con --publicar, guarda el mejor modelo como artefacto versionado en
+     PUBLICADOS_PATH/<versión> (modelo.ubj y metadata.json); la API lo
+     sirve con MODELO_PUBLICADO=<carpeta>
+
+El primer ensayo es siempre la configuración actual de la API: sus
+hiperparámetros con N_ARBOLES árboles, sin parada temprana ni poda.
+
+Uso (desde la carpeta api):
+    python buscar_hiperparametros.py --ensayos 24 --procesos 4 --publicar
+'''
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Tuple
+
+import numpy as np
+import xgboost as xgb
+from dotenv import load_dotenv
+
+from app.core.model_manager import RATING_COLUMNS
+from app.core.training import (
+    MAX_BIN,
+    N_ARBOLES,
+    PARADA_TEMPRANA,
+    PARAMETROS,
+    PLIEGUE_VALIDACION,
+    bloques,
+    huella_archivo,
+    parametros_nativos,
+)
+
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+PUBLICADOS_PATH = os.getenv(
+    "PUBLICADOS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "publicados")
+)
+
+# Rondas en las que se compara cada ensayo con la mediana de los demás
+PUNTOS_CONTROL = (25, 50, 100, 200, 400)
+# Ensayos que deben haber pasado por un punto de control antes de podar
+MIN_ENSAYOS_PODA = 3
+# Filas del bloque con que se mide la latencia (el tamaño del catálogo)
+FILAS_BLOQUE = 4133
+
+# Estado de cada proceso trabajador (ver _iniciar_worker)
+_matrices = None
+_registro = None
+_lock = None
+_hilos = None
+
+
+def espacio(rng) -> dict:
+    """Una configuración al azar del espacio de búsqueda"""
+    return {
+        "learning_rate": float(np.exp(rng.uniform(np.log(0.02), np.log(0.3)))),
+        "max_depth": int(rng.integers(3, 10)),
+        "min_child_weight": float(np.exp(rng.uniform(np.log(0.5), np.log(20)))),
+        "subsample": float(rng.uniform(0.5, 1.0)),
+        "colsample_bytree": float(rng.uniform(0.5, 1.0)),
+        "reg_alpha": float(np.exp(rng.uniform(np.log(1e-3), np.log(1.0)))),
+        "reg_lambda": float(np.exp(rng.uniform(np.log(0.1), np.log(10)))),
+        "objective": "reg:squarederror",
+        "random_state": 42,
+    }
+
+
+def preparar_matrices(data_path: str, directorio: str) -> Tuple[dict, dict]:
+    """
+    Lee el historial por bloques y guarda entrenamiento y validación como
+    .npy. Devuelve las rutas y las filas de cada parte.
+    """
+    partes = {"entrenamiento": ([], []), "validacion": ([], [])}
+    inicio = 0
+    for bloque in bloques(data_path, RATING_COLUMNS):
+        X = bloque.reindex(columns=RATING_COLUMNS, fill_value=0.0).to_numpy(dtype=np.float32)
+        y = bloque["score"].to_numpy(dtype=np.float32)
+        validacion = np.arange(inicio, inicio + len(X)) % PLIEGUE_VALIDACION == 0
+        inicio += len(X)
+        for nombre, filas in (("entrenamiento", ~validacion), ("validacion", validacion)):
+            partes[nombre][0].append(X[filas])
+            partes[nombre][1].append(y[filas])
+
+    rutas, filas = {}, {}
+    for nombre, (Xs, ys) in partes.items():
+        for sufijo, datos in (("X", np.concatenate(Xs)), ("y", np.concatenate(ys))):
+            rutas[f"{sufijo}_{nombre}"] = os.path.join(directorio, f"{sufijo}_{nombre}.npy")
+            np.save(rutas[f"{sufijo}_{nombre}"], datos)
+        filas[nombre] = len(datos)
+    return rutas, filas
+
+
+def _iniciar_worker(rutas: dict, registro, lock, hilos):
+    """Abre las matrices compartidas (memoria mapeada) y arma las de cuantiles una vez"""
+    global _matrices, _registro, _lock, _hilos
+    mapeadas = {nombre: np.load(ruta, mmap_mode="r") for nombre, ruta in rutas.items()}
+    entrenamiento = xgb.QuantileDMatrix(
+        mapeadas["X_entrenamiento"], mapeadas["y_entrenamiento"], max_bin=MAX_BIN,
+        feature_names=RATING_COLUMNS, nthread=hilos
+    )
+    validacion = xgb.QuantileDMatrix(
+        mapeadas["X_validacion"], mapeadas["y_validacion"], ref=entrenamiento,
+        feature_names=RATING_COLUMNS, nthread=hilos
+    )
+    _matrices = {"entrenamiento": entrenamiento, "validacion": validacion, **mapeadas}
+    _registro, _lock, _hilos = registro, lock, hilos
+
+
+class PodaMediana(xgb.callback.TrainingCallback):
+    """Detiene el ensayo si en un punto de control queda peor que la mediana de los demás"""
+
+    def __init__(self):
+        self.podado_en = None
+
+    def after_iteration(self, model, epoch, evals_log) -> bool:
+        ronda = epoch + 1
+        if ronda not in PUNTOS_CONTROL:
+            return False
+        rmse = min(evals_log["validacion"]["rmse"])
+        with _lock:
+            anteriores = list(_registro.get(ronda, []))
+            _registro[ronda] = anteriores + [rmse]
+        if len(anteriores) >= MIN_ENSAYOS_PODA and rmse > statistics.median(anteriores):
+            self.podado_en = ronda
+            return True
+        return False
+
+
+def mediana_s(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def _ensayo(numero: int, parametros: dict, max_arboles: int, parada_temprana: bool = True) -> dict:
+    """
+    Un ensayo en el trabajador: entrena, evalúa y mide la latencia. Sin
+    `parada_temprana` entrena exactamente `max_arboles` árboles y no se poda.
+    """
+    inicio = time.perf_counter()
+    poda = PodaMediana()
+    evaluaciones = {}
+    booster = xgb.train(
+        parametros_nativos(parametros, _hilos), _matrices["entrenamiento"], num_boost_round=max_arboles,
+        evals=[(_matrices["validacion"], "validacion")],
+        early_stopping_rounds=PARADA_TEMPRANA if parada_temprana else None,
+        evals_result=evaluaciones, verbose_eval=False, callbacks=[poda] if parada_temprana else []
+    )
+    resultado = {
+        "ensayo": numero,
+        "parametros": parametros,
+        "segundos": round(time.perf_counter() - inicio, 2),
+        "podado_en": poda.podado_en,
+    }
+    if poda.podado_en is not None:
+        resultado["rmse"] = round(min(evaluaciones["validacion"]["rmse"]), 5)
+        return resultado
+
+    if parada_temprana:
+        booster = booster[:booster.best_iteration + 1]
+    X_val = np.asarray(_matrices["X_validacion"])
+    y_val = np.asarray(_matrices["y_validacion"])
+    pred = booster.inplace_predict(X_val)
+    bloque = X_val[:FILAS_BLOQUE]
+    fila = X_val[:1]
+    resultado.update({
+        "rmse": round(float(np.sqrt(np.mean((pred - y_val) ** 2))), 5),
+        "mae": round(float(np.mean(np.abs(pred - y_val))), 5),
+        "arboles": booster.num_boosted_rounds(),
+        "bloque_ms": round(mediana_s(lambda: booster.inplace_predict(bloque), 5) * 1000, 2),
+        "fila_us": round(mediana_s(lambda: booster.inplace_predict(fila), 50) * 1e6, 1),
+        "booster": bytes(booster.save_raw()),
+    })
+    return resultado
+
+
+def publicar(resultado: dict, data_path: str, filas: int, destino: str) -> str:
+    """
+    Guarda el booster del ensayo como artefacto versionado y devuelve su
+    carpeta. La metadata registra la huella de los datos y las columnas con
+    que se entrenó, que ModelManager.load_artifact compara al cargarlo.
+    """
+    booster = resultado["booster"]
+    version = hashlib.sha1(booster).hexdigest()[:12]
+    carpeta = os.path.join(destino, version)
+    os.makedirs(carpeta, exist_ok=True)
+    with open(os.path.join(carpeta, "modelo.ubj"), "wb") as f:
+        f.write(booster)
+
+    metadata = {
+        "version": version,
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "datos": {"ruta": os.path.abspath(data_path), "sha1": huella_archivo(data_path)},
+        "columnas": RATING_COLUMNS,
+        "filas": filas,
+        "arboles": resultado["arboles"],
+        "parametros": resultado["parametros"],
+        "metricas": {k: resultado[k] for k in ("rmse", "mae", "bloque_ms", "fila_us")},
+    }
+    with open(os.path.join(carpeta, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return carpeta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros del modelo")
+    parser.add_argument("--ensayos", type=int, default=24)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--hilos", type=int, default=1, help="Hilos de XGBoost por proceso")
+    parser.add_argument("--max-arboles", type=int, default=600)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--datos", default=os.getenv("DATA_PATH"))
+    parser.add_argument("--informe", default=None, help="Ruta del informe JSON de todos los ensayos")
+    parser.add_argument("--publicar", action="store_true", help="Publica el mejor modelo en --destino")
+    parser.add_argument("--destino", default=PUBLICADOS_PATH)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("           BÚSQUEDA DE HIPERPARÁMETROS")
+    print("=" * 60)
+    rng = np.random.default_rng(args.semilla)
+    configuraciones = [dict(PARAMETROS)] + [espacio(rng) for _ in range(args.ensayos - 1)]
+
+    with tempfile.TemporaryDirectory(prefix="hiperparametros_") as directorio:
+        inicio = time.perf_counter()
+        rutas, filas = preparar_matrices(args.datos, directorio)
+        print(f"Matrices compartidas: {filas['entrenamiento']} de entrenamiento, "
+              f"{filas['validacion']} de validación ({time.perf_counter() - inicio:.1f}s)")
+        print(f"{args.ensayos} ensayos en {args.procesos} procesos × {args.hilos} hilos\n")
+
+        contexto = multiprocessing.get_context("spawn")
+        with contexto.Manager() as manager:
+            registro, lock = manager.dict(), manager.Lock()
+            resultados = []
+            inicio = time.perf_counter()
+            with ProcessPoolExecutor(
+                max_workers=args.procesos, mp_context=contexto,
+                initializer=_iniciar_worker, initargs=(rutas, registro, lock, args.hilos)
+            ) as pool:
+                # El ensayo 0 reproduce el modelo de la API: N_ARBOLES árboles fijos
+                futuros = [pool.submit(_ensayo, 0, configuraciones[0], N_ARBOLES, False)] + [
+                    pool.submit(_ensayo, n, p, args.max_arboles) for n, p in enumerate(configuraciones) if n > 0
+                ]
+                for futuro in as_completed(futuros):
+                    r = futuro.result()
+                    resultados.append(r)
+                    estado = f"podado en {r['podado_en']}" if r["podado_en"] else f"{r['arboles']} árboles"
+                    print(f"  ensayo {r['ensayo']:>3}: rmse={r['rmse']:.5f} ({estado}, {r['segundos']}s)")
+            total = time.perf_counter() - inicio
+
+    terminados = sorted((r for r in resultados if r["podado_en"] is None), key=lambda r: r["rmse"])
+    print(f"\n{len(terminados)} terminados, {len(resultados) - len(terminados)} podados en {total:.1f}s")
+    print(f"{'ensayo':>6} {'rmse':>8} {'mae':>8} {'árboles':>8} {'bloque':>9} {'fila':>9}  "
+          f"{'lr':>6} {'prof.':>5} {'mcw':>5} {'sub':>5} {'col':>5}")
+    for r in terminados[:10]:
+        p = r["parametros"]
+        print(f"{r['ensayo']:>6} {r['rmse']:>8.5f} {r['mae']:>8.5f} {r['arboles']:>8} "
+              f"{r['bloque_ms']:>7.2f}ms {r['fila_us']:>7.1f}µs  {p['learning_rate']:>6.3f} "
+              f"{p['max_depth']:>5} {p.get('min_child_weight', 1):>5.1f} {p['subsample']:>5.2f} "
+              f"{p['colsample_bytree']:>5.2f}")
+    actual = next((r for r in resultados if r["ensayo"] == 0), None)
+    if actual and actual["podado_en"] is None:
+        print(f"(configuración actual de la API: ensayo 0, puesto {terminados.index(actual) + 1})")
+
+    if args.informe:
+        with open(args.informe, "w", encoding="utf-8") as f:
+            json.dump([{k: v for k, v in r.items() if k != "booster"} for r in resultados], f,
+                      ensure_ascii=False, indent=2)
+        print(f"Informe guardado en {args.informe}")
+
+    if args.publicar and terminados:
+        carpeta = publicar(terminados[0], args.datos, sum(filas.values()), args.destino)
+        print(f"\nMejor modelo (ensayo {terminados[0]['ensayo']}) publicado en {carpeta}")
+        print(f"Para servirlo: MODELO_PUBLICADO={carpeta}")
+
+
+if __name__ == "__main__":
+    main()
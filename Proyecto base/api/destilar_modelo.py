@@ -0,0 +1,230 @@
+'''
+DESTILACIÓN Y PODA DEL MODELO
+
+Proceso fuera de línea que genera variantes más baratas del booster y mide
+cuánto se alejan del modelo completo:
+  1. Separa un 20% de los registros y entrena con el resto un modelo
+     "maestro" igual al de la API
+  2. Construye las variantes candidatas:
+       • poda_K: los primeros K árboles del maestro
+       • destilado_NxD: un booster de N árboles de profundidad D entrenado
+         con las predicciones del maestro (no con el score real) sobre los
+         registros de entrenamiento y sobre esos mismos registros con las
+         preferencias de familias sintéticas, que es lo que puntúa la API
+       • media y sustituto: el promedio de las calificaciones y el sustituto
+         lineal, que no necesitan nada guardado
+  3. Informa de cada variante, sobre los registros separados:
+       • RMSE y MAE frente al score real y frente al maestro
+       • RMSE frente al maestro con preferencias de familias sintéticas
+       • recall@10 frente al top-10 del maestro en todo el catálogo
+       • latencia por bloque del tamaño del catálogo y por fila suelta
+       • tamaño del modelo
+  4. Repite la construcción a partir del modelo de producción (todos los
+     registros, la misma versión que entrena la API) y la guarda en
+     MODELOS_PATH (por defecto models/modelos) junto a indice.json
+
+La API sirve cualquiera de ellas por nombre con MODELO_ACTIVO.
+
+Uso (desde la carpeta api):
+    python destilar_modelo.py --podas 25,50,100 --destilados 30x4,60x6
+'''
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from xgboost import XGBRegressor
+
+from app.core.archetypes import a_preferencias, familias_sinteticas
+from app.core.model_manager import ModelManager
+
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+# Mismo modelo que la API (publicado o entrenado con el mismo perfil), para
+# que coincida la versión
+ENTRENAMIENTO_PERFIL = os.getenv("ENTRENAMIENTO_PERFIL", "clasico")
+ENTRENAMIENTO_HILOS = int(os.getenv("ENTRENAMIENTO_HILOS", "0")) or None
+MODELO_PUBLICADO = os.getenv("MODELO_PUBLICADO")
+
+MODELOS_PATH = os.getenv(
+    "MODELOS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "modelos")
+)
+
+
+def con_familias(X: np.ndarray, familias: np.ndarray, rng) -> np.ndarray:
+    """Cada fila de X con las preferencias de una familia sintética al azar"""
+    elegidas = familias[rng.integers(0, len(familias), len(X))]
+    return np.where(np.isnan(elegidas), X, elegidas).astype(np.float32)
+
+
+def construir_variantes(model_manager: ModelManager, X: np.ndarray, podas, destilados,
+                        familias: np.ndarray) -> dict:
+    """Especificaciones de las variantes (las destiladas, con su booster serializado)"""
+    variantes = {"media": {"tipo": "media"}, "sustituto": {"tipo": "lineal"}}
+    total = model_manager.model.get_booster().num_boosted_rounds()
+    for arboles in (a for a in podas if a < total):
+        variantes[f"poda_{arboles}"] = {"tipo": "poda", "arboles": arboles}
+
+    # Conjunto de destilación: registros tal cual y con preferencias de familias
+    rng = np.random.default_rng(0)
+    X_destilar = np.vstack([X] + [con_familias(X, familias, rng) for _ in range(4)])
+    objetivo = model_manager.model.predict(X_destilar)
+    for arboles, profundidad in destilados:
+        alumno = XGBRegressor(
+            n_estimators=arboles,
+            learning_rate=min(0.3, 15 / arboles),
+            max_depth=profundidad,
+            objective="reg:squarederror",
+            random_state=42
+        )
+        alumno.fit(X_destilar, objetivo)
+        variantes[f"destilado_{arboles}x{profundidad}"] = {
+            "tipo": "booster",
+            "arboles": arboles,
+            "profundidad": profundidad,
+            "booster": bytes(alumno.get_booster().save_raw()),
+        }
+    return variantes
+
+
+def tamano_kb(model_manager: ModelManager, espec: dict) -> float:
+    if espec["tipo"] == "completo":
+        return len(model_manager.model.get_booster().save_raw()) / 1024
+    if espec["tipo"] == "poda":
+        return len(model_manager.model.get_booster()[0:espec["arboles"]].save_raw()) / 1024
+    if espec["tipo"] == "booster":
+        return len(espec["booster"]) / 1024
+    return 25 * 4 / 1024
+
+
+def mediana_s(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def evaluar(model_manager: ModelManager, nombre: str, X_prueba, y_prueba, X_familias,
+            catalogo: pd.DataFrame, familias_eval: np.ndarray, k: int = 10) -> dict:
+    """Métricas de la variante `nombre` frente al score real y al maestro"""
+    model_manager.use_model("completo")
+    maestro = model_manager.predict(X_prueba)
+    maestro_familias = model_manager.predict(X_familias)
+    tops_maestro = [
+        np.argsort(-model_manager.predict_with_preferences(catalogo, a_preferencias(v)), kind="stable")[:k]
+        for v in familias_eval
+    ]
+
+    model_manager.use_model(nombre)
+    pred = model_manager.predict(X_prueba)
+    pred_familias = model_manager.predict(X_familias)
+    recalls = []
+    for v, top_maestro in zip(familias_eval, tops_maestro):
+        scores = model_manager.predict_with_preferences(catalogo, a_preferencias(v))
+        top = np.argsort(-scores, kind="stable")[:k]
+        recalls.append(len(set(top) & set(top_maestro)) / k)
+
+    X_catalogo = catalogo[model_manager.feature_columns].to_numpy(dtype=np.float32)
+    fila = X_catalogo[:1]
+    return {
+        "rmse": round(float(np.sqrt(np.mean((pred - y_prueba) ** 2))), 4),
+        "mae": round(float(np.mean(np.abs(pred - y_prueba))), 4),
+        "rmse_maestro": round(float(np.sqrt(np.mean((pred - maestro) ** 2))), 4),
+        "mae_maestro": round(float(np.mean(np.abs(pred - maestro))), 4),
+        "rmse_maestro_familias": round(float(np.sqrt(np.mean((pred_familias - maestro_familias) ** 2))), 4),
+        f"recall@{k}": round(statistics.mean(recalls), 3),
+        "bloque_ms": round(mediana_s(lambda: model_manager.predict(X_catalogo), 10) * 1000, 2),
+        "fila_us": round(mediana_s(lambda: model_manager.predict(fila), 200) * 1e6, 1),
+        "tamano_kb": round(tamano_kb(model_manager, model_manager.variants[nombre]), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera variantes podadas y destiladas del modelo")
+    parser.add_argument("--podas", default="25,50,100", help="Árboles de cada variante podada")
+    parser.add_argument("--destilados", default="30x4,60x6", help="Árboles x profundidad de cada alumno")
+    parser.add_argument("--familias", type=int, default=2000, help="Familias sintéticas para destilar")
+    parser.add_argument("--evaluacion", type=int, default=100, help="Familias para el recall frente al maestro")
+    parser.add_argument("--prueba", type=float, default=0.2, help="Fracción de registros separados")
+    parser.add_argument("--salida", default=MODELOS_PATH)
+    args = parser.parse_args()
+
+    podas = [int(p) for p in args.podas.split(",") if p]
+    destilados = [tuple(int(x) for x in d.split("x")) for d in args.destilados.split(",") if d]
+    data_path = os.getenv("DATA_PATH")
+    new_data_path = os.getenv("NEW_DATA_PATH")
+
+    print("=" * 60)
+    print("           DESTILACIÓN Y PODA DEL MODELO")
+    print("=" * 60)
+    model_manager = ModelManager(data_path, new_data_path)
+    df = model_manager._load_data()
+    df.columns = df.columns.str.strip()
+    df["lat"] = pd.to_numeric(df["lat"], errors="coerce")
+    df["lon"] = pd.to_numeric(df["lon"], errors="coerce")
+
+    rng = np.random.default_rng(0)
+    prueba = rng.random(len(df)) < args.prueba
+    entrenamiento = df[~prueba].reset_index(drop=True)
+    separados = df[prueba].reset_index(drop=True)
+    catalogo = df.dropna(subset=["lat", "lon"]).reset_index(drop=True)
+    print(f"Registros: {len(entrenamiento)} de entrenamiento, {len(separados)} separados")
+
+    # 1-3. Maestro sin los registros separados, variantes y evaluación
+    model_manager.train_model(entrenamiento, perfil=ENTRENAMIENTO_PERFIL, n_jobs=ENTRENAMIENTO_HILOS)
+    columnas = model_manager.feature_columns
+    familias = familias_sinteticas(args.familias, seed=42)
+    X_entrenamiento = entrenamiento[columnas].to_numpy(dtype=np.float32)
+    model_manager.variants.update(construir_variantes(model_manager, X_entrenamiento, podas, destilados, familias))
+
+    X_prueba = separados[columnas].to_numpy(dtype=np.float32)
+    y_prueba = separados["score"].to_numpy(dtype=float)
+    X_familias = con_familias(X_prueba, familias_sinteticas(500, seed=7), np.random.default_rng(7))
+    familias_eval = familias_sinteticas(args.evaluacion, seed=11)
+
+    print("\nEvaluando variantes sobre los registros separados...")
+    metricas = {}
+    encabezado = (f"{'variante':<16} {'rmse':>7} {'mae':>7} {'rmse/m':>7} {'mae/m':>7} {'fam/m':>7} "
+                  f"{'rec@10':>7} {'bloque':>9} {'fila':>9} {'tamaño':>9}")
+    print(encabezado)
+    for nombre in ["completo"] + [n for n in model_manager.variants if n != "completo"]:
+        m = evaluar(model_manager, nombre, X_prueba, y_prueba, X_familias, catalogo, familias_eval)
+        metricas[nombre] = m
+        print(f"{nombre:<16} {m['rmse']:>7.4f} {m['mae']:>7.4f} {m['rmse_maestro']:>7.4f} "
+              f"{m['mae_maestro']:>7.4f} {m['rmse_maestro_familias']:>7.4f} {m['recall@10']:>7.3f} "
+              f"{m['bloque_ms']:>7.2f}ms {m['fila_us']:>7.1f}µs {m['tamano_kb']:>7.1f}KB")
+    print("(/m: frente al maestro; fam/m: con preferencias de familias sintéticas)")
+
+    # 4. Las mismas variantes a partir del modelo de producción
+    print("\nReconstruyendo las variantes con el modelo de producción...")
+    produccion = ModelManager(data_path, new_data_path)
+    produccion.load_or_train(MODELO_PUBLICADO, ENTRENAMIENTO_PERFIL, ENTRENAMIENTO_HILOS)
+    X_todo = produccion._load_data()[columnas].to_numpy(dtype=np.float32)
+    variantes = construir_variantes(produccion, X_todo, podas, destilados, familias)
+
+    os.makedirs(args.salida, exist_ok=True)
+    indice = {"model_version": produccion.booster_version, "variantes": {}}
+    for nombre, espec in variantes.items():
+        espec = dict(espec)
+        booster = espec.pop("booster", None)
+        if booster is not None:
+            espec["archivo"] = f"{nombre}.ubj"
+            with open(os.path.join(args.salida, espec["archivo"]), "wb") as f:
+                f.write(booster)
+        indice["variantes"][nombre] = {**espec, "metricas": metricas[nombre]}
+    indice["metricas_completo"] = metricas["completo"]
+    with open(os.path.join(args.salida, "indice.json"), "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+    print(f"Variantes guardadas en {args.salida} (modelo {produccion.booster_version}): "
+          f"{', '.join(variantes)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+'''
+GENERACIÓN DE ARQUETIPOS DE PREFERENCIAS
+
+Proceso fuera de línea para el modo rápido de recommend_destinations:
+  1. Entrena el modelo igual que la API (mismos datos, misma versión)
+  2. Agrupa con k-means las preferencias agregadas de los registros guardados
+     (NEW_DATA_PATH) y de familias sintéticas
+  3. Precalcula los mejores destinos de cada arquetipo, en todo el catálogo
+     y por provincia
+  4. Mide la calidad frente a la recomendación exacta con familias nuevas
+  5. Guarda todo en ARQUETIPOS_PATH (por defecto models/arquetipos.json)
+
+Uso (desde la carpeta api):
+    python generar_arquetipos.py --arquetipos 12 --familias 5000
+'''
+
+import argparse
+import os
+import statistics
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.core.archetypes import (
+    ArchetypeIndex,
+    a_preferencias,
+    familias_sinteticas,
+    vectores_historicos,
+)
+from app.core.model_manager import ModelManager
+
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+# Mismo modelo que la API (publicado o entrenado con el mismo perfil), para
+# que coincida la versión
+ENTRENAMIENTO_PERFIL = os.getenv("ENTRENAMIENTO_PERFIL", "clasico")
+ENTRENAMIENTO_HILOS = int(os.getenv("ENTRENAMIENTO_HILOS", "0")) or None
+MODELO_PUBLICADO = os.getenv("MODELO_PUBLICADO")
+
+ARQUETIPOS_PATH = os.getenv(
+    "ARQUETIPOS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "arquetipos.json")
+)
+
+
+def cargar_catalogo(data_path: str) -> pd.DataFrame:
+    """Catálogo con las mismas limpiezas que recommend_destinations"""
+    df = pd.read_csv(data_path, sep="|")
+    df.columns = df.columns.str.strip()
+    df["lat"] = pd.to_numeric(df["lat"], errors="coerce")
+    df["lon"] = pd.to_numeric(df["lon"], errors="coerce")
+    return df.dropna(subset=["lat", "lon"]).reset_index(drop=True)
+
+
+def medir_calidad(model_manager, catalogo, indice, ordenes, vectores, k):
+    """
+    Compara el top-k del arquetipo más cercano con el top-k exacto de cada
+    familia, en todo el catálogo y en una provincia al azar:
+      • recall: fracción del top-k exacto que aparece en el del arquetipo
+      • pérdida: score medio (según la familia) del top-k exacto menos el del
+        top-k del arquetipo
+    """
+    rng = np.random.default_rng(0)
+    provincias = catalogo["provincia"].str.upper().to_numpy()
+    lista_provincias = np.unique(provincias)
+    metricas = {"catalogo": ([], []), "provincia": ([], [])}
+
+    for vector in vectores:
+        preferencias = a_preferencias(vector)
+        scores = model_manager.predict_with_preferences(catalogo, preferencias)
+        exacto = np.argsort(-scores, kind="stable")
+        aproximado = ordenes[indice.nearest(preferencias)]
+
+        provincia = rng.choice(lista_provincias)
+        casos = {
+            "catalogo": (exacto[:k], aproximado[:k]),
+            "provincia": (
+                exacto[provincias[exacto] == provincia][:k],
+                aproximado[provincias[aproximado] == provincia][:k],
+            ),
+        }
+        for nombre, (top_exacto, top_aprox) in casos.items():
+            recalls, perdidas = metricas[nombre]
+            recalls.append(len(set(top_exacto) & set(top_aprox)) / len(top_exacto))
+            perdidas.append(float(scores[top_exacto].mean() - scores[top_aprox].mean()))
+
+    return {
+        nombre: {
+            f"recall@{k}": round(statistics.mean(recalls), 3),
+            "perdida_score_media": round(statistics.mean(perdidas), 4),
+            "perdida_score_p95": round(float(np.percentile(perdidas, 95)), 4),
+        }
+        for nombre, (recalls, perdidas) in metricas.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera los arquetipos del modo rápido")
+    parser.add_argument("--arquetipos", type=int, default=12)
+    parser.add_argument("--familias", type=int, default=5000, help="Familias sintéticas para agrupar")
+    parser.add_argument("--top-m", type=int, default=50, help="Destinos guardados por arquetipo y provincia")
+    parser.add_argument("--evaluacion", type=int, default=300, help="Familias nuevas para medir la calidad")
+    parser.add_argument("--salida", default=ARQUETIPOS_PATH)
+    args = parser.parse_args()
+
+    data_path = os.getenv("DATA_PATH")
+    new_data_path = os.getenv("NEW_DATA_PATH")
+
+    print("=" * 60)
+    print("           GENERACIÓN DE ARQUETIPOS")
+    print("=" * 60)
+    model_manager = ModelManager(data_path, new_data_path)
+    model_manager.load_or_train(MODELO_PUBLICADO, ENTRENAMIENTO_PERFIL, ENTRENAMIENTO_HILOS)
+    catalogo = cargar_catalogo(data_path)
+
+    historicos = vectores_historicos(model_manager.new_data_path)
+    vectores = np.vstack([historicos, familias_sinteticas(args.familias, seed=42)])
+    print(f"Vectores de preferencias: {len(historicos)} históricos + {args.familias} sintéticos")
+
+    indice, ordenes = ArchetypeIndex.build(
+        model_manager, catalogo, vectores, n_arquetipos=args.arquetipos, top_m=args.top_m
+    )
+    for a, nombre in enumerate(indice.nombres):
+        print(f"  Arquetipo {a:>2}: {nombre}")
+
+    print("\nMidiendo calidad frente a la recomendación exacta...")
+    indice.calidad = medir_calidad(
+        model_manager, catalogo, indice, ordenes, familias_sinteticas(args.evaluacion, seed=7), k=10
+    )
+    for nombre, valores in indice.calidad.items():
+        print(f"  {nombre:<10} " + "  ".join(f"{m}={v}" for m, v in valores.items()))
+
+    indice.save(args.salida)
+    print(f"\nArquetipos guardados en {args.salida} ({os.path.getsize(args.salida) / 1024:.0f} KB, "
+          f"modelo {indice.model_version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+'''
+RECOMENDACIONES POR LOTES
+
+Proceso fuera de línea que calcula las recomendaciones de muchas familias
+guardadas sin pasar por HTTP:
+  1. Lee las familias de un archivo NDJSON o CSV (ver formatos abajo)
+  2. Reparte las familias entre procesos: cada proceso lee el archivo por su
+     cuenta, se queda con las posiciones que le tocan (posición % procesos),
+     prepara el modelo y carga el catálogo una sola vez
+  3. Cada familia pasa por recommend_destinations de la API (misma
+     agregación, filtros y estrategias), así que el resultado coincide con
+     el de la API con el mismo modelo
+  4. Cada proceso escribe sus resultados línea a línea en su parte
+     (<salida>.parte-N); al terminar se unen en <salida> en el orden de
+     entrada
+  5. Si el proceso se interrumpe, volver a correr el mismo comando retoma
+     donde quedó: las familias ya escritas en las partes no se recalculan
+
+Formatos de entrada:
+  • NDJSON: una familia por línea, con el cuerpo de recommend_destinations
+    ("miembros") más "id" y, opcionalmente, los parámetros de la petición
+    (top_k, provincia_preferida, ubicacion_actual_lat, ubicacion_actual_lon,
+    max_distancia_km, tipos_interes, estrategia, candidatos)
+  • CSV: un miembro por fila, con las columnas "familia" (id), "nombre",
+    "rol" y las calificaciones de RATING_COLUMNS (nombre completo o corto,
+    p. ej. "playas"; vacío = sin preferencia). Las filas de una familia van
+    seguidas; los parámetros de la petición se toman de su primera fila
+    (tipos_interes separados por ";")
+
+Salida: NDJSON con una línea por familia: "id", "posicion" y la respuesta de
+la API, o "error" si la API la hubiera rechazado.
+
+Uso (desde la carpeta api):
+    python recomendar_lote.py familias.ndjson recomendaciones.ndjson --procesos 4 --top-k 10
+'''
+
+import argparse
+import csv
+import glob
+import heapq
+import json
+import multiprocessing
+import os
+import queue
+import time
+from typing import Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.core.model_manager import RATING_COLUMNS
+
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+# Parámetros de recommend_destinations que puede traer cada familia
+PARAMETROS_FAMILIA = {
+    "top_k": int,
+    "ubicacion_actual_lat": float,
+    "ubicacion_actual_lon": float,
+    "max_distancia_km": float,
+    "provincia_preferida": str,
+    "tipos_interes": lambda v: [t for t in v.split(";") if t],
+    "estrategia": str,
+    "candidatos": int,
+}
+# Familias entre dos avisos de avance de cada proceso
+AVISO_CADA = 100
+
+
+def formato_de(ruta: str) -> str:
+    return "csv" if ruta.lower().endswith(".csv") else "ndjson"
+
+
+def leer_familias(ruta: str, formato: str) -> Iterator[Tuple[int, dict]]:
+    """(posición, registro) de cada familia del archivo, sin cargarlo entero"""
+    if formato == "ndjson":
+        with open(ruta, encoding="utf-8") as f:
+            posicion = 0
+            for linea in f:
+                if not linea.strip():
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    registro = {"error": f"JSON inválido: {e}"}
+                yield posicion, registro
+                posicion += 1
+        return
+
+    with open(ruta, encoding="utf-8", newline="") as f:
+        lector = csv.DictReader(f)
+        cortas = {col.replace("Calif promedio ", ""): col for col in RATING_COLUMNS}
+        columnas = {c: cortas.get(c.strip(), c.strip()) for c in lector.fieldnames or []}
+        actual, registro, posicion = None, None, 0
+        for fila in lector:
+            fila = {columnas[c]: (v or "").strip() for c, v in fila.items() if c in columnas}
+            if fila.get("familia") != actual:
+                if registro is not None:
+                    yield posicion, registro
+                    posicion += 1
+                actual = fila.get("familia")
+                registro = {"id": actual, "miembros": []}
+                for nombre, tipo in PARAMETROS_FAMILIA.items():
+                    if fila.get(nombre):
+                        registro[nombre] = tipo(fila[nombre])
+            registro["miembros"].append({
+                "nombre": fila.get("nombre", ""),
+                "rol": fila.get("rol", ""),
+                "vector": [float(fila[col]) if fila.get(col) else None for col in RATING_COLUMNS],
+            })
+        if registro is not None:
+            yield posicion, registro
+
+
+def posiciones_hechas(ruta_parte: str) -> set:
+    """Posiciones ya escritas en una parte; descarta una última línea a medias"""
+    if not os.path.exists(ruta_parte):
+        return set()
+    with open(ruta_parte, "rb+") as f:
+        contenido = f.read()
+        completo = contenido.rfind(b"\n") + 1
+        if completo < len(contenido):
+            f.truncate(completo)
+    return {json.loads(linea)["posicion"] for linea in contenido[:completo].splitlines()}
+
+
+def recomendar(family, registro: dict, top_k: int) -> dict:
+    """La respuesta de recommend_destinations para el registro, o el error que habría dado la API"""
+    from fastapi import HTTPException
+    from pydantic import ValidationError
+
+    from app.schemas import FamilyBase
+
+    if "error" in registro:
+        return {"error": registro["error"]}
+    parametros = {nombre: registro[nombre] for nombre in PARAMETROS_FAMILIA if registro.get(nombre) is not None}
+    parametros.setdefault("top_k", top_k)
+    try:
+        familia = FamilyBase(miembros=registro.get("miembros", []))
+        return family.recommend_destinations(familia, **parametros, en_curso=1, limite=None)
+    except HTTPException as e:
+        return {"error": e.detail}
+    except ValidationError as e:
+        return {"error": f"Familia inválida: {e.errors()[0]['msg']}"}
+
+
+def _procesar_parte(parte: int, procesos: int, entrada: str, formato: str, salida: str,
+                    top_k: int, avisos):
+    """Proceso trabajador: calcula las familias de su parte que aún no estén escritas"""
+    from app.routes import family
+
+    family.destinos_en_memoria = family.cargar_destinos()
+    ruta_parte = f"{salida}.parte-{parte}"
+    hechas = posiciones_hechas(ruta_parte)
+    avisos.put(("retomadas", parte, len(hechas)))
+
+    nuevas, errores = 0, 0
+    with open(ruta_parte, "a", encoding="utf-8") as f:
+        for posicion, registro in leer_familias(entrada, formato):
+            if posicion % procesos != parte or posicion in hechas:
+                continue
+            respuesta = recomendar(family, registro, top_k)
+            errores += "error" in respuesta
+            linea = {"id": registro.get("id", posicion), "posicion": posicion, **respuesta}
+            f.write(json.dumps(linea, ensure_ascii=False) + "\n")
+            f.flush()
+            nuevas += 1
+            if nuevas % AVISO_CADA == 0:
+                avisos.put(("avance", parte, AVISO_CADA, errores))
+                errores = 0
+    avisos.put(("avance", parte, nuevas % AVISO_CADA, errores))
+    avisos.put(("listo", parte))
+
+
+def unir_partes(salida: str, procesos: int) -> int:
+    """Une las partes en `salida` en el orden de entrada y las borra"""
+    rutas = [f"{salida}.parte-{p}" for p in range(procesos)]
+    archivos = [open(r, encoding="utf-8") for r in rutas]
+    try:
+        lineas = heapq.merge(*archivos, key=lambda linea: json.loads(linea)["posicion"])
+        total = 0
+        with open(salida, "w", encoding="utf-8") as f:
+            for linea in lineas:
+                f.write(linea)
+                total += 1
+    finally:
+        for archivo in archivos:
+            archivo.close()
+    for ruta in rutas:
+        os.remove(ruta)
+    return total
+
+
+def comprobar_estado(salida: str, entrada: str, formato: str, procesos: int, top_k: int,
+                     reiniciar: bool) -> bool:
+    """
+    Guarda en <salida>.estado.json la configuración de la corrida. Si ya hay
+    una con otra configuración, no se puede retomar. Devuelve si se retoma.
+    """
+    ruta = f"{salida}.estado.json"
+    estado = {"entrada": os.path.abspath(entrada), "formato": formato, "procesos": procesos, "top_k": top_k}
+    if os.path.exists(ruta) and not reiniciar:
+        with open(ruta, encoding="utf-8") as f:
+            anterior = json.load(f)
+        if anterior != estado:
+            raise SystemExit(
+                f"Hay una corrida a medias con otra configuración ({anterior}). "
+                "Repite el mismo comando para retomarla o usa --reiniciar."
+            )
+        return True
+    for parte in glob.glob(f"{glob.escape(salida)}.parte-*"):
+        os.remove(parte)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+    return False
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Recomendaciones por lotes para familias guardadas")
+    parser.add_argument("entrada", help="Familias en NDJSON o CSV")
+    parser.add_argument("salida", help="Archivo NDJSON de resultados")
+    parser.add_argument("--formato", choices=("ndjson", "csv"), default=None)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--reiniciar", action="store_true", help="Descarta una corrida anterior a medias")
+    parser.add_argument("--cada", type=float, default=5.0, help="Segundos entre líneas de avance")
+    args = parser.parse_args(argv)
+
+    formato = args.formato or formato_de(args.entrada)
+    total = sum(1 for _ in leer_familias(args.entrada, formato))
+    retoma = comprobar_estado(args.salida, args.entrada, formato, args.procesos, args.top_k, args.reiniciar)
+
+    print("=" * 60)
+    print("           RECOMENDACIONES POR LOTES")
+    print("=" * 60)
+    print(f"{total} familias en {args.entrada} ({formato}), {args.procesos} procesos"
+          f"{' (retomando)' if retoma else ''}")
+
+    # Cada proceso calcula directamente, sin unión de peticiones, micro-batching
+    # ni catálogo particionado
+    os.environ.update({"COALESCE_ENABLED": "0", "MICROBATCH_ENABLED": "0", "SHARDS": "0"})
+    contexto = multiprocessing.get_context("spawn")
+    avisos = contexto.Queue()
+    trabajadores = [
+        contexto.Process(
+            target=_procesar_parte,
+            args=(p, args.procesos, args.entrada, formato, args.salida, args.top_k, avisos),
+        )
+        for p in range(args.procesos)
+    ]
+    for trabajador in trabajadores:
+        trabajador.start()
+
+    hechas, nuevas, errores, listos = 0, 0, 0, 0
+    inicio = time.perf_counter()
+    ultimo_aviso = inicio
+    while listos < args.procesos:
+        try:
+            aviso = avisos.get(timeout=1)
+        except queue.Empty:
+            if any(t.exitcode not in (None, 0) for t in trabajadores):
+                for t in trabajadores:
+                    t.terminate()
+                raise SystemExit("Un proceso trabajador falló; vuelve a correr el comando para retomar.")
+            continue
+        if aviso[0] == "retomadas":
+            hechas += aviso[2]
+        elif aviso[0] == "avance":
+            nuevas += aviso[2]
+            errores += aviso[3]
+        else:
+            listos += 1
+        ahora = time.perf_counter()
+        if ahora - ultimo_aviso >= args.cada and nuevas:
+            ritmo = nuevas / (ahora - inicio)
+            faltan = total - hechas - nuevas
+            print(f"  {hechas + nuevas}/{total} ({(hechas + nuevas) / total:.0%}) "
+                  f"{ritmo:.0f} familias/s, faltan ~{faltan / ritmo:.0f}s, {errores} errores")
+            ultimo_aviso = ahora
+    for trabajador in trabajadores:
+        trabajador.join()
+
+    segundos = time.perf_counter() - inicio
+    escritas = unir_partes(args.salida, args.procesos)
+    os.remove(f"{args.salida}.estado.json")
+    print(f"\n{nuevas} familias calculadas en {segundos:.1f}s ({nuevas / max(segundos, 1e-9):.0f}/s), "
+          f"{hechas} retomadas, {errores} errores")
+    print(f"Resultados: {args.salida} ({escritas} líneas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+'''
+Fixtures de las pruebas de la API. Se ejecutan desde la carpeta api:
+
+    python -m pytest -q tests
+'''
+
+import os
+import sys
+
+import pytest
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_DIR = os.path.join(API_DIR, "..", "data")
+
+os.environ.setdefault("DATA_PATH", os.path.join(DATA_DIR, "datos_sintetico.csv"))
+os.environ.setdefault("NEW_DATA_PATH", os.path.join(DATA_DIR, "nuevos_viajes.csv"))
+sys.path.insert(0, API_DIR)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routes import family as family_module  # noqa: E402
+from app.core.deadline import EstimadorCostos, UltimasRespuestas  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def family():
+    """Módulo de rutas de familia"""
+    return family_module
+
+
+@pytest.fixture
+def forzar_costos(monkeypatch):
+    """
+    Reemplaza los costos observados por los indicados (segundos por fila;
+    "carga" por lectura del catálogo) y vacía las respuestas guardadas.
+    Devuelve la función para volver a fijarlos dentro de la prueba.
+    """
+    monkeypatch.setattr(family_module, "ultimas_respuestas",
+                        UltimasRespuestas(family_module.DEADLINE_CACHE_CLAVES))
+
+    def fijar(**costos):
+        estimador = EstimadorCostos(costos, margen=family_module.DEADLINE_MARGEN)
+        # Lo observado durante la prueba no debe mover los costos forzados
+        monkeypatch.setattr(estimador, "observar", lambda *args, **kwargs: None)
+        monkeypatch.setattr(family_module, "costos", estimador)
+        return estimador
+
+    fijar(**family_module.model_manager.costo_por_fila)
+    return fijar
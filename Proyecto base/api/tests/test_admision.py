@@ -0,0 +1,46 @@
+'''
+Control de admisión (core/admission.py): las peticiones rechazadas por
+tiempo o canceladas mientras esperan turno no se quedan con un permiso.
+'''
+
+import asyncio
+
+from app.core.admission import AdmissionControl, Saturado
+
+
+async def peticion(control: AdmissionControl, duracion_s: float):
+    try:
+        await control.entrar()
+    except Saturado:
+        return
+    try:
+        await asyncio.sleep(duracion_s)
+    finally:
+        control.salir()
+
+
+def test_sin_fugas_de_permisos():
+    async def escenario():
+        # Esperas máximas del orden de lo que dura cada petición: muchos
+        # permisos se conceden justo cuando vence el plazo
+        control = AdmissionControl("prueba", max_concurrentes=2, max_cola=1000, espera_max_s=0.002)
+        tareas = [asyncio.create_task(peticion(control, 0.001)) for _ in range(300)]
+        for i in range(0, len(tareas), 3):
+            await asyncio.sleep(0.0005)
+            tareas[i].cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        assert control.en_curso == control.en_cola == 0
+        assert control.rechazadas > 0
+
+        # Todos los permisos volvieron: entran max_concurrentes sin esperar
+        # y la siguiente agota su espera
+        esperas = [await control.entrar() for _ in range(control.max_concurrentes)]
+        assert max(esperas) < control.espera_max_s
+        try:
+            await control.entrar()
+        except Saturado:
+            return
+        raise AssertionError("Entró una petición más que max_concurrentes")
+
+    for _ in range(5):
+        asyncio.run(escenario())
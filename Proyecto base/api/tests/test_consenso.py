@@ -0,0 +1,31 @@
+'''
+Recomendaciones por consenso: score de cada miembro en los destinos
+recomendados ("scores_miembros", alineado con los miembros enviados).
+'''
+
+import pytest
+
+RUTA = "/api/family/recommend_destinations"
+
+
+def miembro(nombre: str, indices: list, valores: list) -> dict:
+    return {"nombre": nombre, "rol": "👦👧 Hijos (Adolescentes 13-17)", "indices": indices, "valores": valores}
+
+
+@pytest.mark.parametrize("candidatos", [0, 200])
+def test_scores_por_posicion_con_nombres_repetidos(cliente, candidatos):
+    # Dos miembros con el mismo nombre y gustos opuestos, más uno distinto
+    familia = {"miembros": [
+        miembro("Hijo", [0, 5], [5.0, 1.0]),
+        miembro("Hijo", [0, 5], [1.0, 5.0]),
+        miembro("Madre", [16], [4.0]),
+    ]}
+    params = {"top_k": 5, "estrategia": "minima_miseria", "candidatos": candidatos}
+    r = cliente.post(RUTA, params=params, json={"family": familia})
+    assert r.status_code == 200, r.text
+    for rec in r.json()["recommendations"]:
+        scores = rec["scores_miembros"]
+        assert len(scores) == 3
+        # minima_miseria: el score combinado es el del miembro menos satisfecho
+        assert rec["predicted_score"] == pytest.approx(min(scores), abs=2e-3)
+    assert any(rec["scores_miembros"][0] != rec["scores_miembros"][1] for rec in r.json()["recommendations"])
@@ -0,0 +1,145 @@
+'''
+Niveles de servicio de recommend_destinations con plazo (deadline_ms o
+cabecera X-Deadline-Ms). Casi todas las pruebas fuerzan un nivel fijando los
+costos que la API cree que tiene cada etapa (fixture forzar_costos);
+test_aprende_lentitud_real hace lento el modelo y deja que la API lo aprenda.
+'''
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.archetypes import ArchetypeIndex, familias_sinteticas
+
+RUTA = "/api/family/recommend_destinations"
+
+
+def familia(i: int) -> dict:
+    return {"miembros": [
+        {"nombre": "Madre", "rol": "👨‍👩‍👧‍👦 Padres", "indices": [i % 24, 16], "valores": [5.0, 4.0]},
+        {"nombre": "Hijo", "rol": "👦👧 Hijos (Adolescentes 13-17)", "indices": [(i * 7 + 3) % 24], "valores": [5.0]},
+    ]}
+
+
+def recomendar(cliente, i: int, plazo_ms=None, **params):
+    if plazo_ms is not None:
+        params["deadline_ms"] = plazo_ms
+    r = cliente.post(RUTA, params={"top_k": 10, **params}, json={"family": familia(i)})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def nombres(respuesta: dict) -> list:
+    return [rec["nombre"] for rec in respuesta["recommendations"]]
+
+
+@pytest.fixture(scope="module")
+def arquetipos(family):
+    """Arquetipos pequeños del modelo actual (models/ no se versiona)"""
+    indice, _ = ArchetypeIndex.build(
+        family.model_manager, family.cargar_destinos().reset_index(drop=True),
+        familias_sinteticas(200), n_arquetipos=3, top_m=10
+    )
+    return indice
+
+
+@pytest.mark.parametrize("plazo_ms", [None, 60000])
+def test_completo(cliente, forzar_costos, plazo_ms):
+    forzar_costos(carga=1e-6, booster=1e-9, sustituto=1e-9)
+    assert recomendar(cliente, 1, plazo_ms)["nivel"] == "completo"
+
+
+def test_plazo_por_cabecera(cliente, forzar_costos):
+    forzar_costos(carga=1e-6, booster=1.0, sustituto=1e-9)
+    r = cliente.post(RUTA, params={"top_k": 10}, json={"family": familia(1)}, headers={"X-Deadline-Ms": "10000"})
+    assert r.status_code == 200
+    assert r.json()["nivel"] == "sustituto"
+
+
+@pytest.mark.parametrize("estrategia", [None, "minima_miseria"])
+def test_candidatos(cliente, forzar_costos, estrategia):
+    # El booster no alcanza para todo el catálogo pero sí para cientos de candidatos
+    forzar_costos(carga=1e-6, booster=1e-3, sustituto=1e-9)
+    params = {"estrategia": estrategia} if estrategia else {}
+    respuesta = recomendar(cliente, 2, 1000, **params)
+    assert respuesta["nivel"] == "candidatos"
+    assert len(respuesta["recommendations"]) == 10
+
+
+def test_sustituto(cliente, forzar_costos):
+    # Ni los candidatos mínimos caben en el plazo con el booster
+    forzar_costos(carga=1e-6, booster=1.0, sustituto=1e-9)
+    respuesta = recomendar(cliente, 3, 10000)
+    assert respuesta["nivel"] == "sustituto"
+    assert len(respuesta["recommendations"]) == 10
+
+
+def test_cache(cliente, forzar_costos):
+    exacta = recomendar(cliente, 4)
+    assert exacta["nivel"] == "completo"
+    # Ni la lectura del catálogo ni el sustituto caben: se responde la última respuesta exacta
+    forzar_costos(carga=100.0, booster=100.0, sustituto=100.0)
+    respuesta = recomendar(cliente, 4, 1000)
+    assert respuesta["nivel"] == "cache"
+    assert nombres(respuesta) == nombres(exacta)
+
+
+def test_precalculado(cliente, family, forzar_costos, arquetipos, monkeypatch):
+    monkeypatch.setattr(family, "archetype_index", arquetipos)
+    forzar_costos(carga=100.0, booster=100.0, sustituto=100.0)
+    respuesta = recomendar(cliente, 5, 1000)
+    assert respuesta["nivel"] == "precalculado"
+    assert respuesta["modo"] == "arquetipo"
+
+
+def test_aprende_lentitud_real(cliente, family, monkeypatch):
+    """Con el modelo lento de verdad, la segunda petición ya no pide el nivel completo"""
+    monkeypatch.setattr(family, "costos", family.EstimadorCostos(
+        family.model_manager.costo_por_fila, margen=family.DEADLINE_MARGEN
+    ))
+    monkeypatch.setattr(family, "ultimas_respuestas", family.UltimasRespuestas(family.DEADLINE_CACHE_CLAVES))
+    predictor = family.model_manager._predictor
+
+    def predictor_lento(X):
+        time.sleep(0.25)
+        return predictor(X)
+
+    monkeypatch.setattr(family.model_manager, "_predictor", predictor_lento)
+    # Con los costos medidos al entrenar el booster cabe de sobra en 100 ms...
+    assert recomendar(cliente, 7, 100)["nivel"] == "completo"
+    # ...pero tardó más de 250 ms, y con lo observado ya no cabe
+    assert recomendar(cliente, 8, 100)["nivel"] in ("candidatos", "sustituto")
+
+
+@pytest.mark.parametrize("plazos", [(None, 10000), (10000, None)], ids=["sin_plazo_primero", "con_plazo_primero"])
+def test_plazos_distintos_no_comparten_calculo(cliente, family, forzar_costos, monkeypatch, plazos):
+    """Una petición igual a otra en curso pero con otro plazo recibe el nivel de su propio plazo"""
+    # Con plazo solo cabe el sustituto; sin plazo, el booster sobre todo el catálogo
+    forzar_costos(carga=1e-6, booster=1.0, sustituto=1e-9)
+    original = family.nivel_de_servicio
+    primera, segunda = threading.Event(), threading.Event()
+    lock = threading.Lock()
+
+    def nivel_de_servicio(*args):
+        # La primera petición espera dentro del cálculo a que la segunda elija
+        # su propio nivel (si se uniera a la primera, nunca lo elegiría)
+        with lock:
+            es_primera = not primera.is_set()
+            primera.set()
+        if es_primera:
+            segunda.wait(timeout=2)
+        else:
+            segunda.set()
+        return original(*args)
+
+    monkeypatch.setattr(family, "nivel_de_servicio", nivel_de_servicio)
+    with ThreadPoolExecutor(2) as pool:
+        antes = pool.submit(recomendar, cliente, 6, plazos[0])
+        assert primera.wait(timeout=10)
+        despues = pool.submit(recomendar, cliente, 6, plazos[1])
+        respuestas = [antes.result(), despues.result()]
+
+    esperados = ["completo" if plazo is None else "sustituto" for plazo in plazos]
+    assert [r["nivel"] for r in respuestas] == esperados
@@ -0,0 +1,48 @@
+'''
+Explicaciones de las recomendaciones (/explain_recommendations): la suma de
+base y contribuciones reproduce el score de cada miembro y las explicaciones
+guardadas dependen de las versiones del modelo y del catálogo.
+'''
+
+import pytest
+
+RUTA = "/api/family/explain_recommendations"
+
+
+def miembro(nombre: str, indices: list, valores: list) -> dict:
+    return {"nombre": nombre, "rol": "👤 Otro", "indices": indices, "valores": valores}
+
+
+FAMILIA = {"miembros": [
+    miembro("Hijo", [0, 5], [5.0, 1.0]),
+    miembro("Hijo", [0, 5], [1.0, 5.0]),
+    miembro("Madre", [16], [4.0]),
+]}
+
+
+def test_por_miembro_con_nombres_repetidos(cliente):
+    r = cliente.post(RUTA, params={"top_k": 5, "estrategia": "promedio"}, json={"family": FAMILIA})
+    assert r.status_code == 200, r.text
+    for rec in r.json()["recommendations"]:
+        por_miembro = rec["explicacion"]["por_miembro"]
+        assert len(por_miembro) == len(rec["scores_miembros"]) == 3
+        for detalle, score in zip(por_miembro, rec["scores_miembros"]):
+            assert detalle["base"] + sum(detalle["contribuciones"].values()) == pytest.approx(score, abs=0.01)
+
+
+def test_guardadas_por_version_del_catalogo(cliente, family, monkeypatch):
+    llamadas = []
+    explicar = family.explicar
+    monkeypatch.setattr(family, "explicar", lambda *args: llamadas.append(1) or explicar(*args))
+    monkeypatch.setattr(family, "explicaciones", family.UltimasRespuestas(family.EXPLICACIONES_CACHE_CLAVES))
+    params = {"top_k": 3}
+
+    cliente.post(RUTA, params=params, json={"family": FAMILIA})
+    cliente.post(RUTA, params=params, json={"family": FAMILIA})
+    assert len(llamadas) == 1
+
+    # Otro catálogo: la explicación guardada ya no vale
+    monkeypatch.setattr(family, "version_catalogo", lambda: "otra")
+    r = cliente.post(RUTA, params=params, json={"family": FAMILIA})
+    assert r.status_code == 200
+    assert len(llamadas) == 2
@@ -0,0 +1,60 @@
+'''
+Modelos publicados por buscar_hiperparametros.py: la metadata registra los
+datos y columnas de entrenamiento y ModelManager.load_artifact los compara
+con los actuales.
+'''
+
+import json
+import os
+import shutil
+
+import pytest
+
+from app.core.model_manager import ModelManager
+from buscar_hiperparametros import publicar
+
+
+@pytest.fixture
+def artefacto(family, tmp_path):
+    resultado = {
+        "booster": bytes(family.model_manager.model.get_booster().save_raw()),
+        "arboles": 300, "parametros": {}, "rmse": 0.0, "mae": 0.0, "bloque_ms": 0.0, "fila_us": 0.0,
+    }
+    return publicar(resultado, family.DATA_PATH, 4133, str(tmp_path / "publicados"))
+
+
+def cargar(data_path: str, carpeta: str) -> ModelManager:
+    modelo = ModelManager(data_path, os.path.join(os.path.dirname(data_path), "nuevos.csv"))
+    modelo.load_artifact(carpeta)
+    return modelo
+
+
+def test_mismos_datos(family, artefacto, capsys):
+    with open(os.path.join(artefacto, "metadata.json"), encoding="utf-8") as f:
+        metadata = json.load(f)
+    assert metadata["filas"] == 4133
+    assert metadata["columnas"] == family.model_manager.feature_columns
+
+    modelo = cargar(family.DATA_PATH, artefacto)
+    assert modelo.training_summary["artefacto"] == metadata["version"]
+    assert "Aviso" not in capsys.readouterr().out
+
+
+def test_aviso_con_otros_datos(family, artefacto, tmp_path, capsys):
+    otros = str(tmp_path / "otros.csv")
+    shutil.copy(family.DATA_PATH, otros)
+    with open(otros, "a", encoding="utf-8") as f:
+        f.write("\n")
+    cargar(otros, artefacto)
+    assert "se entrenó con otros datos" in capsys.readouterr().out
+
+
+def test_otras_columnas(family, artefacto):
+    ruta = os.path.join(artefacto, "metadata.json")
+    with open(ruta, encoding="utf-8") as f:
+        metadata = json.load(f)
+    metadata["columnas"] = metadata["columnas"][::-1]
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    with pytest.raises(ValueError, match="otras columnas"):
+        cargar(family.DATA_PATH, artefacto)
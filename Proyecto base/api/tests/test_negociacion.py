@@ -0,0 +1,31 @@
+'''
+Negociación de formato (JSON o MessagePack según Accept): toda respuesta de
+los endpoints negociados, incluidos los 304 y los errores, lleva Vary: Accept.
+'''
+
+import msgpack
+import pytest
+
+MSGPACK = "application/msgpack"
+RUTA = "/api/family/destinos_por_tipo"
+
+
+@pytest.mark.parametrize("accept", ["application/json", MSGPACK])
+def test_vary_en_304(cliente, accept):
+    params = {"tipo": ["playas", "museos"], "top_k": 5}
+    r = cliente.get(RUTA, params=params, headers={"Accept": accept})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith(accept)
+    assert "Accept" in r.headers["vary"]
+
+    revalidada = cliente.get(RUTA, params=params, headers={"Accept": accept, "If-None-Match": r.headers["etag"]})
+    assert revalidada.status_code == 304
+    assert "Accept" in revalidada.headers["vary"]
+    assert revalidada.headers["etag"] == r.headers["etag"]
+
+
+def test_vary_en_errores(cliente):
+    r = cliente.post("/api/family/recommend_destinations", content=msgpack.packb({"family": {"miembros": []}}),
+                     headers={"Content-Type": MSGPACK, "Accept": MSGPACK})
+    assert r.status_code == 400
+    assert "Accept" in r.headers["vary"]
@@ -0,0 +1,75 @@
+'''
+recommend_destinations sobre el catálogo particionado (SHARDS > 0): mismas
+respuestas, niveles y errores que sobre el catálogo completo.
+'''
+
+import pandas as pd
+import pytest
+
+from app.core.shards import CatalogoParticionado
+
+RUTA = "/api/family/recommend_destinations"
+FAMILIA = {"miembros": [
+    {"nombre": "Madre", "rol": "👨‍👩‍👧‍👦 Padres", "indices": [3, 16], "valores": [5.0, 4.0]},
+    {"nombre": "Hijo", "rol": "👦👧 Hijos (Adolescentes 13-17)", "indices": [7], "valores": [5.0]},
+]}
+# 71 de los 242 destinos de Pichincha quedan a menos de 20 km de Quito
+CERCA_DE_QUITO = {"provincia_preferida": "Pichincha", "ubicacion_actual_lat": -0.2,
+                  "ubicacion_actual_lon": -78.5, "max_distancia_km": 20}
+
+
+@pytest.fixture(scope="module")
+def catalogo(family):
+    df = pd.read_csv(family.DATA_PATH, sep="|")
+    df.columns = df.columns.str.strip()
+    return CatalogoParticionado(family.limpiar_coordenadas(df), family.model_manager, 4)
+
+
+@pytest.fixture
+def particionado(cliente, family, catalogo, monkeypatch):
+    """Función que hace la misma petición sin particionar y particionada"""
+    def recomendar(**params):
+        respuestas = []
+        for actual in (None, catalogo):
+            monkeypatch.setattr(family, "catalogo", actual)
+            respuestas.append(cliente.post(RUTA, params={"top_k": 10, **params}, json={"family": FAMILIA}))
+        return respuestas
+    return recomendar
+
+
+def test_mismas_recomendaciones(particionado):
+    completo, partido = particionado(**CERCA_DE_QUITO)
+    assert completo.status_code == partido.status_code == 200
+    assert completo.json() == partido.json()
+
+
+def test_nivel_sobre_destinos_filtrados(particionado, forzar_costos):
+    particionado(**CERCA_DE_QUITO)  # deja guardada la respuesta exacta
+    # El sustituto cabe para los 71 destinos filtrados pero no para los 242 de
+    # la provincia (con esos se respondería lo guardado)
+    forzar_costos(carga=1e-6, booster=100.0, sustituto=6e-3)
+    completo, partido = particionado(**CERCA_DE_QUITO, deadline_ms=1000)
+    assert completo.json()["nivel"] == partido.json()["nivel"] == "sustituto"
+
+
+@pytest.mark.parametrize("plazo_ms", [None, 1000])
+def test_sin_destinos_por_distancia(particionado, plazo_ms):
+    # Ningún destino a 1 km: lista vacía, no un error
+    params = {"ubicacion_actual_lat": 0.0, "ubicacion_actual_lon": 0.0, "max_distancia_km": 1}
+    if plazo_ms is not None:
+        params["deadline_ms"] = plazo_ms
+    completo, partido = particionado(**params)
+    assert completo.status_code == partido.status_code == 200
+    assert completo.json() == partido.json()
+    assert partido.json()["recommendations"] == []
+
+
+@pytest.mark.parametrize("plazo_ms", [None, 1000])
+def test_sin_destinos_tras_filtros(particionado, plazo_ms):
+    params = {"provincia_preferida": "Atlántida"}
+    if plazo_ms is not None:
+        params["deadline_ms"] = plazo_ms
+    completo, partido = particionado(**params)
+    assert completo.status_code == partido.status_code == 404
+    assert completo.json() == partido.json()
+    assert partido.json()["detail"] == "No hay destinos tras aplicar filtros"
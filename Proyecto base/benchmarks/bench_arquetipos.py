@@ -0,0 +1,84 @@
+'''
+BENCHMARK DEL MODO RÁPIDO POR ARQUETIPOS
+
+Compara la latencia de recommend_destinations en modo exacto y en modo
+rápido (arquetipo más cercano) y la del paso de búsqueda del arquetipo por
+sí solo, para familias sintéticas. Muestra además las métricas de calidad
+frente a la recomendación exacta guardadas por generar_arquetipos.py.
+
+Requiere haber generado los arquetipos antes:
+    cd api && python generar_arquetipos.py
+
+Uso:
+    python benchmarks/bench_arquetipos.py --familias 50
+'''
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from comun import API_DIR, entorno_api
+
+os.environ.update(entorno_api())
+sys.path.insert(0, API_DIR)
+
+from app.schemas import FamilyBase  # noqa: E402
+from app.core.archetypes import a_preferencias, familias_sinteticas  # noqa: E402
+from app.core.preferences import aggregate_preferences  # noqa: E402
+from app.routes import family  # noqa: E402
+
+
+def a_familia(vector) -> FamilyBase:
+    preferencias = a_preferencias(vector)
+    return FamilyBase.model_validate({"miembros": [{"nombre": "Familia", "rol": "👤 Otro", "preferencias": preferencias}]})
+
+
+def medir_us(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia y calidad del modo rápido por arquetipos")
+    parser.add_argument("--familias", type=int, default=50)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    indice = family.archetype_index
+    if indice is None:
+        sys.exit(f"No hay arquetipos para el modelo actual en {family.ARQUETIPOS_PATH}; "
+                 "ejecuta primero api/generar_arquetipos.py")
+
+    familias = [a_familia(v) for v in familias_sinteticas(args.familias, seed=123)]
+
+    casos = {
+        "arquetipo más cercano": lambda f: indice.nearest(
+            aggregate_preferences(f.miembros, family.model_manager.feature_columns)
+        ),
+        "endpoint rápido": lambda f: family.recommend_destinations(f, top_k=10, rapido=True, en_curso=1, limite=None),
+        "endpoint exacto": lambda f: family.recommend_destinations(f, top_k=10, en_curso=1, limite=None),
+    }
+
+    print("=" * 60)
+    print(f"           MODO RÁPIDO POR ARQUETIPOS ({len(indice.nombres)} arquetipos)")
+    print("=" * 60)
+    print(f"{'caso':<24} {'mediana':>12} {'p95':>12}")
+    for nombre, fn in casos.items():
+        tiempos = [medir_us(lambda: fn(f), args.repeticiones) for f in familias]
+        p95 = sorted(tiempos)[int(0.95 * (len(tiempos) - 1))]
+        print(f"{nombre:<24} {statistics.median(tiempos):>10.1f}us {p95:>10.1f}us")
+
+    print()
+    print("Calidad frente a la recomendación exacta (generar_arquetipos.py):")
+    for nombre, valores in indice.calidad.items():
+        print(f"  {nombre:<10} " + "  ".join(f"{m}={v}" for m, v in valores.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+'''
+BENCHMARK DE ARRANQUE EN FRÍO
+
+Mide, en procesos nuevos (sin caché de módulos):
+  • API: tiempo hasta la primera respuesta de `app.main:app` (importación,
+    entrenamiento del modelo al cargar las rutas y primer GET /).
+  • Frontend: tiempo hasta el primer render de `frontend/app.py` usando
+    el AppTest de Streamlit (sin navegador).
+
+Para cada proceso reporta el desglose de importación por paquete
+(`python -X importtime`) y falla (código de salida 1) si se supera el
+presupuesto configurado. Además indica qué imports pesados de
+`utils/visualizations.py` y de los módulos de `pagina/` solo se usan dentro
+de funciones y podrían diferirse hasta que realmente se necesiten.
+
+Uso:
+    python benchmarks/bench_arranque.py
+    python benchmarks/bench_arranque.py --presupuesto-api 6 --presupuesto-frontend 4 --repeticiones 3
+
+Los presupuestos también se pueden fijar con las variables de entorno
+BENCH_PRESUPUESTO_API_S y BENCH_PRESUPUESTO_FRONTEND_S.
+'''
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from comun import BASE_DIR, API_DIR, FRONTEND_DIR, entorno_api
+
+# Código que se ejecuta en el proceso hijo. Imprime una línea JSON con los tiempos.
+SNIPPET_API = """
+import json, time
+t0 = time.perf_counter()
+from app.main import app
+t_import = time.perf_counter() - t0
+from fastapi.testclient import TestClient
+r = TestClient(app).get("/")
+t_total = time.perf_counter() - t0
+print("__BENCH__" + json.dumps({"import_s": t_import, "primera_respuesta_s": t_total, "status": r.status_code}))
+"""
+
+SNIPPET_FRONTEND = """
+import json, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=120)
+t_import = time.perf_counter() - t0
+at.run()
+t_total = time.perf_counter() - t0
+print("__BENCH__" + json.dumps({"import_s": t_import, "primer_render_s": t_total, "errores": len(at.exception)}))
+"""
+
+# Módulos que el runtime de Streamlit ya tiene cargados: diferirlos no ahorra nada
+YA_CARGADOS = {"streamlit"}
+
+
+def ejecutar(snippet: str, cwd: str, env: dict) -> tuple[dict, dict]:
+    """
+    Ejecuta el snippet en un proceso nuevo con -X importtime
+
+    Returns:
+        (tiempos reportados por el hijo, costo acumulado de importación por paquete en segundos)
+    """
+    inicio = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", snippet],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - inicio
+
+    linea = next((l for l in proc.stdout.splitlines() if l.startswith("__BENCH__")), None)
+    if proc.returncode != 0 or linea is None:
+        raise RuntimeError(f"El proceso falló ({proc.returncode}):\n{proc.stderr[-2000:]}")
+
+    tiempos = json.loads(linea[len("__BENCH__"):])
+    tiempos["proceso_s"] = wall
+    return tiempos, parsear_importtime(proc.stderr)
+
+
+def parsear_importtime(salida: str) -> dict:
+    """
+    Agrupa la salida de -X importtime por paquete raíz sumando el tiempo
+    propio (self) de cada módulo, así un paquete importado por otro no se
+    cuenta dos veces
+    """
+    por_paquete = defaultdict(float)
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:"):
+            continue
+        partes = linea[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue
+        por_paquete[partes[2].strip().split(".")[0]] += int(partes[0]) / 1e6
+    return dict(por_paquete)
+
+
+def imports_diferibles(ruta: str) -> list[dict]:
+    """
+    Devuelve los imports de nivel de módulo cuyos nombres solo se usan
+    dentro de funciones (y por tanto podrían moverse a la función que los usa)
+    """
+    with open(ruta, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    imports = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append((alias.asname or alias.name.split(".")[0], alias.name))
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            for alias in node.names:
+                imports.append((alias.asname or alias.name, node.module))
+
+    uso_modulo, uso_funciones = set(), defaultdict(set)
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for sub in ast.walk(node):
+                if isinstance(sub, ast.Name):
+                    uso_funciones[sub.id].add(node.name)
+        else:
+            for sub in ast.walk(node):
+                if isinstance(sub, ast.Name):
+                    uso_modulo.add(sub.id)
+
+    resultado = []
+    for nombre, modulo in imports:
+        if nombre in uso_modulo:
+            continue
+        resultado.append({
+            "nombre": nombre,
+            "modulo": modulo,
+            "usado_en": sorted(uso_funciones.get(nombre, [])),
+        })
+    return resultado
+
+
+def reporte_diferibles(costos_frontend: dict, umbral_s: float) -> list[dict]:
+    archivos = [os.path.join(FRONTEND_DIR, "utils", "visualizations.py")]
+    pagina_dir = os.path.join(FRONTEND_DIR, "pagina")
+    archivos += sorted(
+        os.path.join(pagina_dir, f) for f in os.listdir(pagina_dir) if f.endswith(".py")
+    )
+
+    # Un mismo paquete puede importarse varias veces en un archivo (import folium,
+    # from folium import plugins...): se agrupa por archivo y paquete raíz
+    sugerencias = {}
+    for ruta in archivos:
+        archivo = os.path.relpath(ruta, BASE_DIR)
+        for imp in imports_diferibles(ruta):
+            raiz = imp["modulo"].split(".")[0]
+            costo = costos_frontend.get(raiz, 0.0)
+            if raiz in YA_CARGADOS or raiz in ("utils", "pagina") or costo < umbral_s:
+                continue
+            s = sugerencias.setdefault((archivo, raiz), {
+                "archivo": archivo,
+                "paquete": raiz,
+                "costo_s": costo,
+                "usado_en": set(),
+            })
+            s["usado_en"].update(imp["usado_en"])
+
+    resultado = [{**s, "usado_en": sorted(s["usado_en"])} for s in sugerencias.values()]
+    return sorted(resultado, key=lambda s: -s["costo_s"])
+
+
+def imprimir_desglose(titulo: str, costos: dict, top: int):
+    print(f"\n   Importación por paquete ({titulo}):")
+    for paquete, segundos in sorted(costos.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"   • {paquete:<28} {segundos * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío de la API y el frontend")
+    parser.add_argument("--presupuesto-api", type=float,
+                        default=float(os.getenv("BENCH_PRESUPUESTO_API_S", "8")),
+                        help="Segundos máximos hasta la primera respuesta de la API")
+    parser.add_argument("--presupuesto-frontend", type=float,
+                        default=float(os.getenv("BENCH_PRESUPUESTO_FRONTEND_S", "6")),
+                        help="Segundos máximos hasta el primer render del frontend")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--top", type=int, default=12, help="Paquetes a mostrar en el desglose")
+    parser.add_argument("--umbral-diferible-ms", type=float, default=20.0,
+                        help="Costo mínimo de un import para sugerir diferirlo")
+    parser.add_argument("--json", help="Ruta opcional donde guardar el resultado completo")
+    args = parser.parse_args()
+
+    env = entorno_api()
+
+    api_runs, front_runs = [], []
+    costos_api, costos_front = {}, {}
+    for _ in range(args.repeticiones):
+        tiempos, costos_api = ejecutar(SNIPPET_API, API_DIR, env)
+        api_runs.append(tiempos)
+        tiempos, costos_front = ejecutar(SNIPPET_FRONTEND, FRONTEND_DIR, env)
+        front_runs.append(tiempos)
+
+    api_s = statistics.median(r["primera_respuesta_s"] for r in api_runs)
+    front_s = statistics.median(r["primer_render_s"] for r in front_runs)
+
+    print("=" * 60)
+    print("           ARRANQUE EN FRÍO")
+    print("=" * 60)
+    print(f"API      primera respuesta: {api_s:7.3f} s  (import {statistics.median(r['import_s'] for r in api_runs):.3f} s, "
+          f"presupuesto {args.presupuesto_api:.2f} s)")
+    print(f"Frontend primer render:     {front_s:7.3f} s  (import {statistics.median(r['import_s'] for r in front_runs):.3f} s, "
+          f"presupuesto {args.presupuesto_frontend:.2f} s)")
+
+    imprimir_desglose("API", costos_api, args.top)
+    imprimir_desglose("frontend", costos_front, args.top)
+
+    sugerencias = reporte_diferibles(costos_front, args.umbral_diferible_ms / 1000)
+    print("\n   Imports que podrían diferirse (solo se usan dentro de funciones):")
+    if not sugerencias:
+        print("   • Ninguno por encima del umbral")
+    for s in sugerencias:
+        print(f"   • {s['archivo']}: {s['paquete']} ({s['costo_s'] * 1000:.1f} ms) -> {', '.join(s['usado_en']) or 'sin uso'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "api": api_runs, "frontend": front_runs,
+                "importacion_api": costos_api, "importacion_frontend": costos_front,
+                "diferibles": sugerencias,
+            }, f, indent=2, ensure_ascii=False)
+
+    excedidos = []
+    if api_s > args.presupuesto_api:
+        excedidos.append(f"API {api_s:.3f} s > {args.presupuesto_api:.2f} s")
+    if front_s > args.presupuesto_frontend:
+        excedidos.append(f"frontend {front_s:.3f} s > {args.presupuesto_frontend:.2f} s")
+
+    print("=" * 60)
+    if excedidos:
+        print("PRESUPUESTO EXCEDIDO: " + "; ".join(excedidos))
+        sys.exit(1)
+    print("Dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
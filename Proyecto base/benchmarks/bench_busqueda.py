@@ -0,0 +1,147 @@
+'''
+BENCHMARK DE LA BÚSQUEDA DE DESTINOS POR TEXTO
+
+Construye el índice de búsqueda (IndiceBusqueda) sobre el catálogo real y
+sobre réplicas más grandes. En las réplicas cada destino copiado recibe un
+nombre distinto (su nombre más una palabra de otro destino y un número) y
+conserva la descripción de su original, así que casi todas las filas son
+documentos distintos. Para cada tamaño informa:
+  • tiempo de construcción y tamaño del índice (términos, postings, MB)
+  • mediana y p95 de latencia de consultas exactas, con errores de tipeo,
+    por prefijo, de varias palabras, muy frecuentes y con filtros de
+    provincia y tipo (misma lógica que /buscar_destinos)
+  • como referencia, una búsqueda ingenua (str.contains sobre los nombres
+    plegados de todo el catálogo)
+
+Antes de medir verifica sobre el catálogo real que las consultas con tildes
+y sin ellas dan el mismo resultado y que una palabra mal escrita encuentra
+el destino.
+
+Uso:
+    python benchmarks/bench_busqueda.py --tamanos 4133,100000,1000000 --repeticiones 50
+'''
+
+import argparse
+import os
+import sys
+import time
+
+from comun import API_DIR, entorno_api, percentil
+
+os.environ.update(entorno_api())
+sys.path.insert(0, API_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.core.search import IndiceBusqueda, cargar_descripciones, mejores, plegar  # noqa: E402
+from app.routes.family import DESCRIPCIONES_PATH, buscar_columnas_por_tipo, cargar_destinos  # noqa: E402
+
+CONSULTAS = {
+    "exacta": ["museo amantes de sumpa", "cascada el molino", "granja burgay"],
+    "tipeo": ["cascda molino", "catedrl santa elena", "muzeo sumpa"],
+    "prefijo": ["casc", "mira", "igle"],
+    "varias palabras": ["playa galapagos", "iglesia quito centro", "parque ecologico guayaquil"],
+    "frecuente": ["iglesia", "parque", "playa"],
+    "con filtros": [("cascada", "EL ORO", ["parques"]), ("iglesia", "Pichincha", ["museos"]),
+                    ("playa", "Manabí", None)],
+}
+
+
+def replicar(df: pd.DataFrame, descripciones: dict, filas: int, seed: int = 0):
+    """Catálogo de `filas` destinos con nombres casi todos distintos"""
+    if filas <= len(df):
+        return df.head(filas).reset_index(drop=True), descripciones
+    rng = np.random.default_rng(seed)
+    idx = np.resize(np.arange(len(df)), filas)
+    grande = df.iloc[idx].reset_index(drop=True)
+    palabras = np.array(sorted({p for n in df["nombre"] for p in str(n).split() if len(p) > 3}), dtype=object)
+    extra = rng.choice(palabras, filas)
+    numero = rng.integers(1, 10_000, filas).astype(str)
+    originales = grande["nombre"].to_numpy(dtype=object)
+    nombres = originales + " " + extra + " " + numero
+    nombres[:len(df)] = originales[:len(df)]
+    grande["nombre"] = nombres
+
+    # Cada copia conserva la descripción de su original
+    copias = dict(descripciones)
+    for nombre, original in zip(nombres[len(df):], originales[len(df):]):
+        desc = descripciones.get(plegar(original))
+        if desc:
+            copias[plegar(nombre)] = desc
+    return grande, copias
+
+
+def consultar(indice, df, provincias, codigo_provincia, score, consulta, top_k: int = 10):
+    """Misma lógica que el endpoint /buscar_destinos, sin serializar"""
+    provincia, tipos = None, None
+    if isinstance(consulta, tuple):
+        consulta, provincia, tipos = consulta
+    filas, relevancia, _ = indice.buscar(consulta)
+    if provincia:
+        dentro = provincias[filas] == codigo_provincia.get(plegar(provincia), -1)
+        filas, relevancia = filas[dentro], relevancia[dentro]
+    if tipos:
+        dentro = np.zeros(len(filas), dtype=bool)
+        for t in tipos:
+            cols = buscar_columnas_por_tipo(df, t)
+            dentro |= np.mean([df[c].to_numpy(dtype=float)[filas] for c in cols], axis=0) > 0
+        filas, relevancia = filas[dentro], relevancia[dentro]
+    return filas[mejores(relevancia, score[filas], top_k)], len(filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia y tamaño del índice de búsqueda")
+    parser.add_argument("--tamanos", default="4133,100000,1000000")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    real = cargar_destinos().reset_index(drop=True)
+    descripciones = cargar_descripciones(DESCRIPCIONES_PATH)
+
+    # Verificación sobre el catálogo real
+    indice = IndiceBusqueda(real, descripciones)
+    nombres = real["nombre"].to_numpy()
+    con_tildes, _, _ = indice.buscar("PLAYA DE LA ESTACIÓN Galápagos")
+    sin_tildes, _, _ = indice.buscar("playa de la estacion galapagos")
+    tipeo, _, _ = indice.buscar("cascda molino")
+    fallos = int(not np.array_equal(con_tildes, sin_tildes) or not len(con_tildes))
+    fallos += "CASCADA EL MOLINO" not in set(nombres[tipeo])
+    print(f"Verificación (tildes y errores de tipeo): {'OK' if not fallos else 'FALLO'}")
+
+    print("=" * 96)
+    print(f"           BÚSQUEDA DE DESTINOS (mediana / p95 en ms, {args.repeticiones} repeticiones)")
+    print("=" * 96)
+    for filas in (int(t) for t in args.tamanos.split(",")):
+        df, descs = replicar(real, descripciones, filas)
+        indice = IndiceBusqueda(df, descs)
+        stats = indice.stats()
+        provincias, unicas = pd.factorize(df["provincia"].astype(str).map(plegar))
+        codigo_provincia = {p: i for i, p in enumerate(unicas)}
+        score = df["score"].to_numpy(dtype=float)
+        mb = (stats["bytes_arreglos"] + stats["bytes_vocabulario"]) / 1e6
+        print(f"\n{filas} filas: {stats['documentos']} documentos, {stats['terminos']} términos, "
+              f"{stats['postings']} postings, {mb:.1f} MB, construido en {stats['segundos_construccion']:.1f}s")
+
+        for clase, consultas in CONSULTAS.items():
+            tiempos, total = [], 0
+            for _ in range(args.repeticiones):
+                for consulta in consultas:
+                    inicio = time.perf_counter()
+                    _, n = consultar(indice, df, provincias, codigo_provincia, score, consulta)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    total += n
+            print(f"  {clase:<16} {percentil(tiempos, 50):>7.2f} / {percentil(tiempos, 95):>6.2f} ms "
+                  f"({total // (args.repeticiones * len(consultas))} coincidencias en promedio)")
+
+        plegados = df["nombre"].astype(str).map(plegar)
+        inicio = time.perf_counter()
+        plegados.str.contains("cascada", regex=False).sum()
+        print(f"  {'ingenua':<16} {(time.perf_counter() - inicio) * 1000:>7.2f} ms (str.contains sobre nombres ya plegados)")
+        del df, descs, indice
+
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
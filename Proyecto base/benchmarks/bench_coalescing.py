@@ -0,0 +1,78 @@
+'''
+BENCHMARK DE UNIÓN DE RECOMENDACIONES IDÉNTICAS
+
+Simula la ráfaga de una campaña: N clientes piden a la vez la misma
+recomendación (misma familia plantilla). Levanta la API con la unión de
+peticiones desactivada (COALESCE_ENABLED=0) y activada, y mide para cada
+ráfaga el tiempo total, la latencia p50/p99 y cuántas peticiones se
+sirvieron con un cálculo compartido (según /metricas).
+
+Uso:
+    python benchmarks/bench_coalescing.py --rafagas 3
+'''
+
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import api_en_segundo_plano, percentil
+
+FAMILIA = {
+    "family": {
+        "miembros": [
+            {"nombre": "Plantilla", "rol": "👨‍👩‍👧‍👦 Padres", "indices": [1, 2, 16], "valores": [5.0, 5.0, 4.0]},
+            {"nombre": "Hijo", "rol": "👦👧 Hijos (Adolescentes 13-17)", "indices": [7, 15], "valores": [5.0, 3.0]},
+        ]
+    }
+}
+
+
+def pedir(url: str) -> float:
+    data = json.dumps(FAMILIA).encode("utf-8")
+    req = urllib.request.Request(
+        url + "/api/family/recommend_destinations?top_k=10",
+        data=data, headers={"Content-Type": "application/json"}
+    )
+    inicio = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        resp.read()
+    return time.perf_counter() - inicio
+
+
+def coalesced(url: str) -> int:
+    with urllib.request.urlopen(url + "/metricas", timeout=10) as resp:
+        return json.load(resp)["recomendaciones"]["coalesced"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ráfagas de recomendaciones idénticas con y sin unión")
+    parser.add_argument("--rafagas", type=int, default=3, help="Ráfagas por nivel de concurrencia")
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("           RÁFAGAS DE RECOMENDACIONES IDÉNTICAS (mediana de ráfagas)")
+    print("=" * 78)
+    print(f"{'unión':<9} {'clientes':>8} {'ráfaga':>10} {'p50':>10} {'p99':>10} {'compartidas':>12}")
+    for activada in (False, True):
+        with api_en_segundo_plano(COALESCE_ENABLED=int(activada)) as url:
+            pedir(url)
+            for clientes in (1, 10, 50):
+                totales, latencias, compartidas = [], [], []
+                with ThreadPoolExecutor(max_workers=clientes) as pool:
+                    for _ in range(args.rafagas):
+                        antes = coalesced(url)
+                        inicio = time.perf_counter()
+                        latencias.extend(pool.map(lambda _: pedir(url), range(clientes)))
+                        totales.append(time.perf_counter() - inicio)
+                        compartidas.append(coalesced(url) - antes)
+                print(f"{'sí' if activada else 'no':<9} {clientes:>8} "
+                      f"{statistics.median(totales) * 1000:>8.0f}ms "
+                      f"{percentil(latencias, 50) * 1000:>8.0f}ms {percentil(latencias, 99) * 1000:>8.0f}ms "
+                      f"{statistics.median(compartidas):>7.0f}/{clientes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+'''
+BENCHMARK DE LA COMPATIBILIDAD ENTRE MIEMBROS
+
+Para familias sintéticas de 2 a 50 miembros compara el cálculo vectorizado
+de matriz_compatibilidad (un bloque para todos los pares) con la versión
+directa: un ciclo por par con scipy.stats.spearmanr y el coseno sobre las
+columnas en común. Mide (mediana):
+  • vectorizado: matriz_compatibilidad
+  • por pares:   ciclos por par
+  • endpoint:    la llamada completa a /compatibility (sin HTTP)
+
+Antes de medir verifica que ambas versiones den los mismos valores.
+
+Uso:
+    python benchmarks/bench_compatibilidad.py --repeticiones 20
+'''
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import warnings
+
+from comun import API_DIR, entorno_api
+
+os.environ.update(entorno_api())
+sys.path.insert(0, API_DIR)
+
+import numpy as np  # noqa: E402
+from scipy.stats import spearmanr  # noqa: E402
+
+from app.schemas import FamilyBase  # noqa: E402
+from app.core.compatibility import CENTRO_ESCALA, matriz_compatibilidad  # noqa: E402
+from app.core.preferences import preferencias_por_miembro  # noqa: E402
+from app.routes.family import compatibility  # noqa: E402
+
+ROLES = ["👨‍👩‍👧‍👦 Padres", "👦👧 Hijos (Adolescentes 13-17)", "👴👵 Abuelos", "👤 Otro"]
+
+
+def familia_aleatoria(n: int, rng: random.Random) -> FamilyBase:
+    miembros = []
+    for i in range(n):
+        vector = [None] * 24
+        for j in rng.sample(range(24), rng.randint(3, 12)):
+            vector[j] = float(rng.randint(1, 5))
+        miembros.append({"nombre": f"M{i}", "rol": rng.choice(ROLES), "vector": vector})
+    return FamilyBase(miembros=miembros)
+
+
+def por_pares(preferencias: np.ndarray):
+    """Coseno y Spearman con un ciclo por par (referencia)"""
+    n = len(preferencias)
+    coseno = np.full((n, n), np.nan)
+    rangos = np.full((n, n), np.nan)
+    for i in range(n):
+        for k in range(n):
+            comunes = ~np.isnan(preferencias[i]) & ~np.isnan(preferencias[k])
+            if not comunes.any():
+                continue
+            x = preferencias[i, comunes] - CENTRO_ESCALA
+            y = preferencias[k, comunes] - CENTRO_ESCALA
+            if (x @ x) * (y @ y) > 0:
+                coseno[i, k] = x @ y / np.sqrt((x @ x) * (y @ y))
+            if comunes.sum() >= 2:
+                rangos[i, k] = spearmanr(preferencias[i, comunes], preferencias[k, comunes]).statistic
+    return coseno, rangos
+
+
+def mediana_ms(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compatibilidad vectorizada frente a ciclos por par")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--miembros", default="2,5,12,25,50")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    rng = random.Random(0)
+    print("=" * 72)
+    print(f"           COMPATIBILIDAD ENTRE MIEMBROS (mediana de {args.repeticiones}, ms)")
+    print("=" * 72)
+    print(f"{'miembros':>9} {'vectorizado':>12} {'por pares':>10} {'aceleración':>12} {'endpoint':>10} {'error':>9}")
+    fallos = 0
+    for n in (int(m) for m in args.miembros.split(",")):
+        familia = familia_aleatoria(n, rng)
+        preferencias = preferencias_por_miembro(familia.miembros)
+
+        resultado = matriz_compatibilidad(preferencias)
+        coseno, rangos = por_pares(preferencias)
+        error = 0.0
+        for obtenido, esperado in ((resultado["coseno"], coseno), (resultado["rangos"], rangos)):
+            if not np.array_equal(np.isnan(obtenido), np.isnan(esperado)):
+                error = float("inf")
+            else:
+                error = max(error, float(np.nanmax(np.abs(obtenido - esperado), initial=0.0)))
+        fallos += error > 1e-9
+
+        vectorizado = mediana_ms(lambda: matriz_compatibilidad(preferencias), args.repeticiones)
+        pares = mediana_ms(lambda: por_pares(preferencias), max(1, args.repeticiones // 5))
+        endpoint = mediana_ms(lambda: compatibility(familia), args.repeticiones)
+        print(f"{n:>9} {vectorizado:>12.2f} {pares:>10.1f} {pares / vectorizado:>11.0f}x {endpoint:>10.2f} {error:>9.1e}")
+
+    print(f"\nVerificación (mismos valores que por pares): {'OK' if not fallos else f'{fallos} FALLOS'}")
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+'''
+BENCHMARK DE ESTRATEGIAS DE CONSENSO
+
+Compara la ruta original de recommend_destinations (promediar preferencias y
+predecir una vez por destino) con el modo de consenso (un score por miembro y
+destino en una sola predicción por bloque, combinado con cada estrategia)
+para familias de 2 a 12 miembros sobre el catálogo completo.
+
+Mide dos tiempos (mediana):
+  • modelo:   agregación + predicción + combinación
+  • endpoint: la llamada completa a recommend_destinations (incluye leer el CSV)
+
+Antes de medir verifica que, con un solo miembro, el modo de consenso
+"promedio" reproduce los scores de la ruta original.
+
+El consenso no queda a un factor pequeño de la ruta original: predice una
+fila por miembro y destino, así que la etapa del modelo crece con el tamaño
+de la familia (~10x con 12 miembros, ~5.5x el endpoint). Para familias
+grandes con plazo, el nivel "candidatos" acota las filas que pasan al booster.
+
+Uso:
+    python benchmarks/bench_consenso.py --repeticiones 10
+'''
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from comun import API_DIR, entorno_api
+
+os.environ.update(entorno_api())
+sys.path.insert(0, API_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.schemas import FamilyBase  # noqa: E402
+from app.core.consensus import ESTRATEGIAS, combinar_scores  # noqa: E402
+from app.core.preferences import aggregate_preferences, preferencias_por_miembro  # noqa: E402
+from app.routes.family import DATA_PATH, model_manager, recommend_destinations  # noqa: E402
+
+ROLES = ["👨‍👩‍👧‍👦 Padres", "👦👧 Hijos (Adolescentes 13-17)", "👴👵 Abuelos", "👤 Otro"]
+
+
+def generar_familia(n: int, seed: int) -> FamilyBase:
+    rng = random.Random(seed)
+    k = len(model_manager.feature_columns)
+    miembros = []
+    for i in range(n):
+        elegidas = sorted(rng.sample(range(k), rng.randint(3, 12)))
+        miembros.append({
+            "nombre": f"Miembro {i}",
+            "rol": ROLES[i % len(ROLES)],
+            "indices": elegidas,
+            "valores": [float(rng.randint(1, 5)) for _ in elegidas],
+        })
+    return FamilyBase.model_validate({"miembros": miembros})
+
+
+def modelo_original(familia, X: pd.DataFrame) -> np.ndarray:
+    agregadas = aggregate_preferences(familia.miembros, model_manager.feature_columns)
+    X = X.copy()
+    for col, val in agregadas.items():
+        X[col] = val
+    return model_manager.model.predict(X)
+
+
+def modelo_consenso(familia, X: np.ndarray, estrategia: str) -> np.ndarray:
+    preferencias = preferencias_por_miembro(familia.miembros, model_manager.feature_columns)
+    scores = model_manager.predict_members(X, preferencias)
+    return combinar_scores(scores, estrategia, [m.rol for m in familia.miembros])
+
+
+def mediana_ms(fn, repeticiones: int) -> float:
+    fn()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia del modo de consenso frente a la ruta original")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_PATH, sep="|")
+    X_df = df[model_manager.feature_columns]
+    X = X_df.to_numpy(dtype=np.float32)
+
+    uno = generar_familia(1, seed=0)
+    original = modelo_original(uno, X_df)
+    consenso = modelo_consenso(uno, X, "promedio")
+    assert np.allclose(original, consenso, atol=1e-5), "El consenso de un miembro no coincide con la ruta original"
+
+    print("=" * 78)
+    print(f"           CONSENSO FRENTE A LA RUTA ORIGINAL ({len(X)} destinos, mediana)")
+    print("=" * 78)
+    print(f"{'miembros':>8} {'modo':<16} {'modelo':>10} {'factor':>7} {'endpoint':>10} {'factor':>7}")
+    for n in (2, 4, 8, 12):
+        familia = generar_familia(n, seed=n)
+        base_modelo = mediana_ms(lambda: modelo_original(familia, X_df), args.repeticiones)
+        base_endpoint = mediana_ms(
+            lambda: recommend_destinations(familia, top_k=10, en_curso=1, limite=None), args.repeticiones
+        )
+        print(f"{n:>8} {'original':<16} {base_modelo:>8.1f}ms {'1.0x':>7} {base_endpoint:>8.1f}ms {'1.0x':>7}")
+        for estrategia in ESTRATEGIAS:
+            t_modelo = mediana_ms(lambda: modelo_consenso(familia, X, estrategia), args.repeticiones)
+            t_endpoint = mediana_ms(
+                lambda: recommend_destinations(familia, top_k=10, estrategia=estrategia, en_curso=1, limite=None),
+                args.repeticiones
+            )
+            print(f"{n:>8} {estrategia:<16} {t_modelo:>8.1f}ms {t_modelo / base_modelo:>6.1f}x "
+                  f"{t_endpoint:>8.1f}ms {t_endpoint / base_endpoint:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+'''
+BENCHMARK DE RECUPERACIÓN EN DOS ETAPAS
+
+Compara la puntuación completa del catálogo con el booster frente a la
+recuperación en dos etapas de recommend_destinations (sustituto lineal sobre
+todo el catálogo + booster solo sobre los N mejores):
+  • recall@k: fracción del top-k exacto que recupera el top-k en dos etapas,
+    promediada sobre familias aleatorias, para varios N
+  • latencia: etapa de modelo con catálogos de 4k a 1M destinos (el catálogo
+    real remuestreado con ruido) para la puntuación completa y en dos etapas
+
+Uso:
+    python benchmarks/bench_dos_etapas.py --familias 50 --candidatos 200,2000
+'''
+
+import argparse
+import statistics
+import sys
+import time
+
+from comun import API_DIR, DATA_PATH, NEW_DATA_PATH
+
+sys.path.insert(0, API_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.core.model_manager import ModelManager  # noqa: E402
+
+
+def familia_aleatoria(rng, columnas) -> dict:
+    elegidas = rng.choice(len(columnas), size=rng.integers(3, 13), replace=False)
+    return {columnas[j]: float(rng.integers(1, 6)) for j in elegidas}
+
+
+def con_preferencias(X: np.ndarray, preferencias: dict, columnas) -> np.ndarray:
+    X = X.copy()
+    for col, val in preferencias.items():
+        X[:, columnas.index(col)] = val
+    return X
+
+
+def top_completo(mm, X, preferencias, k):
+    scores = mm.model.predict(con_preferencias(X, preferencias, mm.feature_columns))
+    return np.argsort(-scores, kind="stable")[:k]
+
+
+def top_dos_etapas(mm, X, preferencias, k, n):
+    candidatos = mm.candidate_indices(X, preferencias, n)
+    scores = mm.model.predict(con_preferencias(X[candidatos], preferencias, mm.feature_columns))
+    return candidatos[np.argsort(-scores, kind="stable")[:k]]
+
+
+def recall(exacto, aproximado) -> float:
+    return len(set(exacto) & set(aproximado)) / len(exacto)
+
+
+def catalogo_sintetico(X: np.ndarray, n: int, rng) -> np.ndarray:
+    filas = X[rng.integers(0, len(X), size=n)]
+    return np.clip(filas + rng.normal(0, 0.25, size=filas.shape), 0, 5).astype(np.float32)
+
+
+def mediana_ms(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall y latencia de la recuperación en dos etapas")
+    parser.add_argument("--familias", type=int, default=50, help="Familias aleatorias para el recall")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-destinos", type=int, default=1_000_000)
+    parser.add_argument("--candidatos", default="200,2000", help="Valores de N para la curva de latencia")
+    args = parser.parse_args()
+
+    mm = ModelManager(DATA_PATH, NEW_DATA_PATH)
+    mm.train_model()
+    columnas = mm.feature_columns
+    X = pd.read_csv(DATA_PATH, sep="|")[columnas].to_numpy(dtype=np.float32)
+    rng = np.random.default_rng(42)
+    familias = [familia_aleatoria(rng, columnas) for _ in range(args.familias)]
+
+    print("=" * 60)
+    print(f"           RECALL@{args.k} FRENTE A PUNTUACIÓN COMPLETA ({len(X)} destinos)")
+    print("=" * 60)
+    exactos = [top_completo(mm, X, f, args.k) for f in familias]
+    print(f"{'N':>6} {'recall medio':>13} {'recall mínimo':>14}")
+    for n in (25, 50, 100, 200, 500, 1000):
+        valores = [recall(e, top_dos_etapas(mm, X, f, args.k, n)) for e, f in zip(exactos, familias)]
+        print(f"{n:>6} {statistics.mean(valores):>13.3f} {min(valores):>14.3f}")
+
+    print()
+    print("=" * 72)
+    print("           LATENCIA DE LA ETAPA DE MODELO (mediana)")
+    print("=" * 72)
+    print(f"{'destinos':>9} {'N':>6} {'completo':>11} {'dos etapas':>11} {'aceleración':>12} {'recall@' + str(args.k):>10}")
+    valores_n = [int(v) for v in args.candidatos.split(",")]
+    tamanos = [n for n in (len(X), 40_000, 200_000, 1_000_000) if n <= args.max_destinos]
+    for n in tamanos:
+        catalogo = X if n == len(X) else catalogo_sintetico(X, n, rng)
+        muestra = familias[:5]
+        repeticiones = 5 if n <= 200_000 else 2
+        completo = mediana_ms(lambda: top_completo(mm, catalogo, muestra[0], args.k), repeticiones)
+        exactos = [top_completo(mm, catalogo, f, args.k) for f in muestra]
+        for n_cand in valores_n:
+            dos_etapas = mediana_ms(
+                lambda: top_dos_etapas(mm, catalogo, muestra[0], args.k, n_cand), repeticiones
+            )
+            r = statistics.mean(
+                recall(e, top_dos_etapas(mm, catalogo, f, args.k, n_cand)) for e, f in zip(exactos, muestra)
+            )
+            print(f"{n:>9} {n_cand:>6} {completo:>9.1f}ms {dos_etapas:>9.1f}ms "
+                  f"{completo / dos_etapas:>11.1f}x {r:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+'''
+BENCHMARK DE LOS PERFILES DE ENTRENAMIENTO
+
+Entrena el modelo de la API con cada perfil de ModelManager.train_model
+(clasico, hist, cuantiles, externo) sobre historiales de distinto tamaño:
+el real y réplicas con ruido (las calificaciones alteradas y el score
+recalculado como su promedio, igual que en los datos sintéticos). Cada
+entrenamiento corre en un proceso aparte para medir:
+  • tiempo total (lectura de datos, matrices, árboles y sustituto lineal)
+  • memoria pico del proceso (ru_maxrss) y lo que suma sobre la memoria
+    tras importar las librerías
+  • árboles conservados (con parada temprana) y RMSE del pliegue de
+    validación
+
+Los historiales sintéticos se escriben en un directorio temporal.
+
+Uso:
+    python benchmarks/bench_entrenamiento.py --tamanos 4133,100000,1000000 --hilos 0
+'''
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from comun import API_DIR, DATA_PATH, NEW_DATA_PATH
+
+sys.path.insert(0, API_DIR)
+
+
+def memoria_pico_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def escribir_historial(destino: str, filas: int, seed: int = 0):
+    """Historial de `filas` registros a partir del real, escrito por bloques"""
+    import numpy as np
+    import pandas as pd
+    from app.core.model_manager import RATING_COLUMNS
+
+    real = pd.read_csv(DATA_PATH, sep="|", usecols=RATING_COLUMNS)
+    base = real.to_numpy(dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    bloque = 100_000
+    for inicio in range(0, filas, bloque):
+        n = min(bloque, filas - inicio)
+        X = base[rng.integers(0, len(base), n)] + rng.normal(0, 0.2, (n, base.shape[1])).astype(np.float32)
+        X = X.clip(0, 5).round(2)
+        df = pd.DataFrame(X, columns=RATING_COLUMNS)
+        df["score"] = X.mean(axis=1).round(4)
+        df.to_csv(destino, sep="|", index=False, header=inicio == 0, mode="w" if inicio == 0 else "a")
+
+
+def entrenar(perfil: str, data_path: str, hilos: int):
+    """Modo hijo: entrena una vez e imprime las mediciones en JSON"""
+    from app.core.model_manager import ModelManager
+
+    model_manager = ModelManager(data_path, NEW_DATA_PATH)
+    base = memoria_pico_mb()
+    inicio = time.perf_counter()
+    model_manager.train_model(perfil=perfil, n_jobs=hilos or None)
+    segundos = time.perf_counter() - inicio
+    print(json.dumps({
+        "segundos": segundos,
+        "pico_mb": memoria_pico_mb(),
+        "base_mb": base,
+        "arboles": model_manager.training_summary["arboles"],
+        "rmse_validacion": model_manager.training_summary.get("rmse_validacion"),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo y memoria de cada perfil de entrenamiento")
+    parser.add_argument("--tamanos", default="4133,100000,1000000")
+    parser.add_argument("--perfiles", default="clasico,hist,cuantiles,externo")
+    parser.add_argument("--hilos", type=int, default=0, help="Hilos de XGBoost (0 = todos los núcleos)")
+    parser.add_argument("--hijo", nargs=2, metavar=("PERFIL", "DATOS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        entrenar(*args.hijo, args.hilos)
+        return
+
+    print("=" * 86)
+    print(f"           PERFILES DE ENTRENAMIENTO ({os.cpu_count()} núcleos, hilos={args.hilos or 'todos'})")
+    print("=" * 86)
+    print(f"{'registros':>10} {'perfil':<10} {'tiempo':>9} {'pico':>9} {'sobre base':>11} "
+          f"{'árboles':>8} {'rmse val.':>10}")
+    with open(DATA_PATH, encoding="utf-8") as f:
+        filas_reales = sum(1 for _ in f) - 1
+    with tempfile.TemporaryDirectory(prefix="historial_") as tmp:
+        for filas in (int(t) for t in args.tamanos.split(",")):
+            data_path = DATA_PATH
+            if filas != filas_reales:
+                data_path = os.path.join(tmp, f"historial_{filas}.csv")
+                escribir_historial(data_path, filas)
+            for perfil in args.perfiles.split(","):
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--hijo", perfil, data_path, "--hilos", str(args.hilos)],
+                    capture_output=True, text=True
+                )
+                if proc.returncode != 0:
+                    print(f"{filas:>10} {perfil:<10} ERROR: {proc.stderr.strip().splitlines()[-1]}")
+                    continue
+                m = json.loads(proc.stdout.strip().splitlines()[-1])
+                rmse = f"{m['rmse_validacion']:.4f}" if m["rmse_validacion"] is not None else "-"
+                print(f"{filas:>10} {perfil:<10} {m['segundos']:>8.1f}s {m['pico_mb']:>7.0f}MB "
+                      f"{m['pico_mb'] - m['base_mb']:>9.0f}MB {m['arboles']:>8} {rmse:>10}")
+            if data_path != DATA_PATH:
+                os.remove(data_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+'''
+BENCHMARK DE ETAGS Y GET CONDICIONAL
+
+Levanta una API (con una copia del catálogo en un directorio temporal) y
+compara, para destinos_por_tipo (1, 3 y 6 tipos) y destino_mas_cercano:
+  • completa:    GET sin validador (200 con el cuerpo completo)
+  • revalidada:  GET con If-None-Match del ETag anterior (304 sin cuerpo)
+  • cliente:     APIClient con la caché de validadores (siempre revalida,
+                 con Cache-Control: no-cache)
+Informa mediana de latencia en ms y bytes de cuerpo recibidos.
+
+Antes de medir verifica que:
+  • la misma consulta da el mismo ETag y la revalidación responde 304
+  • otros parámetros (o los tipos en otro orden) dan otro ETag
+  • al cambiar el catálogo (fecha de modificación) el ETag cambia y
+    el validador viejo recibe 200 con el cuerpo nuevo
+
+Uso:
+    python benchmarks/bench_etags.py --repeticiones 50
+'''
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from comun import DATA_PATH, FRONTEND_DIR, api_en_segundo_plano
+
+CONSULTAS = {
+    "por_tipo 1": ("destinos_por_tipo", {"tipo": ["playas"], "top_k": 10}),
+    "por_tipo 3": ("destinos_por_tipo", {"tipo": ["playas", "museos", "parques"], "top_k": 10}),
+    "por_tipo 6": ("destinos_por_tipo", {"tipo": ["playas", "museos", "parques", "restaurantes", "teatros",
+                                                  "iglesias"], "top_k": 30}),
+    "mas_cercano": ("destino_mas_cercano", {"lat": -0.2, "lon": -78.5, "min_score": 2.0}),
+}
+
+
+def medir(fn, repeticiones: int):
+    tiempos, tamanos = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        r = fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        tamanos.append(len(r.content))
+    return statistics.median(tiempos), statistics.median(tamanos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia y bytes de GET completo frente a condicional")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    import requests
+
+    directorio = tempfile.mkdtemp()
+    datos = os.path.join(directorio, os.path.basename(DATA_PATH))
+    shutil.copy(DATA_PATH, datos)
+    sesion = requests.Session()
+    fallos = 0
+    try:
+        with api_en_segundo_plano(DATA_PATH=datos) as url:
+            base = f"{url}/api/family"
+
+            # Verificación
+            ruta, params = CONSULTAS["por_tipo 3"]
+            primera = sesion.get(f"{base}/{ruta}", params=params)
+            etag = primera.headers.get("ETag")
+            fallos += not etag or sesion.get(f"{base}/{ruta}", params=params).headers.get("ETag") != etag
+            fallos += sesion.get(f"{base}/{ruta}", params=params, headers={"If-None-Match": etag}).status_code != 304
+            otro = {**params, "tipo": list(reversed(params["tipo"]))}
+            fallos += sesion.get(f"{base}/{ruta}", params=otro).headers.get("ETag") == etag
+            os.utime(datos, ns=(time.time_ns(), time.time_ns() + 10**9))
+            cambiado = sesion.get(f"{base}/{ruta}", params=params, headers={"If-None-Match": etag})
+            fallos += cambiado.status_code != 200 or cambiado.headers.get("ETag") == etag \
+                or cambiado.json() != primera.json()
+            print(f"Verificación (304 sin cambios, 200 con ETag nuevo al cambiar el catálogo): "
+                  f"{'OK' if not fallos else f'{fallos} FALLOS'}")
+
+            sys.path.insert(0, FRONTEND_DIR)
+            os.environ["API_BASE_URL"] = url
+            from utils.api_client import APIClient, validator_cache
+
+            print("=" * 84)
+            print(f"           GET COMPLETO FRENTE A CONDICIONAL (mediana de {args.repeticiones}, ms y bytes)")
+            print("=" * 84)
+            print(f"{'consulta':<13} {'completa':>9} {'bytes':>7} {'revalidada':>11} {'bytes':>6} "
+                  f"{'ahorro':>7} {'cliente':>9}")
+            for nombre, (ruta, params) in CONSULTAS.items():
+                etag = sesion.get(f"{base}/{ruta}", params=params).headers["ETag"]
+                completa, bytes_completa = medir(lambda: sesion.get(f"{base}/{ruta}", params=params),
+                                                 args.repeticiones)
+                revalidada, bytes_revalidada = medir(
+                    lambda: sesion.get(f"{base}/{ruta}", params=params, headers={"If-None-Match": etag}),
+                    args.repeticiones
+                )
+                metodo = APIClient.get_destinos_por_tipo if ruta == "destinos_por_tipo" \
+                    else APIClient.get_destino_mas_cercano
+                metodo(params)
+                tiempos = []
+                for _ in range(args.repeticiones):
+                    inicio = time.perf_counter()
+                    metodo(params)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                print(f"{nombre:<13} {completa:>9.2f} {bytes_completa:>7.0f} {revalidada:>11.2f} "
+                      f"{bytes_revalidada:>6.0f} {1 - revalidada / completa:>7.0%} {statistics.median(tiempos):>9.2f}")
+            print(f"\nCaché de validadores del cliente: {validator_cache.stats()}")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+'''
+BENCHMARK DE LAS EXPLICACIONES DE RECOMENDACIONES
+
+Compara, para top_k 5, 10 y 50 y familias sintéticas (con y sin
+estrategia de consenso), tres llamadas directas (sin HTTP):
+  • recommend_destinations (la recomendación sola)
+  • explain_recommendations la primera vez (recomendación + contribuciones
+    de las filas recomendadas)
+  • explain_recommendations repetida (desde las explicaciones guardadas)
+
+Antes de medir verifica que, en cada destino explicado, la suma de la base
+y las contribuciones reproduce su score (predicted_score o el de cada
+miembro) y que las recomendaciones son las mismas que sin explicación.
+Con --aproximadas la API usa EXPLICACIONES_APROXIMADAS=1.
+
+Uso:
+    python benchmarks/bench_explicaciones.py --familias 30 [--aproximadas]
+'''
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from comun import API_DIR, entorno_api
+
+APROXIMADAS = "--aproximadas" in sys.argv
+os.environ.update(entorno_api(COALESCE_ENABLED=0, MICROBATCH_ENABLED=0, EXPLICACIONES_APROXIMADAS=int(APROXIMADAS)))
+sys.path.insert(0, API_DIR)
+
+from app.schemas import FamilyBase  # noqa: E402
+from app.routes.family import explain_recommendations, recommend_destinations  # noqa: E402
+
+ROLES = ["👨‍👩‍👧‍👦 Padres", "👦👧 Hijos (Adolescentes 13-17)", "👴👵 Abuelos", "👤 Otro"]
+CLAVES = ["playas", "museos", "parques", "miradores", "iglesias", "restaurantes", "zoologicos", "piscinas"]
+
+
+def familia_aleatoria(rng: random.Random) -> FamilyBase:
+    miembros = [
+        {
+            "nombre": f"M{i}",
+            "rol": rng.choice(ROLES),
+            "preferencias": {c: float(rng.randint(1, 5)) for c in rng.sample(CLAVES, rng.randint(1, 3))},
+        }
+        for i in range(rng.randint(2, 5))
+    ]
+    return FamilyBase(miembros=miembros)
+
+
+def cronometrar(fn):
+    inicio = time.perf_counter()
+    resultado = fn()
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def error_suma(explicada: dict) -> float:
+    """Mayor diferencia entre base + contribuciones y el score explicado"""
+    peor = 0.0
+    for rec in explicada["recommendations"]:
+        exp = rec["explicacion"]
+        if "por_miembro" in exp:
+            pares = list(zip(exp["por_miembro"], rec["scores_miembros"]))
+        else:
+            pares = [(exp, rec["predicted_score"])]
+        for detalle, score in pares:
+            peor = max(peor, abs(detalle["base"] + sum(detalle["contribuciones"].values()) - score))
+    return peor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia añadida por las explicaciones")
+    parser.add_argument("--familias", type=int, default=30)
+    parser.add_argument("--top-k", default="5,10,50")
+    parser.add_argument("--aproximadas", action="store_true", help="Contribuciones aproximadas en vez de SHAP exactos")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    familias = [familia_aleatoria(rng) for _ in range(args.familias)]
+    comun = dict(ubicacion_actual_lat=None, ubicacion_actual_lon=None, max_distancia_km=None,
+                 provincia_preferida=None, tipos_interes=None, candidatos=None, en_curso=1)
+
+    print("=" * 84)
+    print(f"           EXPLICACIONES {'APROXIMADAS' if APROXIMADAS else 'SHAP'} "
+          f"({args.familias} familias por fila, mediana en ms)")
+    print("=" * 84)
+    print(f"{'top_k':>6} {'estrategia':<15} {'recomendar':>11} {'explicar':>10} {'añadido':>9} "
+          f"{'repetida':>10} {'error suma':>11}")
+    fallos = 0
+    for top_k in (int(k) for k in args.top_k.split(",")):
+        for estrategia in (None, "minima_miseria"):
+            tiempos = {"recomendar": [], "explicar": [], "repetida": []}
+            peor = 0.0
+            for familia in familias:
+                base, ms = cronometrar(lambda: recommend_destinations(
+                    familia, top_k=top_k, estrategia=estrategia, rapido=False, limite=None, **comun))
+                tiempos["recomendar"].append(ms)
+                explicada, ms = cronometrar(lambda: explain_recommendations(
+                    familia, top_k=top_k, estrategia=estrategia, **comun))
+                tiempos["explicar"].append(ms)
+                _, ms = cronometrar(lambda: explain_recommendations(
+                    familia, top_k=top_k, estrategia=estrategia, **comun))
+                tiempos["repetida"].append(ms)
+
+                sin_explicacion = [{k: v for k, v in r.items() if k != "explicacion"}
+                                   for r in explicada["recommendations"]]
+                fallos += sin_explicacion != base["recommendations"]
+                peor = max(peor, error_suma(explicada))
+            # Los scores se redondean a 3 decimales y cada contribución a 4
+            fallos += peor > 0.01
+            medianas = {k: statistics.median(v) for k, v in tiempos.items()}
+            print(f"{top_k:>6} {estrategia or 'promedio':<15} {medianas['recomendar']:>11.1f} "
+                  f"{medianas['explicar']:>10.1f} {medianas['explicar'] - medianas['recomendar']:>+9.1f} "
+                  f"{medianas['repetida']:>10.2f} {peor:>11.4f}")
+    print(f"\nVerificación (mismas recomendaciones y sumas que cuadran): {'OK' if not fallos else f'{fallos} FALLOS'}")
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+'''
+BENCHMARK DE LAS RECOMENDACIONES POR LOTES
+
+Genera familias sintéticas con parámetros variados (provincia, ubicación y
+distancia máxima, tipos de interés, estrategias de consenso y algunas
+inválidas) y:
+  • corre recomendar_lote.py con 1 y con --procesos procesos y mide
+    familias por segundo
+  • interrumpe una corrida a la mitad, la retoma y verifica que la salida
+    tenga cada familia exactamente una vez
+  • verifica con la misma familia en CSV que ambos formatos dan lo mismo
+  • compara una muestra contra la API por HTTP (mismo modelo): las
+    respuestas deben coincidir exactamente; de paso mide cuánto tarda la
+    API familia por familia
+
+Termina con error si alguna verificación falla.
+
+Uso:
+    python benchmarks/bench_lotes.py --familias 2000 --procesos 4 --muestra 200
+'''
+
+import argparse
+import csv
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from comun import API_DIR, api_en_segundo_plano, entorno_api
+
+ROLES = ["👨‍👩‍👧‍👦 Padres", "👦👧 Hijos (Adolescentes 13-17)", "👶 Niños (0-12)", "👴👵 Abuelos"]
+PROVINCIAS = ["Pichincha", "Guayas", "Manabí", "Azuay", "Galápagos"]
+TIPOS = ["playas", "museos", "parques", "miradores"]
+ESTRATEGIAS = ["minima_miseria", "maximo_placer", "equidad_rol"]
+
+
+def familias_sinteticas(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(n):
+        miembros = []
+        for m in range(rng.randint(1, 5)):
+            vector = [None] * 24
+            for j in rng.sample(range(24), rng.randint(1, 4)):
+                vector[j] = float(rng.randint(1, 5))
+            miembros.append({"nombre": f"M{m}", "rol": rng.choice(ROLES), "vector": vector})
+        registro = {"id": f"fam-{i}", "miembros": miembros}
+        caso = rng.random()
+        if caso < 0.2:
+            registro["provincia_preferida"] = rng.choice(PROVINCIAS)
+        elif caso < 0.35:
+            registro["estrategia"] = rng.choice(ESTRATEGIAS)
+        elif caso < 0.5:
+            registro.update(ubicacion_actual_lat=-0.2 - rng.random() * 2, ubicacion_actual_lon=-78.5 - rng.random(),
+                            max_distancia_km=rng.choice([50.0, 150.0]))
+        elif caso < 0.6:
+            registro["tipos_interes"] = rng.sample(TIPOS, 2)
+        elif caso < 0.62:
+            registro["estrategia"] = "desconocida"
+        if rng.random() < 0.1:
+            registro["top_k"] = 5
+        yield registro
+
+
+def escribir_csv(ruta: str, registros):
+    from app.core.model_manager import RATING_COLUMNS
+
+    cortas = [c.replace("Calif promedio ", "") for c in RATING_COLUMNS]
+    parametros = ["top_k", "provincia_preferida", "ubicacion_actual_lat", "ubicacion_actual_lon",
+                  "max_distancia_km", "tipos_interes", "estrategia"]
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["familia", "nombre", "rol"] + cortas + parametros)
+        for r in registros:
+            for m in r["miembros"]:
+                valores = ["" if v is None else v for v in m["vector"]]
+                extra = [";".join(r[p]) if p == "tipos_interes" and p in r else r.get(p, "") for p in parametros]
+                escritor.writerow([r["id"], m["nombre"], m["rol"]] + valores + extra)
+
+
+def correr_lote(entrada: str, salida: str, procesos: int, interrumpir_tras: float = None):
+    comando = [sys.executable, "recomendar_lote.py", entrada, salida, "--procesos", str(procesos), "--cada", "1"]
+    inicio = time.perf_counter()
+    proc = subprocess.Popen(comando, cwd=API_DIR, env=entorno_api(), stdout=subprocess.PIPE, text=True,
+                            start_new_session=True)
+    if interrumpir_tras is not None:
+        time.sleep(interrumpir_tras)
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+        return None, None
+    salida_texto, _ = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"recomendar_lote.py falló:\n{salida_texto}")
+    return time.perf_counter() - inicio, salida_texto
+
+
+def leer_salida(ruta: str) -> list:
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f]
+
+
+def pedir_api(url: str, registro: dict) -> dict:
+    parametros = {k: v for k, v in registro.items() if k not in ("id", "miembros", "tipos_interes")}
+    parametros.setdefault("top_k", 10)
+    # tipos_interes es una lista: FastAPI la espera en el cuerpo, no en la query
+    cuerpo = {"family": {"miembros": registro["miembros"]}}
+    if "tipos_interes" in registro:
+        cuerpo["tipos_interes"] = registro["tipos_interes"]
+    respuesta = requests.post(f"{url}/api/family/recommend_destinations", params=parametros,
+                              json=cuerpo, timeout=60)
+    cuerpo = respuesta.json()
+    return cuerpo if respuesta.status_code == 200 else {"error": cuerpo.get("detail")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recomendaciones por lotes: rendimiento, reanudación y coincidencia")
+    parser.add_argument("--familias", type=int, default=2000)
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--muestra", type=int, default=200, help="Familias comparadas contra la API por HTTP")
+    args = parser.parse_args()
+
+    sys.path.insert(0, API_DIR)
+    fallos = 0
+    registros = list(familias_sinteticas(args.familias))
+    with tempfile.TemporaryDirectory(prefix="lotes_") as tmp:
+        entrada = os.path.join(tmp, "familias.ndjson")
+        with open(entrada, "w", encoding="utf-8") as f:
+            for r in registros:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+        print("=" * 72)
+        print(f"           RECOMENDACIONES POR LOTES ({args.familias} familias, {os.cpu_count()} núcleos)")
+        print("=" * 72)
+        resultados = {}
+        for procesos in sorted({1, args.procesos}):
+            salida = os.path.join(tmp, f"salida_{procesos}.ndjson")
+            segundos, _ = correr_lote(entrada, salida, procesos)
+            resultados[procesos] = leer_salida(salida)
+            print(f"{procesos:>2} procesos: {segundos:>6.1f}s  {args.familias / segundos:>6.0f} familias/s "
+                  f"(incluye preparar el modelo en cada proceso)")
+        referencia = resultados[1]
+        errores = sum("error" in r for r in referencia)
+        print(f"Familias con error (las que la API rechazaría): {errores}")
+        if any(resultados[p] != referencia for p in resultados):
+            print("FALLO: la salida cambia con el número de procesos")
+            fallos += 1
+
+        # Interrupción a la mitad y reanudación
+        salida = os.path.join(tmp, "interrumpida.ndjson")
+        correr_lote(entrada, salida, args.procesos, interrumpir_tras=max(4.0, segundos / 2))
+        parciales = sum(
+            sum(1 for _ in open(os.path.join(tmp, n), encoding="utf-8"))
+            for n in os.listdir(tmp) if n.startswith("interrumpida.ndjson.parte-")
+        )
+        segundos_resto, texto = correr_lote(entrada, salida, args.procesos)
+        retomada = leer_salida(salida)
+        posiciones = [r["posicion"] for r in retomada]
+        ok = posiciones == list(range(args.familias)) and retomada == referencia
+        fallos += not ok
+        print(f"\nInterrumpida con {parciales} familias escritas; retomada en {segundos_resto:.1f}s: "
+              f"{len(retomada)} líneas, {len(set(posiciones))} únicas {'OK' if ok else 'FALLO'}")
+
+        # Mismo lote en CSV
+        entrada_csv = os.path.join(tmp, "familias.csv")
+        escribir_csv(entrada_csv, registros[:args.muestra])
+        salida_csv = os.path.join(tmp, "salida_csv.ndjson")
+        correr_lote(entrada_csv, salida_csv, args.procesos)
+        ok = leer_salida(salida_csv) == referencia[:args.muestra]
+        fallos += not ok
+        print(f"CSV frente a NDJSON ({args.muestra} familias): {'OK' if ok else 'FALLO'}")
+
+    # Coincidencia con la API por HTTP
+    muestra = random.Random(1).sample(range(args.familias), min(args.muestra, args.familias))
+    with api_en_segundo_plano() as url:
+        inicio = time.perf_counter()
+        distintas = 0
+        for i in muestra:
+            esperado = {k: v for k, v in referencia[i].items() if k not in ("id", "posicion")}
+            distintas += pedir_api(url, registros[i]) != esperado
+        segundos_api = time.perf_counter() - inicio
+    fallos += distintas > 0
+    print(f"API por HTTP: {len(muestra) - distintas}/{len(muestra)} respuestas idénticas "
+          f"{'OK' if not distintas else 'FALLO'}; {len(muestra) / segundos_api:.0f} familias/s de una en una")
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
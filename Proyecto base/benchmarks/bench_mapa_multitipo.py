@@ -0,0 +1,88 @@
+'''
+BENCHMARK DE BÚSQUEDA MULTI-TIPO EN EL MAPA INTERACTIVO
+
+Mide la latencia de la interacción "Por tipo" de la página del mapa (clic en
+Buscar hasta terminar el rerun, con Streamlit AppTest y una API real) al
+pedir 1, 3 y 6 tipos a la vez:
+  • secuencial:  una petición por tipo, una tras otra (comportamiento anterior)
+  • concurrente: una petición por tipo en paralelo (APIClient.get_destinos_por_tipos)
+  • lote:        una sola petición a destinos_por_tipo con todos los `tipo`
+
+Con un solo núcleo la API no puede atender peticiones en paralelo, así que
+la variante concurrente solo gana cuando hay varios workers y CPUs.
+
+La caché del cliente se vacía antes de cada medición.
+
+Uso:
+    python benchmarks/bench_mapa_multitipo.py --repeticiones 5
+'''
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from comun import FRONTEND_DIR, api_en_segundo_plano
+
+TIPOS = ["playas", "museos", "parques", "restaurantes", "teatros", "iglesias"]
+
+
+def medir_pagina(tipos, estrategia, workers, repeticiones):
+    from streamlit.testing.v1 import AppTest
+    from utils.config import MAP_FETCH_CONFIG
+    from utils.api_client import response_cache
+
+    MAP_FETCH_CONFIG["estrategia"] = estrategia
+    MAP_FETCH_CONFIG["max_workers"] = workers
+    tiempos = []
+    for _ in range(repeticiones):
+        response_cache.invalidate()
+        at = AppTest.from_file(os.path.join(FRONTEND_DIR, "app.py"), default_timeout=120)
+        at.session_state["current_page"] = "mapa"
+        at.run()
+        at.radio(key="modo_mapa").set_value(" Por tipo").run()
+        at.multiselect[0].set_value(tipos)
+        boton = next(b for b in at.button if "Buscar" in str(b.label))
+        boton.click()
+
+        inicio = time.perf_counter()
+        at.run()
+        tiempos.append(time.perf_counter() - inicio)
+
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de la búsqueda multi-tipo del mapa")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--api-url", help="Usar una API ya levantada en lugar de arrancar una")
+    args = parser.parse_args()
+
+    def correr(url):
+        os.environ["API_BASE_URL"] = url
+        sys.path.insert(0, FRONTEND_DIR)
+
+        print("=" * 60)
+        print(f"   LATENCIA DE INTERACCIÓN: MAPA POR TIPO (mediana, {os.cpu_count()} CPU)")
+        print("=" * 60)
+        print(f"{'tipos':>6} {'secuencial':>12} {'concurrente':>12} {'lote':>12}")
+        for n in (1, 3, 6):
+            tipos = TIPOS[:n]
+            secuencial = medir_pagina(tipos, "concurrente", 1, args.repeticiones)
+            concurrente = medir_pagina(tipos, "concurrente", 6, args.repeticiones)
+            lote = medir_pagina(tipos, "lote", 1, args.repeticiones)
+            print(f"{n:>6} {secuencial * 1000:>10.1f}ms {concurrente * 1000:>10.1f}ms {lote * 1000:>10.1f}ms")
+
+    if args.api_url:
+        correr(args.api_url)
+    else:
+        # Varios workers para que las peticiones concurrentes no se serialicen en un solo proceso
+        with api_en_segundo_plano(workers=4) as url:
+            correr(url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+'''
+BENCHMARK DE RENDER DE MAPAS FOLIUM
+
+Construye el mapa de recomendaciones (`render_mapa_recomendaciones`) con 100,
+1.000 y 10.000 destinos tomados del catálogo y mide el tamaño del HTML
+generado y el tiempo de construcción + serialización en tres modos:
+  • marcadores: un folium.Marker con popup completo por destino (modo anterior)
+  • cluster:    FastMarkerCluster con popups armados en el navegador
+  • vista:      cluster limitado a la vista actual (una región alrededor de Guayaquil)
+
+Uso:
+    python benchmarks/bench_mapa_render.py
+'''
+
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from comun import DATA_PATH, FRONTEND_DIR
+
+# Límites aproximados de una vista de zoom ~10 sobre Guayaquil
+VISTA_GUAYAQUIL = {
+    "bounds": {"_southWest": {"lat": -2.45, "lng": -80.15}, "_northEast": {"lat": -1.95, "lng": -79.65}},
+    "center": {"lat": -2.2, "lng": -79.9},
+    "zoom": 10,
+}
+
+
+def generar_destinos(n: int, seed: int = 42) -> list:
+    df = pd.read_csv(DATA_PATH, sep="|")
+    rng = np.random.default_rng(seed)
+    muestra = df.sample(n=n, replace=n > len(df), random_state=seed).reset_index(drop=True)
+    return [
+        {
+            "nombre": r["nombre"],
+            "provincia": r["provincia"],
+            "canton": r["canton"],
+            "lat": float(r["lat"]) + rng.uniform(-0.01, 0.01),
+            "lon": float(r["lon"]) + rng.uniform(-0.01, 0.01),
+            "predicted_score": round(float(r["score"]), 3),
+            "distancia_km": None,
+        }
+        for _, r in muestra.iterrows()
+    ]
+
+
+def medir(destinos, umbral, vista, repeticiones):
+    from utils.config import MAP_RENDER_CONFIG
+    from pagina.recomendaciones_page import render_mapa_recomendaciones
+
+    MAP_RENDER_CONFIG["cluster_threshold"] = umbral
+    tiempos, html = [], ""
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        m = render_mapa_recomendaciones(destinos, vista)
+        html = m.get_root().render()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), len(html.encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamaño y tiempo de render de mapas folium")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.path.insert(0, FRONTEND_DIR)
+
+    modos = [
+        ("marcadores", 10**9, None),
+        ("cluster", 0, None),
+        ("vista", 0, VISTA_GUAYAQUIL),
+    ]
+
+    print("=" * 64)
+    print("           RENDER DE MAPAS FOLIUM (mediana)")
+    print("=" * 64)
+    print(f"{'puntos':>7} {'modo':<11} {'tiempo':>10} {'HTML':>12}")
+    for n in (100, 1_000, 10_000):
+        destinos = generar_destinos(n)
+        for nombre, umbral, vista in modos:
+            t, size = medir(destinos, umbral, vista, args.repeticiones)
+            print(f"{n:>7} {nombre:<11} {t * 1000:>8.1f}ms {size / 1024:>9.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
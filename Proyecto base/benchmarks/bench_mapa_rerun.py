@@ -0,0 +1,80 @@
+'''
+BENCHMARK DE RERUNS CON MAPAS EN CACHÉ
+
+Mide el tiempo de un rerun de Streamlit (AppTest) en las páginas de
+recomendaciones y del mapa interactivo cuando los datos del mapa no cambian,
+con la caché de mapas desactivada (se reconstruye y serializa en cada rerun)
+y activada (se reutiliza el mapa por huella). Se mide con 10 y 500 destinos,
+estos últimos con marcadores individuales y agrupados en cluster.
+
+Uso:
+    python benchmarks/bench_mapa_rerun.py --reruns 10
+'''
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from comun import FRONTEND_DIR
+from bench_mapa_render import generar_destinos
+
+MIEMBROS = [
+    {"nombre": "Ana", "rol": "👤 Otro", "preferencias": {"🌳 Recreación": {"playas": 5.0, "parques": 4.0, "miradores": 3.0}}},
+]
+
+
+def medir(pagina, destinos, cache, umbral, reruns):
+    from streamlit.testing.v1 import AppTest
+    from utils.config import MAP_CACHE_CONFIG, MAP_RENDER_CONFIG
+
+    MAP_CACHE_CONFIG["enabled"] = cache
+    MAP_RENDER_CONFIG["cluster_threshold"] = umbral
+
+    at = AppTest.from_file(os.path.join(FRONTEND_DIR, "app.py"), default_timeout=300)
+    at.session_state["family_members"] = MIEMBROS
+    at.session_state["current_page"] = pagina
+    if pagina == "recomendaciones":
+        at.session_state["recommendations"] = destinos
+    else:
+        at.session_state["recomendaciones_mapa"] = destinos
+    at.run()
+
+    tiempos = []
+    for _ in range(reruns):
+        inicio = time.perf_counter()
+        at.run()
+        tiempos.append(time.perf_counter() - inicio)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo por rerun con y sin caché de mapas")
+    parser.add_argument("--reruns", type=int, default=10)
+    args = parser.parse_args()
+
+    sys.path.insert(0, FRONTEND_DIR)
+
+    casos = [
+        (10, "marcadores", 10**9),
+        (500, "marcadores", 10**9),
+        (500, "cluster", 0),
+    ]
+
+    print("=" * 70)
+    print("           TIEMPO POR RERUN CON EL MAPA SIN CAMBIOS (mediana)")
+    print("=" * 70)
+    print(f"{'página':<16} {'puntos':>6} {'modo':<11} {'sin caché':>11} {'con caché':>11}")
+    for pagina in ("recomendaciones", "mapa"):
+        for n, modo, umbral in casos:
+            destinos = generar_destinos(n)
+            antes = medir(pagina, destinos, False, umbral, args.reruns)
+            despues = medir(pagina, destinos, True, umbral, args.reruns)
+            print(f"{pagina:<16} {n:>6} {modo:<11} {antes * 1000:>9.1f}ms {despues * 1000:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+'''
+BENCHMARK DEL MAPA POR VISTA (/destinos_en_vista)
+
+Construye el índice espacial (IndiceEspacial) sobre el catálogo real y sobre
+réplicas más grandes (cada copia desplazada unos cientos de metros de su
+original, para conservar la densidad de cada zona). Para vistas de 900 × 650
+px centradas en destinos al azar, en zoom 6, 8, 10, 12 y 14, mide:
+  • latencia del endpoint (sin HTTP, incluida la armada de la respuesta)
+  • tamaño del JSON devuelto y cantidad de elementos
+  • como referencia, un recorrido completo del catálogo por vista (máscara
+    de límites y agrupación con np.unique) y el tamaño del JSON de todo el
+    catálogo, que es lo que habría que traer sin el endpoint
+
+Antes de medir verifica en cada vista que el total coincide con el recorrido
+completo: los destinos dentro de los límites en modo destinos (y, si caben,
+que son los mismos) y los de las celdas que tocan la vista en modo agrupado.
+
+Uso:
+    python benchmarks/bench_mapa_vista.py --tamanos 4133,100000,1000000 --vistas 200
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from comun import API_DIR, entorno_api, percentil
+
+os.environ.update(entorno_api())
+sys.path.insert(0, API_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.core.spatial import _celdas, _rango_celdas  # noqa: E402
+from app.routes import family  # noqa: E402
+
+ZOOMS = [6, 8, 10, 12, 14]
+ANCHO_PX, ALTO_PX = 900, 650
+
+
+def replicar(df: pd.DataFrame, filas: int, seed: int = 0) -> pd.DataFrame:
+    if filas <= len(df):
+        return df.head(filas).reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    grande = df.iloc[np.resize(np.arange(len(df)), filas)].reset_index(drop=True)
+    ruido = rng.normal(0, 0.003, (filas, 2))
+    ruido[:len(df)] = 0
+    grande["lat"] = grande["lat"].to_numpy(dtype=float) + ruido[:, 0]
+    grande["lon"] = grande["lon"].to_numpy(dtype=float) + ruido[:, 1]
+    return grande
+
+
+def vistas(df: pd.DataFrame, zoom: int, n: int, rng) -> list:
+    """Límites de n vistas de ANCHO_PX × ALTO_PX centradas en destinos al azar"""
+    grados_px = 360 / 256 / 2 ** zoom
+    centros = rng.choice(len(df), n)
+    lat, lon = df["lat"].to_numpy(dtype=float)[centros], df["lon"].to_numpy(dtype=float)[centros]
+    return [
+        (la - ALTO_PX / 2 * grados_px, la + ALTO_PX / 2 * grados_px,
+         lo - ANCHO_PX / 2 * grados_px, lo + ANCHO_PX / 2 * grados_px)
+        for la, lo in zip(lat, lon)
+    ]
+
+
+def recorrido_completo(lat, lon, score, zoom: int, limites, zoom_detalle: int):
+    """Misma respuesta que el endpoint recorriendo todo el catálogo (referencia)"""
+    lat_min, lat_max, lon_min, lon_max = limites
+    if zoom >= zoom_detalle:
+        filas = np.flatnonzero((lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max))
+        return filas, len(filas)
+    iy, ix = _celdas(lat, lon, zoom)
+    iy0, iy1, ix0, ix1 = _rango_celdas(zoom, *limites)
+    dentro = (iy >= iy0) & (iy <= iy1) & (ix >= ix0) & (ix <= ix1)
+    celdas, cantidad = np.unique(iy[dentro] * 2 ** 30 + ix[dentro], return_counts=True)
+    return celdas, int(cantidad.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia y tamaño de respuesta del mapa por vista")
+    parser.add_argument("--tamanos", default="4133,100000,1000000")
+    parser.add_argument("--vistas", type=int, default=200)
+    args = parser.parse_args()
+
+    real = family.cargar_destinos().reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    fallos = 0
+
+    print("=" * 100)
+    print(f"           MAPA POR VISTA ({args.vistas} vistas de {ANCHO_PX}×{ALTO_PX} px por zoom, "
+          f"tope {family.MAPA_MAX_ELEMENTOS} elementos)")
+    print("=" * 100)
+    for filas in (int(t) for t in args.tamanos.split(",")):
+        df = replicar(real, filas)
+        family.destinos_en_memoria = df
+        mapa = family.indice_mapa()
+        indice = mapa["indice"]
+        stats = indice.stats()
+        lat, lon, score = indice.lat, indice.lon, indice.score
+        completo = len(json.dumps(
+            df[["nombre", "provincia", "canton", "lat", "lon", "score"]].to_dict("records"), default=str
+        ).encode("utf-8"))
+        print(f"\n{filas} destinos: índice de {stats['bytes'] / 1e6:.1f} MB en {stats['segundos_construccion']:.2f}s; "
+              f"catálogo completo en JSON: {completo / 1e6:.1f} MB")
+        print(f"{'zoom':>6} {'modo':<9} {'mediana':>9} {'p95':>8} {'recorrido':>10} {'elementos':>10} "
+              f"{'KB (p95)':>9} {'truncadas':>10}")
+
+        for zoom in ZOOMS:
+            tiempos, referencia, elementos, tamanos, truncadas = [], [], [], [], 0
+            for limites in vistas(df, zoom, args.vistas, rng):
+                inicio = time.perf_counter()
+                r = family.destinos_en_vista(*limites, zoom=zoom, limite=None)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+
+                inicio = time.perf_counter()
+                esperado, total = recorrido_completo(lat, lon, score, r.get("zoom_agrupacion", zoom),
+                                                     limites, indice.zoom_detalle)
+                referencia.append((time.perf_counter() - inicio) * 1000)
+
+                items = r["clusters"] if r["modo"] == "clusters" else r["destinos"]
+                fallos += r["total"] != total
+                if r["modo"] == "destinos" and not r["truncado"]:
+                    fallos += sorted(d["nombre"] for d in items) != sorted(mapa["nombre"][esperado])
+                elementos.append(len(items))
+                tamanos.append(len(json.dumps(r).encode("utf-8")))
+                truncadas += r["truncado"]
+
+            print(f"{zoom:>6} {r['modo']:<9} {percentil(tiempos, 50):>7.2f}ms {percentil(tiempos, 95):>6.2f}ms "
+                  f"{percentil(referencia, 50):>8.2f}ms {int(np.median(elementos)):>10} "
+                  f"{percentil(tamanos, 95) / 1e3:>9.1f} {truncadas:>10}")
+        del df, mapa, indice
+
+    print(f"\nVerificación (totales y destinos iguales al recorrido completo): {'OK' if not fallos else f'{fallos} FALLOS'}")
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+'''
+BENCHMARK DE MICRO-BATCHING EN ModelManager
+
+Lanza de 1 a 200 clientes concurrentes (hilos) que llaman sin pausa al
+modelo durante unos segundos, con el micro-batching desactivado y activado,
+en tres casos:
+  • predict_score: una fila por llamada (preferencias agregadas sueltas)
+  • 200 candidatos: predict_with_preferences sobre 200 destinos, como la
+    segunda etapa de recommend_destinations con candidatos=200
+  • catálogo: predict_with_preferences sobre todo el catálogo (4133 filas);
+    supera max_filas_bloque, así que se predice sin agrupar
+
+Informa el rendimiento (llamadas por segundo), la latencia p50/p99 y el
+tamaño medio de lote.
+
+Uso:
+    python benchmarks/bench_microbatching.py --segundos 3 --ventana-ms 0.5
+'''
+
+import argparse
+import sys
+import threading
+import time
+
+from comun import API_DIR, DATA_PATH, NEW_DATA_PATH, percentil
+
+sys.path.insert(0, API_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app.core.model_manager import ModelManager  # noqa: E402
+
+
+def correr(fn, clientes: int, segundos: float):
+    latencias = [[] for _ in range(clientes)]
+    fin = time.perf_counter() + segundos
+
+    def cliente(i):
+        rng = np.random.default_rng(i)
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            fn(rng)
+            latencias[i].append(time.perf_counter() - inicio)
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    total = time.perf_counter() - inicio
+    todas = [lat for lista in latencias for lat in lista]
+    return len(todas) / total, percentil(todas, 50), percentil(todas, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento y latencia con y sin micro-batching")
+    parser.add_argument("--segundos", type=float, default=3)
+    parser.add_argument("--ventana-ms", type=float, default=0.5)
+    parser.add_argument("--max-lote", type=int, default=64)
+    parser.add_argument("--clientes", default="1,10,50,200")
+    args = parser.parse_args()
+
+    mm = ModelManager(DATA_PATH, NEW_DATA_PATH)
+    mm.train_model()
+    catalogo = pd.read_csv(DATA_PATH, sep="|")
+    candidatos = catalogo.iloc[:200]
+    columnas = mm.feature_columns
+
+    def preferencias(rng):
+        elegidas = rng.choice(len(columnas), size=4, replace=False)
+        return {columnas[j]: float(rng.integers(1, 6)) for j in elegidas}
+
+    casos = {
+        "predict_score": lambda rng: mm.predict_score(preferencias(rng)),
+        "200 candidatos": lambda rng: mm.predict_with_preferences(candidatos, preferencias(rng)),
+        "catálogo": lambda rng: mm.predict_with_preferences(catalogo, preferencias(rng)),
+    }
+    lotero = None
+
+    print("=" * 80)
+    print(f"           MICRO-BATCHING (ventana {args.ventana_ms} ms, máx. {args.max_lote} por lote)")
+    print("=" * 80)
+    print(f"{'caso':<14} {'clientes':>8} {'batching':>9} {'llamadas/s':>11} {'p50':>10} {'p99':>10} {'lote medio':>11}")
+    for nombre, fn in casos.items():
+        for clientes in (int(c) for c in args.clientes.split(",")):
+            for activado in (False, True):
+                if activado:
+                    if lotero is None:
+                        mm.enable_batching(ventana_ms=args.ventana_ms, max_lote=args.max_lote)
+                        lotero = mm.batcher
+                    mm.batcher = lotero
+                    antes = lotero.stats()
+                else:
+                    mm.batcher = None
+                rendimiento, p50, p99 = correr(fn, clientes, args.segundos)
+                lote = "-"
+                if activado:
+                    despues = lotero.stats()
+                    lotes = despues["lotes"] - antes["lotes"]
+                    lote = f"{(despues['predicciones'] - antes['predicciones']) / max(lotes, 1):.1f}"
+                print(f"{nombre:<14} {clientes:>8} {'sí' if activado else 'no':>9} {rendimiento:>11.1f} "
+                      f"{p50 * 1000:>8.2f}ms {p99 * 1000:>8.2f}ms {lote:>11}")
+
+
+if __name__ == "__main__":
+    main()
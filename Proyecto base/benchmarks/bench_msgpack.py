@@ -0,0 +1,127 @@
+'''
+BENCHMARK DE MESSAGEPACK FRENTE A JSON
+
+Compara los dos formatos que negocian los endpoints de familia
+(Content-Type / Accept application/msgpack) sobre cargas reales:
+  • familias de 2 a 50 miembros (cuerpo de /recommend_destinations), en
+    forma dict y dispersa: codificar en el cliente y, en la API, decodificar
+    y validar con FamilyBase
+  • respuestas de recommend_destinations (top_k 10, 100 y 1000, con
+    estrategia para incluir el score de cada miembro) y una lista de 500
+    destinos de /destinos_en_vista: codificar en la API (como
+    RespuestaNegociada) y decodificar en el cliente
+Informa bytes y mediana de tiempos en microsegundos.
+
+Antes de medir verifica con TestClient, endpoint por endpoint, que la
+respuesta en MessagePack decodificada es igual a la JSON y que un cuerpo
+MessagePack produce la misma recomendación que el mismo cuerpo en JSON.
+
+Uso:
+    python benchmarks/bench_msgpack.py --numero 200
+'''
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from comun import API_DIR, entorno_api
+
+os.environ.update(entorno_api(COALESCE_ENABLED=0, MICROBATCH_ENABLED=0))
+sys.path.insert(0, API_DIR)
+
+import msgpack  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.schemas import FamilyBase  # noqa: E402
+from app.routes.family import destinos_en_vista, recommend_destinations  # noqa: E402
+from bench_payload_familia import generar_familia  # noqa: E402
+
+MSGPACK = "application/msgpack"
+
+
+def json_a_bytes(contenido) -> bytes:
+    """Igual que JSONResponse.render"""
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def tiempo_us(fn, numero: int) -> float:
+    return min(timeit.repeat(fn, number=numero, repeat=5)) / numero * 1e6
+
+
+def fila(nombre: str, contenido, decodificar_json, decodificar_msgpack, numero: int):
+    crudo_json, crudo_msgpack = json_a_bytes(contenido), msgpack.packb(contenido, use_bin_type=True)
+    cod_json = tiempo_us(lambda: json_a_bytes(contenido), numero)
+    cod_msgpack = tiempo_us(lambda: msgpack.packb(contenido, use_bin_type=True), numero)
+    dec_json = tiempo_us(lambda: decodificar_json(crudo_json), numero)
+    dec_msgpack = tiempo_us(lambda: decodificar_msgpack(crudo_msgpack), numero)
+    print(f"{nombre:<24} {len(crudo_json):>8} {len(crudo_msgpack):>8} {len(crudo_msgpack) / len(crudo_json):>6.0%} "
+          f"{cod_json:>9.1f} {cod_msgpack:>9.1f} {dec_json:>9.1f} {dec_msgpack:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamaño y tiempos de MessagePack frente a JSON")
+    parser.add_argument("--numero", type=int, default=200, help="Iteraciones por medición")
+    args = parser.parse_args()
+
+    familia = {"miembros": [
+        {"nombre": "Ana", "rol": "👤 Otro", "preferencias": {"playas": 5.0, "museos": 2.0}},
+        {"nombre": "Luis", "rol": "👦👧 Hijos (Adolescentes 13-17)", "preferencias": {"parques": 4.0}},
+    ]}
+    comun = dict(ubicacion_actual_lat=None, ubicacion_actual_lon=None, max_distancia_km=None,
+                 provincia_preferida=None, tipos_interes=None, candidatos=None, en_curso=1, limite=None)
+
+    # Verificación con la app completa (negociación de cuerpo y respuesta)
+    cliente = TestClient(app)
+    fallos = 0
+    casos = [
+        ("post", "/api/family/recommend_destinations?top_k=20&estrategia=minima_miseria", {"family": familia}),
+        ("post", "/api/family/explain_recommendations?top_k=5", {"family": familia}),
+        ("post", "/api/family/compatibility", familia),
+        ("get", "/api/family/destinos_por_tipo?tipo=playas&tipo=museos&top_k=50", None),
+        ("get", "/api/family/destinos_en_vista?lat_min=-5&lat_max=2&lon_min=-82&lon_max=-75&zoom=13", None),
+    ]
+    for metodo, ruta, cuerpo in casos:
+        if metodo == "post":
+            en_json = cliente.post(ruta, json=cuerpo)
+            en_msgpack = cliente.post(ruta, content=msgpack.packb(cuerpo),
+                                      headers={"Content-Type": MSGPACK, "Accept": MSGPACK})
+        else:
+            en_json = cliente.get(ruta)
+            en_msgpack = cliente.get(ruta, headers={"Accept": MSGPACK})
+        fallos += en_msgpack.headers["content-type"] != MSGPACK
+        fallos += en_json.status_code != 200 or msgpack.unpackb(en_msgpack.content) != en_json.json()
+    print(f"Verificación (mismas respuestas en JSON y MessagePack): {'OK' if not fallos else f'{fallos} FALLOS'}")
+
+    print("=" * 96)
+    print(f"           MESSAGEPACK FRENTE A JSON (bytes y µs, mejor de 5 × {args.numero})")
+    print("=" * 96)
+    print(f"{'carga':<24} {'JSON':>8} {'msgpack':>8} {'tamaño':>6} {'cod JSON':>9} {'cod mp':>9} "
+          f"{'dec JSON':>9} {'dec mp':>9}")
+
+    # Cuerpos de familia: el cliente codifica, la API decodifica y valida
+    for n in (2, 10, 50):
+        for formato in ("dict", "dispersa"):
+            fila(f"familia {n} ({formato})", generar_familia(n, formato, seed=n),
+                 lambda b: FamilyBase.model_validate(json.loads(b)),
+                 lambda b: FamilyBase.model_validate(msgpack.unpackb(b, raw=False)), args.numero)
+
+    # Respuestas: la API codifica, el cliente decodifica
+    modelo = FamilyBase.model_validate(familia)
+    for top_k in (10, 100, 1000):
+        respuesta = jsonable_encoder(recommend_destinations(
+            modelo, top_k=top_k, estrategia="minima_miseria", rapido=False, **comun))
+        fila(f"recomendación top {top_k}", respuesta, json.loads,
+             lambda b: msgpack.unpackb(b, raw=False), args.numero)
+    vista = jsonable_encoder(destinos_en_vista(-5, 2, -82, -75, zoom=13, limite=500))
+    fila(f"vista {len(vista['destinos'])} destinos", vista, json.loads,
+         lambda b: msgpack.unpackb(b, raw=False), args.numero)
+
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
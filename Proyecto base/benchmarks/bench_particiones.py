@@ -0,0 +1,146 @@
+'''
+BENCHMARK DEL CATÁLOGO PARTICIONADO POR PROVINCIA
+
+Construye el catálogo particionado (CatalogoParticionado) sobre el catálogo
+real y sobre réplicas más grandes (cada destino repetido con coordenadas y
+calificaciones levemente alteradas, conservando su provincia), con 1 a 23
+particiones, consultadas en el proceso de la API o en procesos trabajadores
+locales (uno por partición, hasta --max-procesos). Para cada caso mide la
+mediana de latencia de:
+  • recomendación nacional (todas las particiones)
+  • recomendación con provincia_preferida (una sola partición)
+  • destinos_por_tipo con dos tipos (todas las particiones)
+  • destino_mas_cercano (solo las provincias cuya caja puede ganar)
+y cuántas particiones consultó en promedio cada una. Con el catálogo real
+se incluye como referencia la ruta sin particionar, que lee el CSV en cada
+consulta.
+
+Antes verifica sobre el catálogo real que las respuestas particionadas
+coinciden con las del catálogo sin particionar (salvo empates exactos).
+La aceleración con procesos depende de los núcleos disponibles (se informan).
+
+Uso:
+    python benchmarks/bench_particiones.py --tamanos 4133,100000,400000 --particiones 1,2,4,8,23
+'''
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from comun import API_DIR, entorno_api
+
+os.environ.update(entorno_api())
+os.environ["COALESCE_ENABLED"] = "0"
+sys.path.insert(0, API_DIR)
+
+
+def replicar(df, filas: int, seed: int = 0):
+    """Catálogo de `filas` destinos a partir del real, con ruido leve"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    idx = np.resize(np.arange(len(df)), filas)
+    grande = df.iloc[idx].reset_index(drop=True)
+    if filas > len(df):
+        grande["lat"] = grande["lat"] + rng.normal(0, 0.01, filas)
+        grande["lon"] = grande["lon"] + rng.normal(0, 0.01, filas)
+        numericas = [c for c in grande.columns if c.startswith("Calif promedio")]
+        ruido = rng.normal(0, 0.2, (filas, len(numericas)))
+        grande[numericas] = (grande[numericas].to_numpy() + ruido).clip(0, 5)
+    return pd.DataFrame(grande)
+
+
+def mediana_ms(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado del catálogo particionado por provincia")
+    parser.add_argument("--tamanos", default="4133,100000,400000")
+    parser.add_argument("--particiones", default="1,2,4,8,23")
+    parser.add_argument("--max-procesos", type=int, default=8)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    import pandas as pd
+    from app.core.shards import CatalogoParticionado
+    from app.routes import family
+    from app.schemas import FamilyBase
+
+    real = pd.read_csv(family.DATA_PATH, sep="|")
+    real.columns = real.columns.str.strip()
+    real = family.limpiar_coordenadas(real)
+    familia = FamilyBase(miembros=[
+        {"nombre": "Madre", "rol": "👨‍👩‍👧‍👦 Padres", "indices": [1, 2, 16], "valores": [5.0, 5.0, 4.0]},
+        {"nombre": "Hijo", "rol": "👦👧 Hijos (Adolescentes 13-17)", "indices": [7, 15], "valores": [5.0, 3.0]},
+    ])
+
+    consultas = {
+        "rec. nacional": lambda: family.recommend_destinations(familia, top_k=10, en_curso=1, limite=None),
+        "rec. provincia": lambda: family.recommend_destinations(
+            familia, top_k=10, provincia_preferida="Pichincha", en_curso=1, limite=None
+        ),
+        "por tipo": lambda: family.destinos_por_tipo(tipo=["playas", "museos"], top_k=10, provincia=None),
+        "más cercano": lambda: family.obtener_destino_mas_cercano(
+            lat=-2.19, lon=-79.88, tipo="playas", min_score=0.0
+        ),
+    }
+
+    # Verificación: particionado frente al catálogo sin particionar
+    family.catalogo = None
+    esperadas = {nombre: fn() for nombre, fn in consultas.items()}
+    for n in (4, 23):
+        family.catalogo = CatalogoParticionado(real, family.model_manager, n)
+        for nombre, fn in consultas.items():
+            obtenida, esperada = fn(), esperadas[nombre]
+            if obtenida != esperada:
+                print(f"AVISO: {nombre} con {n} particiones difiere del catálogo sin particionar")
+        family.catalogo = None
+    print(f"Verificación sobre el catálogo real: {len(consultas)} consultas × 2 particionados")
+
+    llamadas = {"n": 0}
+
+    print("=" * 100)
+    print(f"           CATÁLOGO PARTICIONADO POR PROVINCIA ({os.cpu_count()} núcleos, mediana de "
+          f"{args.repeticiones})")
+    print("=" * 100)
+    print(f"{'destinos':>9} {'part.':>6} {'procesos':>9} " + " ".join(f"{c:>17}" for c in consultas))
+    for filas in (int(t) for t in args.tamanos.split(",")):
+        df = real if filas == len(real) else replicar(real, filas)
+        if df is real:
+            # Referencia: el catálogo sin particionar, leído del CSV en cada consulta
+            celdas = [f"{mediana_ms(fn, args.repeticiones):>8.1f}ms {'(CSV)':>6}" for fn in consultas.values()]
+            print(f"{filas:>9} {'-':>6} {'-':>9} " + " ".join(f"{c:>17}" for c in celdas))
+        for n in (int(p) for p in args.particiones.split(",")):
+            for procesos in ([0] if n == 1 else [0, min(n, args.max_procesos)]):
+                catalogo = CatalogoParticionado(df, family.model_manager, n, procesos=procesos)
+                consultar = catalogo._consultar
+
+                def contado(operacion, grupos, consultar=consultar):
+                    llamadas["n"] += len(grupos)
+                    return consultar(operacion, grupos)
+
+                catalogo._consultar = contado
+                family.catalogo = catalogo
+                celdas = []
+                for fn in consultas.values():
+                    fn()
+                    llamadas["n"] = 0
+                    ms = mediana_ms(fn, args.repeticiones)
+                    celdas.append(f"{ms:>8.1f}ms ({llamadas['n'] / args.repeticiones:>4.1f}p)")
+                print(f"{filas:>9} {catalogo.n_particiones:>6} {procesos:>9} "
+                      + " ".join(f"{c:>17}" for c in celdas))
+                family.catalogo = None
+                catalogo.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+'''
+BENCHMARK DEL PAYLOAD DE FAMILIA
+
+Compara las tres formas de enviar las preferencias de cada miembro:
+  • dict:     {"Calif promedio playas": 5, ...} (forma original)
+  • vector:   24 valores en el orden de RATING_COLUMNS (null = sin preferencia)
+  • dispersa: índices y valores
+para familias de 2 a 50 miembros. Mide el tamaño del JSON, el tiempo de
+parseo y validación (FamilyBase.model_validate_json) y el de agregación
+(bucle original por subcadenas frente a aggregate_preferences), y verifica
+que todas las formas producen la misma agregación.
+
+Uso:
+    python benchmarks/bench_payload_familia.py
+'''
+
+import argparse
+import json
+import random
+import sys
+import timeit
+
+from comun import API_DIR
+
+sys.path.insert(0, API_DIR)
+
+from app.schemas import FamilyBase  # noqa: E402
+from app.core.model_manager import RATING_COLUMNS  # noqa: E402
+from app.core.preferences import aggregate_preferences, normalizar_texto  # noqa: E402
+
+
+def agregar_original(miembros, feature_columns):
+    """Agregación tal como estaba en recommend_destinations (referencia)"""
+    aggregated_preferences, counts = {}, {}
+    for member in miembros:
+        for key, value in member.preferencias.items():
+            key_norm = normalizar_texto(key)
+            for col in feature_columns:
+                if key_norm in normalizar_texto(col):
+                    aggregated_preferences[col] = aggregated_preferences.get(col, 0.0) + value
+                    counts[col] = counts.get(col, 0) + 1
+    for col in aggregated_preferences:
+        aggregated_preferences[col] /= counts[col]
+    return aggregated_preferences
+
+
+def generar_familia(n: int, formato: str, seed: int) -> dict:
+    rng = random.Random(seed)
+    miembros = []
+    for i in range(n):
+        elegidas = sorted(rng.sample(range(len(RATING_COLUMNS)), rng.randint(3, 12)))
+        ratings = {j: float(rng.randint(1, 5)) for j in elegidas}
+        miembro = {"nombre": f"Miembro {i}", "rol": "👤 Otro"}
+        if formato == "dict":
+            miembro["preferencias"] = {RATING_COLUMNS[j]: v for j, v in ratings.items()}
+        elif formato == "vector":
+            miembro["vector"] = [ratings.get(j) for j in range(len(RATING_COLUMNS))]
+        else:
+            miembro["indices"] = list(ratings)
+            miembro["valores"] = list(ratings.values())
+        miembros.append(miembro)
+    return {"miembros": miembros}
+
+
+def tiempo_us(fn, numero: int) -> float:
+    return min(timeit.repeat(fn, number=numero, repeat=5)) / numero * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parseo y agregación del payload de familia")
+    parser.add_argument("--numero", type=int, default=200, help="Iteraciones por medición")
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("           PAYLOAD DE FAMILIA: TAMAÑO, PARSEO Y AGREGACIÓN")
+    print("=" * 78)
+    print(f"{'miembros':>8} {'formato':<9} {'bytes':>7} {'parseo':>10} {'agregación':>11} {'original':>10}")
+    for n in (2, 5, 10, 20, 50):
+        referencia = None
+        for formato in ("dict", "vector", "dispersa"):
+            raw = json.dumps(generar_familia(n, formato, seed=n), ensure_ascii=False).encode("utf-8")
+            familia = FamilyBase.model_validate_json(raw)
+
+            agregado = aggregate_preferences(familia.miembros, RATING_COLUMNS)
+            if referencia is None:
+                referencia = agregar_original(familia.miembros, RATING_COLUMNS)
+            assert agregado.keys() == referencia.keys()
+            assert all(abs(agregado[k] - referencia[k]) < 1e-9 for k in referencia)
+
+            parseo = tiempo_us(lambda: FamilyBase.model_validate_json(raw), args.numero)
+            agregacion = tiempo_us(lambda: aggregate_preferences(familia.miembros, RATING_COLUMNS), args.numero)
+            original = (
+                f"{tiempo_us(lambda: agregar_original(familia.miembros, RATING_COLUMNS), args.numero):>8.1f}us"
+                if formato == "dict" else f"{'-':>10}"
+            )
+            print(f"{n:>8} {formato:<9} {len(raw):>7} {parseo:>8.1f}us {agregacion:>9.1f}us {original}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+'''
+PRUEBA DE CARGA: CONTROL DE ADMISIÓN BAJO SOBRECARGA
+
+Genera carga de lazo abierto (las peticiones llegan a ritmo fijo, sin esperar
+a las anteriores) contra recommend_destinations, con familias distintas para
+que no se unan en un solo cálculo. Se prueba a un ritmo por debajo de la
+capacidad de la API y a varios por encima, con el control de admisión
+desactivado (ADMISION_ENABLED=0) y activado.
+
+Para cada caso informa las peticiones atendidas y rechazadas (503) y la
+latencia p50/p99 de las atendidas, medida desde el momento en que la
+petición debía salir, y las atendidas por segundo hasta que termina la
+última respuesta. Sin admisión la cola crece sin límite y la p99 se
+dispara; con admisión la p99 queda acotada y el exceso se rechaza rápido.
+
+Uso:
+    python benchmarks/bench_sobrecarga.py --duracion 10 --ritmos 5,20,40
+'''
+
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import api_en_segundo_plano, percentil
+
+
+def pedir(url: str, i: int, programada: float):
+    familia = {
+        "family": {
+            "miembros": [
+                {"nombre": f"Familia {i}", "rol": "👤 Otro", "indices": [i % 24, (i * 7) % 24], "valores": [5.0, 3.0]}
+            ]
+        }
+    }
+    req = urllib.request.Request(
+        url + "/api/family/recommend_destinations?top_k=10",
+        data=json.dumps(familia).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    espera = programada - time.perf_counter()
+    if espera > 0:
+        time.sleep(espera)
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            estado = resp.status
+    except urllib.error.HTTPError as e:
+        estado = e.code
+    return estado, time.perf_counter() - programada
+
+
+def carga(url: str, ritmo: float, duracion: float):
+    n = int(ritmo * duracion)
+    inicio = time.perf_counter() + 0.5
+    with ThreadPoolExecutor(max_workers=min(n, 400)) as pool:
+        resultados = list(pool.map(lambda i: pedir(url, i, inicio + i / ritmo), range(n)))
+    total = time.perf_counter() - inicio
+    atendidas = [lat for estado, lat in resultados if estado == 200]
+    rechazadas = [lat for estado, lat in resultados if estado == 503]
+    return atendidas, rechazadas, n, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia bajo sobrecarga con y sin control de admisión")
+    parser.add_argument("--duracion", type=float, default=10, help="Segundos de carga por caso")
+    parser.add_argument("--ritmos", default="5,20,40", help="Peticiones por segundo a probar")
+    args = parser.parse_args()
+    ritmos = [float(r) for r in args.ritmos.split(",")]
+
+    print("=" * 84)
+    print(f"           CARGA DE LAZO ABIERTO SOBRE recommend_destinations ({args.duracion:.0f} s por caso)")
+    print("=" * 84)
+    print(f"{'admisión':<9} {'ritmo':>7} {'atendidas':>10} {'503':>6} {'p50':>9} {'p99':>9} "
+          f"{'p99 503':>9} {'atendidas/s':>12}")
+    for activada in (False, True):
+        with api_en_segundo_plano(ADMISION_ENABLED=int(activada)) as url:
+            pedir(url, 0, time.perf_counter())
+            for ritmo in ritmos:
+                atendidas, rechazadas, n, total = carga(url, ritmo, args.duracion)
+                p99_rechazo = f"{percentil(rechazadas, 99) * 1000:>7.0f}ms" if rechazadas else f"{'-':>9}"
+                print(f"{'sí' if activada else 'no':<9} {ritmo:>5.0f}/s {len(atendidas):>6}/{n:<3} "
+                      f"{len(rechazadas):>6} {percentil(atendidas, 50) * 1000:>7.0f}ms "
+                      f"{percentil(atendidas, 99) * 1000:>7.0f}ms {p99_rechazo} "
+                      f"{len(atendidas) / total:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+'''
+Utilidades compartidas por los benchmarks: rutas del proyecto y una API
+levantada con uvicorn en un puerto libre mientras dura la medición.
+'''
+
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+API_DIR = os.path.join(BASE_DIR, "api")
+FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
+DATA_PATH = os.path.join(BASE_DIR, "data", "datos_sintetico.csv")
+NEW_DATA_PATH = os.path.join(BASE_DIR, "data", "nuevos_viajes.csv")
+
+
+def entorno_api(**extra) -> dict:
+    env = os.environ.copy()
+    env.setdefault("DATA_PATH", DATA_PATH)
+    env.setdefault("NEW_DATA_PATH", NEW_DATA_PATH)
+    env.update({k: str(v) for k, v in extra.items()})
+    return env
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def api_en_segundo_plano(workers: int = 1, timeout_s: float = 120, **env_extra):
+    """
+    Levanta `uvicorn app.main:app` en un puerto libre y devuelve su URL base.
+    El proceso se termina al salir del bloque.
+    """
+    port = puerto_libre()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=API_DIR, env=entorno_api(**env_extra),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        limite = time.monotonic() + timeout_s
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"La API terminó al arrancar:\n{proc.stderr.read().decode()[-2000:]}")
+            try:
+                urllib.request.urlopen(url + "/", timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > limite:
+                    raise RuntimeError("La API no respondió a tiempo")
+                time.sleep(0.2)
+        yield url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def percentil(valores, p: float) -> float:
+    """Percentil por rango más cercano (p entre 0 y 100)"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return float("nan")
+    idx = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[idx]
@@ -253,6 +253,8 @@ def render_sidebar():
         else:
             st.info("Sin miembros")
         
+        st.caption(f"Consultas servidas desde caché: {APIClient.cache_hit_ratio():.0%}")
+        
         st.markdown("---")
         
         if st.button("Limpiar Todo", use_container_width=True):
@@ -3,7 +3,12 @@ from utils.visualizations import (
     create_preference_radar, 
     create_family_comparison_chart,
     create_score_gauge,
+    create_contribution_chart,
+    create_similarity_heatmap,
+    create_conflict_chart,
 )
+from utils.api_client import APIClient, format_family_data
+from utils.helpers import clean_member_preferences
 
 def render_analisis_page():
     if not st.session_state.family_members:
@@ -23,62 +28,24 @@ def render_analisis_page():
         return
     
     try:
+        compat = get_compatibilidad()
+        resumen = compat["resumen"] if compat else {}
+
         # ========== RESUMEN GENERAL ==========
         st.markdown("<h3><i class='fas fa-chart-line' style='margin-right: 10px;'></i>Resumen General</h3>", unsafe_allow_html=True)
 
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            total_prefs = sum(
-                sum(len(cat) for cat in m.get('preferencias', {}).values())
-                for m in st.session_state.family_members
-            )
-
-            st.markdown(f"""
-                <div style="background: white; border-radius: 8px; padding: 15px; border: 1px solid #e0e0e0; margin-bottom: 10px; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
-                    <div style="font-size: 0.9rem; color: #666; margin-bottom: 5px;">
-                        <i class='fas fa-bullseye' style='margin-right: 8px; color: #4361EE;'></i>Preferencias totales
-                    </div>
-                    <div style="font-size: 1.8rem; font-weight: bold; color: #2c3e50;">
-                        {total_prefs}
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+            render_tarjeta('fa-bullseye', '#4361EE', 'Preferencias totales', resumen.get('preferencias_totales', '-'))
 
         with col2:
-            all_ratings = []
-            for member in st.session_state.family_members:
-                for category in member.get('preferencias', {}).values():
-                    all_ratings.extend(category.values())
-            avg_rating = sum(all_ratings) / len(all_ratings) if all_ratings else 0
-            
-            st.markdown(f"""
-                <div style="background: white; border-radius: 8px; padding: 15px; border: 1px solid #e0e0e0; margin-bottom: 10px; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
-                    <div style="font-size: 0.9rem; color: #666; margin-bottom: 5px;">
-                        <i class='fas fa-star' style='margin-right: 8px; color: #FFD700;'></i>Rating promedio
-                    </div>
-                    <div style="font-size: 1.8rem; font-weight: bold; color: #2c3e50;">
-                        {avg_rating:.1f}<span style="font-size: 1rem; color: #999;">/5</span>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+            promedio = resumen.get('calificacion_promedio')
+            valor = f'{promedio:.1f}<span style="font-size: 1rem; color: #999;">/5</span>' if promedio is not None else '-'
+            render_tarjeta('fa-star', '#FFD700', 'Rating promedio', valor)
 
         with col3:
-            unique_prefs = set()
-            for member in st.session_state.family_members:
-                for category, items in member.get('preferencias', {}).items():
-                    unique_prefs.update(items.keys())
-            
-            st.markdown(f"""
-                <div style="background: white; border-radius: 8px; padding: 15px; border: 1px solid #e0e0e0; margin-bottom: 10px; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
-                    <div style="font-size: 0.9rem; color: #666; margin-bottom: 5px;">
-                        <i class='fas fa-hashtag' style='margin-right: 8px; color: #764ba2;'></i>Actividades únicas
-                    </div>
-                    <div style="font-size: 1.8rem; font-weight: bold; color: #2c3e50;">
-                        {len(unique_prefs)}
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+            render_tarjeta('fa-hashtag', '#764ba2', 'Actividades únicas', resumen.get('intereses_unicos', '-'))
 
         st.markdown("---")
         
@@ -94,13 +61,18 @@ def render_analisis_page():
         
         with col_b:
             st.markdown("<h5><i class='fas fa-crosshairs' style='margin-right: 8px;'></i>Compatibilidad Familiar</h5>", unsafe_allow_html=True)
-            try:
-                compatibility_score = avg_rating * 20
-                fig_gauge = create_score_gauge(compatibility_score / 20)
+            if resumen.get('compatibilidad') is not None:
+                fig_gauge = create_score_gauge(resumen['compatibilidad'], max_score=100)
                 st.plotly_chart(fig_gauge, use_container_width=True, height=300)
-            except:
-                st.info("Agrega más datos para calcular compatibilidad")
-        
+                st.caption(f"Promedio de {resumen['pares_comparables']} pares de miembros con intereses en común")
+            else:
+                st.info("Se necesitan al menos dos miembros que califiquen los mismos intereses")
+
+        # ========== AFINIDAD Y CONFLICTOS ==========
+        if compat and len(compat["miembros"]) > 1:
+            st.markdown("---")
+            render_afinidad(compat)
+
         st.markdown("---")
         
         # ========== PERFILES INDIVIDUALES ==========
@@ -125,24 +97,116 @@ def render_analisis_page():
                     try:
                         fig_radar = create_preference_radar(member)
                         st.plotly_chart(fig_radar, use_container_width=True, height=300)
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            member_prefs = sum(
-                                len(cat) for cat in member.get('preferencias', {}).values()
-                            )
-                            st.metric("Preferencias", member_prefs)
-                        
-                        with col2:
-                            member_ratings = [
-                                rating for cat in member.get('preferencias', {}).values()
-                                for rating in cat.values()
-                            ]
-                            member_avg = sum(member_ratings) / len(member_ratings) if member_ratings else 0
-                            st.metric("Rating promedio", f"{member_avg:.1f}/5")
+
+                        if compat:
+                            perfil = compat["miembros"][idx]
+                            col1, col2, col3 = st.columns(3)
+                            with col1:
+                                st.metric("Preferencias", perfil["preferencias"])
+                            with col2:
+                                promedio = perfil["promedio"]
+                                st.metric("Rating promedio", f"{promedio:.1f}/5" if promedio is not None else "-")
+                            with col3:
+                                afinidad = perfil["afinidad"]
+                                st.metric("Afinidad", f"{afinidad:+.2f}" if afinidad is not None else "-")
                     except:
                         st.info("Este miembro no tiene preferencias configuradas")
+
+        # ========== POR QUÉ ESTOS DESTINOS ==========
+        if st.session_state.get('recommendations') and st.session_state.get('last_family_payload'):
+            st.markdown("---")
+            render_explicaciones()
     
     except Exception as e:
         st.error(f"Error al generar análisis: {str(e)}")
-        st.info("Intenta agregar más preferencias a los miembros de familia")
\ No newline at end of file
+        st.info("Intenta agregar más preferencias a los miembros de familia")
+
+
+def get_compatibilidad():
+    """Compatibilidad de la familia calculada por la API (None si no responde)"""
+    members = [
+        {**member, "preferencias": clean_member_preferences(member)}
+        for member in st.session_state.family_members
+    ]
+    try:
+        return APIClient.get_compatibility(format_family_data(members))
+    except Exception as e:
+        st.warning(f"No se pudo calcular la compatibilidad: {str(e)}")
+        return None
+
+
+def render_tarjeta(icono, color, titulo, valor):
+    st.markdown(f"""
+        <div style="background: white; border-radius: 8px; padding: 15px; border: 1px solid #e0e0e0; margin-bottom: 10px; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
+            <div style="font-size: 0.9rem; color: #666; margin-bottom: 5px;">
+                <i class='fas {icono}' style='margin-right: 8px; color: {color};'></i>{titulo}
+            </div>
+            <div style="font-size: 1.8rem; font-weight: bold; color: #2c3e50;">
+                {valor}
+            </div>
+        </div>
+    """, unsafe_allow_html=True)
+
+
+def render_afinidad(compat):
+    """Similitud entre cada par de miembros e intereses en conflicto"""
+    st.markdown("<h3><i class='fas fa-handshake' style='margin-right: 10px;'></i>Afinidad entre Miembros</h3>", unsafe_allow_html=True)
+
+    col_a, col_b = st.columns([3, 2])
+
+    with col_a:
+        medida = st.radio(
+            "Medida", ["coseno", "rangos"], horizontal=True, key="medida_afinidad",
+            format_func=lambda m: "Similitud coseno" if m == "coseno" else "Correlación de rangos"
+        )
+        nombres = [m["nombre"] for m in compat["miembros"]]
+        fig = create_similarity_heatmap(nombres, compat["similitud"][medida], compat["similitud"]["comunes"])
+        st.plotly_chart(fig, use_container_width=True, height=400)
+
+    with col_b:
+        conflictos = compat["conflictos"]
+        if conflictos:
+            st.plotly_chart(create_conflict_chart(conflictos), use_container_width=True, height=400)
+            mayor = conflictos[0]
+            if mayor["conflicto"] > 0:
+                st.caption(
+                    f"Mayor desacuerdo en **{mayor['interes'].replace('_', ' ')}**: "
+                    f"{mayor['quien_mas']} ({mayor['maximo']:.0f}) frente a {mayor['quien_menos']} ({mayor['minimo']:.0f})"
+                )
+        else:
+            st.info("Ningún interés fue calificado por más de un miembro")
+
+
+def render_explicaciones():
+    """Contribución de cada preferencia al score de los destinos recomendados"""
+    st.markdown("<h3><i class='fas fa-lightbulb' style='margin-right: 10px;'></i>¿Por qué estos destinos?</h3>", unsafe_allow_html=True)
+
+    busqueda = st.session_state.get('last_search', {"top_k": len(st.session_state.recommendations), "estrategia": None})
+    try:
+        result = APIClient.get_explanation(
+            st.session_state.last_family_payload, busqueda["top_k"], busqueda["estrategia"]
+        )
+    except Exception as e:
+        st.info(f"No se pudo obtener la explicación: {str(e)}")
+        return
+
+    explicados = [r for r in result.get("recommendations", []) if "explicacion" in r]
+    if not explicados:
+        st.info("No hay explicaciones para estas recomendaciones")
+        return
+
+    nombres = [f"{r['nombre']} ({r['provincia']})" for r in explicados]
+    idx = st.selectbox("Destino", range(len(explicados)), format_func=lambda i: nombres[i], key="destino_explicado")
+    explicacion = explicados[idx]["explicacion"]
+
+    if "por_miembro" in explicacion:
+        miembros = [m["nombre"] for m in st.session_state.last_family_payload["miembros"]]
+        i = st.selectbox("Miembro", range(len(miembros)), format_func=lambda i: miembros[i], key="miembro_explicado")
+        detalle = explicacion["por_miembro"][i]
+    else:
+        detalle = explicacion
+
+    fig = create_contribution_chart(
+        detalle["contribuciones"], detalle["base"], explicacion.get("preferencias_familia", [])
+    )
+    st.plotly_chart(fig, use_container_width=True, height=450)
@@ -142,6 +142,7 @@ def render_familia_page():
                         st.session_state.family_members.pop(idx)
                         # Limpiar recomendaciones si se elimina un miembro
                         st.session_state.recommendations = None
+                        invalidate_family_cache()
                         st.rerun()
             
             # Estadísticas
@@ -165,4 +166,4 @@ def render_familia_page():
                     st.rerun()
 
 # Importar funciones necesarias del app.py
-from utils.helpers import save_member_simple, render_stars
+from utils.helpers import save_member_simple, render_stars, invalidate_family_cache
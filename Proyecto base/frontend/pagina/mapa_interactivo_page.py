@@ -1,15 +1,28 @@
 import streamlit as st
 import pandas as pd
 import folium
-from streamlit_folium import st_folium
-import requests
 from folium import plugins
 from streamlit.components.v1 import html
 import time
 from folium.plugins import BeautifyIcon
 
+from utils.api_client import APIClient
+from utils.visualizations import (
+    use_cluster_mode,
+    get_map_view,
+    filter_to_viewport,
+    add_destination_cluster,
+    add_grid_clusters,
+    view_params,
+    map_fingerprint,
+    get_cached_map,
+    show_map,
+)
+
+MAP_KEY = "mapa_interactivo"
+EXPLORE_KEY = "mapa_explorar"
+MODO_EXPLORAR = " Explorar"
 
-API_URL = "http://localhost:8000"
 
 def get_location_component():
     """obtiene y retorna la ubicación GPS"""
@@ -127,6 +140,157 @@ def get_location_component():
     </html>
     """
 
+def build_mapa_interactivo(ubicacion, gps_obtenido, destino_cercano, recomendaciones, vista=None):
+    """Construye el mapa de la página a partir de su estado (ubicación, destino cercano y resultados)"""
+    gps_text = "GPS" if gps_obtenido else "Manual"
+
+    #  DETERMINAR CENTRO 
+    if destino_cercano:
+        center = [
+            destino_cercano["lat"],
+            destino_cercano["lon"]
+        ]
+        zoom = 11
+
+    elif recomendaciones:
+        avg_lat = sum(r['lat'] for r in recomendaciones) / len(recomendaciones)
+        avg_lon = sum(r['lon'] for r in recomendaciones) / len(recomendaciones)
+        center = [avg_lat, avg_lon]
+        zoom = 9
+
+    else:
+        center = [
+            ubicacion['lat'],
+            ubicacion['lon']
+        ]
+        zoom = 7
+
+    # Con muchos destinos se respeta la vista del usuario y solo se envían los visibles
+    cluster = use_cluster_mode(len(recomendaciones))
+    if vista and vista.get("center"):
+        center = [vista["center"]["lat"], vista["center"]["lng"]]
+        zoom = vista.get("zoom") or zoom
+
+    # CREAR MAPA 
+    m = folium.Map(location=center, zoom_start=zoom, tiles="OpenStreetMap")
+    plugins.Fullscreen().add_to(m)
+
+    # UBICACIÓN ACTUAL
+    icon_color = "green" if gps_obtenido else "blue"
+    icon_symbol = "satellite" if gps_obtenido else "home"
+
+    folium.Marker(
+        location=[
+            ubicacion["lat"],
+            ubicacion["lon"]
+        ],
+        popup=f"""
+        <b> {ubicacion['nombre']}</b><br>
+         {ubicacion['lat']:.6f}, {ubicacion['lon']:.6f}<br>
+         Ubicación {gps_text}
+        """,
+        tooltip="Tu ubicación actual",
+        icon=folium.Icon(color=icon_color, icon=icon_symbol, prefix="fa")
+    ).add_to(m)
+
+    # --------- DESTINO MÁS CERCANO ----------
+    if destino_cercano:
+        dest = destino_cercano
+
+        folium.Marker(
+            location=[dest["lat"], dest["lon"]],
+            popup=f"""
+            <b> {dest['nombre']}</b><br>
+             {dest['provincia']}<br>
+            ⭐ {dest['score']:.2f}/5<br>
+            📏 {dest['distancia_km']} km
+            """,
+            tooltip=f" {dest['nombre']}",
+            icon=folium.Icon(color="red", icon="star", prefix="fa")
+        ).add_to(m)
+
+    # --------- RECOMENDACIONES ----------
+    if cluster:
+        add_destination_cluster(m, filter_to_viewport(recomendaciones, vista))
+    else:
+        for idx, rec in enumerate(recomendaciones, 1):
+            score = rec.get("predicted_score") or rec.get("score_general", 0)
+
+            folium.Marker(
+                location=[rec["lat"], rec["lon"]],
+                popup=f"""
+                <b>#{idx} {rec['nombre']}</b><br>
+                 {rec['provincia']}<br>
+                 {score:.2f}/5
+                """,
+                tooltip=f"#{idx} {rec['nombre']}",
+                icon=folium.Icon(color="orange", icon="map-marker", prefix="fa")
+            ).add_to(m)
+
+    return m
+
+
+def build_mapa_explorar(ubicacion, gps_obtenido, datos, vista=None):
+    """Mapa del modo explorar: lo que devolvió /destinos_en_vista para la vista actual"""
+    if vista and vista.get("center"):
+        center, zoom = [vista["center"]["lat"], vista["center"]["lng"]], vista.get("zoom") or 7
+    else:
+        center, zoom = [ubicacion["lat"], ubicacion["lon"]], 7
+
+    m = folium.Map(location=center, zoom_start=zoom, tiles="OpenStreetMap")
+    plugins.Fullscreen().add_to(m)
+
+    folium.Marker(
+        location=[ubicacion["lat"], ubicacion["lon"]],
+        tooltip="Tu ubicación actual",
+        icon=folium.Icon(color="green" if gps_obtenido else "blue",
+                         icon="satellite" if gps_obtenido else "home", prefix="fa")
+    ).add_to(m)
+
+    if datos and datos["modo"] == "clusters":
+        add_grid_clusters(m, datos["clusters"])
+    elif datos:
+        add_destination_cluster(m, list(enumerate(datos["destinos"], 1)))
+    return m
+
+
+def render_mapa_explorar():
+    """
+    Modo explorar: en cada paneo o zoom st_folium devuelve la vista nueva y
+    se piden a la API solo los destinos (o celdas agrupadas) de esa vista.
+    """
+    ubicacion = st.session_state.ubicacion_actual_mapa
+    vista = get_map_view(EXPLORE_KEY)
+    params = view_params(vista, [ubicacion["lat"], ubicacion["lon"]], 7)
+
+    try:
+        datos = APIClient.get_destinos_en_vista(params)
+    except Exception as e:
+        st.error(f"{str(e)}")
+        datos = None
+    st.session_state.explorar_mapa = datos
+
+    inputs = (ubicacion, st.session_state.gps_obtenido, datos, vista)
+    mapa = get_cached_map(EXPLORE_KEY, map_fingerprint(*inputs), lambda: build_mapa_explorar(*inputs))
+    show_map(mapa, EXPLORE_KEY, height=650, track_view=True)
+
+
+def render_mapa_resultados():
+    """Mapa de los otros modos: ubicación, destino más cercano y resultados de la búsqueda"""
+    cluster = use_cluster_mode(len(st.session_state.recomendaciones_mapa))
+    vista = get_map_view(MAP_KEY) if cluster else None
+
+    inputs = (
+        st.session_state.ubicacion_actual_mapa,
+        st.session_state.gps_obtenido,
+        st.session_state.destino_cercano_mapa,
+        st.session_state.recomendaciones_mapa,
+        vista
+    )
+    mapa = get_cached_map(MAP_KEY, map_fingerprint(*inputs), lambda: build_mapa_interactivo(*inputs))
+    show_map(mapa, MAP_KEY, height=650, track_view=cluster)
+
+
 def render_mapa_google_page():
     """Mapa interactivo con GPS automático"""
 
@@ -188,81 +352,10 @@ def render_mapa_google_page():
     col_mapa, col_config = st.columns([2.5, 1])
 
     with col_mapa:
-        #  DETERMINAR CENTRO 
-        if st.session_state.destino_cercano_mapa:
-            center = [
-                st.session_state.destino_cercano_mapa["lat"],
-                st.session_state.destino_cercano_mapa["lon"]
-            ]
-            zoom = 11
-
-        elif st.session_state.recomendaciones_mapa:
-            avg_lat = sum(r['lat'] for r in st.session_state.recomendaciones_mapa) / len(st.session_state.recomendaciones_mapa)
-            avg_lon = sum(r['lon'] for r in st.session_state.recomendaciones_mapa) / len(st.session_state.recomendaciones_mapa)
-            center = [avg_lat, avg_lon]
-            zoom = 9
-
+        if st.session_state.get("modo_mapa") == MODO_EXPLORAR:
+            render_mapa_explorar()
         else:
-            center = [
-                st.session_state.ubicacion_actual_mapa['lat'],
-                st.session_state.ubicacion_actual_mapa['lon']
-            ]
-            zoom = 7
-
-        # CREAR MAPA 
-        m = folium.Map(location=center, zoom_start=zoom, tiles="OpenStreetMap")
-        plugins.Fullscreen().add_to(m)
-
-        # UBICACIÓN ACTUAL
-        icon_color = "green" if st.session_state.gps_obtenido else "blue"
-        icon_symbol = "satellite" if st.session_state.gps_obtenido else "home"
-        
-        folium.Marker(
-            location=[
-                st.session_state.ubicacion_actual_mapa["lat"],
-                st.session_state.ubicacion_actual_mapa["lon"]
-            ],
-            popup=f"""
-            <b> {st.session_state.ubicacion_actual_mapa['nombre']}</b><br>
-             {st.session_state.ubicacion_actual_mapa['lat']:.6f}, {st.session_state.ubicacion_actual_mapa['lon']:.6f}<br>
-             Ubicación {gps_text}
-            """,
-            tooltip="Tu ubicación actual",
-            icon=folium.Icon(color=icon_color, icon=icon_symbol, prefix="fa")
-        ).add_to(m)
-
-        # --------- DESTINO MÁS CERCANO ----------
-        if st.session_state.destino_cercano_mapa:
-            dest = st.session_state.destino_cercano_mapa
-
-            folium.Marker(
-                location=[dest["lat"], dest["lon"]],
-                popup=f"""
-                <b> {dest['nombre']}</b><br>
-                 {dest['provincia']}<br>
-                ⭐ {dest['score']:.2f}/5<br>
-                📏 {dest['distancia_km']} km
-                """,
-                tooltip=f" {dest['nombre']}",
-                icon=folium.Icon(color="red", icon="star", prefix="fa")
-            ).add_to(m)
-
-        # --------- RECOMENDACIONES ----------
-        for idx, rec in enumerate(st.session_state.recomendaciones_mapa, 1):
-            score = rec.get("predicted_score") or rec.get("score_general", 0)
-
-            folium.Marker(
-                location=[rec["lat"], rec["lon"]],
-                popup=f"""
-                <b>#{idx} {rec['nombre']}</b><br>
-                 {rec['provincia']}<br>
-                 {score:.2f}/5
-                """,
-                tooltip=f"#{idx} {rec['nombre']}",
-                icon=folium.Icon(color="orange", icon="map-marker", prefix="fa")
-            ).add_to(m)
-
-        st_folium(m, height=650, use_container_width=True)
+            render_mapa_resultados()
 
     # ================= PANEL DERECHO: CONFIGURACIÓN =================
     with col_config:
@@ -270,7 +363,7 @@ def render_mapa_google_page():
         
         modo = st.radio(
             "Modo de búsqueda:",
-            [" Mi ubicación", " Por tipo", " Más cercano"],
+            [" Mi ubicación", " Por tipo", " Por nombre", " Más cercano", MODO_EXPLORAR],
             key="modo_mapa"
         )
 
@@ -353,14 +446,15 @@ def render_mapa_google_page():
         elif modo == " Por tipo":
             st.markdown("**Buscar por tipo**")
 
-            tipo_destino = st.selectbox(
-                "Tipo de destino",
+            tipos_destino = st.multiselect(
+                "Tipos de destino",
                 [
                     "playas", "museos", "parques", "restaurantes",
                     "hoteles", "centros_comerciales",
                     "teatros", "iglesias", "zoologicos",
                     "bares_pubs", "monumentos"
-                ]
+                ],
+                default=["playas"]
             )
 
             provincia = st.selectbox(
@@ -370,24 +464,54 @@ def render_mapa_google_page():
 
             cantidad = st.slider("Cantidad", 5, 30, 10)
 
-            if st.button("🔍 Buscar", type="primary", use_container_width=True):
+            if st.button("🔍 Buscar", type="primary", use_container_width=True, disabled=not tipos_destino):
                 try:
-                    params = {"tipo": tipo_destino, "top_k": cantidad}
+                    params = {"top_k": cantidad}
                     if provincia != "Todas":
                         params["provincia"] = provincia
 
                     with st.spinner("Buscando..."):
-                        r = requests.get(
-                            f"{API_URL}/api/family/destinos_por_tipo",
-                            params=params,
-                            timeout=30
-                        )
-
-                    if r.status_code == 200:
-                        st.session_state.recomendaciones_mapa = r.json()["resultados"]
-                        st.success(f"{len(st.session_state.recomendaciones_mapa)} destinos encontrados")
+                        data = APIClient.get_destinos_por_tipos(tipos_destino, params)
+
+                    st.session_state.recomendaciones_mapa = data["resultados"]
+                    st.session_state.pop(f"{MAP_KEY}_vista", None)
+                    st.success(f"{len(st.session_state.recomendaciones_mapa)} destinos encontrados")
+                except Exception as e:
+                    st.error(f"{str(e)}")
+
+        # POR NOMBRE
+        elif modo == " Por nombre":
+            st.markdown("**Buscar por nombre**")
+
+            consulta = st.text_input(
+                "Nombre, cantón o descripción",
+                placeholder="ej. cascada molino, museo cuenca",
+                key="consulta_mapa"
+            )
+
+            provincia = st.selectbox(
+                "Provincia",
+                ["Todas", "SANTA ELENA", "PICHINCHA", "GUAYAS", "MANABÍ", "AZUAY"],
+                key="provincia_nombre_mapa"
+            )
+
+            cantidad = st.slider("Cantidad", 5, 30, 10, key="cantidad_nombre_mapa")
+
+            if st.button("🔍 Buscar", type="primary", use_container_width=True, disabled=not consulta.strip()):
+                try:
+                    params = {"q": consulta, "top_k": cantidad}
+                    if provincia != "Todas":
+                        params["provincia"] = provincia
+
+                    with st.spinner("Buscando..."):
+                        data = APIClient.buscar_destinos(params)
+
+                    st.session_state.recomendaciones_mapa = data["resultados"]
+                    st.session_state.pop(f"{MAP_KEY}_vista", None)
+                    if data["resultados"]:
+                        st.success(f"{data['total']} destinos encontrados")
                     else:
-                        st.error("Error en el API")
+                        st.warning("Ningún destino coincide con la búsqueda")
                 except Exception as e:
                     st.error(f"{str(e)}")
 
@@ -413,26 +537,38 @@ def render_mapa_google_page():
                         params["tipo"] = tipo
 
                     with st.spinner("Buscando..."):
-                        r = requests.get(
-                            f"{API_URL}/api/family/destino_mas_cercano",
-                            params=params,
-                            timeout=30
-                        )
-
-                    if r.status_code == 200:
-                        st.session_state.destino_cercano_mapa = r.json()
-                        st.success("Destino encontrado")
-                    else:
-                        st.error("Error en el API")
+                        st.session_state.destino_cercano_mapa = APIClient.get_destino_mas_cercano(params)
+
+                    st.success("Destino encontrado")
                 except Exception as e:
                     st.error(f"{str(e)}")
 
+        # EXPLORAR
+        elif modo == MODO_EXPLORAR:
+            st.markdown("**Explorar el mapa**")
+            st.caption(
+                "Mueve o acerca el mapa para ver los destinos de la zona. "
+                "Con poco zoom se agrupan por área (tamaño = cantidad, color = score medio)."
+            )
+
         # ESTADÍSTICAS 
         st.markdown("---")
         st.markdown("###  Estadísticas")
 
+        #  VISTA DEL MODO EXPLORAR
+        if modo == MODO_EXPLORAR:
+            datos = st.session_state.get("explorar_mapa")
+            if datos:
+                st.metric("Destinos en la vista", datos["total"])
+                if datos["modo"] == "clusters":
+                    st.metric("Zonas", len(datos["clusters"]))
+                elif datos["truncado"]:
+                    st.caption(f"Se muestran los {len(datos['destinos'])} de mejor score")
+            else:
+                st.info("Sin datos para esta vista.")
+
         #  DESTINO MÁS CERCANO 
-        if st.session_state.destino_cercano_mapa:
+        elif st.session_state.destino_cercano_mapa:
             dest = st.session_state.destino_cercano_mapa
 
             st.metric("Destino", dest["nombre"])
@@ -468,6 +604,7 @@ def render_mapa_google_page():
         if st.button(" Limpiar resultados", use_container_width=True):
             st.session_state.recomendaciones_mapa = []
             st.session_state.destino_cercano_mapa = None
+            st.session_state.pop(f"{MAP_KEY}_vista", None)
             st.rerun()
 
 
@@ -484,6 +621,8 @@ def render_mapa_google_page():
             cols_mostrar.append('nombre')
         if 'provincia' in df.columns:
             cols_mostrar.append('provincia')
+        if 'tipo' in df.columns:
+            cols_mostrar.append('tipo')
         if 'predicted_score' in df.columns:
             cols_mostrar.append('predicted_score')
         elif 'score_general' in df.columns:
@@ -1,13 +1,24 @@
 import streamlit as st
 import folium
-from streamlit_folium import st_folium
 from folium import plugins
 
 from utils.api_client import APIClient, format_family_data
 from utils.helpers import clean_member_preferences
+from utils.config import CONSENSUS_STRATEGIES
+from utils.visualizations import (
+    use_cluster_mode,
+    get_map_view,
+    filter_to_viewport,
+    add_destination_cluster,
+    map_fingerprint,
+    get_cached_map,
+    show_map,
+)
 
+MAP_KEY = "mapa_recomendaciones"
 
-def search_destinations_simple(top_k):
+
+def search_destinations_simple(top_k, estrategia=None):
     try:
         clean_members = []
 
@@ -20,11 +31,15 @@ def search_destinations_simple(top_k):
 
         st.session_state.family_members = clean_members
         family_data = format_family_data(clean_members)
+        st.session_state.last_family_payload = family_data
+        st.session_state.last_search = {"top_k": top_k, "estrategia": estrategia}
 
-        result = APIClient.get_recommendations(family_data, top_k)
+        result = APIClient.get_recommendations(family_data, top_k, estrategia)
 
         if result and "recommendations" in result:
             st.session_state.recommendations = result["recommendations"]
+            # La vista guardada del mapa corresponde a los resultados anteriores
+            st.session_state.pop(f"{MAP_KEY}_vista", None)
             return True
 
     except Exception as e:
@@ -36,21 +51,39 @@ def search_destinations_simple(top_k):
 
 # MAPA DE RECOMENDACIONES
 
-def render_mapa_recomendaciones(recommendations):
+def render_mapa_recomendaciones(recommendations, vista=None):
+    """
+    Construye el mapa de recomendaciones. Con muchos destinos se agrupan en
+    clusters con popups diferidos y solo se incluyen los que caen en la
+    vista actual (centro, zoom y límites devueltos por st_folium).
+    """
     if not recommendations:
         return None
 
-    avg_lat = sum(r["lat"] for r in recommendations) / len(recommendations)
-    avg_lon = sum(r["lon"] for r in recommendations) / len(recommendations)
+    cluster = use_cluster_mode(len(recommendations))
+
+    if cluster and vista and vista.get("center"):
+        center = [vista["center"]["lat"], vista["center"]["lng"]]
+        zoom = vista.get("zoom") or 9
+    else:
+        center = [
+            sum(r["lat"] for r in recommendations) / len(recommendations),
+            sum(r["lon"] for r in recommendations) / len(recommendations),
+        ]
+        zoom = 9
 
     m = folium.Map(
-        location=[avg_lat, avg_lon],
-        zoom_start=9,
+        location=center,
+        zoom_start=zoom,
         tiles="OpenStreetMap"
     )
 
     plugins.Fullscreen().add_to(m)
 
+    if cluster:
+        add_destination_cluster(m, filter_to_viewport(recommendations, vista))
+        return m
+
     for idx, rec in enumerate(recommendations, 1):
         score = rec.get("predicted_score", 0)
         distancia = rec.get("distancia_km")
@@ -185,12 +218,18 @@ def render_recomendaciones_page():
             format_func=lambda x: f"{x} destinos",
             help="Selecciona cuántos destinos quieres ver"
         )
+        estrategia_label = st.selectbox(
+            "Cómo decidir en familia",
+            list(CONSENSUS_STRATEGIES),
+            help="Promedio de preferencias combina los gustos antes de puntuar; "
+                 "las demás opciones puntúan cada destino para cada miembro y luego combinan"
+        )
     
     with col3:
         st.markdown("<div style='height: 28px'></div>", unsafe_allow_html=True)
         if st.button('Buscar Destinos', type="primary", use_container_width=True):
             with st.spinner('Analizando preferencias familiares...'):
-                if search_destinations_simple(top_k):
+                if search_destinations_simple(top_k, CONSENSUS_STRATEGIES[estrategia_label]):
                     st.markdown(f'''
                         <div class="success-message">
                             <i class="fas fa-check-circle" style="color: #4CAF50;"></i>
@@ -243,6 +282,13 @@ def render_recomendaciones_page():
                     stars_html += '<i class="fas fa-star-half-alt" style="color: #FFD700; font-size: 0.9rem;"></i>'
                 stars_html += '<i class="far fa-star" style="color: #FFD700; font-size: 0.9rem;"></i>' * stars_empty
                 
+                # Score de cada miembro (solo con estrategias de consenso)
+                miembros_html = ""
+                if dest.get('scores_miembros'):
+                    nombres = [m["nombre"] for m in st.session_state.last_family_payload["miembros"]]
+                    detalle = " · ".join(f"{n} {v:.1f}" for n, v in zip(nombres, dest['scores_miembros']))
+                    miembros_html = f'<div style="margin-top: 6px; font-size: 0.75rem; opacity: 0.9;"><i class="fas fa-users"></i> {detalle}</div>'
+
                 # Tarjeta 
                 card_html = f'''
                 <div style="
@@ -269,7 +315,7 @@ def render_recomendaciones_page():
                             </div>
                             <div style="margin-top: 8px;">
                                 {stars_html}
-                            </div>
+                            </div>{miembros_html}
                         </div>
                         <div style="
                             background: rgba(255,255,255,0.2); 
@@ -303,10 +349,17 @@ def render_recomendaciones_page():
                 </p>
             ''', unsafe_allow_html=True)
             
-            # Renderizar mapa
-            mapa = render_mapa_recomendaciones(st.session_state.recommendations)
+            # Renderizar mapa (se reutiliza mientras no cambien sus datos)
+            recs = st.session_state.recommendations
+            cluster = use_cluster_mode(len(recs))
+            vista = get_map_view(MAP_KEY) if cluster else None
+            mapa = get_cached_map(
+                MAP_KEY,
+                map_fingerprint(recs, vista),
+                lambda: render_mapa_recomendaciones(recs, vista)
+            )
             if mapa:
-                st_folium(mapa, height=500, use_container_width=True)
+                show_map(mapa, MAP_KEY, height=500, track_view=cluster)
     
     else:
         # Estado cuando no hay recomendaciones
@@ -1,31 +1,403 @@
-import requests
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 from typing import List, Dict, Optional
-from utils.config import ENDPOINTS
+from utils.config import (
+    ENDPOINTS,
+    API_CACHE_CONFIG,
+    API_VALIDATOR_CACHE_CONFIG,
+    MAP_FETCH_CONFIG,
+    PREFERENCE_ORDER,
+    FAMILY_PAYLOAD_FORMAT,
+)
+from utils.http_session import MSGPACK, WIRE_MSGPACK, get_session
+
+if WIRE_MSGPACK:
+    import msgpack
+
+
+class ResponseCache:
+    """
+    Caché LRU con TTL para respuestas de la API.
+
+    Vive a nivel de módulo, así que la comparten todas las sesiones del
+    proceso de Streamlit. Cada entrada guarda el hash de la familia que la
+    produjo para poder invalidarla cuando cambian los miembros y la versión
+    del modelo que la calculó: solo se usa mientras coincide con la última
+    que reportó la API (la caché completa se vacía al cambiar).
+
+    Un acierto no consulta la API, así que un modelo nuevo se nota en la
+    siguiente respuesta de cualquier endpoint; si todas las peticiones son
+    aciertos, una entrada del modelo anterior puede servirse hasta su TTL.
+    """
+
+    def __init__(self, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.model_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint: str, family_data: Optional[Dict] = None, params: Optional[Dict] = None) -> str:
+        raw = json.dumps(
+            {"endpoint": endpoint, "family": family_data, "params": params},
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def family_hash(family_data: Optional[Dict]) -> Optional[str]:
+        if family_data is None:
+            return None
+        raw = json.dumps(family_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_s or entry[3] != self.model_version:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def set(self, key: str, value, family: Optional[str] = None, model_version: Optional[str] = None):
+        """
+        Guarda una respuesta con la versión del modelo que la calculó (su
+        cabecera X-Model-Version; por defecto, la última vista)
+        """
+        with self._lock:
+            version = model_version or self.model_version
+            self._entries[key] = (time.monotonic(), family, copy.deepcopy(value), version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, family: Optional[str] = None):
+        """Elimina las entradas de una familia, o todas si no se indica ninguna"""
+        with self._lock:
+            if family is None:
+                self._entries.clear()
+                return
+            for key in [k for k, e in self._entries.items() if e[1] == family]:
+                del self._entries[key]
+
+    def observe_model_version(self, version: Optional[str]):
+        """Vacía la caché si la API reporta un modelo distinto al último visto"""
+        if not version:
+            return
+        with self._lock:
+            if self.model_version is not None and version != self.model_version:
+                self._entries.clear()
+            self.model_version = version
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+response_cache = ResponseCache(**API_CACHE_CONFIG)
+
+
+def max_age(cache_control: Optional[str]) -> Optional[float]:
+    """
+    Segundos que una respuesta se puede usar sin revalidar según su
+    Cache-Control: None si no se debe guardar (no-store), 0 si hay que
+    revalidar siempre (no-cache o sin max-age).
+    """
+    directivas = [d.strip().lower() for d in (cache_control or "").split(",")]
+    if "no-store" in directivas:
+        return None
+    if "no-cache" in directivas:
+        return 0.0
+    for d in directivas:
+        if d.startswith("max-age="):
+            try:
+                return max(0.0, float(d.split("=", 1)[1]))
+            except ValueError:
+                return 0.0
+    return 0.0
+
+
+class ValidatorCache:
+    """
+    Respuestas con su ETag para los endpoints que la API marca con ETag y
+    Cache-Control. Mientras no pasa su max-age se usan sin ir a la red;
+    después se revalidan con If-None-Match y, si la API responde 304, se
+    vuelve a usar el cuerpo guardado sin descargarlo. Como el ETag incluye
+    la versión del catálogo y del modelo, las entradas no se vacían al
+    cambiar el modelo: la revalidación lo detecta.
+    """
+
+    def __init__(self, enabled: bool, max_entries: int):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+
+    def get(self, key: str):
+        """(etag, cuerpo, sigue_fresca) de la entrada, o None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            etag, expires, body = entry
+            return etag, copy.deepcopy(body), time.monotonic() < expires
+
+    def set(self, key: str, etag: str, body, cache_control: Optional[str]):
+        segundos = max_age(cache_control)
+        if not self.enabled or not etag or segundos is None:
+            return
+        with self._lock:
+            self._entries[key] = (etag, time.monotonic() + segundos, copy.deepcopy(body))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key: str, cache_control: Optional[str]):
+        """Tras un 304: la entrada vuelve a estar fresca por otro max-age"""
+        segundos = max_age(cache_control)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if segundos is None:
+                del self._entries[key]
+            else:
+                self._entries[key] = (entry[0], time.monotonic() + segundos, entry[2])
+
+    def stats(self) -> Dict:
+        return {
+            "entradas": len(self._entries),
+            "frescas": self.fresh_hits,
+            "revalidadas": self.revalidated,
+            "descargadas": self.downloads,
+        }
+
+
+validator_cache = ValidatorCache(**API_VALIDATOR_CACHE_CONFIG)
+
+PREFERENCE_INDEX = {item: i for i, item in enumerate(PREFERENCE_ORDER)}
+
 
 class APIClient:
     """Cliente para interactuar con la API de Family Harmony"""
+
+    @staticmethod
+    def _parse(response):
+        response_cache.observe_model_version(response.headers.get("X-Model-Version"))
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Error HTTP {response.status_code}: {response.text}"
+            )
+
+        if response.headers.get("Content-Type", "").startswith(MSGPACK):
+            return msgpack.unpackb(response.content, raw=False)
+        return response.json()
+
+    @staticmethod
+    def _body(payload) -> Dict:
+        """Argumentos de requests para enviar el cuerpo en el formato configurado (API_WIRE_FORMAT)"""
+        if WIRE_MSGPACK:
+            return {"data": msgpack.packb(payload, use_bin_type=True), "headers": {"Content-Type": MSGPACK}}
+        return {"json": payload}
+
+    @staticmethod
+    def _get_validated(endpoint: str, params: Dict) -> Dict:
+        """
+        GET de un endpoint con ETag: usa la copia guardada mientras está
+        fresca y, si no, la revalida con If-None-Match (304 = sin cambios).
+        Si la API no envía ETag (ETAGS_ENABLED=0) se usa la caché con TTL.
+        """
+        key = ResponseCache.make_key(endpoint, params=params)
+        stored = validator_cache.get(key)
+        if stored is not None and stored[2]:
+            validator_cache.fresh_hits += 1
+            return stored[1]
+        if stored is None:
+            cached = response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        headers = {"If-None-Match": stored[0]} if stored is not None else {}
+        response = get_session().get(endpoint, ENDPOINTS[endpoint], params=params, headers=headers)
+
+        if response.status_code == 304 and stored is not None:
+            response_cache.observe_model_version(response.headers.get("X-Model-Version"))
+            validator_cache.refresh(key, response.headers.get("Cache-Control"))
+            validator_cache.revalidated += 1
+            return stored[1]
+
+        result = APIClient._parse(response)
+        if response.headers.get("ETag"):
+            validator_cache.set(key, response.headers["ETag"], result, response.headers.get("Cache-Control"))
+            validator_cache.downloads += 1
+        else:
+            response_cache.set(key, result, model_version=response.headers.get("X-Model-Version"))
+        return result
     
     @staticmethod
-    def get_recommendations(family_data, top_k):
+    def get_recommendations(family_data, top_k, estrategia=None):
+        params = {"top_k": top_k}
+        if estrategia:
+            params["estrategia"] = estrategia
+
+        key = ResponseCache.make_key("recommend", family_data, params)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
         payload = {
             "family": family_data,
             "top_k": top_k
         }
 
-        response = requests.post(
+        response = get_session().post(
+            "recommend",
             ENDPOINTS["recommend"],
-            params={"top_k": top_k},
-            json=payload,
-            timeout=30
+            params=params,
+            **APIClient._body(payload)
         )
 
-        if response.status_code != 200:
-            raise Exception(
-                f"Error HTTP {response.status_code}: {response.text}"
-            )
+        result = APIClient._parse(response)
+        response_cache.set(key, result, family=ResponseCache.family_hash(family_data),
+                           model_version=response.headers.get("X-Model-Version"))
+        return result
 
-        return response.json()
+    @staticmethod
+    def get_explanation(family_data, top_k, estrategia=None):
+        """Recomendaciones con la contribución de cada preferencia a su score (con caché)"""
+        params = {"top_k": top_k}
+        if estrategia:
+            params["estrategia"] = estrategia
+
+        key = ResponseCache.make_key("explain", family_data, params)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = get_session().post(
+            "explain",
+            ENDPOINTS["explain"],
+            params=params,
+            **APIClient._body({"family": family_data})
+        )
+
+        result = APIClient._parse(response)
+        response_cache.set(key, result, family=ResponseCache.family_hash(family_data),
+                           model_version=response.headers.get("X-Model-Version"))
+        return result
+
+    @staticmethod
+    def get_compatibility(family_data) -> Dict:
+        """Similitud entre miembros y conflictos por interés (con caché)"""
+        key = ResponseCache.make_key("compatibility", family_data)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = get_session().post("compatibility", ENDPOINTS["compatibility"], **APIClient._body(family_data))
+
+        result = APIClient._parse(response)
+        response_cache.set(key, result, family=ResponseCache.family_hash(family_data),
+                           model_version=response.headers.get("X-Model-Version"))
+        return result
+
+    @staticmethod
+    def get_destinos_por_tipo(params: Dict) -> Dict:
+        """Destinos mejor calificados para un tipo de lugar (revalidados por ETag)"""
+        return APIClient._get_validated("destinos_por_tipo", params)
+
+    @staticmethod
+    def get_destinos_por_tipos(tipos: List[str], params: Dict) -> Dict:
+        """
+        Consulta varios tipos de destino y une los resultados sin duplicados,
+        conservando el mejor score de cada destino.
+
+        Con la estrategia "concurrente" se hace una petición por tipo en
+        paralelo (cada una con su propia entrada en caché); con "lote" se
+        pide todo en una sola llamada a la API.
+        """
+        tipos = list(dict.fromkeys(tipos))
+
+        if MAP_FETCH_CONFIG["estrategia"] == "lote":
+            data = APIClient.get_destinos_por_tipo({**params, "tipo": tipos})
+            return {"resultados": merge_destinos([(None, data)])}
+
+        workers = max(1, min(MAP_FETCH_CONFIG["max_workers"], len(tipos)))
+
+        def fetch(tipo):
+            return tipo, APIClient.get_destinos_por_tipo({**params, "tipo": tipo})
+
+        if workers == 1:
+            respuestas = [fetch(t) for t in tipos]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                respuestas = list(pool.map(fetch, tipos))
+
+        return {"resultados": merge_destinos(respuestas)}
+
+    @staticmethod
+    def buscar_destinos(params: Dict) -> Dict:
+        """Destinos por nombre, cantón, parroquia o descripción (con caché)"""
+        key = ResponseCache.make_key("buscar", params=params)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = get_session().get("buscar", ENDPOINTS["buscar"], params=params)
+
+        result = APIClient._parse(response)
+        response_cache.set(key, result, model_version=response.headers.get("X-Model-Version"))
+        return result
+
+    @staticmethod
+    def get_destinos_en_vista(params: Dict) -> Dict:
+        """Destinos o celdas agrupadas dentro de los límites del mapa (con caché)"""
+        key = ResponseCache.make_key("destinos_en_vista", params=params)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = get_session().get("destinos_en_vista", ENDPOINTS["destinos_en_vista"], params=params)
+
+        result = APIClient._parse(response)
+        response_cache.set(key, result, model_version=response.headers.get("X-Model-Version"))
+        return result
+
+    @staticmethod
+    def get_destino_mas_cercano(params: Dict) -> Dict:
+        """Destino más cercano a una ubicación (revalidado por ETag)"""
+        return APIClient._get_validated("destino_mas_cercano", params)
+
+    @staticmethod
+    def invalidate_family(family_data: Dict):
+        """Descarta las respuestas en caché de una familia"""
+        response_cache.invalidate(ResponseCache.family_hash(family_data))
+
+    @staticmethod
+    def cache_hit_ratio() -> float:
+        """Fracción de consultas respondidas sin ir a la red"""
+        return response_cache.hit_ratio()
     
     @staticmethod
     def check_api_health() -> bool:
@@ -35,75 +407,61 @@ class APIClient:
         Returns:
             True si la API responde, False en caso contrario
         """
+        if get_session().breaker.is_open:
+            return False
         try:
-            # Intentar conectar al endpoint raíz o de salud
-            response = requests.get(
-                ENDPOINTS["recommend"].replace('/api/family/recommend_destinations', ''),
-                timeout=3
-            )
+            response = get_session().get("health", ENDPOINTS["health"], retry=False)
             return response.status_code == 200
-        except:
-            # Intentar directamente con el endpoint
-            try:
-                response = requests.head(
-                    ENDPOINTS["recommend"],
-                    timeout=3
-                )
-                return True
-            except:
-                return False
+        except Exception:
+            return False
+
+
+def merge_destinos(respuestas: List[tuple]) -> List[Dict]:
+    """
+    Une las respuestas de destinos_por_tipo de varios tipos, elimina los
+    destinos repetidos (mismo nombre y coordenadas) y ordena por score
+    """
+    mejores = {}
+    for tipo, data in respuestas:
+        for r in data.get("resultados", []):
+            key = (r["nombre"], round(r["lat"], 5), round(r["lon"], 5))
+            if key not in mejores or r["score_general"] > mejores[key]["score_general"]:
+                mejores[key] = {**r, "tipo": r.get("tipo", tipo)}
+
+    return sorted(mejores.values(), key=lambda r: -r["score_general"])
 
 
-def format_family_data(members: List[Dict]) -> Dict:
+def format_family_data(members: List[Dict], formato: Optional[str] = None) -> Dict:
     """
     Formatea los datos de la familia para enviar a la API
-    Envía SOLO preferencias con rating > 0
+    Envía SOLO preferencias con rating > 0, en forma dispersa (índices y
+    valores alineados a PREFERENCE_ORDER) o como diccionario por columna
     """
+    formato = formato or FAMILY_PAYLOAD_FORMAT
     formatted_members = []
     
     for member in members:
-        flat_preferences = {}
-        
-        pref_mapping = {
-            "iglesias": "Calif promedio iglesias",
-            "resorts": "Calif promedio resorts",
-            "playas": "Calif promedio playas",
-            "parques": "Calif promedio parques",
-            "teatros": "Calif promedio teatros",
-            "museos": "Calif promedio museos",
-            "centros_comerciales": "Calif promedio centros_comerciales",
-            "zoologicos": "Calif promedio zoologicos",
-            "restaurantes": "Calif promedio restaurantes",
-            "bares_pubs": "Calif promedio bares_pubs",
-            "servicios_locales": "Calif promedio servicios_locales",
-            "pizzerias_hamburgueserias": "Calif promedio pizzerias_hamburgueserias",
-            "hoteles_alojamientos": "Calif promedio hoteles_alojamientos",
-            "juguerias": "Calif promedio juguerias",
-            "galerias_arte": "Calif promedio galerias_arte",
-            "discotecas": "Calif promedio discotecas",
-            "piscinas": "Calif promedio piscinas",
-            "gimnasios": "Calif promedio gimnasios",
-            "panaderias": "Calif promedio panaderias",
-            "belleza_spas": "Calif promedio belleza_spas",
-            "cafeterias": "Calif promedio cafeterias",
-            "miradores": "Calif promedio miradores",
-            "monumentos": "Calif promedio monumentos",
-            "jardines": "Calif promedio jardines"
-        }
+        ratings = {}
         
         # Solo agregar preferencias con rating > 0
         for category, items in member.get('preferencias', {}).items():
             for item, rating in items.items():
-                if item in pref_mapping and rating > 0:
-                    col_name = pref_mapping[item]
-                    flat_preferences[col_name] = float(rating)
+                if item in PREFERENCE_INDEX and rating > 0:
+                    ratings[item] = float(rating)
         
         formatted_member = {
             "nombre": member['nombre'],
             "rol": member['rol'],
-            "preferencias": flat_preferences
         }
+
+        if formato == "dict":
+            formatted_member["preferencias"] = {
+                f"Calif promedio {item}": rating for item, rating in ratings.items()
+            }
+        else:
+            formatted_member["indices"] = [PREFERENCE_INDEX[item] for item in ratings]
+            formatted_member["valores"] = list(ratings.values())
         
         formatted_members.append(formatted_member)
     
-    return {"miembros": formatted_members}
\ No newline at end of file
+    return {"miembros": formatted_members}
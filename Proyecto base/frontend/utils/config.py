@@ -10,10 +10,76 @@ API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 # Endpoints
 ENDPOINTS = {
     "recommend": f"{API_BASE_URL}/api/family/recommend_destinations",
+    "explain": f"{API_BASE_URL}/api/family/explain_recommendations",
+    "compatibility": f"{API_BASE_URL}/api/family/compatibility",
     "save_record": f"{API_BASE_URL}/api/family/save_family_record",
+    "destinos_por_tipo": f"{API_BASE_URL}/api/family/destinos_por_tipo",
+    "destino_mas_cercano": f"{API_BASE_URL}/api/family/destino_mas_cercano",
+    "buscar": f"{API_BASE_URL}/api/family/buscar_destinos",
+    "destinos_en_vista": f"{API_BASE_URL}/api/family/destinos_en_vista",
     "health": f"{API_BASE_URL}/" 
 }
 
+# Sesión HTTP compartida (pool keep-alive, reintentos y circuito)
+HTTP_CONFIG = {
+    "pool_connections": int(os.getenv("HTTP_POOL_CONNECTIONS", "4")),
+    "pool_maxsize": int(os.getenv("HTTP_POOL_MAXSIZE", "20")),
+    "max_retries": int(os.getenv("HTTP_MAX_RETRIES", "2")),
+    "backoff_base_s": float(os.getenv("HTTP_BACKOFF_BASE_S", "0.2")),
+    "backoff_max_s": float(os.getenv("HTTP_BACKOFF_MAX_S", "2.0")),
+    "connect_timeout_s": float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "3.05")),
+    "breaker_threshold": int(os.getenv("HTTP_BREAKER_THRESHOLD", "3")),
+    "breaker_cooldown_s": float(os.getenv("HTTP_BREAKER_COOLDOWN_S", "15")),
+}
+
+# Timeout de lectura (segundos) por endpoint
+ENDPOINT_TIMEOUTS = {
+    "recommend": 30,
+    "explain": 30,
+    "compatibility": 10,
+    "save_record": 10,
+    "destinos_por_tipo": 10,
+    "destino_mas_cercano": 10,
+    "buscar": 5,
+    "destinos_en_vista": 5,
+    "health": 3,
+    "default": 30,
+}
+
+# Búsqueda de varios tipos de destino en el mapa:
+#   "concurrente": una petición por tipo en paralelo (max_workers, 1 = en serie)
+#   "lote": una sola petición con todos los tipos
+MAP_FETCH_CONFIG = {
+    "estrategia": os.getenv("MAP_FETCH_STRATEGY", "lote"),
+    "max_workers": int(os.getenv("MAP_FETCH_WORKERS", "6")),
+}
+
+# Render de mapas folium: por encima del umbral los destinos se agrupan con
+# FastMarkerCluster y solo se envían los que caen en la vista actual del mapa
+MAP_RENDER_CONFIG = {
+    "cluster_threshold": int(os.getenv("MAP_CLUSTER_THRESHOLD", "200")),
+    "viewport_padding": float(os.getenv("MAP_VIEWPORT_PADDING", "0.25")),
+}
+
+# Mapas ya construidos que se reutilizan entre reruns mientras no cambien sus datos
+MAP_CACHE_CONFIG = {
+    "enabled": os.getenv("MAP_CACHE_ENABLED", "1") == "1",
+    "max_entries": int(os.getenv("MAP_CACHE_MAX_ENTRIES", "32")),
+}
+
+# Caché de respuestas de la API en el cliente (compartida por el proceso de Streamlit)
+API_CACHE_CONFIG = {
+    "ttl_s": float(os.getenv("API_CACHE_TTL_S", "300")),
+    "max_entries": int(os.getenv("API_CACHE_MAX_ENTRIES", "256")),
+}
+
+# Validadores (ETag) de las respuestas que la API marca con ETag y
+# Cache-Control: pasado su max-age se revalidan con If-None-Match
+API_VALIDATOR_CACHE_CONFIG = {
+    "enabled": os.getenv("API_VALIDATOR_CACHE_ENABLED", "1") == "1",
+    "max_entries": int(os.getenv("API_VALIDATOR_CACHE_MAX_ENTRIES", "256")),
+}
+
 # Configuración de la aplicación
 APP_CONFIG = {
     "page_title": "Family Harmony AI",
@@ -62,6 +128,35 @@ PREFERENCE_CATEGORIES = {
     ]
 }
 
+# Orden de las 24 preferencias en el vector que recibe la API (mismo orden que RATING_COLUMNS)
+PREFERENCE_ORDER = [
+    "iglesias", "resorts", "playas", "parques", "teatros", "museos",
+    "centros_comerciales", "zoologicos", "restaurantes", "bares_pubs",
+    "servicios_locales", "pizzerias_hamburgueserias", "hoteles_alojamientos",
+    "juguerias", "galerias_arte", "discotecas", "piscinas", "gimnasios",
+    "panaderias", "belleza_spas", "cafeterias", "miradores", "monumentos", "jardines"
+]
+
+# Formato de las preferencias enviadas a la API:
+#   "dispersa": índices y valores alineados a PREFERENCE_ORDER
+#   "dict": diccionario {"Calif promedio <preferencia>": rating}
+FAMILY_PAYLOAD_FORMAT = os.getenv("FAMILY_PAYLOAD_FORMAT", "dispersa")
+
+# Formato de los cuerpos enviados a la API y de sus respuestas:
+#   "json": JSON (por defecto)
+#   "msgpack": MessagePack (necesita la librería msgpack; si no está, JSON)
+API_WIRE_FORMAT = os.getenv("API_WIRE_FORMAT", "json")
+
+# Cómo combinar las preferencias de la familia (parámetro `estrategia` de la API).
+# None usa la ruta original: promediar preferencias y predecir una vez.
+CONSENSUS_STRATEGIES = {
+    "Promedio de preferencias": None,
+    "Promedio de satisfacción": "promedio",
+    "Que nadie quede descontento": "minima_miseria",
+    "Máximo entusiasmo": "maximo_placer",
+    "Equidad por rol": "equidad_rol",
+}
+
 # Roles familiares mejorados
 FAMILY_ROLES = [
     "👨‍👩‍👧‍👦 Padres",
@@ -1,6 +1,7 @@
 import pandas as pd
 import streamlit as st
 from utils.config import FAMILY_ROLES
+from utils.api_client import APIClient
 
 def clean_member_preferences(member):
     """Limpia las preferencias de un miembro"""
@@ -29,6 +30,12 @@ def clean_member_preferences(member):
     
     return cleaned
 
+def invalidate_family_cache():
+    """Descarta las respuestas en caché de la última familia consultada"""
+    previous = st.session_state.pop('last_family_payload', None)
+    if previous is not None:
+        APIClient.invalidate_family(previous)
+
 def render_stars(rating):
     """Renderiza estrellas visualmente"""
     stars = ""
@@ -88,6 +95,7 @@ def save_member_simple():
     
     # Limpiar recomendaciones anteriores
     st.session_state.recommendations = None
+    invalidate_family_cache()
     
     # Limpiar temporales
     st.session_state.temp_nombre = ""
@@ -0,0 +1,166 @@
+import importlib.util
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import HTTP_CONFIG, ENDPOINT_TIMEOUTS, API_WIRE_FORMAT
+
+# Códigos que indican un problema transitorio del servidor
+RETRY_STATUS = {502, 503, 504}
+
+# MessagePack solo si se configuró y la librería está instalada
+MSGPACK = "application/msgpack"
+WIRE_MSGPACK = API_WIRE_FORMAT == "msgpack" and importlib.util.find_spec("msgpack") is not None
+
+
+class APIUnavailableError(Exception):
+    """La API se considera caída (circuito abierto) y no se intenta la llamada"""
+
+
+class CircuitBreaker:
+    """
+    Circuito simple por proceso: tras `threshold` fallos consecutivos se abre
+    durante `cooldown_s` segundos; pasado ese tiempo deja pasar una llamada de
+    prueba (semiabierto) y se cierra de nuevo si esta tiene éxito.
+    """
+
+    def __init__(self, threshold: int, cooldown_s: float):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_s or self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.cooldown_s
+
+
+class APISession:
+    """
+    Sesión HTTP compartida por todas las páginas del proceso de Streamlit.
+
+    Mantiene un pool de conexiones keep-alive, reintenta con backoff
+    exponencial y jitter los errores de red y los 502/503/504, aplica el
+    timeout configurado para cada endpoint y deja de llamar a la API mientras
+    el circuito está abierto.
+    """
+
+    def __init__(self, config: dict = HTTP_CONFIG, timeouts: dict = ENDPOINT_TIMEOUTS):
+        self.config = config
+        self.timeouts = timeouts
+        self.breaker = CircuitBreaker(config["breaker_threshold"], config["breaker_cooldown_s"])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=config["pool_connections"],
+            pool_maxsize=config["pool_maxsize"],
+            max_retries=0
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if WIRE_MSGPACK:
+            # Los errores de la API siguen llegando en JSON
+            self.session.headers["Accept"] = f"{MSGPACK}, application/json;q=0.5"
+
+    def _timeout(self, endpoint: str):
+        return (self.config["connect_timeout_s"], self.timeouts.get(endpoint, self.timeouts["default"]))
+
+    def _sleep_backoff(self, attempt: int, retry_after: Optional[str] = None):
+        # Full jitter: espera aleatoria entre 0 y el backoff exponencial
+        limit = min(self.config["backoff_max_s"], self.config["backoff_base_s"] * (2 ** attempt))
+        # Si la API indicó cuándo reintentar (503 por saturación), esperar al menos eso
+        if retry_after and retry_after.isdigit():
+            wait = min(self.config["backoff_max_s"], float(retry_after))
+            time.sleep(wait + random.uniform(0, limit))
+            return
+        time.sleep(random.uniform(0, limit))
+
+    def request(self, method: str, endpoint: str, url: str, retry: bool = True, **kwargs) -> requests.Response:
+        """
+        Ejecuta una petición contra la API
+
+        Args:
+            method: Método HTTP
+            endpoint: Nombre del endpoint en ENDPOINTS (define el timeout)
+            url: URL completa
+            retry: False para operaciones no idempotentes
+
+        Raises:
+            APIUnavailableError: si el circuito está abierto
+            requests.RequestException: si se agotan los reintentos
+        """
+        if not self.breaker.allow():
+            raise APIUnavailableError("La API no está disponible, se reintentará en unos segundos")
+
+        kwargs.setdefault("timeout", self._timeout(endpoint))
+        attempts = 1 + (self.config["max_retries"] if retry else 0)
+
+        for attempt in range(attempts):
+            retry_after = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == attempts - 1:
+                    self.breaker.record_failure()
+                    raise
+            except requests.RequestException:
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    self.breaker.record_success()
+                    return response
+                if attempt == attempts - 1:
+                    self.breaker.record_failure()
+                    return response
+                retry_after = response.headers.get("Retry-After")
+            self._sleep_backoff(attempt, retry_after)
+
+    def get(self, endpoint: str, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, url, **kwargs)
+
+    def post(self, endpoint: str, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, url, **kwargs)
+
+
+_session: Optional[APISession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> APISession:
+    """Devuelve la sesión única del proceso, creándola la primera vez"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = APISession()
+    return _session
@@ -1,9 +1,15 @@
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 import folium
-from streamlit_folium import folium_static
+from utils.config import MAP_RENDER_CONFIG, MAP_CACHE_CONFIG
 
 def create_preference_radar(member_data: Dict) -> go.Figure:
     """
@@ -99,6 +105,119 @@ def create_family_comparison_chart(members: List[Dict]) -> go.Figure:
     return fig
 
 
+def create_contribution_chart(contribuciones: Dict[str, float], base: float,
+                              preferencias_familia: List[str], max_items: int = 12) -> go.Figure:
+    """
+    Crea un gráfico de barras horizontales con la contribución de cada
+    preferencia al score de un destino
+
+    Args:
+        contribuciones: Contribución por actividad (ya ordenada)
+        base: Valor base del modelo
+        preferencias_familia: Actividades que indicó la familia (se resaltan)
+        max_items: Máximo de actividades a mostrar (las de mayor efecto)
+
+    Returns:
+        Figura de Plotly
+    """
+    items = sorted(contribuciones.items(), key=lambda kv: abs(kv[1]), reverse=True)[:max_items]
+    items.reverse()
+
+    fig = go.Figure(go.Bar(
+        x=[v for _, v in items],
+        y=[k.replace('_', ' ').title() for k, _ in items],
+        orientation='h',
+        marker_color=[
+            ('#764ba2' if k in preferencias_familia else '#667eea') if v >= 0 else '#e74c3c'
+            for k, v in items
+        ],
+        hovertemplate='%{y}: %{x:+.3f}<extra></extra>'
+    ))
+
+    score = base + sum(contribuciones.values())
+    fig.update_layout(
+        title=f'Score {score:.2f} = base {base:.2f} + contribuciones',
+        xaxis_title='Contribución al score',
+        height=450,
+        margin=dict(l=10, r=10, t=50, b=10)
+    )
+
+    return fig
+
+
+def create_similarity_heatmap(nombres: List[str], matriz: List[List[Optional[float]]],
+                              comunes: List[List[int]]) -> go.Figure:
+    """
+    Crea un mapa de calor con la similitud entre cada par de miembros
+
+    Args:
+        nombres: Nombres de los miembros
+        matriz: Similitud por par (-1 a 1; None si no es comparable)
+        comunes: Intereses calificados por ambos miembros de cada par
+
+    Returns:
+        Figura de Plotly
+    """
+    texto = [
+        [f"{v:+.2f}" if v is not None else "-" for v in fila]
+        for fila in matriz
+    ]
+
+    fig = go.Figure(go.Heatmap(
+        z=[[v if v is not None else float('nan') for v in fila] for fila in matriz],
+        x=nombres,
+        y=nombres,
+        zmin=-1,
+        zmax=1,
+        colorscale='RdYlGn',
+        text=texto,
+        texttemplate='%{text}',
+        customdata=comunes,
+        hovertemplate='%{y} / %{x}: %{text}<br>%{customdata} intereses en común<extra></extra>'
+    ))
+
+    fig.update_layout(
+        height=400,
+        yaxis_autorange='reversed',
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+
+    return fig
+
+
+def create_conflict_chart(conflictos: List[Dict], max_items: int = 10) -> go.Figure:
+    """
+    Crea un gráfico de barras con los intereses en los que más discrepan los miembros
+
+    Args:
+        conflictos: Conflictos por interés, de mayor a menor
+        max_items: Máximo de intereses a mostrar
+
+    Returns:
+        Figura de Plotly
+    """
+    items = list(reversed(conflictos[:max_items]))
+
+    fig = go.Figure(go.Bar(
+        x=[c['conflicto'] for c in items],
+        y=[c['interes'].replace('_', ' ').title() for c in items],
+        orientation='h',
+        marker_color='#e74c3c',
+        customdata=[[c['minimo'], c['maximo'], c['miembros']] for c in items],
+        hovertemplate='%{y}: %{x:.2f}<br>de %{customdata[0]:.0f} a %{customdata[1]:.0f} '
+                      '(%{customdata[2]} miembros)<extra></extra>'
+    ))
+
+    fig.update_layout(
+        title='Intereses en conflicto',
+        xaxis=dict(range=[0, 1], title='Conflicto'),
+        height=400,
+        margin=dict(l=10, r=10, t=50, b=10)
+    )
+
+    return fig
+
+
 def create_score_gauge(score: float, max_score: float = 5.0) -> go.Figure:
     """
     Crea un medidor de puntuación para un destino
@@ -142,3 +261,246 @@ def create_score_gauge(score: float, max_score: float = 5.0) -> go.Figure:
     
     return fig
 
+
+# ========== MAPAS ==========
+
+# El popup de cada punto se arma en el navegador solo cuando se abre, así el
+# HTML del mapa lleva una fila compacta por destino y no un popup completo.
+# Cada fila es [lat, lon, ranking, nombre, ubicación, score, distancia_km].
+CLUSTER_CALLBACK = """
+function (row) {
+    function esc(t) {
+        return String(t).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    }
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(function () {
+        var html = '<div style="width: 230px">' +
+            '<h4><i class="fas fa-map-pin"></i> #' + row[2] + ' ' + esc(row[3]) + '</h4>' +
+            '<p><b><i class="fas fa-map-marker-alt"></i></b> ' + esc(row[4]) + '</p>' +
+            '<p><b><i class="fas fa-star"></i> Score:</b> ' + Number(row[5]).toFixed(2) + '/5</p>';
+        if (row[6] !== null) {
+            html += '<p><b><i class="fas fa-road"></i> Distancia:</b> ' + row[6] + ' km</p>';
+        }
+        return html + '</div>';
+    }, {maxWidth: 300});
+    marker.bindTooltip('#' + row[2] + ' - ' + esc(row[3]));
+    return marker;
+}
+"""
+
+
+def use_cluster_mode(n_points: int) -> bool:
+    """Indica si un mapa con n_points destinos debe agruparse en clusters"""
+    return n_points > MAP_RENDER_CONFIG["cluster_threshold"]
+
+
+def get_map_view(key: str) -> Optional[Dict]:
+    """Última vista (centro, zoom y límites) que devolvió st_folium para este mapa"""
+    import streamlit as st
+
+    return st.session_state.get(f"{key}_vista")
+
+
+def filter_to_viewport(destinos: List[Dict], vista: Optional[Dict]) -> List[tuple]:
+    """
+    Devuelve (ranking, destino) de los destinos dentro de los límites de la
+    vista, ampliados por un margen para que el paneo corto no deje huecos.
+    Sin vista se devuelven todos. El ranking se calcula antes de filtrar.
+    """
+    ranked = list(enumerate(destinos, 1))
+    if not vista or not vista.get("bounds"):
+        return ranked
+
+    sw, ne = vista["bounds"]["_southWest"], vista["bounds"]["_northEast"]
+    pad = MAP_RENDER_CONFIG["viewport_padding"]
+    dlat, dlon = (ne["lat"] - sw["lat"]) * pad, (ne["lng"] - sw["lng"]) * pad
+    lat_min, lat_max = sw["lat"] - dlat, ne["lat"] + dlat
+    lon_min, lon_max = sw["lng"] - dlon, ne["lng"] + dlon
+
+    return [
+        (idx, d) for idx, d in ranked
+        if lat_min <= d["lat"] <= lat_max and lon_min <= d["lon"] <= lon_max
+    ]
+
+
+def add_destination_cluster(m: folium.Map, ranked: List[tuple]) -> None:
+    """
+    Agrega los destinos como un FastMarkerCluster con popups diferidos
+
+    Args:
+        m: Mapa destino
+        ranked: Lista de (ranking, destino) ya filtrada a la vista
+    """
+    from folium import plugins
+
+    rows = [
+        [
+            d["lat"], d["lon"], idx, d.get("nombre", ""),
+            ", ".join(str(d[k]) for k in ("provincia", "canton") if d.get(k)),
+            d.get("predicted_score") or d.get("score_general") or 0,
+            d.get("distancia_km"),
+        ]
+        for idx, d in ranked
+    ]
+    plugins.FastMarkerCluster(rows, callback=CLUSTER_CALLBACK).add_to(m)
+
+
+def view_params(vista: Optional[Dict], center: List[float], zoom: int,
+                width_px: int = 900, height_px: int = 650) -> Dict:
+    """
+    Límites y zoom de la vista para /destinos_en_vista. Sin vista se estiman
+    a partir del centro y el zoom iniciales. Los límites se redondean hacia
+    afuera a la grilla de celdas del zoom (la misma de la API), así que un
+    paneo corto repite la consulta y sale de la caché del cliente.
+    """
+    if vista and vista.get("bounds") and vista.get("zoom") is not None:
+        sw, ne = vista["bounds"]["_southWest"], vista["bounds"]["_northEast"]
+        zoom = int(vista["zoom"])
+        lat_min, lat_max, lon_min, lon_max = sw["lat"], ne["lat"], sw["lng"], ne["lng"]
+    else:
+        # 256 px por tesela: en el zoom z una tesela abarca 360 / 2**z grados
+        grados_px = 360 / 256 / 2 ** zoom
+        lat_min, lat_max = center[0] - height_px / 2 * grados_px, center[0] + height_px / 2 * grados_px
+        lon_min, lon_max = center[1] - width_px / 2 * grados_px, center[1] + width_px / 2 * grados_px
+
+    g = 360 / 2 ** (zoom + 2)
+    return {
+        "lat_min": max(-90.0, math.floor(lat_min / g) * g),
+        "lat_max": min(90.0, math.ceil(lat_max / g) * g),
+        "lon_min": max(-180.0, math.floor(lon_min / g) * g),
+        "lon_max": min(180.0, math.ceil(lon_max / g) * g),
+        "zoom": zoom,
+    }
+
+
+def add_grid_clusters(m: folium.Map, clusters: List[Dict]) -> None:
+    """
+    Agrega las celdas agrupadas de /destinos_en_vista: un círculo por celda en
+    su centroide, de tamaño según la cantidad de destinos y color según el
+    score medio. Las celdas con un solo destino se muestran como ese destino.
+    """
+    if not clusters:
+        return
+    mayor = max(c["cantidad"] for c in clusters)
+    for c in clusters:
+        destacado = c["destacado"]
+        if c["cantidad"] == 1:
+            folium.CircleMarker(
+                location=[c["lat"], c["lon"]], radius=5, color="#e67e22", fill=True, fill_opacity=0.9,
+                tooltip=f"{destacado['nombre']} ({destacado['score_general']:.2f}/5)",
+            ).add_to(m)
+            continue
+        score = c["score_medio"]
+        color = "#27ae60" if score >= 3.5 else "#f39c12" if score >= 2.5 else "#c0392b"
+        folium.CircleMarker(
+            location=[c["lat"], c["lon"]],
+            radius=8 + 17 * math.sqrt(c["cantidad"] / mayor),
+            color=color, fill=True, fill_opacity=0.55, weight=1,
+            popup=folium.Popup(
+                f"<b>{c['cantidad']} destinos</b><br>"
+                f"Score medio: {score:.2f}/5<br>"
+                f"Destacado: {destacado['nombre']} ({destacado['score_general']:.2f}/5)",
+                max_width=260,
+            ),
+            tooltip=f"{c['cantidad']} destinos · {score:.2f}/5",
+        ).add_to(m)
+
+
+class CachedMap:
+    """Mapa ya construido junto con su HTML, que se genera una sola vez"""
+
+    def __init__(self, m: folium.Map):
+        self.map = m
+        self.rendered = False
+        self._html: Optional[str] = None
+        # folium modifica el objeto al serializarlo: un render a la vez
+        self.lock = threading.Lock()
+
+    @property
+    def html(self) -> str:
+        with self.lock:
+            if self._html is None:
+                self._html = self.map.get_root().render()
+            return self._html
+
+
+_map_cache: "OrderedDict[str, CachedMap]" = OrderedDict()
+_map_cache_lock = threading.Lock()
+
+
+def map_fingerprint(*inputs) -> str:
+    """Huella de los datos de entrada de un mapa (incluye la configuración de render)"""
+    raw = json.dumps([inputs, MAP_RENDER_CONFIG], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_map(key: str, fingerprint: str, builder: Callable[[], Optional[folium.Map]]) -> Optional[CachedMap]:
+    """
+    Devuelve el mapa para esta huella sin reconstruirlo si ya existe: primero
+    en la sesión (último mapa mostrado con esta key) y luego en la caché del
+    proceso, compartida entre sesiones. Si no, lo construye con builder().
+    """
+    import streamlit as st
+
+    if not MAP_CACHE_CONFIG["enabled"]:
+        m = builder()
+        return CachedMap(m) if m is not None else None
+
+    session_key = f"{key}_mapa_cache"
+    stored = st.session_state.get(session_key)
+    if stored and stored[0] == fingerprint:
+        return stored[1]
+
+    with _map_cache_lock:
+        entry = _map_cache.get(fingerprint)
+        if entry is not None:
+            _map_cache.move_to_end(fingerprint)
+
+    if entry is None:
+        m = builder()
+        if m is None:
+            return None
+        entry = CachedMap(m)
+        with _map_cache_lock:
+            entry = _map_cache.setdefault(fingerprint, entry)
+            while len(_map_cache) > MAP_CACHE_CONFIG["max_entries"]:
+                _map_cache.popitem(last=False)
+
+    st.session_state[session_key] = (fingerprint, entry)
+    return entry
+
+
+def show_map(entry: CachedMap, key: str, height: int, track_view: bool):
+    """
+    Muestra el mapa. Solo si track_view es True se usa st_folium para pedir
+    de vuelta centro, zoom y límites (cada paneo provoca un rerun) y se
+    guardan para filtrar los puntos del siguiente render.
+
+    Sin seguimiento de la vista el mapa se muestra como HTML estático ya
+    serializado: un mapa reutilizado de la caché no se vuelve a generar y,
+    como su HTML no cambia, el navegador tampoco lo remonta.
+    """
+    import streamlit as st
+    from streamlit.components.v1 import html
+    from streamlit_folium import st_folium
+
+    if not track_view:
+        html(entry.html, height=height)
+        return None
+
+    with entry.lock:
+        data = st_folium(
+            entry.map, key=key, height=height, use_container_width=True,
+            returned_objects=["bounds", "center", "zoom"], render=not entry.rendered
+        )
+        entry.rendered = True
+
+    if track_view and data and (data.get("bounds") or {}).get("_southWest", {}).get("lat") is not None:
+        st.session_state[f"{key}_vista"] = {
+            "bounds": data["bounds"],
+            "center": data.get("center"),
+            "zoom": data.get("zoom"),
+        }
+    return data